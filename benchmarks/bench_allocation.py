@@ -0,0 +1,121 @@
+import argparse
+import json
+import pathlib
+import random
+import sys
+import timeit
+from collections import OrderedDict
+from typing import Any, Callable
+
+# Ensure src/ is in the import path
+SRC_DIR = pathlib.Path(__file__).parent.parent / "src"
+sys.path.insert(0, SRC_DIR.as_posix())
+
+from pydhcp.allocation import AddressPool, Allocator, HashAllocator, SequentialAllocator
+from pydhcp.lease import InMemoryLeaseBackend
+from pydhcp.network import IPv4
+
+POOL_SIZE = 4096
+FILL = 0.8
+"""Fraction of the pool the benchmark clients occupy."""
+
+
+def _clients(count: int) -> list[str]:
+    return [f"01:02:00:00:{i >> 8:02X}:{i & 0xFF:02X}" for i in range(count)]
+
+
+def allocate_all(allocator: Allocator, pool: AddressPool, clients: list[str]) -> dict[str, IPv4]:
+    """Allocate every client in turn, the way `DhcpServer.allocate_address` checks for use."""
+    backend = InMemoryLeaseBackend()
+    assigned = {}
+    for client_id in clients:
+        ip = allocator.select(client_id, pool, lambda candidate: backend.lookup_ip(candidate) is not None)
+        assert ip is not None
+        backend.allocate(client_id, ip, 3600)
+        assigned[client_id] = ip
+    return assigned
+
+
+def stability(factory: Callable[[], Allocator], pool: AddressPool, clients: list[str]) -> float:
+    """Fraction of clients given the same address after a restart that lost the lease table.
+
+    After the restart clients return in a different order, as they would
+    when their renewals come due.
+    """
+    before = allocate_all(factory(), pool, clients)
+    returning = list(clients)
+    random.Random(0).shuffle(returning)
+    after = allocate_all(factory(), pool, returning)
+    return sum(before[client_id] == after[client_id] for client_id in clients) / len(clients)
+
+
+def _measure_benchmarks(iterations: int) -> OrderedDict[str, dict[str, Any]]:
+    pool = AddressPool(IPv4("10.0.0.0"), IPv4(int(IPv4("10.0.0.0")) + POOL_SIZE - 1))
+    clients = _clients(int(POOL_SIZE * FILL))
+    benchmarks: OrderedDict[str, dict[str, Any]] = OrderedDict()
+    for name, factory in (("sequential", SequentialAllocator), ("hash", HashAllocator)):
+        seconds = timeit.timeit(lambda: allocate_all(factory(), pool, clients), number=iterations)
+        allocations = iterations * len(clients)
+        benchmarks[f"{name}_allocate_{len(clients)}_clients"] = {
+            "seconds": seconds,
+            "ops_per_sec": allocations / seconds,
+            "iterations": iterations,
+        }
+        benchmarks[f"{name}_restart_stability"] = {
+            "same_address_ratio": stability(factory, pool, clients),
+            "clients": len(clients),
+        }
+    return benchmarks
+
+
+def _print_benchmarks(iterations: int, benchmarks: OrderedDict[str, dict[str, Any]]) -> None:
+    print(f"--- Running Address Allocation Benchmarks ({iterations:,} iterations, {POOL_SIZE} address pool at {FILL:.0%}) ---")
+    for name, result in benchmarks.items():
+        if "same_address_ratio" in result:
+            print(f"{name}: {result['same_address_ratio']:.1%} of {result['clients']} clients keep their address")
+        else:
+            print(f"{name}: {result['seconds']:.4f}s ({result['ops_per_sec']:.1f} allocations/sec)")
+
+
+def run_benchmarks(iterations: int = 10) -> OrderedDict[str, dict[str, Any]]:
+    benchmarks = _measure_benchmarks(iterations)
+    _print_benchmarks(iterations, benchmarks)
+    return benchmarks
+
+
+def write_json_report(
+    json_output: pathlib.Path,
+    iterations: int,
+    benchmarks: OrderedDict[str, dict[str, Any]],
+) -> None:
+    payload = {
+        "benchmark": "bench_allocation",
+        "python": sys.version.split()[0],
+        "iterations": iterations,
+        "metrics": benchmarks,
+    }
+    json_output.parent.mkdir(parents=True, exist_ok=True)
+    json_output.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare sequential and hash-based address allocation.")
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=10,
+        help="Number of times each allocator fills the pool.",
+    )
+    parser.add_argument(
+        "--json-output",
+        type=pathlib.Path,
+        help="Optional path to write structured benchmark results as JSON.",
+    )
+    args = parser.parse_args()
+    benchmarks = run_benchmarks(iterations=args.iterations)
+    if args.json_output is not None:
+        write_json_report(args.json_output, args.iterations, benchmarks)
+
+
+if __name__ == "__main__":
+    main()
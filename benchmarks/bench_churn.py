@@ -0,0 +1,144 @@
+import argparse
+import json
+import logging
+import pathlib
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any
+
+# Ensure src/ is in the import path
+SRC_DIR = pathlib.Path(__file__).parent.parent / "src"
+sys.path.insert(0, SRC_DIR.as_posix())
+
+from pydhcp.clock import VirtualClock
+from pydhcp.lease.journal import JournalLeaseBackend
+from pydhcp.log import LOGGER
+from pydhcp.simulate import ChurnReport, LeaseChurnSimulation
+
+DURATION = 86400.0
+EXHAUSTION_CLIENTS = 200
+"""Every DISCOVER an exhausted pool turns away probes the whole pool, so that run stays small."""
+TRACED_CLIENTS = 2_000
+"""Tracing memory slows the simulation several times, so it is measured at no more than this."""
+
+
+def _result(report: ChurnReport, seconds: float) -> dict[str, Any]:
+    return {
+        "clients": report.clients,
+        "pool_size": report.pool_size,
+        "seconds": seconds,
+        "packets": report.packets,
+        "packets_per_sec": report.packets / seconds if seconds else 0.0,
+        "speedup": report.duration / seconds if seconds else 0.0,
+        "peak_leases": report.peak_leases,
+        "discovers_unanswered": report.discovers_unanswered,
+        "exhausted_at": report.exhausted_at,
+        "backend_writes": report.backend_writes,
+        "persisted_writes": report.persisted_writes,
+        "peak_traced_bytes": report.peak_traced_bytes,
+    }
+
+
+def _run(simulation: LeaseChurnSimulation) -> dict[str, Any]:
+    start = time.perf_counter()
+    report = simulation.run(DURATION)
+    return _result(report, time.perf_counter() - start)
+
+
+def _measure_benchmarks(iterations: int) -> OrderedDict[str, dict[str, Any]]:
+    benchmarks: OrderedDict[str, dict[str, Any]] = OrderedDict()
+    benchmarks[f"in_memory_{iterations}_clients"] = _run(LeaseChurnSimulation(iterations))
+    benchmarks[f"direct_{iterations}_clients"] = _run(LeaseChurnSimulation(iterations, wire=False))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        clock = VirtualClock()
+        backend = JournalLeaseBackend(str(pathlib.Path(tmp) / "leases.json"), fsync="none", clock=clock)
+        try:
+            result = _run(LeaseChurnSimulation(iterations, lease_backend=backend, clock=clock))
+        finally:
+            backend.close()
+        result["compactions"] = backend.compactions
+        benchmarks[f"journal_{iterations}_clients"] = result
+
+    exhaustion = min(iterations, EXHAUSTION_CLIENTS)
+    # An exhausted pool logs a warning per DISCOVER turned away.
+    level = LOGGER.level
+    LOGGER.setLevel(logging.ERROR)
+    try:
+        benchmarks[f"quarter_pool_{exhaustion}_clients"] = _run(
+            LeaseChurnSimulation(exhaustion, pool_size=max(1, exhaustion // 4), lease_time=4 * 3600, release_ratio=0.0)
+        )
+    finally:
+        LOGGER.setLevel(level)
+
+    traced = min(iterations, TRACED_CLIENTS)
+    simulation = LeaseChurnSimulation(traced, trace_memory=True)
+    result = _run(simulation)
+    samples = simulation.report.samples
+    result["traced_bytes_per_lease"] = samples[-1].traced_bytes / max(1, samples[-1].leases)  # type: ignore[operator]
+    result["traced_growth_bytes"] = samples[-1].traced_bytes - samples[0].traced_bytes  # type: ignore[operator]
+    benchmarks[f"traced_{traced}_clients"] = result
+    return benchmarks
+
+
+def _print_benchmarks(iterations: int, benchmarks: OrderedDict[str, dict[str, Any]]) -> None:
+    print(f"--- Running Lease Churn Simulation Benchmarks ({iterations:,} clients, one day) ---")
+    for name, result in benchmarks.items():
+        line = (
+            f"{name}: {result['seconds']:.2f}s ({result['speedup']:,.0f}x real time), "
+            f"{result['packets']:,} packets, peak {result['peak_leases']:,}/{result['pool_size']:,} leases, "
+            f"{result['backend_writes']:,} backend writes"
+        )
+        if result["persisted_writes"] is not None:
+            line += f", {result['persisted_writes']:,} persisted"
+        if result["discovers_unanswered"]:
+            line += f", {result['discovers_unanswered']:,} DISCOVERs unanswered from {result['exhausted_at']:.0f}s"
+        if "traced_bytes_per_lease" in result:
+            line += f", {result['traced_bytes_per_lease']:.0f} traced bytes/lease"
+        print(line)
+
+
+def run_benchmarks(iterations: int = 10_000) -> OrderedDict[str, dict[str, Any]]:
+    benchmarks = _measure_benchmarks(iterations)
+    _print_benchmarks(iterations, benchmarks)
+    return benchmarks
+
+
+def write_json_report(
+    json_output: pathlib.Path,
+    iterations: int,
+    benchmarks: OrderedDict[str, dict[str, Any]],
+) -> None:
+    payload = {
+        "benchmark": "bench_churn",
+        "python": sys.version.split()[0],
+        "iterations": iterations,
+        "metrics": benchmarks,
+    }
+    json_output.parent.mkdir(parents=True, exist_ok=True)
+    json_output.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Simulate a day of lease churn on virtual time.")
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=10_000,
+        help="Number of simulated clients.",
+    )
+    parser.add_argument(
+        "--json-output",
+        type=pathlib.Path,
+        help="Optional path to write structured benchmark results as JSON.",
+    )
+    args = parser.parse_args()
+    benchmarks = run_benchmarks(iterations=args.iterations)
+    if args.json_output is not None:
+        write_json_report(args.json_output, args.iterations, benchmarks)
+
+
+if __name__ == "__main__":
+    main()
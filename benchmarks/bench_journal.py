@@ -0,0 +1,143 @@
+import argparse
+import json
+import pathlib
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any
+
+# Ensure src/ is in the import path
+SRC_DIR = pathlib.Path(__file__).parent.parent / "src"
+sys.path.insert(0, SRC_DIR.as_posix())
+
+from pydhcp.lease import DhcpLease, FileLeaseBackend, JournalLeaseBackend, lease_to_json
+from pydhcp.network import IPv4
+from pydhcp.options import DhcpOptions
+
+LEASES = 100_000
+FILE_WRITES = 5
+"""FileLeaseBackend rewrites every lease per write, so it is only timed this many times."""
+POLICIES = ("always", "group", "interval", "none")
+
+
+def _ip(i: int) -> IPv4:
+    return IPv4(0x0A000000 + i)
+
+
+def write_lease_file(path: pathlib.Path, count: int) -> None:
+    """Write `count` leases in the FileLeaseBackend format, without going through a backend."""
+    lease = DhcpLease(ip=None, expires=float("inf"), options=DhcpOptions())
+    data = {}
+    for i in range(count):
+        record = lease_to_json(lease._replace(ip=_ip(i)))
+        data[f"client-{i}"] = record
+    path.write_text(json.dumps(data), encoding="utf-8")
+
+
+def _time_writes(backend: Any, writes: int) -> float:
+    start = time.perf_counter()
+    for i in range(writes):
+        backend.allocate(f"new-{i}", _ip(LEASES + i), 3600)
+    return time.perf_counter() - start
+
+
+def _measure_benchmarks(iterations: int) -> OrderedDict[str, dict[str, Any]]:
+    benchmarks: OrderedDict[str, dict[str, Any]] = OrderedDict()
+    with tempfile.TemporaryDirectory() as tmp:
+        base = pathlib.Path(tmp) / "base.json"
+        write_lease_file(base, LEASES)
+
+        path = pathlib.Path(tmp) / "file.json"
+        path.write_bytes(base.read_bytes())
+        writes = min(iterations, FILE_WRITES)
+        seconds = _time_writes(FileLeaseBackend(str(path)), writes)
+        benchmarks[f"file_allocate_{LEASES}_leases"] = {
+            "seconds": seconds,
+            "ops_per_sec": writes / seconds,
+            "iterations": writes,
+        }
+
+        for policy in POLICIES:
+            path = pathlib.Path(tmp) / f"{policy}.json"
+            path.write_bytes(base.read_bytes())
+            backend = JournalLeaseBackend(str(path), fsync=policy, compact_threshold=iterations + 1)
+            seconds = _time_writes(backend, iterations)
+            backend.close()
+            benchmarks[f"journal_{policy}_allocate_{LEASES}_leases"] = {
+                "seconds": seconds,
+                "ops_per_sec": iterations / seconds,
+                "iterations": iterations,
+            }
+
+        # The "none" run left `iterations` records in its journal to replay.
+        path = pathlib.Path(tmp) / "none.json"
+        start = time.perf_counter()
+        backend = JournalLeaseBackend(str(path), fsync="none")
+        benchmarks[f"journal_startup_{LEASES}_leases"] = {
+            "seconds": time.perf_counter() - start,
+            "replayed_records": backend.records,
+        }
+        start = time.perf_counter()
+        backend.compact()
+        benchmarks[f"journal_compact_{LEASES}_leases"] = {
+            "seconds": time.perf_counter() - start,
+            "snapshot_bytes": path.stat().st_size,
+        }
+        backend.close()
+    return benchmarks
+
+
+def _print_benchmarks(iterations: int, benchmarks: OrderedDict[str, dict[str, Any]]) -> None:
+    print(f"--- Running Lease Journal Benchmarks ({iterations:,} iterations, {LEASES:,} leases) ---")
+    for name, result in benchmarks.items():
+        if "ops_per_sec" in result:
+            print(f"{name}: {result['seconds']:.4f}s ({result['ops_per_sec']:.1f} writes/sec)")
+        elif "replayed_records" in result:
+            print(f"{name}: {result['seconds']:.4f}s (replayed {result['replayed_records']:,} records)")
+        else:
+            print(f"{name}: {result['seconds']:.4f}s ({result['snapshot_bytes']:,} byte snapshot)")
+
+
+def run_benchmarks(iterations: int = 1000) -> OrderedDict[str, dict[str, Any]]:
+    benchmarks = _measure_benchmarks(iterations)
+    _print_benchmarks(iterations, benchmarks)
+    return benchmarks
+
+
+def write_json_report(
+    json_output: pathlib.Path,
+    iterations: int,
+    benchmarks: OrderedDict[str, dict[str, Any]],
+) -> None:
+    payload = {
+        "benchmark": "bench_journal",
+        "python": sys.version.split()[0],
+        "iterations": iterations,
+        "metrics": benchmarks,
+    }
+    json_output.parent.mkdir(parents=True, exist_ok=True)
+    json_output.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare whole-file and journaled lease persistence.")
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=1000,
+        help="Number of lease writes timed per journal fsync policy.",
+    )
+    parser.add_argument(
+        "--json-output",
+        type=pathlib.Path,
+        help="Optional path to write structured benchmark results as JSON.",
+    )
+    args = parser.parse_args()
+    benchmarks = run_benchmarks(iterations=args.iterations)
+    if args.json_output is not None:
+        write_json_report(args.json_output, args.iterations, benchmarks)
+
+
+if __name__ == "__main__":
+    main()
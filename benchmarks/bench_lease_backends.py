@@ -0,0 +1,428 @@
+import argparse
+import datetime
+import gc
+import json
+import pathlib
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from typing import Any, Callable, NamedTuple, Optional, Union
+
+# Ensure src/ is in the import path
+SRC_DIR = pathlib.Path(__file__).parent.parent / "src"
+sys.path.insert(0, SRC_DIR.as_posix())
+
+from pydhcp.lease import DhcpLease, FileLeaseBackend, InMemoryLeaseBackend, JournalLeaseBackend, LeaseRecord, pack_options
+from pydhcp.lease.cached import CachedLeaseBackend
+from pydhcp.lease.mmapped import MmapLeaseBackend
+from pydhcp.lease.shared import SharedMemoryLeaseBackend
+from pydhcp.lease.sqlite import _UPSERT, SqliteLeaseBackend
+from pydhcp.lease.threadsafe import ThreadSafeLeaseBackend
+from pydhcp.leasestore import LeaseStoreServer, RemoteLeaseBackend
+from pydhcp.network import IPv4
+from pydhcp.options import DhcpOptionCode, DhcpOptions
+
+SIZES = (10_000, 100_000, 1_000_000)
+"""Lease table sizes every backend is measured at."""
+THREADS = 4
+"""Threads sharing one backend in the concurrent runs."""
+OPERATIONS = ("allocate", "lookup", "renew", "release")
+CONCURRENT_OPERATIONS = ("allocate", "lookup", "renew")
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class BackendSpec(NamedTuple):
+    name: str
+    open: Callable[[pathlib.Path, int], tuple[Any, Callable[[], None]]]
+    """Create the backend under a directory holding `count` one-hour leases; return it and a cleanup."""
+    write_limit: Optional[int] = None
+    """Most writes timed per operation, for backends whose every write rewrites the whole table."""
+    max_size: Optional[int] = None
+    """Largest table the backend is measured at."""
+
+
+def _options() -> DhcpOptions:
+    options = DhcpOptions()
+    options[DhcpOptionCode.SUBNET_MASK] = IPv4("255.0.0.0")
+    options[DhcpOptionCode.ROUTER] = [IPv4("10.0.0.1")]
+    options[DhcpOptionCode.IP_ADDRESS_LEASE_TIME] = 3600
+    return options
+
+
+def _chaddr(i: int) -> bytes:
+    return (0x020000000000 + i).to_bytes(6, "big")
+
+
+def fill_memory(backend: InMemoryLeaseBackend, count: int) -> None:
+    """Load `count` one-hour leases into an in-memory backend without going through `allocate`."""
+    now = time.time()
+    options = backend._option_sets.intern(_options())
+    backend._store_all(
+        (f"client-{i}", LeaseRecord(0x0A000000 + i, now + 3600, now, _chaddr(i), options)) for i in range(count)
+    )
+
+
+def fill_sqlite(backend: SqliteLeaseBackend, count: int) -> None:
+    now = time.time()
+    packed = pack_options(_options())
+    records = ((f"client-{i}", 0x0A000000 + i, now + 3600, packed, _chaddr(i), now) for i in range(count))
+    with backend._conn:
+        backend._conn.execute("BEGIN")
+        backend._conn.executemany(_UPSERT, records)
+
+
+def fill_mmap(backend: Union[MmapLeaseBackend, SharedMemoryLeaseBackend], count: int) -> None:
+    now = time.time()
+    options = _options()
+    expires = datetime.datetime.fromtimestamp(now + 3600)
+    for i in range(count):
+        backend._bind(f"client-{i}", DhcpLease(IPv4(0x0A000000 + i), expires, options), touched=now)
+
+
+def _open_memory(tmp: pathlib.Path, count: int) -> tuple[Any, Callable[[], None]]:
+    backend = InMemoryLeaseBackend()
+    fill_memory(backend, count)
+    return backend, lambda: None
+
+
+def _open_file(file_format: str) -> Callable[[pathlib.Path, int], tuple[Any, Callable[[], None]]]:
+    def open_file(tmp: pathlib.Path, count: int) -> tuple[Any, Callable[[], None]]:
+        backend = FileLeaseBackend(str(tmp / "leases"), file_format=file_format)
+        fill_memory(backend, count)
+        backend._save()
+        return backend, lambda: None
+
+    return open_file
+
+
+def _open_journal(tmp: pathlib.Path, count: int) -> tuple[Any, Callable[[], None]]:
+    backend = JournalLeaseBackend(str(tmp / "leases.json"), compact_threshold=1 << 62)
+    fill_memory(backend, count)
+    backend.compact()
+    return backend, backend.close
+
+
+def _open_sqlite(tmp: pathlib.Path, count: int) -> tuple[Any, Callable[[], None]]:
+    backend = SqliteLeaseBackend(str(tmp / "leases.db"))
+    fill_sqlite(backend, count)
+    return backend, backend.close
+
+
+def _open_mmap(tmp: pathlib.Path, count: int) -> tuple[Any, Callable[[], None]]:
+    capacity = 1 << max(count * 2, 1024).bit_length()
+    backend = MmapLeaseBackend(str(tmp / "leases.mmap"), capacity=capacity)
+    fill_mmap(backend, count)
+    return backend, backend.close
+
+
+def _open_shared(tmp: pathlib.Path, count: int) -> tuple[Any, Callable[[], None]]:
+    capacity = 1 << max(count * 2, 1024).bit_length()
+    backend = SharedMemoryLeaseBackend(capacity=capacity)
+    fill_mmap(backend, count)
+
+    def cleanup() -> None:
+        backend.close()
+        backend.unlink()
+
+    return backend, cleanup
+
+
+def _open_threadsafe(tmp: pathlib.Path, count: int) -> tuple[Any, Callable[[], None]]:
+    inner = InMemoryLeaseBackend()
+    fill_memory(inner, count)
+    return ThreadSafeLeaseBackend(inner), lambda: None
+
+
+def _open_cached(tmp: pathlib.Path, count: int) -> tuple[Any, Callable[[], None]]:
+    inner = SqliteLeaseBackend(str(tmp / "leases.db"))
+    fill_sqlite(inner, count)
+    return CachedLeaseBackend(inner), inner.close
+
+
+def _open_remote(tmp: pathlib.Path, count: int) -> tuple[Any, Callable[[], None]]:
+    inner = InMemoryLeaseBackend()
+    fill_memory(inner, count)
+    store = LeaseStoreServer(inner, listen=("127.0.0.1", 0), select_timeout=0.05)
+    store.bind()
+    thread = store.start()
+    client = RemoteLeaseBackend(store.address.compat(), pool_size=THREADS, timeout=10.0)
+
+    def cleanup() -> None:
+        client.close()
+        store.close()
+        if thread:
+            thread.join(timeout=1.0)
+
+    return client, cleanup
+
+
+BACKENDS = (
+    BackendSpec("memory", _open_memory),
+    BackendSpec("file_json", _open_file("json"), write_limit=5, max_size=100_000),
+    BackendSpec("file_binary", _open_file("binary"), write_limit=5, max_size=100_000),
+    BackendSpec("journal", _open_journal),
+    BackendSpec("sqlite", _open_sqlite),
+    BackendSpec("mmap", _open_mmap),
+    BackendSpec("shared", _open_shared),
+    BackendSpec("threadsafe", _open_threadsafe),
+    BackendSpec("cached_sqlite", _open_cached),
+    BackendSpec("remote", _open_remote),
+)
+
+
+def _latencies(samples: list[int], seconds: float) -> dict[str, Any]:
+    samples.sort()
+    result: dict[str, Any] = {
+        "ops": len(samples),
+        "seconds": seconds,
+        "ops_per_sec": len(samples) / seconds if seconds else 0.0,
+    }
+    for percentile in PERCENTILES:
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+        result[f"p{percentile:g}_us".replace(".", "_")] = samples[index] / 1000
+    result["max_us"] = samples[-1] / 1000
+    return result
+
+
+def _run_ops(operation: Callable[[int], Any], indexes: range) -> list[int]:
+    samples = []
+    clock = time.perf_counter_ns
+    for i in indexes:
+        start = clock()
+        operation(i)
+        samples.append(clock() - start)
+    return samples
+
+
+def _timed(operation: Callable[[int], Any], ops: int) -> dict[str, Any]:
+    start = time.perf_counter()
+    samples = _run_ops(operation, range(ops))
+    return _latencies(samples, time.perf_counter() - start)
+
+
+def _timed_concurrently(operation: Callable[[int], Any], ops: int) -> dict[str, Any]:
+    per_thread = max(ops // THREADS, 1)
+    results: list[list[int]] = [[] for _ in range(THREADS)]
+    barrier = threading.Barrier(THREADS + 1)
+
+    def worker(n: int) -> None:
+        barrier.wait()
+        results[n] = _run_ops(operation, range(n * per_thread, (n + 1) * per_thread))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    return _latencies([sample for samples in results for sample in samples], seconds)
+
+
+class _Serialized:
+    """One lock around every call, for backends :class:`ThreadSafeLeaseBackend` cannot wrap."""
+
+    def __init__(self, backend: Any) -> None:
+        self._backend = backend
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self._backend, name)
+
+        def locked(*args: Any, **kwargs: Any) -> Any:
+            with self._lock:
+                return method(*args, **kwargs)
+
+        return locked
+
+
+def _shared(backend: Any) -> Any:
+    if isinstance(backend, (ThreadSafeLeaseBackend, RemoteLeaseBackend, SharedMemoryLeaseBackend)):
+        return backend
+    if isinstance(backend, MmapLeaseBackend):
+        return _Serialized(backend)
+    return ThreadSafeLeaseBackend(backend)
+
+
+def _disk_bytes(tmp: pathlib.Path) -> int:
+    return sum(path.stat().st_size for path in tmp.iterdir() if path.is_file())
+
+
+def _open_traced(spec: BackendSpec, tmp: pathlib.Path, size: int) -> tuple[Any, Callable[[], None], dict[str, Any]]:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        backend, cleanup = spec.open(tmp, size)
+        seconds = time.perf_counter() - start
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    memory = {
+        "bytes_per_lease": (after - before) / size,
+        "disk_bytes_per_lease": _disk_bytes(tmp) / size,
+        "fill_seconds": seconds,
+    }
+    return backend, cleanup, memory
+
+
+def _sweep(backend: Any) -> Optional[Callable[[float], int]]:
+    if isinstance(backend, MmapLeaseBackend):
+        # Its sweep() visits a bounded run of slots; compact() rehashes the whole table.
+        return backend.compact
+    if isinstance(backend, SharedMemoryLeaseBackend):
+        # Its sweep() visits a bounded run of slots per call.
+        return lambda now: backend.sweep(now, slots=backend.capacity)
+    sweep: Optional[Callable[[float], int]] = getattr(backend, "sweep", None)
+    return sweep
+
+
+def measure_backend(spec: BackendSpec, size: int, iterations: int) -> OrderedDict[str, dict[str, Any]]:
+    """Time each operation `iterations` times (fewer for write-limited backends) on a table of `size` leases."""
+    benchmarks: OrderedDict[str, dict[str, Any]] = OrderedDict()
+    ops = min(iterations, size)
+    writes = min(ops, spec.write_limit) if spec.write_limit else ops
+    rng = random.Random(0)
+    existing = [f"client-{rng.randrange(size)}" for _ in range(ops)]
+    options = _options()
+    with tempfile.TemporaryDirectory() as tmp_name:
+        tmp = pathlib.Path(tmp_name)
+        backend, cleanup, memory = _open_traced(spec, tmp, size)
+        try:
+            benchmarks[f"{spec.name}_memory_{size}_leases"] = memory
+            operations: dict[str, tuple[Callable[[int], Any], int]] = {
+                "allocate": (lambda i: backend.allocate(f"new-{i}", IPv4(0x0B000000 + i), 3600, options), writes),
+                "lookup": (lambda i: backend.lookup(existing[i]), ops),
+                "renew": (lambda i: backend.renew(existing[i], 3600), writes),
+                "release": (lambda i: backend.release(f"new-{i}"), writes),
+            }
+            for name in OPERATIONS:
+                operation, count = operations[name]
+                benchmarks[f"{spec.name}_{name}_{size}_leases"] = _timed(operation, count)
+
+            shared = _shared(backend)
+            offset = writes
+            concurrent: dict[str, tuple[Callable[[int], Any], int]] = {
+                "allocate": (
+                    lambda i: shared.allocate(f"new-{offset + i}", IPv4(0x0B000000 + offset + i), 3600, options),
+                    writes,
+                ),
+                "lookup": (lambda i: shared.lookup(existing[i]), ops),
+                "renew": (lambda i: shared.renew(existing[i], 3600), writes),
+            }
+            for name in CONCURRENT_OPERATIONS:
+                operation, count = concurrent[name]
+                benchmarks[f"{spec.name}_concurrent_{name}_{size}_leases"] = _timed_concurrently(operation, count)
+
+            sweep = _sweep(backend)
+            if sweep is not None:
+                start = time.perf_counter()
+                swept = sweep(time.time() + 7200)
+                seconds = time.perf_counter() - start
+                benchmarks[f"{spec.name}_sweep_{size}_leases"] = {
+                    "seconds": seconds,
+                    "swept": swept,
+                    "leases_per_sec": swept / seconds if seconds else 0.0,
+                }
+        finally:
+            cleanup()
+    return benchmarks
+
+
+def _measure_benchmarks(
+    iterations: int,
+    sizes: Optional[tuple[int, ...]] = None,
+    backends: Optional[tuple[str, ...]] = None,
+) -> OrderedDict[str, dict[str, Any]]:
+    benchmarks: OrderedDict[str, dict[str, Any]] = OrderedDict()
+    for spec in BACKENDS:
+        if backends is not None and spec.name not in backends:
+            continue
+        for size in SIZES if sizes is None else sizes:
+            if spec.max_size is not None and size > spec.max_size:
+                continue
+            benchmarks.update(measure_backend(spec, size, iterations))
+    return benchmarks
+
+
+def _print_benchmarks(iterations: int, benchmarks: OrderedDict[str, dict[str, Any]]) -> None:
+    print(f"--- Running Lease Backend Benchmarks ({iterations:,} operations each) ---")
+    for name, result in benchmarks.items():
+        if "bytes_per_lease" in result:
+            print(
+                f"{name}: {result['bytes_per_lease']:.0f} bytes/lease in memory, "
+                f"{result['disk_bytes_per_lease']:.0f} on disk, filled in {result['fill_seconds']:.2f}s"
+            )
+        elif "swept" in result:
+            print(f"{name}: {result['swept']:,} leases in {result['seconds']:.3f}s ({result['leases_per_sec']:,.0f}/sec)")
+        else:
+            print(
+                f"{name}: {result['ops_per_sec']:,.0f} ops/sec, p50 {result['p50_us']:.1f}us, "
+                f"p99 {result['p99_us']:.1f}us, max {result['max_us']:.1f}us ({result['ops']:,} ops)"
+            )
+
+
+def run_benchmarks(
+    iterations: int = 10_000,
+    sizes: Optional[tuple[int, ...]] = None,
+    backends: Optional[tuple[str, ...]] = None,
+) -> OrderedDict[str, dict[str, Any]]:
+    benchmarks = _measure_benchmarks(iterations, sizes, backends)
+    _print_benchmarks(iterations, benchmarks)
+    return benchmarks
+
+
+def write_json_report(
+    json_output: pathlib.Path,
+    iterations: int,
+    benchmarks: OrderedDict[str, dict[str, Any]],
+) -> None:
+    payload = {
+        "benchmark": "bench_lease_backends",
+        "python": sys.version.split()[0],
+        "iterations": iterations,
+        "metrics": benchmarks,
+    }
+    json_output.parent.mkdir(parents=True, exist_ok=True)
+    json_output.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time every lease backend's operations at several table sizes.")
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=10_000,
+        help="Operations timed per measurement.",
+    )
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in SIZES),
+        help="Comma-separated lease table sizes.",
+    )
+    parser.add_argument(
+        "--backends",
+        help=f"Comma-separated backends to run, out of {', '.join(spec.name for spec in BACKENDS)} (default: all).",
+    )
+    parser.add_argument(
+        "--json-output",
+        type=pathlib.Path,
+        help="Optional path to write structured benchmark results as JSON.",
+    )
+    args = parser.parse_args()
+    sizes = tuple(int(size) for size in args.sizes.split(","))
+    backends = tuple(args.backends.split(",")) if args.backends else None
+    benchmarks = run_benchmarks(iterations=args.iterations, sizes=sizes, backends=backends)
+    if args.json_output is not None:
+        write_json_report(args.json_output, args.iterations, benchmarks)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import argparse
+import datetime
+import gc
+import json
+import pathlib
+import sys
+import tracemalloc
+from collections import OrderedDict
+from typing import Any, Callable
+
+# Ensure src/ is in the import path
+SRC_DIR = pathlib.Path(__file__).parent.parent / "src"
+sys.path.insert(0, SRC_DIR.as_posix())
+
+from pydhcp.lease import DhcpLease, InMemoryLeaseBackend
+from pydhcp.network import IPv4
+from pydhcp.options import DhcpOptionCode, DhcpOptions
+
+LEGACY_LEASES = 100_000
+"""The tuple-per-lease layout needs about 1 KB a lease, so it is measured at no more than this."""
+
+
+def _options() -> DhcpOptions:
+    options = DhcpOptions()
+    options[DhcpOptionCode.SUBNET_MASK] = IPv4("255.255.0.0")
+    options[DhcpOptionCode.ROUTER] = [IPv4("10.0.0.1")]
+    options[DhcpOptionCode.IP_ADDRESS_LEASE_TIME] = 3600
+    return options
+
+
+def fill_backend(count: int) -> Any:
+    backend = InMemoryLeaseBackend()
+    options = _options()
+    for i in range(count):
+        backend.allocate(f"client-{i}", IPv4(0x0A000000 + i), 3600, options)
+    return backend
+
+
+def fill_legacy(count: int) -> Any:
+    """The layout leases had before `LeaseRecord`: a DhcpLease tuple with its own options per client."""
+    leases = {}
+    by_ip = {}
+    options = _options()
+    for i in range(count):
+        ip = IPv4(0x0A000000 + i)
+        leases[f"client-{i}"] = DhcpLease(
+            ip=ip, expires=datetime.datetime.now() + datetime.timedelta(seconds=3600), options=options.copy()
+        )
+        by_ip[ip] = f"client-{i}"
+    return leases, by_ip
+
+
+def bytes_per_lease(fill: Callable[[int], Any], count: int) -> float:
+    """Memory `fill` holds on to per lease, as traced by tracemalloc."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        table = fill(count)
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del table
+    return (after - before) / count
+
+
+def _measure_benchmarks(iterations: int) -> OrderedDict[str, dict[str, Any]]:
+    benchmarks: OrderedDict[str, dict[str, Any]] = OrderedDict()
+    legacy = min(iterations, LEGACY_LEASES)
+    benchmarks[f"legacy_tuples_{legacy}_leases"] = {
+        "bytes_per_lease": bytes_per_lease(fill_legacy, legacy),
+        "leases": legacy,
+    }
+    benchmarks[f"in_memory_records_{iterations}_leases"] = {
+        "bytes_per_lease": bytes_per_lease(fill_backend, iterations),
+        "leases": iterations,
+    }
+    return benchmarks
+
+
+def _print_benchmarks(iterations: int, benchmarks: OrderedDict[str, dict[str, Any]]) -> None:
+    print(f"--- Running Lease Memory Benchmarks ({iterations:,} leases) ---")
+    for name, result in benchmarks.items():
+        print(f"{name}: {result['bytes_per_lease']:.1f} bytes/lease")
+
+
+def run_benchmarks(iterations: int = 1_000_000) -> OrderedDict[str, dict[str, Any]]:
+    benchmarks = _measure_benchmarks(iterations)
+    _print_benchmarks(iterations, benchmarks)
+    return benchmarks
+
+
+def write_json_report(
+    json_output: pathlib.Path,
+    iterations: int,
+    benchmarks: OrderedDict[str, dict[str, Any]],
+) -> None:
+    payload = {
+        "benchmark": "bench_lease_memory",
+        "python": sys.version.split()[0],
+        "iterations": iterations,
+        "metrics": benchmarks,
+    }
+    json_output.parent.mkdir(parents=True, exist_ok=True)
+    json_output.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure memory per lease held by InMemoryLeaseBackend.")
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=1_000_000,
+        help="Number of leases to allocate.",
+    )
+    parser.add_argument(
+        "--json-output",
+        type=pathlib.Path,
+        help="Optional path to write structured benchmark results as JSON.",
+    )
+    args = parser.parse_args()
+    benchmarks = run_benchmarks(iterations=args.iterations)
+    if args.json_output is not None:
+        write_json_report(args.json_output, args.iterations, benchmarks)
+
+
+if __name__ == "__main__":
+    main()
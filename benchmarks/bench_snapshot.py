@@ -0,0 +1,143 @@
+import argparse
+import json
+import pathlib
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any
+
+# Ensure src/ is in the import path
+SRC_DIR = pathlib.Path(__file__).parent.parent / "src"
+sys.path.insert(0, SRC_DIR.as_posix())
+
+from pydhcp.lease import FileLeaseBackend, InMemoryLeaseBackend, lease_to_json
+from pydhcp.lease.snapshot import write_snapshot
+from pydhcp.network import IPv4
+from pydhcp.options import DhcpOptionCode, DhcpOptions
+
+OPTION_SETS = 16
+"""Distinct option sets among the leases, as with a handful of subnets and classes."""
+
+
+def _options(n: int) -> DhcpOptions:
+    options = DhcpOptions()
+    options[DhcpOptionCode.SUBNET_MASK] = IPv4("255.255.255.0")
+    options[DhcpOptionCode.ROUTER] = [IPv4(0x0A000001 + (n << 8))]
+    options[DhcpOptionCode.DNS] = [IPv4("10.255.0.53"), IPv4("10.255.1.53")]
+    options[DhcpOptionCode.IP_ADDRESS_LEASE_TIME] = 3600
+    return options
+
+
+def fill_backend(count: int, expired_every: int = 0) -> InMemoryLeaseBackend:
+    """`count` leases; with `expired_every`, every that-many-th lease has already expired."""
+    backend = InMemoryLeaseBackend()
+    options = [_options(n) for n in range(OPTION_SETS)]
+    for i in range(count):
+        ttl = -1 if expired_every and i % expired_every == 0 else 3600
+        chaddr = (0x020000000000 + i).to_bytes(6, "big")
+        backend.allocate(f"client-{i}", IPv4(0x0A000000 + i), ttl, options[i % OPTION_SETS], chaddr=chaddr)
+    return backend
+
+
+def write_json(path: pathlib.Path, backend: InMemoryLeaseBackend) -> None:
+    data = {
+        client_id: lease_to_json(record.view(), record.chaddr, record.cltt)
+        for client_id, record in backend._leases.items()
+    }
+    path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+
+
+def _time_startup(path: pathlib.Path, file_format: str) -> tuple[float, int]:
+    start = time.perf_counter()
+    backend = FileLeaseBackend(str(path), file_format=file_format)
+    return time.perf_counter() - start, len(backend._leases)
+
+
+def _measure_benchmarks(iterations: int) -> OrderedDict[str, dict[str, Any]]:
+    benchmarks: OrderedDict[str, dict[str, Any]] = OrderedDict()
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = fill_backend(iterations)
+        json_path = pathlib.Path(tmp) / "leases.json"
+        binary_path = pathlib.Path(tmp) / "leases.bin"
+        write_json(json_path, backend)
+        start = time.perf_counter()
+        write_snapshot(str(binary_path), backend._leases.items())
+        write_seconds = time.perf_counter() - start
+        del backend
+
+        for file_format, path in (("json", json_path), ("binary", binary_path)):
+            seconds, loaded = _time_startup(path, file_format)
+            benchmarks[f"{file_format}_startup_{iterations}_leases"] = {
+                "seconds": seconds,
+                "leases_per_sec": loaded / seconds,
+                "file_bytes": path.stat().st_size,
+                "loaded": loaded,
+            }
+        benchmarks[f"binary_write_{iterations}_leases"] = {
+            "seconds": write_seconds,
+            "leases_per_sec": iterations / write_seconds,
+        }
+
+        backend = fill_backend(iterations, expired_every=2)
+        write_snapshot(str(binary_path), backend._leases.items())
+        del backend
+        seconds, loaded = _time_startup(binary_path, "binary")
+        benchmarks[f"binary_startup_half_expired_{iterations}_leases"] = {
+            "seconds": seconds,
+            "leases_per_sec": iterations / seconds,
+            "file_bytes": binary_path.stat().st_size,
+            "loaded": loaded,
+        }
+    return benchmarks
+
+
+def _print_benchmarks(iterations: int, benchmarks: OrderedDict[str, dict[str, Any]]) -> None:
+    print(f"--- Running Lease Snapshot Benchmarks ({iterations:,} leases) ---")
+    for name, result in benchmarks.items():
+        size = f", {result['file_bytes'] / 1e6:.1f} MB" if "file_bytes" in result else ""
+        print(f"{name}: {result['seconds']:.3f}s ({result['leases_per_sec']:,.0f} leases/sec{size})")
+
+
+def run_benchmarks(iterations: int = 500_000) -> OrderedDict[str, dict[str, Any]]:
+    benchmarks = _measure_benchmarks(iterations)
+    _print_benchmarks(iterations, benchmarks)
+    return benchmarks
+
+
+def write_json_report(
+    json_output: pathlib.Path,
+    iterations: int,
+    benchmarks: OrderedDict[str, dict[str, Any]],
+) -> None:
+    payload = {
+        "benchmark": "bench_snapshot",
+        "python": sys.version.split()[0],
+        "iterations": iterations,
+        "metrics": benchmarks,
+    }
+    json_output.parent.mkdir(parents=True, exist_ok=True)
+    json_output.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Time FileLeaseBackend startup from JSON and binary lease files.")
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=500_000,
+        help="Number of leases in the lease file.",
+    )
+    parser.add_argument(
+        "--json-output",
+        type=pathlib.Path,
+        help="Optional path to write structured benchmark results as JSON.",
+    )
+    args = parser.parse_args()
+    benchmarks = run_benchmarks(iterations=args.iterations)
+    if args.json_output is not None:
+        write_json_report(args.json_output, args.iterations, benchmarks)
+
+
+if __name__ == "__main__":
+    main()
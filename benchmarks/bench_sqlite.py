@@ -0,0 +1,123 @@
+import argparse
+import json
+import pathlib
+import random
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+# Ensure src/ is in the import path
+SRC_DIR = pathlib.Path(__file__).parent.parent / "src"
+sys.path.insert(0, SRC_DIR.as_posix())
+
+from pydhcp.lease.sqlite import _UPSERT, SqliteLeaseBackend
+from pydhcp.network import IPv4
+
+ROWS = 1_000_000
+BATCH_SIZE = 1000
+"""Writes per transaction in the batched runs."""
+
+
+def populate(backend: SqliteLeaseBackend, rows: int) -> None:
+    """Bulk insert `rows` one-hour leases in one transaction, bypassing the per-call API."""
+    now = time.time()
+    records = ((f"client-{i}", 0x0A000000 + i, now + 3600, b"", None, now) for i in range(rows))
+    with backend._conn:
+        backend._conn.execute("BEGIN")
+        backend._conn.executemany(_UPSERT, records)
+
+
+def _timed(operation: Callable[[int], Any], iterations: int) -> dict[str, Any]:
+    start = time.perf_counter()
+    for i in range(iterations):
+        operation(i)
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "ops_per_sec": iterations / seconds, "iterations": iterations}
+
+
+def _measure_benchmarks(iterations: int) -> OrderedDict[str, dict[str, Any]]:
+    benchmarks: OrderedDict[str, dict[str, Any]] = OrderedDict()
+    rng = random.Random(0)
+    existing = [rng.randrange(ROWS) for _ in range(iterations)]
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = SqliteLeaseBackend(str(pathlib.Path(tmp) / "leases.db"))
+        start = time.perf_counter()
+        populate(backend, ROWS)
+        benchmarks[f"populate_{ROWS}_rows"] = {"seconds": time.perf_counter() - start, "rows": ROWS}
+
+        def allocate(i: int) -> None:
+            backend.allocate(f"new-{i}", IPv4(0x0B000000 + i), 3600)
+
+        def renew(i: int) -> None:
+            backend.renew(f"client-{existing[i]}", 3600)
+
+        benchmarks[f"allocate_{ROWS}_rows"] = _timed(allocate, iterations)
+        benchmarks[f"renew_{ROWS}_rows"] = _timed(renew, iterations)
+        backend.batch_size = BATCH_SIZE
+        benchmarks[f"allocate_batched_{ROWS}_rows"] = _timed(lambda i: allocate(iterations + i), iterations)
+        benchmarks[f"renew_batched_{ROWS}_rows"] = _timed(renew, iterations)
+        backend.commit()
+        benchmarks[f"lookup_{ROWS}_rows"] = _timed(lambda i: backend.lookup(f"client-{existing[i]}"), iterations)
+        benchmarks[f"lookup_ip_{ROWS}_rows"] = _timed(
+            lambda i: backend.lookup_ip(IPv4(0x0A000000 + existing[i])), iterations
+        )
+        benchmarks[f"expired_query_{ROWS}_rows"] = _timed(
+            lambda i: backend.expired(now=time.time() + 7200, limit=100), iterations
+        )
+        backend.close()
+    return benchmarks
+
+
+def _print_benchmarks(iterations: int, benchmarks: OrderedDict[str, dict[str, Any]]) -> None:
+    print(f"--- Running SQLite Lease Backend Benchmarks ({iterations:,} iterations, {ROWS:,} rows) ---")
+    for name, result in benchmarks.items():
+        if "ops_per_sec" in result:
+            print(f"{name}: {result['seconds']:.4f}s ({result['ops_per_sec']:.1f} ops/sec)")
+        else:
+            print(f"{name}: {result['seconds']:.4f}s")
+
+
+def run_benchmarks(iterations: int = 10000) -> OrderedDict[str, dict[str, Any]]:
+    benchmarks = _measure_benchmarks(iterations)
+    _print_benchmarks(iterations, benchmarks)
+    return benchmarks
+
+
+def write_json_report(
+    json_output: pathlib.Path,
+    iterations: int,
+    benchmarks: OrderedDict[str, dict[str, Any]],
+) -> None:
+    payload = {
+        "benchmark": "bench_sqlite",
+        "python": sys.version.split()[0],
+        "iterations": iterations,
+        "metrics": benchmarks,
+    }
+    json_output.parent.mkdir(parents=True, exist_ok=True)
+    json_output.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure SqliteLeaseBackend throughput on a large table.")
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=10000,
+        help="Number of calls timed per operation.",
+    )
+    parser.add_argument(
+        "--json-output",
+        type=pathlib.Path,
+        help="Optional path to write structured benchmark results as JSON.",
+    )
+    args = parser.parse_args()
+    benchmarks = run_benchmarks(iterations=args.iterations)
+    if args.json_output is not None:
+        write_json_report(args.json_output, args.iterations, benchmarks)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,20 @@ JsonWriter = Callable[[pathlib.Path, int, BenchmarkResults], None]
 def _run_suite(suite: str, iterations: int) -> tuple[BenchmarkResults, JsonWriter]:
     if suite == "options":
         from benchmarks.bench_options import run_benchmarks, write_json_report
+    elif suite == "allocation":
+        from benchmarks.bench_allocation import run_benchmarks, write_json_report
+    elif suite == "journal":
+        from benchmarks.bench_journal import run_benchmarks, write_json_report
+    elif suite == "sqlite":
+        from benchmarks.bench_sqlite import run_benchmarks, write_json_report
+    elif suite == "lease-memory":
+        from benchmarks.bench_lease_memory import run_benchmarks, write_json_report
+    elif suite == "snapshot":
+        from benchmarks.bench_snapshot import run_benchmarks, write_json_report
+    elif suite == "lease-backends":
+        from benchmarks.bench_lease_backends import run_benchmarks, write_json_report
+    elif suite == "churn":
+        from benchmarks.bench_churn import run_benchmarks, write_json_report
     else:
         from benchmarks.bench_parse import run_benchmarks, write_json_report
 
@@ -24,7 +38,7 @@ def main() -> None:
     parser = argparse.ArgumentParser(description="Run pydhcp repository benchmarks")
     parser.add_argument(
         "--suite",
-        choices=["parse", "options"],
+        choices=["parse", "options", "allocation", "journal", "sqlite", "lease-memory", "snapshot", "lease-backends", "churn"],
         default="parse",
         help="Benchmark suite to run",
     )
@@ -82,8 +82,11 @@ from .capture import (
 from .lease import (
     DhcpLease as DhcpLease,
     LeaseBackend as LeaseBackend,
+    LeaseQueryBackend as LeaseQueryBackend,
     InMemoryLeaseBackend as InMemoryLeaseBackend,
     FileLeaseBackend as FileLeaseBackend,
+    JournalLeaseBackend as JournalLeaseBackend,
+    ThreadSafeLeaseBackend as ThreadSafeLeaseBackend,
 )
 
 __all__ = [
@@ -165,6 +168,9 @@ __all__ = [
     "compile_capture_filter",
     "DhcpLease",
     "LeaseBackend",
+    "LeaseQueryBackend",
     "InMemoryLeaseBackend",
     "FileLeaseBackend",
+    "JournalLeaseBackend",
+    "ThreadSafeLeaseBackend",
 ]
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import hashlib as _hashlib
+import ipaddress as _ipaddress
+import time as _time
+import typing as _ty
+
+from .network import IPv4
+from .scopes import parse_range
+from .timers import ExpiryHeap
+
+Clock = _ty.Callable[[], float]
+InUse = _ty.Callable[[IPv4], bool]
+
+
+class OfferTable:
+    """Addresses offered in a DHCPOFFER that the client has not yet claimed.
+
+    RFC 2131 4.3.1 has the server reserve an offered address until the client
+    answers, so a concurrent DISCOVER from another client is not offered the
+    same address. Holds are keyed by client id, indexed by address, and expire
+    through an :class:`~pydhcp.timers.ExpiryHeap` after ``hold_time`` seconds.
+    """
+
+    def __init__(self, hold_time: float = 60.0, clock: Clock = _time.monotonic) -> None:
+        self.hold_time = hold_time
+        self._clock = clock
+        self._by_client: _ty.Dict[str, IPv4] = {}
+        self._by_ip: _ty.Dict[IPv4, str] = {}
+        self._expiry: ExpiryHeap[str] = ExpiryHeap()
+
+    def __len__(self) -> int:
+        return len(self._by_client)
+
+    def __contains__(self, client_id: object) -> bool:
+        return client_id in self._by_client
+
+    def hold(self, client_id: str, ip: IPv4, hold_time: _ty.Optional[float] = None) -> None:
+        """Reserve ``ip`` for ``client_id``, replacing any earlier offer to it."""
+        previous = self._by_client.get(client_id)
+        if previous is not None and previous != ip:
+            self._by_ip.pop(previous, None)
+        self._by_client[client_id] = ip
+        self._by_ip[ip] = client_id
+        ttl = self.hold_time if hold_time is None else hold_time
+        self._expiry.schedule(client_id, self._clock() + ttl)
+
+    def release(self, client_id: str) -> _ty.Optional[IPv4]:
+        """Drop the offer held for ``client_id`` and return its address."""
+        ip = self._by_client.pop(client_id, None)
+        if ip is None:
+            return None
+        if self._by_ip.get(ip) == client_id:
+            del self._by_ip[ip]
+        self._expiry.discard(client_id)
+        return ip
+
+    def offered(self, client_id: str) -> _ty.Optional[IPv4]:
+        """Return the address currently held for ``client_id``, if still valid."""
+        ip = self._by_client.get(client_id)
+        if ip is None or self._is_expired(client_id):
+            return None
+        return ip
+
+    def holder(self, ip: IPv4) -> _ty.Optional[str]:
+        """Return the client an unexpired offer of ``ip`` is held for."""
+        client_id = self._by_ip.get(ip)
+        if client_id is None or self._is_expired(client_id):
+            return None
+        return client_id
+
+    def is_available(self, ip: IPv4, client_id: str) -> bool:
+        """True unless ``ip`` is held for a client other than ``client_id``."""
+        holder = self.holder(ip)
+        return holder is None or holder == client_id
+
+    def expire(self, now: _ty.Optional[float] = None) -> int:
+        """Drop offers whose hold time has passed; returns how many expired."""
+        expired = self._expiry.pop_expired(self._clock() if now is None else now)
+        for client_id in expired:
+            ip = self._by_client.pop(client_id, None)
+            if ip is not None and self._by_ip.get(ip) == client_id:
+                del self._by_ip[ip]
+        return len(expired)
+
+    def _is_expired(self, client_id: str) -> bool:
+        deadline = self._expiry.deadline(client_id)
+        return deadline is not None and deadline <= self._clock()
+
+
+class DeclineQuarantine:
+    """Addresses clients have declined, kept out of circulation for a while.
+
+    A DHCPDECLINE means the client found the address already in use on the
+    wire (RFC 2131 4.3.3), so handing it straight back out just earns another
+    decline. Quarantined addresses are refused by allocation until their hold
+    time runs out; membership is a dict lookup and expiry runs through an
+    :class:`~pydhcp.timers.ExpiryHeap`, like the :class:`OfferTable`.
+    """
+
+    def __init__(self, hold_time: float = 86400.0, clock: Clock = _time.monotonic) -> None:
+        self.hold_time = hold_time
+        self._clock = clock
+        self._expiry: ExpiryHeap[IPv4] = ExpiryHeap()
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def __contains__(self, ip: object) -> bool:
+        deadline = self._expiry.deadline(_ty.cast(IPv4, ip))
+        return deadline is not None and deadline > self._clock()
+
+    def quarantine(self, ip: IPv4, hold_time: _ty.Optional[float] = None) -> None:
+        """Keep ``ip`` out of allocation for ``hold_time`` seconds, restarting any earlier hold."""
+        ttl = self.hold_time if hold_time is None else hold_time
+        self._expiry.schedule(ip, self._clock() + ttl)
+
+    def release(self, ip: IPv4) -> bool:
+        """Return ``ip`` to circulation early, e.g. once an operator has fixed the conflict."""
+        return self._expiry.discard(ip)
+
+    def until(self, ip: IPv4) -> _ty.Optional[float]:
+        """The clock reading at which ``ip`` leaves quarantine."""
+        return self._expiry.deadline(ip)
+
+    def expire(self, now: _ty.Optional[float] = None) -> int:
+        """Drop addresses whose hold time has passed; returns how many were released."""
+        return len(self._expiry.pop_expired(self._clock() if now is None else now))
+
+
+class AddressPool:
+    """A contiguous range of assignable addresses, ``first`` to ``last`` inclusive.
+
+    ``network`` is the subnet the pool serves, used to pick the pool for a
+    request; ``classes`` restricts it to clients in any of those client
+    classes; ``exclude`` lists addresses inside the range never to assign.
+    """
+
+    def __init__(
+        self,
+        first: IPv4,
+        last: IPv4,
+        network: _ty.Optional[_ipaddress.IPv4Network] = None,
+        exclude: _ty.Iterable[IPv4] = (),
+        classes: _ty.Optional[_ty.Iterable[str]] = None,
+    ) -> None:
+        if int(first) > int(last):
+            raise ValueError(f"Pool {first}-{last} ends before it starts")
+        self.first = first
+        self.last = last
+        self.network = network
+        self.exclude = frozenset(exclude)
+        self.classes = frozenset(classes) if classes is not None else None
+        self._first = int(first)
+        self.size = int(last) - self._first + 1
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.first}-{self.last})"
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, ip: object) -> bool:
+        return isinstance(ip, _ipaddress.IPv4Address) and 0 <= int(ip) - self._first < self.size
+
+    def address(self, index: int) -> IPv4:
+        return IPv4(self._first + index)
+
+    def index(self, ip: IPv4) -> int:
+        return int(ip) - self._first
+
+    def admits(self, classes: _ty.Sequence[str]) -> bool:
+        return self.classes is None or not self.classes.isdisjoint(classes)
+
+    def split(self, parts: int) -> list[AddressPool]:
+        """Cut the range into `parts` contiguous pools whose sizes differ by at most one."""
+        if not 0 < parts <= self.size:
+            raise ValueError(f"Cannot split {self!r} into {parts} pools")
+        pools = []
+        start = self._first
+        for part in range(parts):
+            size = self.size // parts + (part < self.size % parts)
+            first, last = IPv4(start), IPv4(start + size - 1)
+            exclude = [ip for ip in self.exclude if first <= ip <= last]
+            pools.append(AddressPool(first, last, self.network, exclude, self.classes))
+            start += size
+        return pools
+
+
+class Allocator(_ty.Protocol):
+    def select(self, client_id: str, pool: AddressPool, in_use: InUse) -> _ty.Optional[IPv4]:
+        """Return a free address from `pool` for `client_id`, or None when it is full."""
+        ...
+
+
+class SequentialAllocator:
+    """Next-fit allocation: hand out the first free address after the last one given.
+
+    Cheap while the pool is sparse, but the address a client gets depends on
+    arrival order, so it changes whenever the lease table is lost.
+    """
+
+    def __init__(self) -> None:
+        self._cursors: _ty.Dict[int, int] = {}
+
+    def select(self, client_id: str, pool: AddressPool, in_use: InUse) -> _ty.Optional[IPv4]:
+        start = self._cursors.get(id(pool), 0)
+        size = pool.size
+        for step in range(size):
+            index = (start + step) % size
+            ip = pool.address(index)
+            if ip in pool.exclude or in_use(ip):
+                continue
+            self._cursors[id(pool)] = index + 1
+            return ip
+        return None
+
+
+class HashAllocator:
+    """Deterministic allocation: a client's home address is a hash of its client id.
+
+    The hash picks a slot in the pool and collisions probe linearly to the
+    next free one. Without collisions a returning client is handed the same
+    address after a restart with an empty lease table, and no lookup of its
+    old lease is needed. The hash is keyed BLAKE2b, so it is stable across
+    processes (unlike :func:`hash`) and `salt` can reshuffle a deployment.
+    """
+
+    def __init__(self, salt: bytes = b"") -> None:
+        self.salt = salt
+
+    def home(self, client_id: str, pool: AddressPool) -> int:
+        """The slot `client_id` hashes to in `pool`, before probing."""
+        digest = _hashlib.blake2b(client_id.encode(), digest_size=8, key=self.salt).digest()
+        return int.from_bytes(digest, "big") % pool.size
+
+    def select(self, client_id: str, pool: AddressPool, in_use: InUse) -> _ty.Optional[IPv4]:
+        start = self.home(client_id, pool)
+        size = pool.size
+        for step in range(size):
+            ip = pool.address((start + step) % size)
+            if ip in pool.exclude or in_use(ip):
+                continue
+            return ip
+        return None
+
+
+ALLOCATORS: _ty.Dict[str, _ty.Callable[[], Allocator]] = {
+    "sequential": SequentialAllocator,
+    "hash": HashAllocator,
+}
+"""Allocation strategies by their config name."""
+
+
+def pools_from_config(config: _ty.Mapping[str, _ty.Any]) -> list[AddressPool]:
+    """Read the ``pools`` of every subnet in the ``subnets`` and ``shared_networks`` sections.
+
+    These are the same declarations :class:`~pydhcp.scopes.OptionScopes`
+    reads options from; a pool may add ``exclude`` and ``classes`` lists.
+    """
+    subnets = [*config.get("subnets", ())]
+    for shared_network in config.get("shared_networks", ()):
+        subnets.extend(shared_network.get("subnets", ()))
+    pools = []
+    for subnet in subnets:
+        network = _ipaddress.IPv4Network(subnet["subnet"])
+        for pool in subnet.get("pools", ()):
+            first, last = parse_range(pool["range"])
+            pools.append(AddressPool(
+                first,
+                last,
+                network,
+                exclude=[IPv4(ip) for ip in pool.get("exclude", ())],
+                classes=pool.get("classes"),
+            ))
+    return pools
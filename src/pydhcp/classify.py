@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import collections as _collections
+import re as _re
+import typing as _ty
+
+from .leasequery import relay_suboption
+from .options import DhcpOptionCode, DhcpOptions
+
+RawOptions = _ty.Mapping[int, bytearray]
+Extractor = _ty.Callable[[RawOptions], _ty.Sequence[bytes]]
+Predicate = _ty.Callable[[RawOptions], bool]
+
+_NOTHING: tuple[bytes, ...] = ()
+
+
+def _whole(code: int) -> Extractor:
+    def extract(options: RawOptions) -> _ty.Sequence[bytes]:
+        value = options.get(code)
+        return (bytes(value),) if value is not None else _NOTHING
+
+    return extract
+
+
+def _user_class(options: RawOptions) -> _ty.Sequence[bytes]:
+    # RFC 3004: a run of length-prefixed opaque class names.
+    value = options.get(DhcpOptionCode.USER_CLASS)
+    if value is None:
+        return _NOTHING
+    items = []
+    offset = 0
+    while offset < len(value):
+        length = value[offset]
+        items.append(bytes(value[offset + 1 : offset + 1 + length]))
+        offset += 1 + length
+    return items
+
+
+def _client_arch(options: RawOptions) -> _ty.Sequence[bytes]:
+    value = options.get(DhcpOptionCode.CLIENT_SYSTEM_ARCHITECTURE)
+    if value is None:
+        return _NOTHING
+    return [bytes(value[i : i + 2]) for i in range(0, len(value) - 1, 2)]
+
+
+def _relay(sub_code: int) -> Extractor:
+    def extract(options: RawOptions) -> _ty.Sequence[bytes]:
+        value = relay_suboption(options.get(DhcpOptionCode.RELAY_AGENT_INFORMATION), sub_code)
+        return (value,) if value is not None else _NOTHING
+
+    return extract
+
+
+def _text(value: _ty.Any) -> bytes:
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    return str(value).encode()
+
+
+def _u16(value: _ty.Any) -> bytes:
+    return int(value).to_bytes(2, "big")
+
+
+def _code_list(value: _ty.Any) -> bytes:
+    if isinstance(value, str):
+        value = [part for part in value.replace(" ", "").split(",") if part]
+    return bytes(int(code) for code in value)
+
+
+class _Field(_ty.NamedTuple):
+    code: int
+    extract: Extractor
+    encode: _ty.Callable[[_ty.Any], bytes]
+
+
+FIELDS: _ty.Dict[str, _Field] = {
+    "vendor_class": _Field(DhcpOptionCode.VENDOR_CLASS_IDENTIFIER, _whole(DhcpOptionCode.VENDOR_CLASS_IDENTIFIER), _text),
+    "user_class": _Field(DhcpOptionCode.USER_CLASS, _user_class, _text),
+    "fingerprint": _Field(DhcpOptionCode.PARAMETER_REQUEST_LIST, _whole(DhcpOptionCode.PARAMETER_REQUEST_LIST), _code_list),
+    "arch": _Field(DhcpOptionCode.CLIENT_SYSTEM_ARCHITECTURE, _client_arch, _u16),
+    "circuit_id": _Field(DhcpOptionCode.RELAY_AGENT_INFORMATION, _relay(1), _text),
+    "remote_id": _Field(DhcpOptionCode.RELAY_AGENT_INFORMATION, _relay(2), _text),
+    "hostname": _Field(DhcpOptionCode.HOSTNAME, _whole(DhcpOptionCode.HOSTNAME), _text),
+}
+"""Rule fields and the raw option bytes each one reads."""
+
+
+def _alternatives(expected: _ty.Any, encode: _ty.Callable[[_ty.Any], bytes]) -> list[bytes]:
+    if not isinstance(expected, list):
+        expected = [expected]
+    elif encode is _code_list and all(isinstance(v, int) for v in expected):
+        # A flat list of option codes is one fingerprint, not a list of them.
+        expected = [expected]
+    return [encode(v) for v in expected]
+
+
+def _operator(name: str, expected: _ty.Any, encode: _ty.Callable[[_ty.Any], bytes]) -> _ty.Callable[[bytes], bool]:
+    if name == "equals":
+        return frozenset(_alternatives(expected, encode)).__contains__
+    if name == "hex":
+        values = frozenset(bytes.fromhex(str(v).replace(":", "")) for v in (expected if isinstance(expected, list) else [expected]))
+        return values.__contains__
+    if name == "prefix":
+        prefix = tuple(_alternatives(expected, encode))
+        return lambda value: value.startswith(prefix)
+    if name == "suffix":
+        suffix = tuple(_alternatives(expected, encode))
+        return lambda value: value.endswith(suffix)
+    if name == "contains":
+        needle = encode(expected)
+        return lambda value: needle in value
+    if name == "regex":
+        pattern = _re.compile(encode(expected))
+        return lambda value: pattern.search(value) is not None
+    raise ValueError(f"Unknown match operator {name!r}")
+
+
+def _compile_field(field_name: str, spec: _ty.Any) -> tuple[Predicate, int]:
+    try:
+        field = FIELDS[field_name]
+    except KeyError:
+        raise ValueError(f"Unknown classification field {field_name!r}; expected one of {sorted(FIELDS)}") from None
+    if not isinstance(spec, dict):
+        # A bare value (or list of values) is shorthand for `equals`.
+        spec = {"equals": spec}
+    tests = [_operator(op, expected, field.encode) for op, expected in spec.items()]
+    extract = field.extract
+
+    if len(tests) == 1:
+        test = tests[0]
+
+        def predicate(options: RawOptions) -> bool:
+            return any(test(value) for value in extract(options))
+    else:
+        def predicate(options: RawOptions) -> bool:
+            return any(all(t(value) for t in tests) for value in extract(options))
+
+    return predicate, field.code
+
+
+class ClientClass(_ty.NamedTuple):
+    name: str
+    match: Predicate
+    codes: frozenset[int]
+    """Option codes the rule reads; only these feed the memoization key."""
+    spec: _ty.Mapping[str, _ty.Any]
+
+
+def compile_class(name: str, match: _ty.Mapping[str, _ty.Any]) -> ClientClass:
+    """Compile one class rule into a predicate over raw option bytes.
+
+    ``match`` maps field names from :data:`FIELDS` to a value, a list of values
+    (any may equal; a flat list of option codes is one ``fingerprint``), or ``{operator: value}`` with operators ``equals``,
+    ``prefix``, ``suffix``, ``contains``, ``regex`` and ``hex``. Every field must
+    match. An empty ``match`` makes a class every client belongs to.
+    """
+    predicates: list[Predicate] = []
+    codes: set[int] = set()
+    for field_name, spec in match.items():
+        predicate, code = _compile_field(field_name, spec)
+        predicates.append(predicate)
+        codes.add(code)
+
+    matches: Predicate
+    if not predicates:
+        def always(options: RawOptions) -> bool:
+            return True
+
+        matches = always
+    elif len(predicates) == 1:
+        matches = predicates[0]
+    else:
+        def every(options: RawOptions) -> bool:
+            return all(predicate(options) for predicate in predicates)
+
+        matches = every
+
+    return ClientClass(name, matches, frozenset(codes), dict(match))
+
+
+class ClientClassifier:
+    """Compiled client classification rules with a memoized result per fingerprint.
+
+    Rules are compiled once into closures that read the raw option bytes in
+    ``DhcpOptions._options``; nothing is decoded on the request path. Results
+    are memoized by the bytes of just the options the rules look at, so the
+    many clients sharing a vendor class, PRL and architecture are classified
+    by one dict lookup. The memo is a bounded LRU of ``cache_size`` entries.
+    """
+
+    def __init__(self, classes: _ty.Sequence[ClientClass], cache_size: int = 4096) -> None:
+        names = [client_class.name for client_class in classes]
+        if len(set(names)) != len(names):
+            raise ValueError("Client class names must be unique")
+        self.classes = tuple(classes)
+        self.codes = tuple(sorted(set().union(*(c.codes for c in self.classes))))
+        self.cache_size = cache_size
+        self._cache: _ty.OrderedDict[tuple[_ty.Optional[bytes], ...], tuple[str, ...]] = _collections.OrderedDict()
+
+    @classmethod
+    def from_config(cls, config: _ty.Any, cache_size: int = 4096) -> "ClientClassifier":
+        """Build a classifier from the ``classes`` config section.
+
+        Accepts either a list of ``{"name": ..., "match": {...}}`` entries or a
+        mapping of class name to its ``match`` table; definition order is the
+        order classes are reported in.
+        """
+        if isinstance(config, _ty.Mapping):
+            entries = [
+                (name, spec.get("match", {}) if isinstance(spec, _ty.Mapping) else {})
+                for name, spec in config.items()
+            ]
+        else:
+            entries = [(entry["name"], entry.get("match", {})) for entry in config]
+        return cls([compile_class(str(name), match) for name, match in entries], cache_size=cache_size)
+
+    def fingerprint(self, options: RawOptions) -> tuple[_ty.Optional[bytes], ...]:
+        get = options.get
+        return tuple(bytes(value) if (value := get(code)) is not None else None for code in self.codes)
+
+    def classify(self, options: _ty.Union[DhcpOptions, RawOptions]) -> tuple[str, ...]:
+        """Return the names of every class `options` belongs to, in definition order."""
+        raw = options._options if isinstance(options, DhcpOptions) else options
+        key = self.fingerprint(raw)
+        cache = self._cache
+        found = cache.get(key)
+        if found is not None:
+            cache.move_to_end(key)
+            return found
+        result = tuple(client_class.name for client_class in self.classes if client_class.match(raw))
+        cache[key] = result
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return result
+
+    def clear_cache(self) -> None:
+        self._cache.clear()
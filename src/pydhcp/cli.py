@@ -7,12 +7,21 @@ import pathlib
 import os
 import subprocess
 import sys
+import time
 import typing as _ty
 import logging as _logging
 
 from .capture import CaptureEvent, DhcpCapture
 from .network import host_ip_interfaces
 from .server import DhcpServer
+from .leasequery import BulkLeaseQueryListener
+from .lease import JournalLeaseBackend
+from .lease.migrate import FORMATS as LEASE_FORMATS, LeaseWriter, copy_leases, infer_format, read_leases
+from .leasestore import DEFAULT_PORT as LEASE_STORE_PORT, LeaseStoreServer, RemoteLeaseBackend
+from .classify import ClientClassifier
+from .scopes import OptionScopes
+from .loadbalance import LoadBalancer
+from .allocation import ALLOCATORS, pools_from_config
 from .relay import DhcpRelay
 from .config import load_config
 from .packet.message import DhcpMessage
@@ -42,12 +51,37 @@ def cmd_server(args: argparse.Namespace) -> None:
 
     print(f"Starting DHCP server, listening on: {listen}...")
     server = DhcpServer(listen=listen)
+    lease_store = server_config.get("lease_store", args.lease_store)
+    if lease_store:
+        print(f"Keeping leases in the lease store at: tcp/{lease_store}...")
+        server.lease_backend = RemoteLeaseBackend(_parse_lease_store_address(lease_store))
+    if "decline_hold_time" in server_config:
+        server.quarantine.hold_time = float(server_config["decline_hold_time"])
+    if config.get("classes"):
+        server.classifier = ClientClassifier.from_config(config["classes"])
+    if any(config.get(section) for section in ("options", "shared_networks", "subnets", "classes", "hosts")):
+        server.option_scopes = OptionScopes.from_config(config)
+    if config.get("load_balance"):
+        server.load_balancer = LoadBalancer.from_config(config["load_balance"])
+    allocation = config.get("allocation") or {}
+    if allocation.get("strategy"):
+        server.allocator = ALLOCATORS[allocation["strategy"]]()
+        server.pools = pools_from_config(config)
+    bulk_listen = server_config.get("bulk_leasequery", args.bulk_leasequery)
+    bulk = None
+    if bulk_listen:
+        print(f"Serving bulk leasequery on: tcp/{bulk_listen}...")
+        bulk = BulkLeaseQueryListener(server, listen=bulk_listen)
+        bulk.start()
     try:
         server.bind()
         server.listen()
     except KeyboardInterrupt:
         print("\nStopping server...")
         server.stop()
+    finally:
+        if bulk is not None:
+            bulk.close()
 
 
 def _parse_server_address(value: str) -> tuple[str, int] | str:
@@ -57,6 +91,63 @@ def _parse_server_address(value: str) -> tuple[str, int] | str:
     return value
 
 
+def _parse_lease_store_address(value: str) -> tuple[str, int]:
+    host, _, port_text = value.rpartition(":")
+    if not host:
+        return (value, LEASE_STORE_PORT)
+    return (host, int(port_text))
+
+
+def cmd_lease_store(args: argparse.Namespace) -> None:
+    if args.log_level:
+        LOGGER.setLevel(getattr(_logging, args.log_level.upper()))
+
+    backend = JournalLeaseBackend(args.journal) if args.journal else None
+    host, port = _parse_lease_store_address(args.listen)
+    print(f"Starting lease store, listening on: tcp/{host}:{port}...")
+    store = LeaseStoreServer(backend, listen=(host, port))
+    try:
+        store.bind()
+        store.listen()
+    except KeyboardInterrupt:
+        print("\nStopping lease store...")
+        store.stop()
+    finally:
+        store.close()
+        if backend is not None:
+            backend.close()
+
+
+def cmd_leases(args: argparse.Namespace) -> None:
+    def progress(count: int, seconds: float) -> None:
+        print(f"{count:,} leases copied ({count / seconds:,.0f} leases/sec)", file=sys.stderr)
+
+    try:
+        source_format = args.from_format or infer_format(args.source)
+        dest_format = args.to_format or infer_format(args.dest)
+        start = time.monotonic()
+        with LeaseWriter(
+            args.dest, dest_format, batch_size=args.batch_size, subnet_id=args.subnet_id, capacity=args.capacity
+        ) as writer:
+            count = copy_leases(
+                read_leases(args.source, source_format, page_size=args.batch_size),
+                writer,
+                progress,
+                args.progress_every,
+            )
+        seconds = time.monotonic() - start
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Error copying leases: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    summary = f"Copied {writer.written:,} leases from {args.source} ({source_format}) to {args.dest} ({dest_format})"
+    if writer.released:
+        summary += f", {writer.released:,} released"
+    if writer.skipped:
+        summary += f", {writer.skipped:,} skipped without an address"
+    print(f"{summary} in {seconds:.1f}s ({count / max(seconds, 1e-9):,.0f} leases/sec)", file=sys.stderr)
+
+
 def cmd_relay(args: argparse.Namespace) -> None:
     if args.log_level:
         LOGGER.setLevel(getattr(_logging, args.log_level.upper()))
@@ -278,6 +369,14 @@ def main() -> None:
         "--listen",
         help="Listen address/port spec, for example '*' or '127.0.0.1:6767,127.0.0.1:6768'",
     )
+    server_parser.add_argument(
+        "--bulk-leasequery",
+        help="Also serve RFC 6926 bulk leasequery over TCP on this listen spec, for example '127.0.0.1:6767'",
+    )
+    server_parser.add_argument(
+        "--lease-store",
+        help="Keep leases in a shared 'pydhcp lease-store' daemon at host[:port]",
+    )
     server_parser.add_argument(
         "--log-level",
         choices=["debug", "info", "warning", "error", "critical"],
@@ -309,6 +408,57 @@ def main() -> None:
         help="Set pydhcp log verbosity",
     )
 
+    lease_store_parser = subparsers.add_parser("lease-store", help="Serve leases to DHCP servers sharing them")
+    lease_store_parser.add_argument(
+        "--listen",
+        default=f"127.0.0.1:{LEASE_STORE_PORT}",
+        help=f"TCP address to listen on, host[:port] (default: 127.0.0.1:{LEASE_STORE_PORT})",
+    )
+    lease_store_parser.add_argument(
+        "--journal",
+        help="Persist leases as a snapshot plus journal at this path; in memory only when omitted",
+    )
+    lease_store_parser.add_argument(
+        "--log-level",
+        choices=["debug", "info", "warning", "error", "critical"],
+        help="Set pydhcp log verbosity",
+    )
+
+    leases_parser = subparsers.add_parser("leases", help="Copy leases between lease backends and formats")
+    leases_parser.add_argument("source", help="Lease file or database to read, or '-' for ISC or Kea text on stdin")
+    leases_parser.add_argument("dest", help="Lease file or database to add the leases to, or '-' for stdout")
+    leases_parser.add_argument(
+        "--from",
+        dest="from_format",
+        choices=LEASE_FORMATS,
+        help="Source format; inferred from the file extension when omitted",
+    )
+    leases_parser.add_argument(
+        "--to",
+        dest="to_format",
+        choices=LEASE_FORMATS,
+        help="Destination format; inferred from the file extension when omitted",
+    )
+    leases_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=10000,
+        help="Leases per SQLite page and transaction (default: 10000)",
+    )
+    leases_parser.add_argument(
+        "--progress-every",
+        type=int,
+        default=100_000,
+        help="Report progress every N leases (default: 100000)",
+    )
+    leases_parser.add_argument("--subnet-id", type=int, default=1, help="Subnet id for Kea output (default: 1)")
+    leases_parser.add_argument(
+        "--capacity",
+        type=int,
+        default=1 << 20,
+        help="Slots in a new mmap store, a power of two (default: 1048576)",
+    )
+
     packet_parser = subparsers.add_parser("packet", help="Encode or decode DHCP packets")
     mode_group = packet_parser.add_mutually_exclusive_group(required=True)
     mode_group.add_argument("--decode", dest="mode", action="store_const", const="decode")
@@ -371,6 +521,10 @@ def main() -> None:
         cmd_server(args)
     elif args.command == "relay":
         cmd_relay(args)
+    elif args.command == "lease-store":
+        cmd_lease_store(args)
+    elif args.command == "leases":
+        cmd_leases(args)
     elif args.command == "packet":
         cmd_packet(args)
     elif args.command == "capture":
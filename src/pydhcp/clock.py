@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import time as _time
+import typing as _ty
+
+
+class TimeSource(_ty.Protocol):
+    """Where the server and lease backends read the time from.
+
+    :meth:`time` is epoch seconds, used for lease expiry and
+    client-last-transaction times. :meth:`monotonic` never goes back, used
+    for hold times and write intervals.
+    """
+
+    def time(self) -> float:
+        ...
+
+    def monotonic(self) -> float:
+        ...
+
+
+class SystemClock:
+    """Reads the system clocks on every call."""
+
+    def time(self) -> float:
+        return _time.time()
+
+    def monotonic(self) -> float:
+        return _time.monotonic()
+
+
+SYSTEM_CLOCK = SystemClock()
+
+
+class CachedClock:
+    """Reads `source` once per :meth:`tick` and returns that reading until the next one.
+
+    :class:`~pydhcp.server.DhcpServer` ticks its clock when a packet arrives
+    and on every housekeeping tick, so the lease lookup, renewal, offer hold
+    and reply for one packet all see the same instant and read the system
+    clock once between them. Other threads using the clock, such as through
+    a shared lease backend, see time advance only as the server ticks: at
+    least every ``select_timeout`` seconds.
+    """
+
+    def __init__(self, source: _ty.Optional[TimeSource] = None) -> None:
+        self.source = source if source is not None else SYSTEM_CLOCK
+        self._time = 0.0
+        self._monotonic = 0.0
+        self.tick()
+
+    def tick(self) -> float:
+        """Read the source; return the new epoch time."""
+        self._time = self.source.time()
+        self._monotonic = self.source.monotonic()
+        return self._time
+
+    def time(self) -> float:
+        return self._time
+
+    def monotonic(self) -> float:
+        return self._monotonic
+
+
+class VirtualClock:
+    """A clock that only moves when told to, for tests and simulations.
+
+    Both clocks start at `start` and move together by :meth:`advance`, so a
+    day of leases can be run without waiting for it. Wrap it in a
+    :class:`CachedClock` to drive a server, which then reads it once per
+    packet as it would the system clock.
+    """
+
+    def __init__(self, start: float = 1_800_000_000.0) -> None:
+        self.start = start
+        self._now = start
+
+    def time(self) -> float:
+        return self._now
+
+    def monotonic(self) -> float:
+        return self._now - self.start
+
+    def advance(self, seconds: float) -> float:
+        """Move both clocks forward by `seconds`; return the new epoch time."""
+        if seconds < 0:
+            raise ValueError("A virtual clock cannot go back")
+        self._now += seconds
+        return self._now
+
+    def advance_to(self, when: float) -> float:
+        """Move both clocks forward to epoch time `when`, if it is not already past."""
+        if when > self._now:
+            self._now = when
+        return self._now
@@ -0,0 +1,605 @@
+from __future__ import annotations
+import datetime as _dt
+import gc as _gc
+import itertools as _itertools
+import json as _json
+import os as _os
+import typing as _ty
+import weakref as _weakref
+from math import inf as _inf
+
+from ..clock import SYSTEM_CLOCK, TimeSource
+from ..network import IPv4
+from ..options import DhcpOptions
+from ..constants import INFINITE_LEASE_TIME
+from ..timers import ExpiryHeap
+
+
+class DhcpLease(_ty.NamedTuple):
+    ip: _ty.Optional[IPv4]
+    expires: _ty.Union[_dt.datetime, float]
+    options: DhcpOptions
+
+
+def lease_to_json(
+    lease: DhcpLease,
+    chaddr: _ty.Optional[bytes] = None,
+    cltt: _ty.Optional[float] = None,
+) -> _ty.Dict[str, _ty.Any]:
+    """Return the JSON-ready record :class:`FileLeaseBackend` stores for a lease."""
+    return {
+        "ip": str(lease.ip) if lease.ip else None,
+        "expires": "inf" if not isinstance(lease.expires, _dt.datetime) else lease.expires.isoformat(),
+        "options": {str(int(code)): option.hex() for code, option in lease.options.items(decoded=False)},
+        "chaddr": chaddr.hex() if chaddr else None,
+        "cltt": cltt,
+    }
+
+
+def lease_from_json(
+    data: _ty.Mapping[str, _ty.Any],
+) -> tuple[DhcpLease, _ty.Optional[bytes], _ty.Optional[float]]:
+    """Inverse of :func:`lease_to_json`: return the lease, its chaddr and last-transaction time."""
+    ip_str = data.get("ip")
+    ip = IPv4(ip_str) if ip_str else None
+    exp_str = data.get("expires")
+    if exp_str == "inf":
+        expires: _ty.Union[_dt.datetime, float] = _inf
+    elif exp_str:
+        expires = _dt.datetime.fromisoformat(exp_str)
+    else:
+        expires = _inf
+
+    opts = DhcpOptions()
+    for code_str, val_hex in data.get("options", {}).items():
+        opts[int(code_str)] = bytearray.fromhex(val_hex)
+
+    chaddr_hex = data.get("chaddr")
+    return DhcpLease(ip=ip, expires=expires, options=opts), bytes.fromhex(chaddr_hex) if chaddr_hex else None, data.get("cltt")
+
+
+def pack_options(options: DhcpOptions) -> bytes:
+    """Serialize `options` as code, 16-bit length and value records, for binary lease stores.
+
+    Unlike the wire encoding, values longer than 255 bytes stay in one record.
+    """
+    packed = bytearray()
+    for code, value in options.items(decoded=False):
+        packed.append(int(code))
+        packed += len(value).to_bytes(2, "big")
+        packed += value
+    return bytes(packed)
+
+
+def unpack_options(data: _ty.Union[bytes, memoryview]) -> DhcpOptions:
+    """Inverse of :func:`pack_options`."""
+    options = DhcpOptions()
+    view = memoryview(data)
+    offset = 0
+    while offset < len(view):
+        code = view[offset]
+        length = int.from_bytes(view[offset + 1 : offset + 3], "big")
+        options._options[code] = bytearray(view[offset + 3 : offset + 3 + length])
+        offset += 3 + length
+    return options
+
+
+class LeaseBackend(_ty.Protocol):
+    def allocate(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        ...
+
+    def lookup(self, client_id: str) -> _ty.Optional[DhcpLease]:
+        ...
+
+    def release(self, client_id: str) -> bool:
+        ...
+
+    def renew(self, client_id: str, ttl: int) -> _ty.Optional[DhcpLease]:
+        ...
+
+
+@_ty.runtime_checkable
+class LeaseQueryBackend(LeaseBackend, _ty.Protocol):
+    """A :class:`LeaseBackend` that can answer RFC 4388 leasequeries.
+
+    Besides the primary ``client_id`` key it keeps secondary indexes by address
+    and by hardware address, so every leasequery is a dict lookup rather than a
+    scan. ``allocate`` additionally accepts the client's ``chaddr`` to feed the
+    hardware-address index.
+    """
+
+    def allocate(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+        chaddr: _ty.Optional[bytes] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        ...
+
+    def lookup_ip(self, ip: IPv4) -> _ty.Optional[tuple[str, DhcpLease]]:
+        ...
+
+    def lookup_chaddr(self, chaddr: bytes) -> _ty.Optional[tuple[str, DhcpLease]]:
+        ...
+
+    def chaddr(self, client_id: str) -> _ty.Optional[bytes]:
+        ...
+
+    def last_transaction(self, client_id: str) -> _ty.Optional[float]:
+        """Epoch seconds of the last allocate or renew for ``client_id``."""
+        ...
+
+    def iter_leases(self) -> _ty.Iterator[tuple[str, DhcpLease]]:
+        """Lazily yield every unexpired ``(client_id, lease)`` binding."""
+        ...
+
+
+class LeaseRecord:
+    """The compact form :class:`InMemoryLeaseBackend` stores a lease in.
+
+    The address is an int (-1 for none), expiry and last transaction are
+    epoch floats (``inf`` for an infinite lease) and `options` is an option
+    set shared by every lease with identical options (see :class:`OptionSets`).
+    Leases loaded from a binary snapshot hold a :class:`LazyOptionSet` until
+    their options are first needed. :class:`DhcpLease` tuples are views built
+    by :meth:`view` when a lease is returned.
+    """
+
+    __slots__ = ("ip", "expires", "cltt", "chaddr", "options")
+
+    def __init__(
+        self,
+        ip: int,
+        expires: float,
+        cltt: float,
+        chaddr: _ty.Optional[bytes],
+        options: _ty.Union[DhcpOptions, LazyOptionSet],
+    ) -> None:
+        self.ip = ip
+        self.expires = expires
+        self.cltt = cltt
+        self.chaddr = chaddr
+        self.options = options
+
+    def view(self) -> DhcpLease:
+        options = self.options
+        if type(options) is LazyOptionSet:
+            options = self.options = options.get()
+        return DhcpLease(
+            ip=IPv4(self.ip) if self.ip >= 0 else None,
+            expires=_dt.datetime.fromtimestamp(self.expires) if self.expires != _inf else _inf,
+            options=_ty.cast(DhcpOptions, options),
+        )
+
+
+class OptionSets:
+    """Interns option sets, so leases with identical options share one :class:`DhcpOptions`.
+
+    A set is dropped once no lease refers to it. Interned sets are shared:
+    copy one before changing it.
+    """
+
+    def __init__(self) -> None:
+        self._sets: _weakref.WeakValueDictionary[bytes, DhcpOptions] = _weakref.WeakValueDictionary()
+
+    def __len__(self) -> int:
+        return len(self._sets)
+
+    def intern(self, options: _ty.Optional[DhcpOptions]) -> DhcpOptions:
+        return self.intern_packed(pack_options(options) if options else b"")
+
+    def intern_packed(self, packed: bytes) -> DhcpOptions:
+        """Like :meth:`intern`, for a set already encoded by :func:`pack_options`."""
+        shared = self._sets.get(packed)
+        if shared is None:
+            # A private copy, so the caller's later changes do not leak into stored leases.
+            shared = unpack_options(packed)
+            self._sets[packed] = shared
+        return shared
+
+
+class LazyOptionSet:
+    """An option set decoded only when a lease using it is first returned.
+
+    Shared by every lease loaded with the same set, so the set is decoded and
+    interned through `option_sets` at most once.
+    """
+
+    __slots__ = ("packed", "_option_sets", "_options")
+
+    def __init__(self, packed: bytes, option_sets: OptionSets) -> None:
+        self.packed = packed
+        self._option_sets = option_sets
+        self._options: _ty.Optional[DhcpOptions] = None
+
+    def get(self) -> DhcpOptions:
+        if self._options is None:
+            self._options = self._option_sets.intern_packed(self.packed)
+        return self._options
+
+
+def _epoch(expires: _ty.Union[_dt.datetime, float]) -> float:
+    return expires.timestamp() if isinstance(expires, _dt.datetime) else _inf
+
+
+class InMemoryLeaseBackend:
+    """Leases in a dict of :class:`LeaseRecord`, with indexes by address and hardware address.
+
+    Expiry deadlines are kept in an :class:`~pydhcp.timers.ExpiryHeap`, so
+    :meth:`sweep` reclaims expired leases without scanning the live ones.
+    Until a sweep runs, :meth:`lookup` still drops an expired lease it
+    comes across, unless :attr:`prune_on_read` is off.
+
+    Times are read from `clock`, by default the system clock. Pass the
+    server's :class:`~pydhcp.clock.CachedClock` so one packet's lookup and
+    renewal share the reading the server took for it.
+    """
+
+    prune_on_read = True
+    """Whether lookups remove the expired leases they find. With it off they
+    only read, so :class:`~pydhcp.lease.threadsafe.ThreadSafeLeaseBackend`
+    turns it off and lets lookups run beside a write."""
+
+    def __init__(self, clock: _ty.Optional[TimeSource] = None) -> None:
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self._leases: _ty.Dict[str, LeaseRecord] = {}
+        self._by_ip: _ty.Dict[int, str] = {}
+        self._by_chaddr: _ty.Dict[bytes, str] = {}
+        self._expiry: ExpiryHeap[str] = ExpiryHeap()
+        self._option_sets = OptionSets()
+        self._removed = 0
+        """Keys ever removed from `_leases`; lets :meth:`iter_leases` find its place again."""
+        self.reclaimed = 0
+        """Expired leases removed by :meth:`sweep`."""
+
+    def allocate(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+        chaddr: _ty.Optional[bytes] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        now = self.clock.time()
+        record = LeaseRecord(
+            int(ip) if ip is not None else -1,
+            now + ttl,
+            now,
+            bytes(chaddr) if chaddr else None,
+            self._option_sets.intern(options),
+        )
+        self._store(client_id, record)
+        return record.view()
+
+    def allocate_if_free(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+        chaddr: _ty.Optional[bytes] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        """Bind `ip` to `client_id` unless another client holds a live lease on it.
+
+        Returns None, and changes nothing, when the address is taken.
+        """
+        holder = self.lookup_ip(ip)
+        if holder is not None and holder[0] != client_id:
+            return None
+        return self.allocate(client_id, ip, ttl, options, chaddr=chaddr)
+
+    def lookup(self, client_id: str) -> _ty.Optional[DhcpLease]:
+        record = self._leases.get(client_id)
+        if record is None:
+            return None
+        if record.expires < self.clock.time():
+            if self.prune_on_read:
+                self._unbind(client_id)
+            return None
+        return record.view()
+
+    def release(self, client_id: str) -> bool:
+        if client_id in self._leases:
+            self._unbind(client_id)
+            return True
+        return False
+
+    def renew(self, client_id: str, ttl: int) -> _ty.Optional[DhcpLease]:
+        record = self._leases.get(client_id)
+        now = self.clock.time()
+        if record is None or record.expires < now:
+            if record is not None:
+                self._unbind(client_id)
+            return None
+        record.expires = now + ttl
+        record.cltt = now
+        self._schedule(client_id, record.expires)
+        return record.view()
+
+    def sweep(self, now: _ty.Optional[float] = None) -> int:
+        """Remove the leases expired at epoch `now`; return how many were removed.
+
+        Costs O(log n) per expired lease and nothing for live ones, so it can
+        run on every tick of the receive loop.
+        """
+        expired = self._expiry.pop_expired(self.clock.time() if now is None else now)
+        for client_id in expired:
+            self._unbind(client_id)
+        self.reclaimed += len(expired)
+        return len(expired)
+
+    def lookup_ip(self, ip: IPv4) -> _ty.Optional[tuple[str, DhcpLease]]:
+        client_id = self._by_ip.get(int(ip))
+        if client_id is None:
+            return None
+        lease = self.lookup(client_id)
+        return (client_id, lease) if lease is not None else None
+
+    def lookup_chaddr(self, chaddr: bytes) -> _ty.Optional[tuple[str, DhcpLease]]:
+        client_id = self._by_chaddr.get(bytes(chaddr))
+        if client_id is None:
+            return None
+        lease = self.lookup(client_id)
+        return (client_id, lease) if lease is not None else None
+
+    def chaddr(self, client_id: str) -> _ty.Optional[bytes]:
+        record = self._leases.get(client_id)
+        return record.chaddr if record is not None else None
+
+    def last_transaction(self, client_id: str) -> _ty.Optional[float]:
+        record = self._leases.get(client_id)
+        return record.cltt if record is not None else None
+
+    def iter_leases(self) -> _ty.Iterator[tuple[str, DhcpLease]]:
+        """Yield every unexpired binding, walking the table in place.
+
+        Nothing is copied, so memory stays flat however large the table. When
+        leases are bound or removed between two steps, the walk resumes from
+        its position in a fresh pass: new keys only ever go at the end, and
+        it steps back one place for each key removed meanwhile. No lease
+        bound throughout is missed, though one may be yielded twice.
+        """
+        # Expired leases are skipped rather than purged: this may run on
+        # another thread than the one mutating the table.
+        now = self.clock.time()
+        leases = self._leases
+        position = 0
+        keys: _ty.Iterator[str] = iter(())
+        size = -1
+        removed = self._removed
+        while True:
+            if len(leases) != size or self._removed != removed:
+                position = max(0, position - (self._removed - removed))
+                keys = _itertools.islice(leases, position, None)
+                size, removed = len(leases), self._removed
+            client_id = next(keys, None)
+            if client_id is None:
+                return
+            position += 1
+            record = leases.get(client_id)
+            if record is None or record.expires < now:
+                continue
+            yield client_id, record.view()
+
+    def _bind(
+        self,
+        client_id: str,
+        lease: DhcpLease,
+        chaddr: _ty.Optional[bytes] = None,
+        touched: _ty.Optional[float] = None,
+    ) -> None:
+        record = LeaseRecord(
+            int(lease.ip) if lease.ip is not None else -1,
+            _epoch(lease.expires),
+            self.clock.time() if touched is None else touched,
+            bytes(chaddr) if chaddr else None,
+            self._option_sets.intern(lease.options),
+        )
+        self._store(client_id, record)
+
+    def _store(self, client_id: str, record: LeaseRecord) -> None:
+        previous = self._leases.get(client_id)
+        if previous is not None:
+            if previous.ip >= 0 and previous.ip != record.ip and self._by_ip.get(previous.ip) == client_id:
+                del self._by_ip[previous.ip]
+            if record.chaddr is None:
+                record.chaddr = previous.chaddr
+            elif previous.chaddr is not None and previous.chaddr != record.chaddr:
+                if self._by_chaddr.get(previous.chaddr) == client_id:
+                    del self._by_chaddr[previous.chaddr]
+        self._leases[client_id] = record
+        if record.ip >= 0:
+            self._by_ip[record.ip] = client_id
+        if record.chaddr is not None:
+            self._by_chaddr[record.chaddr] = client_id
+        self._schedule(client_id, record.expires)
+
+    def _store_all(self, records: _ty.Iterable[tuple[str, LeaseRecord]]) -> None:
+        """:meth:`_store` for many records at once, as when loading a lease file."""
+        leases = self._leases
+        by_ip = self._by_ip
+        by_chaddr = self._by_chaddr
+        deadlines = []
+        # Records form no reference cycles; a collection partway through a
+        # large load would only rescan the table built so far.
+        collecting = _gc.isenabled()
+        _gc.disable()
+        try:
+            for client_id, record in records:
+                if client_id in leases:
+                    self._store(client_id, record)
+                    continue
+                leases[client_id] = record
+                if record.ip >= 0:
+                    by_ip[record.ip] = client_id
+                if record.chaddr is not None:
+                    by_chaddr[record.chaddr] = client_id
+                if record.expires != _inf:
+                    deadlines.append((client_id, record.expires))
+            self._expiry.schedule_many(deadlines)
+        finally:
+            if collecting:
+                _gc.enable()
+
+    def _schedule(self, client_id: str, expires: float) -> None:
+        if expires != _inf:
+            self._expiry.schedule(client_id, expires)
+        else:
+            self._expiry.discard(client_id)
+
+    def _unbind(self, client_id: str) -> None:
+        record = self._leases.pop(client_id, None)
+        if record is None:
+            return
+        self._removed += 1
+        if record.ip >= 0 and self._by_ip.get(record.ip) == client_id:
+            del self._by_ip[record.ip]
+        if record.chaddr is not None and self._by_chaddr.get(record.chaddr) == client_id:
+            del self._by_chaddr[record.chaddr]
+        self._expiry.discard(client_id)
+
+
+class FileLeaseBackend(InMemoryLeaseBackend):
+    """Leases kept in memory and persisted as one JSON file.
+
+    Allocations and releases rewrite the file straight away. Renewals can be
+    coalesced, since rewriting every lease whenever one client renews costs
+    far more than the renewal itself:
+
+    * ``renew_threshold``: a renewal is written only once the expiry on disk
+      covers less than ``1 - renew_threshold`` of the new lease time. With
+      0.25, a client renewing a one-hour lease every minute is written every
+      15 minutes instead of 60 times an hour. After a crash its lease expires
+      early, but never before the client's next renewal would have come.
+    * ``flush_interval``: renewals that do need writing are batched. They are
+      written by the next allocation or release, by a renewal at least
+      ``flush_interval`` seconds after the last write, or by :meth:`flush`.
+
+    Lookups always see the renewed expiry; only the copy on disk lags.
+
+    With ``file_format="binary"`` the file is written as a binary snapshot
+    (:mod:`pydhcp.lease.snapshot`) instead of JSON. It is a fraction of the
+    size and loads many times faster: expired leases are skipped without
+    being decoded and options are decoded on first use. Either format is
+    read on startup, so switching format converts the file on the next write.
+    """
+
+    def __init__(
+        self,
+        filepath: str = "leases.json",
+        renew_threshold: float = 0.0,
+        flush_interval: _ty.Optional[float] = None,
+        file_format: str = "json",
+        clock: _ty.Optional[TimeSource] = None,
+    ) -> None:
+        if file_format not in ("json", "binary"):
+            raise ValueError(f"Unknown lease file format {file_format!r}, expected 'json' or 'binary'")
+        super().__init__(clock)
+        self.filepath = filepath
+        self.file_format = file_format
+        self.renew_threshold = renew_threshold
+        self.flush_interval = flush_interval
+        self.saves = 0
+        """How many times the lease file has been written."""
+        self._persisted: _ty.Dict[str, float] = {}
+        self._dirty = False
+        self._last_save = self.clock.monotonic()
+        self._load()
+        self._persisted = {client_id: record.expires for client_id, record in self._leases.items()}
+
+    def _load(self) -> None:
+        from .snapshot import is_snapshot, read_snapshot
+
+        if not _os.path.exists(self.filepath):
+            return
+        try:
+            if is_snapshot(self.filepath):
+                self._store_all(read_snapshot(self.filepath, self._option_sets))
+                return
+            with open(self.filepath, "r", encoding="utf-8") as f:
+                data = _json.load(f)
+            for client_id, lease_data in data.items():
+                lease, chaddr, cltt = lease_from_json(lease_data)
+                self._bind(client_id, lease, chaddr, cltt)
+        except Exception:
+            pass
+
+    def _save(self) -> None:
+        from .snapshot import write_snapshot
+
+        self.sweep()
+
+        try:
+            if self.file_format == "binary":
+                write_snapshot(self.filepath, self._leases.items())
+            else:
+                data = {}
+                for client_id, record in self._leases.items():
+                    data[client_id] = lease_to_json(record.view(), record.chaddr, record.cltt)
+                with open(self.filepath, "w", encoding="utf-8") as f:
+                    _json.dump(data, f, indent=2)
+        except Exception:
+            return
+        self.saves += 1
+        self._dirty = False
+        self._last_save = self.clock.monotonic()
+        self._persisted = {client_id: record.expires for client_id, record in self._leases.items()}
+
+    def flush(self) -> None:
+        """Write renewals still held back by ``flush_interval``."""
+        if self._dirty:
+            self._save()
+
+    def _renewal_persisted(self, client_id: str, ttl: float) -> bool:
+        """True when the expiry on disk still covers enough of a renewal for `ttl` seconds."""
+        if self.renew_threshold <= 0:
+            return False
+        persisted = self._persisted.get(client_id)
+        if persisted is None:
+            return False
+        if persisted == _inf:
+            return True
+        if ttl == _inf:
+            return False
+        return persisted - self.clock.time() >= (1 - self.renew_threshold) * ttl
+
+    def allocate(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+        chaddr: _ty.Optional[bytes] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        lease = super().allocate(client_id, ip, ttl, options, chaddr)
+        if lease:
+            self._save()
+        return lease
+
+    def release(self, client_id: str) -> bool:
+        res = super().release(client_id)
+        if res:
+            self._save()
+        return res
+
+    def renew(self, client_id: str, ttl: int) -> _ty.Optional[DhcpLease]:
+        lease = super().renew(client_id, ttl)
+        if not lease or self._renewal_persisted(client_id, ttl):
+            return lease
+        if self.flush_interval is None or self.clock.monotonic() - self._last_save >= self.flush_interval:
+            self._save()
+        else:
+            self._dirty = True
+        return lease
+
+
+from .journal import JournalLeaseBackend as JournalLeaseBackend  # noqa: E402
+from .threadsafe import ThreadSafeLeaseBackend as ThreadSafeLeaseBackend  # noqa: E402
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import datetime as _dt
+import typing as _ty
+from collections import OrderedDict as _OrderedDict
+
+from ..clock import SYSTEM_CLOCK, TimeSource
+from ..metrics import DhcpMetrics
+from ..network import IPv4
+from ..options import DhcpOptions
+from . import DhcpLease, LeaseBackend
+
+
+class CachedLeaseBackend:
+    """A read-through LRU cache in front of a slower :class:`~pydhcp.lease.LeaseBackend`.
+
+    :meth:`lookup` answers from a bounded LRU of the `size` most recently used
+    leases and only asks `backend` on a miss. Clients the backend does not
+    know are remembered in a second LRU of `negative_size` entries for
+    `negative_ttl` seconds, so repeated lookups for a new client reach the
+    backend once. Allocations, renewals and releases go to the backend first
+    and the cache then holds their result. The cache never holds a lease the
+    backend has not confirmed.
+
+    The cache assumes it is the backend's only writer. When something else
+    changes the backend, such as another process sharing a SQLite file, call
+    :meth:`invalidate` for the affected clients, or with no argument to drop
+    everything. Cached leases are checked against their expiry on every hit;
+    an expired one counts as a miss and is looked up in `backend` again.
+    Expiry and the negative entries' lifetime are read from `clock`, by
+    default the backend's own, so the cache and the backend agree on which
+    leases have expired.
+
+    Hits and misses are counted in :attr:`hits` and :attr:`misses` and, once
+    the backend is handed to a :class:`~pydhcp.server.DhcpServer`, in its
+    ``metrics.lease_cache_hits`` and ``metrics.lease_cache_misses``. Other
+    methods, such as the :class:`~pydhcp.lease.LeaseQueryBackend` queries,
+    pass straight through to `backend`.
+    """
+
+    def __init__(
+        self,
+        backend: LeaseBackend,
+        size: int = 4096,
+        negative_size: int = 4096,
+        negative_ttl: float = 5.0,
+        metrics: _ty.Optional[DhcpMetrics] = None,
+        clock: _ty.Optional[TimeSource] = None,
+    ) -> None:
+        self.backend = backend
+        self.clock: TimeSource = clock if clock is not None else getattr(backend, "clock", SYSTEM_CLOCK)
+        self.size = size
+        self.negative_size = negative_size
+        self.negative_ttl = negative_ttl
+        self.metrics = metrics
+        self.hits = 0
+        self.misses = 0
+        self._leases: _OrderedDict[str, DhcpLease] = _OrderedDict()
+        self._unknown: _OrderedDict[str, float] = _OrderedDict()
+        """Client id to the monotonic time its negative entry lapses."""
+
+    def __getattr__(self, name: str) -> _ty.Any:
+        if name.startswith("_") or name == "backend":
+            raise AttributeError(name)
+        attribute = getattr(self.backend, name)
+        if name != "allocate_if_free":
+            return attribute
+
+        def allocate_if_free(client_id: str, *args: _ty.Any, **kwargs: _ty.Any) -> _ty.Optional[DhcpLease]:
+            return self._stored(client_id, attribute(client_id, *args, **kwargs))
+
+        return allocate_if_free
+
+    @property
+    def hit_ratio(self) -> float:
+        """Share of lookups answered from the cache, 0.0 before the first."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self._leases)
+
+    def invalidate(self, client_id: _ty.Optional[str] = None) -> None:
+        """Forget what is cached for `client_id`, or for every client."""
+        if client_id is None:
+            self._leases.clear()
+            self._unknown.clear()
+        else:
+            self._leases.pop(client_id, None)
+            self._unknown.pop(client_id, None)
+
+    def _count(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+            if self.metrics is not None:
+                self.metrics.lease_cache_hits += 1
+        else:
+            self.misses += 1
+            if self.metrics is not None:
+                self.metrics.lease_cache_misses += 1
+
+    def _remember(self, client_id: str, lease: DhcpLease) -> None:
+        self._unknown.pop(client_id, None)
+        self._leases[client_id] = lease
+        self._leases.move_to_end(client_id)
+        if len(self._leases) > self.size:
+            self._leases.popitem(last=False)
+
+    def _forget(self, client_id: str) -> None:
+        self._leases.pop(client_id, None)
+        if self.negative_size <= 0:
+            return
+        self._unknown[client_id] = self.clock.monotonic() + self.negative_ttl
+        self._unknown.move_to_end(client_id)
+        if len(self._unknown) > self.negative_size:
+            self._unknown.popitem(last=False)
+
+    def _stored(self, client_id: str, lease: _ty.Optional[DhcpLease]) -> _ty.Optional[DhcpLease]:
+        if lease is not None:
+            self._remember(client_id, lease)
+        else:
+            # The backend refused; whatever it holds for the client is unknown here.
+            self.invalidate(client_id)
+        return lease
+
+    def allocate(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+        chaddr: _ty.Optional[bytes] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        if chaddr is not None:
+            lease = self.backend.allocate(client_id, ip, ttl, options, chaddr=chaddr)  # type: ignore[call-arg]
+        else:
+            lease = self.backend.allocate(client_id, ip, ttl, options)
+        return self._stored(client_id, lease)
+
+    def lookup(self, client_id: str) -> _ty.Optional[DhcpLease]:
+        lease = self._leases.get(client_id)
+        if lease is not None:
+            if not isinstance(lease.expires, _dt.datetime) or lease.expires.timestamp() >= self.clock.time():
+                self._count(True)
+                self._leases.move_to_end(client_id)
+                return lease
+            # The backend may have renewed it behind the cache; only it can say.
+            del self._leases[client_id]
+        lapses = self._unknown.get(client_id)
+        if lapses is not None:
+            if lapses > self.clock.monotonic():
+                self._count(True)
+                return None
+            del self._unknown[client_id]
+        self._count(False)
+        lease = self.backend.lookup(client_id)
+        if lease is not None:
+            self._remember(client_id, lease)
+        else:
+            self._forget(client_id)
+        return lease
+
+    def release(self, client_id: str) -> bool:
+        released = self.backend.release(client_id)
+        self._forget(client_id)
+        return released
+
+    def renew(self, client_id: str, ttl: int) -> _ty.Optional[DhcpLease]:
+        lease = self.backend.renew(client_id, ttl)
+        if lease is not None:
+            self._remember(client_id, lease)
+        else:
+            self._forget(client_id)
+        return lease
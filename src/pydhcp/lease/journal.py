@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import datetime as _dt
+import json as _json
+import os as _os
+import typing as _ty
+from math import inf as _inf
+
+from ..clock import TimeSource
+from ..network import IPv4
+from ..options import DhcpOptions
+from . import DhcpLease, InMemoryLeaseBackend, lease_from_json, lease_to_json
+from .snapshot import is_snapshot, read_snapshot, snapshot_seq, write_snapshot
+
+FSYNC_POLICIES = ("always", "group", "interval", "none")
+SNAPSHOT_FORMAT = "pydhcp-journal-snapshot"
+
+
+def _expires_to_json(expires: _ty.Union[_dt.datetime, float]) -> str:
+    return expires.isoformat() if isinstance(expires, _dt.datetime) else "inf"
+
+
+def _expires_from_json(value: str) -> _ty.Union[_dt.datetime, float]:
+    return _inf if value == "inf" else _dt.datetime.fromisoformat(value)
+
+
+class JournalLeaseBackend(InMemoryLeaseBackend):
+    """Leases kept in memory, persisted as a snapshot plus an append-only journal.
+
+    Each allocate, renew and release appends one JSON line to
+    ``<filepath>.journal``, so a write costs the same whatever the number of
+    leases. Once the journal holds `compact_threshold` records and at least as
+    many records as there are leases, the next :meth:`flush` calls
+    :meth:`compact`, which writes the live leases to a temporary file, renames
+    it over `filepath` and empties the journal. Leaving it to :meth:`flush`
+    keeps the rewrite off the write that crosses the threshold. Startup loads
+    the snapshot and replays the journal on top of it.
+
+    `file_format` picks the snapshot format, ``"json"`` or ``"binary"`` (see
+    :mod:`pydhcp.lease.snapshot`).
+
+    Records carry a sequence number and the snapshot stores the last one it
+    includes. If the process dies between the rename and the truncation,
+    replay skips the records the snapshot already holds. A torn last line
+    from a crash mid-append is dropped.
+
+    `fsync` picks when the journal reaches the disk:
+
+    * ``"always"``: write and fsync every record before returning.
+    * ``"group"``: buffer records and write and fsync them `group_size` at a
+      time, once the oldest has waited `fsync_interval` seconds, or on
+      :meth:`sync`. A crash loses at most one group.
+    * ``"interval"``: write every record and fsync at most every
+      `fsync_interval` seconds. A process crash loses nothing; a power loss
+      loses up to an interval.
+    * ``"none"``: write every record and leave flushing to the OS.
+
+    :meth:`flush` writes and fsyncs whatever a policy is holding back, and
+    :class:`~pydhcp.server.DhcpServer` calls it from its tick every
+    :attr:`flush_interval` seconds, so an idle server does not leave records
+    unsynced. Call :meth:`close` on shutdown; the server does when it stops.
+
+    A plain :class:`~pydhcp.lease.FileLeaseBackend` file, in either format, is
+    accepted as the initial snapshot, so existing lease files carry over.
+    """
+
+    def __init__(
+        self,
+        filepath: str = "leases.json",
+        fsync: str = "group",
+        group_size: int = 64,
+        fsync_interval: float = 1.0,
+        compact_threshold: int = 10000,
+        file_format: str = "json",
+        clock: _ty.Optional[TimeSource] = None,
+    ) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync!r}, expected one of {', '.join(FSYNC_POLICIES)}")
+        if file_format not in ("json", "binary"):
+            raise ValueError(f"Unknown lease file format {file_format!r}, expected 'json' or 'binary'")
+        super().__init__(clock)
+        self.filepath = filepath
+        self.journal_path = filepath + ".journal"
+        self.fsync = fsync
+        self.group_size = group_size
+        self.fsync_interval = fsync_interval
+        self.compact_threshold = compact_threshold
+        self.file_format = file_format
+        self.records = 0
+        """Journal records written since the last compaction."""
+        self.fsyncs = 0
+        self.compactions = 0
+        self._seq = 0
+        self._pending: list[bytes] = []
+        self._pending_since = 0.0
+        self._last_fsync = self.clock.monotonic()
+        self._load()
+        self._fsynced_seq = self._seq
+        self._journal = open(self.journal_path, "ab")
+
+    @property
+    def seq(self) -> int:
+        """Sequence number of the last record written."""
+        return self._seq
+
+    @property
+    def flush_interval(self) -> float:
+        """Seconds :meth:`flush` may be put off for; the `fsync_interval`."""
+        return self.fsync_interval
+
+    def _load(self) -> None:
+        if _os.path.exists(self.filepath) and is_snapshot(self.filepath):
+            self._seq = snapshot_seq(self.filepath)
+            self._store_all(read_snapshot(self.filepath, self._option_sets, now=self.clock.time()))
+        elif _os.path.exists(self.filepath):
+            with open(self.filepath, "r", encoding="utf-8") as f:
+                data = _json.load(f)
+            if data.get("format") == SNAPSHOT_FORMAT:
+                self._seq = data["seq"]
+                data = data["leases"]
+            for client_id, lease_data in data.items():
+                lease, chaddr, cltt = lease_from_json(lease_data)
+                self._bind(client_id, lease, chaddr, cltt)
+        if _os.path.exists(self.journal_path):
+            self._replay()
+
+    def _replay(self) -> None:
+        good = 0
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = _json.loads(line)
+                except ValueError:
+                    break
+                good += len(line)
+                if record["seq"] <= self._seq:
+                    continue
+                self._apply(record)
+                self._seq = record["seq"]
+                self.records += 1
+        if good < _os.path.getsize(self.journal_path):
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(good)
+
+    def _apply(self, record: _ty.Mapping[str, _ty.Any]) -> None:
+        op = record["op"]
+        client_id = record["id"]
+        if op == "allocate":
+            lease, chaddr, cltt = lease_from_json(record["lease"])
+            self._bind(client_id, lease, chaddr, cltt)
+        elif op == "renew":
+            stored = self._leases.get(client_id)
+            if stored is not None:
+                expires = _expires_from_json(record["expires"])
+                stored.expires = expires.timestamp() if isinstance(expires, _dt.datetime) else _inf
+                stored.cltt = record["cltt"]
+                self._schedule(client_id, stored.expires)
+        elif op == "release":
+            self._unbind(client_id)
+        else:
+            raise ValueError(f"Unknown journal record {op!r}")
+
+    def _append(self, op: str, client_id: str, **fields: _ty.Any) -> None:
+        self._seq += 1
+        record = {"seq": self._seq, "op": op, "id": client_id, **fields}
+        line = (_json.dumps(record, separators=(",", ":")) + "\n").encode()
+        self.records += 1
+        if self.fsync == "group":
+            if not self._pending:
+                self._pending_since = self.clock.monotonic()
+            self._pending.append(line)
+            if (
+                len(self._pending) >= self.group_size
+                or self.clock.monotonic() - self._pending_since >= self.fsync_interval
+            ):
+                self.sync()
+        else:
+            self._journal.write(line)
+            self._journal.flush()
+            if self.fsync == "always" or (
+                self.fsync == "interval" and self.clock.monotonic() - self._last_fsync >= self.fsync_interval
+            ):
+                self._fsync()
+
+    def _fsync(self) -> None:
+        _os.fsync(self._journal.fileno())
+        self.fsyncs += 1
+        self._last_fsync = self.clock.monotonic()
+        self._fsynced_seq = self._seq
+
+    def sync(self) -> None:
+        """Write any buffered records and fsync the journal."""
+        if self._pending:
+            self._journal.write(b"".join(self._pending))
+            self._pending.clear()
+        self._journal.flush()
+        if self.fsync != "none":
+            self._fsync()
+
+    @property
+    def compaction_due(self) -> bool:
+        """True once the journal is long enough for :meth:`flush` to compact it."""
+        return self.records >= self.compact_threshold and self.records >= len(self._leases)
+
+    def flush(self) -> None:
+        """Compact if due, else write buffered records and fsync records the policy has not fsynced yet."""
+        if self.compaction_due:
+            self.compact()
+        elif self._pending or (self.fsync == "interval" and self._fsynced_seq != self._seq):
+            self.sync()
+
+    def compact(self) -> None:
+        """Replace the snapshot with the live leases and empty the journal."""
+        if self.file_format == "binary":
+            write_snapshot(self.filepath, self._leases.items(), self._seq)
+        else:
+            data = {
+                "format": SNAPSHOT_FORMAT,
+                "seq": self._seq,
+                "leases": {
+                    client_id: lease_to_json(lease, self.chaddr(client_id), self.last_transaction(client_id))
+                    for client_id, lease in self.iter_leases()
+                },
+            }
+            temp_path = self.filepath + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                _json.dump(data, f, separators=(",", ":"))
+                f.flush()
+                _os.fsync(f.fileno())
+            _os.replace(temp_path, self.filepath)
+        self._sync_directory()
+        # Records still buffered are already in the snapshot.
+        self._pending.clear()
+        self._journal.truncate(0)
+        self._journal.flush()
+        _os.fsync(self._journal.fileno())
+        self.records = 0
+        self.compactions += 1
+
+    def _sync_directory(self) -> None:
+        # Makes the rename itself durable; not every platform can open a directory.
+        try:
+            fd = _os.open(_os.path.dirname(_os.path.abspath(self.filepath)), _os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            _os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            _os.close(fd)
+
+    def close(self) -> None:
+        if self._journal.closed:
+            return
+        self.sync()
+        self._journal.close()
+
+    def allocate(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+        chaddr: _ty.Optional[bytes] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        lease = super().allocate(client_id, ip, ttl, options, chaddr)
+        if lease:
+            self._append("allocate", client_id, lease=lease_to_json(lease, chaddr, self.last_transaction(client_id)))
+        return lease
+
+    def release(self, client_id: str) -> bool:
+        released = super().release(client_id)
+        if released:
+            self._append("release", client_id)
+        return released
+
+    def renew(self, client_id: str, ttl: int) -> _ty.Optional[DhcpLease]:
+        lease = super().renew(client_id, ttl)
+        if lease:
+            self._append("renew", client_id, expires=_expires_to_json(lease.expires), cltt=self.last_transaction(client_id))
+        return lease
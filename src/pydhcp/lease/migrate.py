@@ -0,0 +1,499 @@
+"""Streaming lease import and export between backends and other servers' lease files.
+
+Leases travel as :class:`LeaseEntry` tuples produced by :func:`read_leases`
+and consumed by a :class:`LeaseWriter`, one at a time. Supported formats:
+
+* ``json`` and ``binary``: a :class:`~pydhcp.lease.FileLeaseBackend` file.
+* ``journal``: a :class:`~pydhcp.lease.JournalLeaseBackend` snapshot and journal.
+* ``sqlite``: a :class:`~pydhcp.lease.sqlite.SqliteLeaseBackend` database.
+* ``mmap``: a :class:`~pydhcp.lease.mmapped.MmapLeaseBackend` store. Write only:
+  it keeps hashes of client ids, not the ids themselves.
+* ``isc``: an ISC dhcpd ``dhcpd.leases`` file.
+* ``kea``: a Kea memfile lease CSV (DHCPv4 schema).
+
+SQLite, ISC and Kea sources are read incrementally and SQLite, ISC, Kea and
+mmap destinations are written in batches, so copying between them takes the
+same memory for any number of leases. The other formats are held in memory
+by their backends, so reading or writing them needs room for the whole table.
+
+The ISC and Kea formats have no DHCP options, so leases imported from them
+have none and options are dropped on export. Client ids are kept as pydhcp
+derives them (see :meth:`~pydhcp.packet.message.DhcpMessage.client_id`): the
+client identifier when the file has one, else the hardware type and address.
+"""
+
+from __future__ import annotations
+
+import calendar as _calendar
+import csv as _csv
+import datetime as _dt
+import json as _json
+import os as _os
+import re as _re
+import sys as _sys
+import time as _time
+import typing as _ty
+from math import inf as _inf
+
+from ..network import IPv4
+from ..options import DhcpOptions
+from . import DhcpLease, FileLeaseBackend, InMemoryLeaseBackend, OptionSets, lease_from_json
+from .journal import SNAPSHOT_FORMAT, JournalLeaseBackend
+from .snapshot import is_snapshot, read_snapshot
+
+FORMATS = ("json", "binary", "journal", "sqlite", "mmap", "isc", "kea")
+
+_SUFFIXES = {
+    ".json": "json",
+    ".bin": "binary",
+    ".db": "sqlite",
+    ".sqlite": "sqlite",
+    ".sqlite3": "sqlite",
+    ".mmap": "mmap",
+    ".leases": "isc",
+    ".csv": "kea",
+}
+
+KEA_HEADER = (
+    "address",
+    "hwaddr",
+    "client_id",
+    "valid_lifetime",
+    "expire",
+    "subnet_id",
+    "fqdn_fwd",
+    "fqdn_rev",
+    "hostname",
+    "state",
+    "user_context",
+)
+KEA_INFINITE_LIFETIME = 0xFFFFFFFF
+
+_ISC_TOKEN = _re.compile(r'"(?:[^"\\]|\\.)*"|[{};]|#.*|[^\s{};"#]+')
+_ISC_HARDWARE_TYPES = {"ethernet": 1, "token-ring": 6, "fddi": 8, "infiniband": 32}
+_ISC_HARDWARE_NAMES = {value: name for name, value in _ISC_HARDWARE_TYPES.items()}
+
+
+class LeaseEntry(_ty.NamedTuple):
+    """One lease on its way between formats.
+
+    `released` marks a lease the source recorded as no longer bound, such as
+    a freed lease in ``dhcpd.leases``; writers drop the client's binding.
+    """
+
+    client_id: str
+    lease: DhcpLease
+    chaddr: _ty.Optional[bytes] = None
+    cltt: _ty.Optional[float] = None
+    released: bool = False
+
+
+def infer_format(path: str) -> str:
+    """The format of `path`, going by its extension."""
+    file_format = _SUFFIXES.get(_os.path.splitext(path)[1].lower())
+    if file_format is None:
+        raise ValueError(f"Cannot tell the lease format of {path!r}; pass it explicitly ({', '.join(FORMATS)})")
+    return file_format
+
+
+def _check_format(file_format: str) -> None:
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown lease format {file_format!r}, expected one of {', '.join(FORMATS)}")
+
+
+def _expires(epoch: float) -> _ty.Union[_dt.datetime, float]:
+    return _dt.datetime.fromtimestamp(epoch) if epoch != _inf else _inf
+
+
+def _epoch(expires: _ty.Union[_dt.datetime, float]) -> float:
+    return expires.timestamp() if isinstance(expires, _dt.datetime) else _inf
+
+
+def _client_id_bytes(client_id: str) -> bytes:
+    try:
+        return bytes.fromhex(client_id.replace(":", ""))
+    except ValueError:
+        return client_id.encode()
+
+
+def _client_id(identifier: _ty.Optional[bytes], htype: int, chaddr: _ty.Optional[bytes]) -> _ty.Optional[str]:
+    if identifier:
+        return identifier.hex(":").upper()
+    if chaddr:
+        return bytes([htype, *chaddr]).hex(":").upper()
+    return None
+
+
+def _explicit_client_id(client_id: str, chaddr: _ty.Optional[bytes]) -> tuple[_ty.Optional[bytes], int]:
+    """The client identifier to write, None when it is derived from `chaddr`, and the hardware type."""
+    identifier = _client_id_bytes(client_id)
+    if chaddr and len(identifier) == len(chaddr) + 1 and identifier[1:] == chaddr:
+        return None, identifier[0]
+    return identifier, 1
+
+
+def _open_text(path: str, mode: str) -> _ty.TextIO:
+    if path == "-":
+        return _sys.stdin if "r" in mode else _sys.stdout
+    # `mode` is always a text mode; the open() stubs only narrow literal modes.
+    return _ty.cast(_ty.TextIO, open(path, mode, encoding="utf-8", newline="", buffering=1 << 20))
+
+
+def read_leases(path: str, file_format: str, page_size: int = 10000) -> _ty.Iterator[LeaseEntry]:
+    """Yield the leases stored at `path` in `file_format`; ``-`` reads ISC or Kea text from stdin.
+
+    Leases that have expired are skipped. `page_size` is the number of rows
+    fetched per SQLite query.
+    """
+    _check_format(file_format)
+    if file_format == "mmap":
+        raise ValueError("mmap lease stores keep only hashes of client ids and cannot be read back")
+    if file_format == "isc":
+        return _read_isc(path)
+    if file_format == "kea":
+        return _read_kea(path)
+    if not _os.path.exists(path):
+        raise FileNotFoundError(f"No lease file at {path}")
+    if file_format == "sqlite":
+        return _read_sqlite(path, page_size)
+    if file_format == "journal":
+        return _read_journal(path)
+    return _read_lease_file(path)
+
+
+def _read_lease_file(path: str) -> _ty.Iterator[LeaseEntry]:
+    if is_snapshot(path):
+        for client_id, record in read_snapshot(path, OptionSets()):
+            yield LeaseEntry(client_id, record.view(), record.chaddr, record.cltt)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        data = _json.load(f)
+    if data.get("format") == SNAPSHOT_FORMAT:
+        data = data["leases"]
+    now = _time.time()
+    for client_id, lease_data in data.items():
+        lease, chaddr, cltt = lease_from_json(lease_data)
+        if _epoch(lease.expires) >= now:
+            yield LeaseEntry(client_id, lease, chaddr, cltt)
+
+
+def _read_journal(path: str) -> _ty.Iterator[LeaseEntry]:
+    backend = JournalLeaseBackend(path)
+    try:
+        now = _time.time()
+        for client_id, record in backend._leases.items():
+            if record.expires >= now:
+                yield LeaseEntry(client_id, record.view(), record.chaddr, record.cltt)
+    finally:
+        backend.close()
+
+
+def _read_sqlite(path: str, page_size: int) -> _ty.Iterator[LeaseEntry]:
+    from .sqlite import SqliteLeaseBackend
+
+    backend = SqliteLeaseBackend(path)
+    try:
+        for client_id, lease, chaddr, cltt in backend._iter_records(page_size):
+            yield LeaseEntry(client_id, lease, chaddr, cltt)
+    finally:
+        backend.close()
+
+
+def _isc_unquote(token: str) -> bytes:
+    text = token[1:-1]
+    out = bytearray()
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == "\\" and i + 1 < len(text):
+            octal = text[i + 1 : i + 4]
+            if len(octal) == 3 and all(c in "01234567" for c in octal):
+                out.append(int(octal, 8))
+                i += 4
+                continue
+            char = text[i + 1]
+            i += 1
+        out += char.encode("latin-1")
+        i += 1
+    return bytes(out)
+
+
+def _isc_quote(data: bytes) -> str:
+    return '"' + "".join(
+        chr(b) if 0x20 <= b < 0x7F and b not in (0x22, 0x5C) else f"\\{b:03o}" for b in data
+    ) + '"'
+
+
+def _isc_bytes(tokens: list[str]) -> bytes:
+    if tokens[0].startswith('"'):
+        return _isc_unquote(tokens[0])
+    return bytes.fromhex(tokens[0].replace(":", ""))
+
+
+def _isc_time(tokens: list[str]) -> float:
+    if tokens[0] == "never":
+        return _inf
+    if tokens[0] == "epoch":
+        return float(tokens[1])
+    year, month, day = tokens[1].split("/")
+    hour, minute, second = tokens[2].split(":")
+    return float(_calendar.timegm((int(year), int(month), int(day), int(hour), int(minute), int(second))))
+
+
+def _isc_format_time(epoch: float) -> str:
+    if epoch == _inf:
+        return "never"
+    moment = _dt.datetime.fromtimestamp(epoch, _dt.timezone.utc)
+    return f"{moment.isoweekday() % 7} {moment:%Y/%m/%d %H:%M:%S}"
+
+
+def _isc_statements(f: _ty.TextIO) -> _ty.Iterator[list[str]]:
+    """Yield ``dhcpd.leases`` statements as token lists; ``{`` and ``}`` end one too."""
+    statement: list[str] = []
+    for line in f:
+        if '"' in line or "#" in line:
+            tokens = _ISC_TOKEN.findall(line)
+        else:
+            tokens = line.replace(";", " ;").replace("{", " {").replace("}", " }").split()
+        for token in tokens:
+            if token[0] == "#":
+                break
+            if token in (";", "{", "}"):
+                if token != ";":
+                    statement.append(token)
+                yield statement
+                statement = []
+            else:
+                statement.append(token)
+
+
+def _read_isc(path: str) -> _ty.Iterator[LeaseEntry]:
+    f = _open_text(path, "r")
+    try:
+        depth = 0
+        fields: _ty.Optional[dict[str, list[str]]] = None
+        for statement in _isc_statements(f):
+            if statement[-1:] == ["{"]:
+                depth += 1
+                if depth == 1 and statement[0] == "lease":
+                    fields = {"address": statement[1:2]}
+            elif statement[-1:] == ["}"]:
+                depth -= 1
+                if depth == 0 and fields is not None:
+                    entry = _isc_entry(fields)
+                    if entry is not None:
+                        yield entry
+                    fields = None
+            elif fields is not None and depth == 1 and statement:
+                if statement[:2] == ["binding", "state"]:
+                    fields["binding"] = statement[2:]
+                else:
+                    fields.setdefault(statement[0], statement[1:])
+    finally:
+        if f is not _sys.stdin:
+            f.close()
+
+
+def _isc_entry(fields: dict[str, list[str]]) -> _ty.Optional[LeaseEntry]:
+    htype = 1
+    chaddr = None
+    if "hardware" in fields:
+        hardware = fields["hardware"]
+        htype = _ISC_HARDWARE_TYPES.get(hardware[0], 1)
+        chaddr = bytes.fromhex(hardware[1].replace(":", "")) if len(hardware) > 1 else None
+    client_id = _client_id(_isc_bytes(fields["uid"]) if "uid" in fields else None, htype, chaddr)
+    if client_id is None:
+        return None
+    expires = _isc_time(fields["ends"]) if "ends" in fields else _inf
+    cltt = _isc_time(fields["cltt"]) if "cltt" in fields else _isc_time(fields["starts"]) if "starts" in fields else None
+    released = fields.get("binding", ["active"])[0] != "active"
+    if not released and expires < _time.time():
+        return None
+    lease = DhcpLease(ip=IPv4(fields["address"][0]), expires=_expires(expires), options=DhcpOptions())
+    return LeaseEntry(client_id, lease, chaddr, cltt, released)
+
+
+def _read_kea(path: str) -> _ty.Iterator[LeaseEntry]:
+    f = _open_text(path, "r")
+    try:
+        now = _time.time()
+        for row in _csv.DictReader(f):
+            hwaddr = row.get("hwaddr") or ""
+            chaddr = bytes.fromhex(hwaddr.replace(":", "")) if hwaddr else None
+            identifier = row.get("client_id") or ""
+            client_id = _client_id(bytes.fromhex(identifier.replace(":", "")) if identifier else None, 1, chaddr)
+            if client_id is None:
+                continue
+            lifetime = int(row["valid_lifetime"])
+            expire = int(row["expire"])
+            released = lifetime == 0 or int(row.get("state") or 0) != 0
+            expires = _inf if lifetime == KEA_INFINITE_LIFETIME else float(expire)
+            if not released and expires < now:
+                continue
+            lease = DhcpLease(ip=IPv4(row["address"]), expires=_expires(expires), options=DhcpOptions())
+            yield LeaseEntry(client_id, lease, chaddr, float(expire - lifetime), released)
+    finally:
+        if f is not _sys.stdin:
+            f.close()
+
+
+class LeaseWriter:
+    """Writes :class:`LeaseEntry` tuples to `path` in `file_format`; ``-`` writes ISC or Kea text to stdout.
+
+    Leases are added to whatever the destination already holds. SQLite
+    writes are committed every `batch_size` leases. `subnet_id` is written
+    in the Kea ``subnet_id`` column and `capacity` sizes a new mmap store.
+    ISC and Kea files cannot hold a lease without an address; such leases
+    are counted in :attr:`skipped`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        file_format: str,
+        batch_size: int = 10000,
+        subnet_id: int = 1,
+        capacity: int = 1 << 20,
+    ) -> None:
+        _check_format(file_format)
+        self.path = path
+        self.file_format = file_format
+        self.subnet_id = subnet_id
+        self.written = 0
+        self.released = 0
+        self.skipped = 0
+        self._backend: _ty.Any = None
+        self._file: _ty.Optional[_ty.TextIO] = None
+        self._csv: _ty.Any = None
+        if file_format in ("json", "binary"):
+            self._backend = FileLeaseBackend(path, file_format=file_format)
+        elif file_format == "journal":
+            self._backend = JournalLeaseBackend(path)
+        elif file_format == "sqlite":
+            from .sqlite import SqliteLeaseBackend
+
+            self._backend = SqliteLeaseBackend(path, batch_size=batch_size)
+        elif file_format == "mmap":
+            from .mmapped import MmapLeaseBackend
+
+            self._backend = MmapLeaseBackend(path, capacity=capacity)
+        else:
+            self._file = _open_text(path, "w")
+            if file_format == "isc":
+                self._file.write("# Lease file written by pydhcp\n")
+            else:
+                self._csv = _csv.writer(self._file, lineterminator="\n")
+                self._csv.writerow(KEA_HEADER)
+
+    def __enter__(self) -> LeaseWriter:
+        return self
+
+    def __exit__(self, *exc_info: _ty.Any) -> None:
+        self.close()
+
+    def write(self, entry: LeaseEntry) -> None:
+        if self._file is not None:
+            if entry.lease.ip is None:
+                self.skipped += 1
+                return
+            if self._csv is not None:
+                self._write_kea(entry)
+            else:
+                self._write_isc(entry)
+        elif entry.released:
+            if isinstance(self._backend, InMemoryLeaseBackend):
+                self._backend._unbind(entry.client_id)
+            else:
+                self._backend.release(entry.client_id)
+        elif self._backend._bind(entry.client_id, entry.lease, entry.chaddr, entry.cltt) is False:
+            raise RuntimeError(f"{self.path} is full; create it with a larger capacity")
+        if entry.released:
+            self.released += 1
+        else:
+            self.written += 1
+
+    def _write_isc(self, entry: LeaseEntry) -> None:
+        assert self._file is not None
+        identifier, htype = _explicit_client_id(entry.client_id, entry.chaddr)
+        expires = _epoch(entry.lease.expires)
+        started = _isc_format_time(entry.cltt if entry.cltt is not None else _time.time())
+        lines = [
+            f"lease {entry.lease.ip} {{",
+            f"  starts {started};",
+            f"  ends {_isc_format_time(expires)};",
+            f"  cltt {started};",
+            f"  binding state {'free' if entry.released else 'active'};",
+            "  next binding state free;",
+        ]
+        if entry.chaddr:
+            lines.append(f"  hardware {_ISC_HARDWARE_NAMES.get(htype, 'ethernet')} {entry.chaddr.hex(':')};")
+        if identifier is not None:
+            lines.append(f"  uid {_isc_quote(identifier)};")
+        lines.append("}\n")
+        self._file.write("\n".join(lines))
+
+    def _write_kea(self, entry: LeaseEntry) -> None:
+        identifier, _ = _explicit_client_id(entry.client_id, entry.chaddr)
+        expires = _epoch(entry.lease.expires)
+        cltt = int(entry.cltt if entry.cltt is not None else _time.time())
+        if entry.released:
+            lifetime = 0
+        elif expires == _inf:
+            lifetime = KEA_INFINITE_LIFETIME
+        else:
+            lifetime = max(int(expires) - cltt, 0)
+        self._csv.writerow(
+            (
+                str(entry.lease.ip),
+                entry.chaddr.hex(":") if entry.chaddr else "",
+                identifier.hex(":") if identifier is not None else "",
+                lifetime,
+                cltt + lifetime,
+                self.subnet_id,
+                0,
+                0,
+                "",
+                0,
+                "",
+            )
+        )
+
+    def close(self) -> None:
+        """Write out what is still buffered and close the destination."""
+        if self._file is not None:
+            if self._file is _sys.stdout:
+                self._file.flush()
+            else:
+                self._file.close()
+            self._file = None
+        elif isinstance(self._backend, JournalLeaseBackend):
+            self._backend.compact()
+            self._backend.close()
+        elif isinstance(self._backend, FileLeaseBackend):
+            self._backend._save()
+        elif self._backend is not None:
+            if self.file_format == "mmap":
+                self._backend.flush()
+            self._backend.close()
+        self._backend = None
+
+
+def copy_leases(
+    entries: _ty.Iterable[LeaseEntry],
+    writer: LeaseWriter,
+    progress: _ty.Optional[_ty.Callable[[int, float], None]] = None,
+    progress_every: int = 100_000,
+) -> int:
+    """Write every entry to `writer` and return how many were copied.
+
+    Every `progress_every` entries, `progress` is called with the count so
+    far and the seconds elapsed.
+    """
+    start = _time.monotonic()
+    count = 0
+    for entry in entries:
+        writer.write(entry)
+        count += 1
+        if progress is not None and count % progress_every == 0:
+            progress(count, _time.monotonic() - start)
+    return count
@@ -0,0 +1,395 @@
+from __future__ import annotations
+
+import contextlib as _contextlib
+import datetime as _dt
+import hashlib as _hashlib
+import mmap as _mmap
+import os as _os
+import struct as _struct
+import typing as _ty
+from math import inf as _inf
+
+try:
+    import fcntl as _fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    _fcntl = None  # type: ignore[assignment]
+
+from ..clock import SYSTEM_CLOCK, TimeSource
+from ..network import IPv4
+from ..options import DhcpOptions
+from . import DhcpLease, pack_options, unpack_options
+
+MAGIC = b"PYDHCPMM"
+VERSION = 1
+
+_HEADER = _struct.Struct("<8sIIQ")
+"""Magic, version, capacity and the number of occupied slots."""
+HEADER_SIZE = 64
+_RECORD = _struct.Struct("<QIIddI4x")
+"""Client-id hash, flags, IPv4, expiry epoch, last transaction epoch and option-set id."""
+RECORD_SIZE = _RECORD.size
+_KEY_FLAGS = _struct.Struct("<QI")
+_EXPIRES = _struct.Struct("<d")
+_TIMES = _struct.Struct("<dd")
+_FLAGS = _struct.Struct("<I")
+_TIMES_OFFSET = 16
+_FLAGS_OFFSET = 8
+_TOMBSTONES = _struct.Struct("<Q")
+_TOMBSTONES_OFFSET = 24
+"""Header field after the occupied-slot count: released slots not yet reused. Older files have 0."""
+_SWEEP_CURSOR = _struct.Struct("<Q")
+_SWEEP_CURSOR_OFFSET = 32
+"""Header field after the tombstone count: the slot the next :meth:`MmapLeaseBackend.sweep` starts at."""
+_OPTION_LENGTH = _struct.Struct("<I")
+
+EMPTY = 0
+USED = 1
+DELETED = 2
+NO_IP = 0xFFFFFFFF
+
+
+def client_hash(client_id: str) -> int:
+    """The 64-bit key a client id is stored under; never 0."""
+    return int.from_bytes(_hashlib.blake2b(client_id.encode(), digest_size=8).digest(), "little") or 1
+
+
+class MmapLeaseBackend:
+    """Leases as fixed-size records in a memory-mapped open-addressing hash table.
+
+    Each slot holds a 64-bit hash of the client id, the address as an
+    integer, expiry and last-transaction times as epoch floats, flags and the
+    id of the lease's option set. Option sets are interned: each distinct set
+    is appended once to ``<path>.options``, and records refer to it by its
+    position there. Opening an existing store maps the file and reads the
+    small option-set file; there is nothing else to parse. Probing decodes
+    only the key and flags of each slot it passes. A lease is built only
+    once the slot is found.
+
+    The table does not grow, so size `capacity` (a power of two, used only
+    when the file is created) for comfortably more leases than expected.
+    Released leases leave tombstones and expired leases may be overwritten
+    by new ones. Left alone, tombstones would never turn back into empty
+    slots, so lookups of unknown clients would probe further and further.
+    :meth:`sweep` empties the slots of released and expired leases, moving
+    the records after each one back so all stay reachable. It visits
+    `sweep_slots` slots per call from a cursor every process shares, so the
+    write lock is held for a bounded time and the table is covered every
+    ``capacity / sweep_slots`` calls. :meth:`compact` rehashes the whole
+    table at once. :meth:`allocate` returns None when no slot is free. Only
+    hashes of client ids are stored, which is why this is a plain
+    :class:`~pydhcp.lease.LeaseBackend` and cannot list or query leases by
+    address.
+
+    Several processes, such as ``SO_REUSEPORT`` workers, can open the same
+    file. Changes take an exclusive ``lockf`` lock on the header's byte
+    range and lookups take a shared one, so no process sees a half-written
+    record. Locks are per process. Threads sharing one instance must
+    serialize their calls, as with the other backends. Without ``fcntl``
+    (on Windows) there is no locking and only one process may use a store.
+    Times are read from `clock`, by default the system clock.
+    """
+
+    def __init__(
+        self,
+        path: str = "leases.mmap",
+        capacity: int = 1 << 20,
+        sweep_slots: int = 4096,
+        clock: _ty.Optional[TimeSource] = None,
+    ) -> None:
+        self.path = path
+        self.sweep_slots = sweep_slots
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        create = not _os.path.exists(path) or _os.path.getsize(path) == 0
+        self._fd = _os.open(path, _os.O_RDWR | _os.O_CREAT, 0o644)
+        if create:
+            if capacity <= 0 or capacity & (capacity - 1):
+                _os.close(self._fd)
+                raise ValueError(f"Capacity must be a power of two: {capacity}")
+            _os.ftruncate(self._fd, HEADER_SIZE + capacity * RECORD_SIZE)
+        self._map = _mmap.mmap(self._fd, 0)
+        if create:
+            _HEADER.pack_into(self._map, 0, MAGIC, VERSION, capacity, 0)
+        magic, version, self.capacity, _ = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} lease store")
+        self._mask = self.capacity - 1
+        self._options_path = path + ".options"
+        self._options_fd = _os.open(self._options_path, _os.O_RDWR | _os.O_CREAT | _os.O_APPEND, 0o644)
+        self._option_sets: list[bytes] = [b""]
+        self._option_ids: dict[bytes, int] = {b"": 0}
+        self._options_read = 0
+        self._read_option_sets()
+
+    def __len__(self) -> int:
+        """Occupied slots, counting leases that have expired but not been overwritten."""
+        count: int = _HEADER.unpack_from(self._map, 0)[3]
+        return count
+
+    @property
+    def tombstones(self) -> int:
+        """Slots of released leases that no allocation has reused yet."""
+        tombstones: int = _TOMBSTONES.unpack_from(self._map, _TOMBSTONES_OFFSET)[0]
+        return tombstones
+
+    @_contextlib.contextmanager
+    def _locked(self, exclusive: bool) -> _ty.Iterator[None]:
+        if _fcntl is None:
+            yield
+            return
+        _fcntl.lockf(self._fd, _fcntl.LOCK_EX if exclusive else _fcntl.LOCK_SH, HEADER_SIZE, 0)
+        try:
+            yield
+        finally:
+            _fcntl.lockf(self._fd, _fcntl.LOCK_UN, HEADER_SIZE, 0)
+
+    def _find(self, key: int, now: float) -> tuple[int, int]:
+        """Return the offset of `key`'s slot, or -1, and the first reusable slot offset, or -1."""
+        table = self._map
+        mask = self._mask
+        index = key & mask
+        reusable = -1
+        for _ in range(self.capacity):
+            offset = HEADER_SIZE + index * RECORD_SIZE
+            slot_key, flags = _KEY_FLAGS.unpack_from(table, offset)
+            if flags == EMPTY:
+                return -1, offset if reusable < 0 else reusable
+            if flags == USED and slot_key == key:
+                return offset, reusable
+            if reusable < 0 and (flags == DELETED or _EXPIRES.unpack_from(table, offset + _TIMES_OFFSET)[0] < now):
+                reusable = offset
+            index = (index + 1) & mask
+        return -1, reusable
+
+    def _add_count(self, delta: int) -> None:
+        count = _HEADER.unpack_from(self._map, 0)[3]
+        _struct.pack_into("<Q", self._map, 16, count + delta)
+
+    def _add_tombstones(self, delta: int) -> None:
+        _TOMBSTONES.pack_into(self._map, _TOMBSTONES_OFFSET, max(0, self.tombstones + delta))
+
+    def _read_option_sets(self) -> None:
+        size = _os.fstat(self._options_fd).st_size
+        if size <= self._options_read:
+            return
+        with open(self._options_path, "rb") as f:
+            f.seek(self._options_read)
+            data = f.read(size - self._options_read)
+        offset = 0
+        while offset + _OPTION_LENGTH.size <= len(data):
+            (length,) = _OPTION_LENGTH.unpack_from(data, offset)
+            end = offset + _OPTION_LENGTH.size + length
+            if end > len(data):
+                break
+            packed = data[offset + _OPTION_LENGTH.size : end]
+            self._option_ids.setdefault(packed, len(self._option_sets))
+            self._option_sets.append(packed)
+            offset = end
+        self._options_read += offset
+
+    def _intern_options(self, options: DhcpOptions) -> int:
+        packed = pack_options(options)
+        option_id = self._option_ids.get(packed)
+        if option_id is not None:
+            return option_id
+        # Runs under the exclusive table lock, so no other process appends meanwhile.
+        self._read_option_sets()
+        option_id = self._option_ids.get(packed)
+        if option_id is None:
+            _os.write(self._options_fd, _OPTION_LENGTH.pack(len(packed)) + packed)
+            self._read_option_sets()
+            option_id = self._option_ids[packed]
+        return option_id
+
+    def _lease(self, offset: int) -> DhcpLease:
+        _, _, ip, expires, _, option_id = _RECORD.unpack_from(self._map, offset)
+        if option_id >= len(self._option_sets):
+            self._read_option_sets()
+        return DhcpLease(
+            ip=IPv4(ip) if ip != NO_IP else None,
+            expires=_dt.datetime.fromtimestamp(expires) if expires != _inf else _inf,
+            options=unpack_options(self._option_sets[option_id]),
+        )
+
+    def allocate(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+        chaddr: _ty.Optional[bytes] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        expires = _dt.datetime.fromtimestamp(self.clock.time() + ttl) if ttl != _inf else _inf
+        lease = DhcpLease(ip=ip, expires=expires, options=options or DhcpOptions())
+        return lease if self._bind(client_id, lease) else None
+
+    def _bind(
+        self,
+        client_id: str,
+        lease: DhcpLease,
+        chaddr: _ty.Optional[bytes] = None,
+        touched: _ty.Optional[float] = None,
+    ) -> bool:
+        """Store `lease` as it is; False when no slot is free. `chaddr` is not stored."""
+        epoch = lease.expires.timestamp() if isinstance(lease.expires, _dt.datetime) else _inf
+        key = client_hash(client_id)
+        now = self.clock.time()
+        with self._locked(True):
+            offset, reusable = self._find(key, now)
+            if offset < 0:
+                if reusable < 0:
+                    return False
+                offset = reusable
+                flags = _KEY_FLAGS.unpack_from(self._map, offset)[1]
+                if flags != USED:
+                    self._add_count(1)
+                if flags == DELETED:
+                    self._add_tombstones(-1)
+            option_id = self._intern_options(lease.options)
+            _RECORD.pack_into(
+                self._map,
+                offset,
+                key,
+                USED,
+                int(lease.ip) if lease.ip is not None else NO_IP,
+                epoch,
+                now if touched is None else touched,
+                option_id,
+            )
+        return True
+
+    def lookup(self, client_id: str) -> _ty.Optional[DhcpLease]:
+        now = self.clock.time()
+        with self._locked(False):
+            offset, _ = self._find(client_hash(client_id), now)
+            if offset < 0 or _EXPIRES.unpack_from(self._map, offset + _TIMES_OFFSET)[0] < now:
+                return None
+            return self._lease(offset)
+
+    def release(self, client_id: str) -> bool:
+        with self._locked(True):
+            offset, _ = self._find(client_hash(client_id), self.clock.time())
+            if offset < 0:
+                return False
+            _FLAGS.pack_into(self._map, offset + _FLAGS_OFFSET, DELETED)
+            self._add_count(-1)
+            self._add_tombstones(1)
+        return True
+
+    def renew(self, client_id: str, ttl: int) -> _ty.Optional[DhcpLease]:
+        now = self.clock.time()
+        expires = _dt.datetime.fromtimestamp(now + ttl) if ttl != _inf else _inf
+        with self._locked(True):
+            offset, _ = self._find(client_hash(client_id), now)
+            if offset < 0 or _EXPIRES.unpack_from(self._map, offset + _TIMES_OFFSET)[0] < now:
+                return None
+            epoch = expires.timestamp() if isinstance(expires, _dt.datetime) else _inf
+            _TIMES.pack_into(self._map, offset + _TIMES_OFFSET, epoch, now)
+            lease = self._lease(offset)
+        return lease._replace(expires=expires)
+
+    def last_transaction(self, client_id: str) -> _ty.Optional[float]:
+        with self._locked(False):
+            offset, _ = self._find(client_hash(client_id), self.clock.time())
+            if offset < 0:
+                return None
+            cltt: float = _TIMES.unpack_from(self._map, offset + _TIMES_OFFSET)[1]
+            return cltt
+
+    def sweep(self, now: _ty.Optional[float] = None, slots: _ty.Optional[int] = None) -> int:
+        """Empty the slots of leases released or expired at epoch `now`; return how many had expired.
+
+        Visits the next `slots` slots, `sweep_slots` by default, after where
+        the last sweep in any process stopped, so it is cheap enough for
+        :meth:`~pydhcp.server.DhcpServer.tick` to call on the packet loop.
+        """
+        now = self.clock.time() if now is None else now
+        count = min(self.capacity, self.sweep_slots if slots is None else slots)
+        table = self._map
+        mask = self._mask
+        expired = 0
+        with self._locked(True):
+            index = _SWEEP_CURSOR.unpack_from(table, _SWEEP_CURSOR_OFFSET)[0] & mask
+            for _ in range(count):
+                offset = HEADER_SIZE + index * RECORD_SIZE
+                flags = _KEY_FLAGS.unpack_from(table, offset)[1]
+                lapsed = flags == USED and _EXPIRES.unpack_from(table, offset + _TIMES_OFFSET)[0] < now
+                if flags == DELETED or lapsed:
+                    emptied = self._vacate(index)
+                    if lapsed:
+                        expired += 1
+                        self._add_count(-1)
+                    if emptied != lapsed:
+                        self._add_tombstones(-1 if emptied else 1)
+                    if emptied:
+                        continue  # a record from further on may have moved into the slot
+                index = (index + 1) & mask
+            _SWEEP_CURSOR.pack_into(table, _SWEEP_CURSOR_OFFSET, index)
+        return expired
+
+    def _vacate(self, hole: int) -> bool:
+        """Free slot `hole`, moving back the records after it that would become unreachable.
+
+        This is deletion without tombstones for linear probing (Knuth's
+        Algorithm R). Returns False, leaving a tombstone at `hole`, when the
+        table has no empty slot to stop at.
+        """
+        table = self._map
+        mask = self._mask
+        index = hole
+        for _ in range(self.capacity - 1):
+            index = (index + 1) & mask
+            offset = HEADER_SIZE + index * RECORD_SIZE
+            key, flags = _KEY_FLAGS.unpack_from(table, offset)
+            if flags == EMPTY:
+                break
+            # A record may move back into the hole unless its home slot lies between the two.
+            if flags == USED and (index - (key & mask)) & mask >= (index - hole) & mask:
+                hole_offset = HEADER_SIZE + hole * RECORD_SIZE
+                table[hole_offset : hole_offset + RECORD_SIZE] = table[offset : offset + RECORD_SIZE]
+                hole = index
+        else:
+            _FLAGS.pack_into(table, HEADER_SIZE + hole * RECORD_SIZE + _FLAGS_OFFSET, DELETED)
+            return False
+        hole_offset = HEADER_SIZE + hole * RECORD_SIZE
+        table[hole_offset : hole_offset + RECORD_SIZE] = bytes(RECORD_SIZE)
+        return True
+
+    def compact(self, now: _ty.Optional[float] = None) -> int:
+        """Rehash the live leases into the table, leaving no tombstones; returns how many expired leases it dropped."""
+        now = self.clock.time() if now is None else now
+        table = self._map
+        mask = self._mask
+        with self._locked(True):
+            live: list[bytes] = []
+            expired = 0
+            for index in range(self.capacity):
+                offset = HEADER_SIZE + index * RECORD_SIZE
+                if _KEY_FLAGS.unpack_from(table, offset)[1] != USED:
+                    continue
+                if _EXPIRES.unpack_from(table, offset + _TIMES_OFFSET)[0] < now:
+                    expired += 1
+                    continue
+                live.append(table[offset : offset + RECORD_SIZE])
+            table[HEADER_SIZE : HEADER_SIZE + self.capacity * RECORD_SIZE] = bytes(self.capacity * RECORD_SIZE)
+            for record in live:
+                index = _KEY_FLAGS.unpack_from(record)[0] & mask
+                while _KEY_FLAGS.unpack_from(table, HEADER_SIZE + index * RECORD_SIZE)[1] != EMPTY:
+                    index = (index + 1) & mask
+                offset = HEADER_SIZE + index * RECORD_SIZE
+                table[offset : offset + RECORD_SIZE] = record
+            self._add_count(len(live) - len(self))
+            _TOMBSTONES.pack_into(table, _TOMBSTONES_OFFSET, 0)
+        return expired
+
+    def flush(self) -> None:
+        """Ask the OS to write the mapped table to disk."""
+        self._map.flush()
+
+    def close(self) -> None:
+        if self._map.closed:
+            return
+        self._map.close()
+        _os.close(self._fd)
+        if hasattr(self, "_options_fd"):
+            _os.close(self._options_fd)
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import bisect as _bisect
+import hashlib as _hashlib
+import typing as _ty
+
+from ..allocation import AddressPool, Allocator, HashAllocator, InUse
+from ..network import IPv4
+from ..options import DhcpOptions
+from . import DhcpLease, LeaseQueryBackend
+
+
+class ShardedLeaseBackend:
+    """Spreads leases over several backends, each client id always going to the same one.
+
+    A client's shard is a keyed BLAKE2b hash of its client id modulo the
+    number of shards, so it is the same in every process and across
+    restarts. Every call about one client goes to that client's shard only.
+
+    Each pool in `pools` is split into one contiguous slice per shard (see
+    :meth:`~pydhcp.allocation.AddressPool.split`), and a shard's clients are
+    given addresses from its own slices only; use :class:`ShardedAllocator`
+    as the server's allocator. An address in a slice can then only be leased
+    in the slice's shard, so :meth:`lookup_ip` and :meth:`allocate_if_free`
+    consult that one shard and allocation needs no coordination between
+    shards. Allocating a client an address in another shard's slice, such
+    as one it held before sharding, is refused. Addresses outside every
+    pool may be leased in any shard, and lookups by them ask every shard,
+    as do lookups by hardware address.
+
+    Shards share nothing, which is what lets them scale apart:
+
+    * Threads: wrap each shard in a
+      :class:`~pydhcp.lease.threadsafe.ThreadSafeLeaseBackend`. Calls for
+      clients in different shards then never wait on the same lock.
+    * Processes: give each shard its own store, such as one SQLite file or
+      lease-store daemon per shard, and have each worker own the shards
+      :meth:`shard_of` assigns to it.
+
+    Every shard must be a :class:`~pydhcp.lease.LeaseQueryBackend`.
+    :meth:`sweep`, :meth:`flush` and :meth:`close` reach every shard that
+    has them, and :attr:`flush_interval` is the shortest of the shards'.
+    Changing the number of shards or the salt moves most clients to another
+    shard, where their leases are not found.
+    """
+
+    def __init__(
+        self,
+        shards: _ty.Sequence[LeaseQueryBackend],
+        pools: _ty.Iterable[AddressPool] = (),
+        salt: bytes = b"",
+    ) -> None:
+        if not shards:
+            raise ValueError("A sharded lease backend needs at least one shard")
+        for shard in shards:
+            if not isinstance(shard, LeaseQueryBackend):
+                raise TypeError(f"{type(shard).__name__} cannot look leases up by address")
+        self.shards = list(shards)
+        self.salt = salt
+        self._partitions: _ty.Dict[int, tuple[AddressPool, list[AddressPool]]] = {}
+        # Slice starts and (first, last, shard) slices, replaced together so
+        # that owner_of() never sees one list updated without the other.
+        self._slices: tuple[list[int], list[tuple[int, int, int]]] = ([], [])
+        for pool in pools:
+            self.register(pool)
+
+    def shard_of(self, client_id: str) -> int:
+        """The index of the shard `client_id` belongs to."""
+        digest = _hashlib.blake2b(client_id.encode(), digest_size=8, key=self.salt, person=b"pydhcp-shard").digest()
+        return int.from_bytes(digest, "big") % len(self.shards)
+
+    def shard(self, client_id: str) -> LeaseQueryBackend:
+        return self.shards[self.shard_of(client_id)]
+
+    def partition(self, pool: AddressPool) -> list[AddressPool]:
+        """`pool`'s slices, the one at index ``i`` belonging to shard ``i``; registers `pool` if it is not yet."""
+        entry = self._partitions.get(id(pool))
+        if entry is None:
+            self.register(pool)
+            entry = self._partitions[id(pool)]
+        return entry[1]
+
+    def register(self, pool: AddressPool) -> None:
+        """Route lookups and allocations of addresses in `pool` to the shard owning their slice."""
+        if id(pool) in self._partitions:
+            return
+        parts = pool.split(len(self.shards))
+        starts, slices = list(self._slices[0]), list(self._slices[1])
+        for index, part in enumerate(parts):
+            first = int(part.first)
+            position = _bisect.bisect(starts, first)
+            starts.insert(position, first)
+            slices.insert(position, (first, int(part.last), index))
+        self._slices = (starts, slices)
+        # Keeps `pool` alive, so its id is not reused by another pool.
+        self._partitions[id(pool)] = (pool, parts)
+
+    def owner_of(self, ip: IPv4) -> _ty.Optional[int]:
+        """The shard whose slice holds `ip`, or None when it is in no registered pool."""
+        value = int(ip)
+        starts, slices = self._slices
+        position = _bisect.bisect(starts, value) - 1
+        if position < 0:
+            return None
+        first, last, index = slices[position]
+        return index if first <= value <= last else None
+
+    def _refused(self, index: int, ip: _ty.Optional[IPv4]) -> bool:
+        if ip is None:
+            return False
+        owner = self.owner_of(ip)
+        return owner is not None and owner != index
+
+    def allocate(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+        chaddr: _ty.Optional[bytes] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        index = self.shard_of(client_id)
+        if self._refused(index, ip):
+            return None
+        return self.shards[index].allocate(client_id, ip, ttl, options, chaddr=chaddr)
+
+    def allocate_if_free(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+        chaddr: _ty.Optional[bytes] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        """Bind `ip` to `client_id` unless another client holds a live lease on it.
+
+        Atomic when the client's shard provides ``allocate_if_free`` and `ip`
+        is in a registered pool. Addresses outside every pool are checked
+        against all shards first, which another shard may race.
+        """
+        index = self.shard_of(client_id)
+        if self._refused(index, ip):
+            return None
+        shard = self.shards[index]
+        if self.owner_of(ip) is None:
+            holder = self.lookup_ip(ip)
+            if holder is not None and holder[0] != client_id:
+                return None
+        allocate_if_free: _ty.Optional[_ty.Callable[..., _ty.Optional[DhcpLease]]] = getattr(
+            shard, "allocate_if_free", None
+        )
+        if allocate_if_free is not None:
+            return allocate_if_free(client_id, ip, ttl, options, chaddr=chaddr)
+        holder = shard.lookup_ip(ip)
+        if holder is not None and holder[0] != client_id:
+            return None
+        return shard.allocate(client_id, ip, ttl, options, chaddr=chaddr)
+
+    def lookup(self, client_id: str) -> _ty.Optional[DhcpLease]:
+        return self.shard(client_id).lookup(client_id)
+
+    def release(self, client_id: str) -> bool:
+        return self.shard(client_id).release(client_id)
+
+    def renew(self, client_id: str, ttl: int) -> _ty.Optional[DhcpLease]:
+        return self.shard(client_id).renew(client_id, ttl)
+
+    def lookup_ip(self, ip: IPv4) -> _ty.Optional[tuple[str, DhcpLease]]:
+        owner = self.owner_of(ip)
+        if owner is not None:
+            return self.shards[owner].lookup_ip(ip)
+        for shard in self.shards:
+            found = shard.lookup_ip(ip)
+            if found is not None:
+                return found
+        return None
+
+    def lookup_chaddr(self, chaddr: bytes) -> _ty.Optional[tuple[str, DhcpLease]]:
+        # A client that changed client id may have a lease in two shards; the latest wins.
+        latest: _ty.Optional[tuple[str, DhcpLease]] = None
+        latest_cltt = float("-inf")
+        for shard in self.shards:
+            found = shard.lookup_chaddr(chaddr)
+            if found is None:
+                continue
+            cltt = shard.last_transaction(found[0]) or 0.0
+            if latest is None or cltt > latest_cltt:
+                latest, latest_cltt = found, cltt
+        return latest
+
+    def chaddr(self, client_id: str) -> _ty.Optional[bytes]:
+        return self.shard(client_id).chaddr(client_id)
+
+    def last_transaction(self, client_id: str) -> _ty.Optional[float]:
+        return self.shard(client_id).last_transaction(client_id)
+
+    def iter_leases(self) -> _ty.Iterator[tuple[str, DhcpLease]]:
+        for shard in self.shards:
+            yield from shard.iter_leases()
+
+    def sweep(self, now: _ty.Optional[float] = None) -> int:
+        """Sweep every shard that supports it; return how many leases were removed."""
+        removed = 0
+        for shard in self.shards:
+            sweep = getattr(shard, "sweep", None)
+            if sweep is not None:
+                removed += sweep(now)
+        return removed
+
+    @property
+    def flush_interval(self) -> _ty.Optional[float]:
+        """The shortest `flush_interval` of the shards, or None when none has one."""
+        intervals = [getattr(shard, "flush_interval", None) for shard in self.shards]
+        return min((interval for interval in intervals if interval is not None), default=None)
+
+    def flush(self) -> None:
+        """Flush every shard that supports it."""
+        for shard in self.shards:
+            flush = getattr(shard, "flush", None)
+            if flush is not None:
+                flush()
+
+    def close(self) -> None:
+        """Close every shard that supports it."""
+        for shard in self.shards:
+            close = getattr(shard, "close", None)
+            if close is not None:
+                close()
+
+
+class ShardedAllocator:
+    """Picks a client's address from its shard's slice of each pool, using `allocator` within the slice.
+
+    Pass the same pools to the :class:`ShardedLeaseBackend` so it routes
+    lookups by address to the owning shard.
+    """
+
+    def __init__(self, backend: ShardedLeaseBackend, allocator: _ty.Optional[Allocator] = None) -> None:
+        self.backend = backend
+        self.allocator = allocator if allocator is not None else HashAllocator()
+
+    def select(self, client_id: str, pool: AddressPool, in_use: InUse) -> _ty.Optional[IPv4]:
+        part = self.backend.partition(pool)[self.backend.shard_of(client_id)]
+        return self.allocator.select(client_id, part, in_use)
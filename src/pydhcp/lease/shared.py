@@ -0,0 +1,684 @@
+from __future__ import annotations
+
+import bisect as _bisect
+import contextlib as _contextlib
+import datetime as _dt
+import os as _os
+import struct as _struct
+import sys as _sys
+import threading as _thread
+import typing as _ty
+from math import inf as _inf
+from multiprocessing import resource_tracker as _resource_tracker
+from multiprocessing import shared_memory as _shared_memory
+
+try:
+    import fcntl as _fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    _fcntl = None  # type: ignore[assignment]
+
+from ..allocation import AddressPool, InUse, SequentialAllocator
+from ..clock import SYSTEM_CLOCK, TimeSource
+from ..network import IPv4
+from ..options import DhcpOptions
+from . import DhcpLease, pack_options, unpack_options
+from .mmapped import DELETED, EMPTY, NO_IP, USED, client_hash
+
+MAGIC = b"PYDHCPSM"
+VERSION = 1
+
+_HEADER = _struct.Struct("<8sIIIIQQQ")
+"""Magic, version, capacity, client id size, pool count, occupied slots, option arena size and bytes used."""
+HEADER_SIZE = 64
+_COUNT_OFFSET = 24
+_OPTIONS_USED_OFFSET = 40
+_SWEEP_CURSOR_OFFSET = 48
+"""The slot the next sweep starts at, in the header's spare bytes."""
+_POOL = _struct.Struct("<IIIIQQ")
+"""First address, size, next-fit cursor, padding, bitmap offset and owners offset."""
+_CURSOR_OFFSET = 8
+_RECORD = _struct.Struct("<IIQIIddB16sxH")
+"""Sequence, flags, client-id hash, IPv4, option-set offset, expiry epoch, last transaction epoch, chaddr and id length."""
+_PROBE = _struct.Struct("<IIQ")
+_SEQ = _struct.Struct("<I")
+_FLAGS = _struct.Struct("<I")
+_TIMES = _struct.Struct("<dd")
+_TIMES_OFFSET = 24
+_OPTION_LENGTH = _struct.Struct("<I")
+
+_SPINS = 100
+"""Reads retried while a slot is being written before waiting for the writer's lock."""
+_SCAN_CHUNK = 4096
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+
+_untracked_lock = _thread.Lock()
+
+
+@_contextlib.contextmanager
+def _untracked() -> _ty.Iterator[None]:
+    """Keep the resource tracker out of segments opened or unlinked meanwhile (bpo-38119).
+
+    The segment must outlive whichever process exits first, but before
+    Python 3.13 every process that opens one asks its tracker to unlink it
+    at exit. Forked workers share the tracker, so unregistering afterwards
+    races between them.
+    """
+    with _untracked_lock:
+        register, unregister = _resource_tracker.register, _resource_tracker.unregister
+        _resource_tracker.register = _resource_tracker.unregister = lambda name, rtype: None
+        try:
+            yield
+        finally:
+            _resource_tracker.register, _resource_tracker.unregister = register, unregister
+
+
+def _open_segment(name: _ty.Optional[str], create: bool, size: int = 0) -> _shared_memory.SharedMemory:
+    if _sys.version_info >= (3, 13):
+        return _shared_memory.SharedMemory(name, create, size, track=False)  # type: ignore[call-arg]
+    with _untracked():
+        return _shared_memory.SharedMemory(name, create, size)
+
+
+def _mapped(segment: _shared_memory.SharedMemory) -> memoryview:
+    # Only None once the segment is closed, which no caller has done yet.
+    if segment.buf is None:
+        raise ValueError(f"Shared memory segment {segment.name} is closed")
+    return segment.buf
+
+
+class _Pool(_ty.NamedTuple):
+    first: int
+    size: int
+    offset: int
+    owners: memoryview
+    bitmap: memoryview
+
+
+def _attach(cls: type[SharedMemoryLeaseBackend], name: str) -> SharedMemoryLeaseBackend:
+    # Unpickling must find the pickled table; an empty one in its place would hide that it is gone.
+    return cls(name, create=False)
+
+
+class SharedMemoryLeaseBackend:
+    """Leases in a fixed-slot hash table in shared memory, mapped by every worker process.
+
+    A supervisor creates the segment once, passing the worker count's worth
+    of `capacity` (a power of two) and the address `pools`, and every
+    ``SO_REUSEPORT`` worker opens it by :attr:`name` (or receives the
+    backend pickled, which pickles only the name). All of them then read
+    and change the same table with no round trip to another process. The
+    segment stays as long as any process has it open, so a worker crash
+    loses nothing while the supervisor holds it. The supervisor calls
+    :meth:`unlink` when the service stops.
+
+    Slots are laid out like :class:`~pydhcp.lease.mmapped.MmapLeaseBackend`
+    records but also hold the client id, of up to `client_id_size` bytes,
+    and the hardware address. Each slot starts with a sequence number that a
+    writer makes odd while it changes the slot and even again when done.
+    Lookups therefore take no lock: they read a slot and retry if its
+    sequence was odd or changed meanwhile. Writers take an exclusive
+    ``lockf`` lock on the segment, so they need ``fcntl`` (not on Windows,
+    where only one process may use a table). A writer killed halfway leaves
+    its slot's sequence odd. The slot then reads as free and the next write
+    to it repairs it.
+
+    Every pool has a bitmap with one bit per address, set while the
+    address is leased, and the slot of its holder. :meth:`lookup_ip` and
+    :meth:`allocate_if_free` are direct reads for addresses in a pool, and
+    :class:`SharedMemoryAllocator` finds free addresses by scanning the
+    bitmap. Addresses outside every pool and lookups by hardware address
+    scan the whole table. :meth:`sweep` visits `sweep_slots` slots per call
+    from a cursor all processes share, so the write lock is held for a
+    bounded time and the table is covered every ``capacity / sweep_slots``
+    calls. Option sets are interned into an
+    arena of `options_size` bytes at the end of the segment. Nothing is
+    written to disk.
+
+    Times are read from `clock`, which is this process's own: a backend
+    received pickled reads the system clock.
+
+    Opening an existing segment ignores every argument but `name` and
+    `clock`; with `create` false, a missing one raises
+    :class:`FileNotFoundError` rather than being created, as unpickling
+    does. The table does not grow, and :meth:`allocate` returns None when
+    there is no free slot, room in the arena or room for the client id.
+    """
+
+    def __init__(
+        self,
+        name: _ty.Optional[str] = None,
+        capacity: int = 1 << 16,
+        pools: _ty.Iterable[AddressPool] = (),
+        client_id_size: int = 64,
+        options_size: int = 1 << 20,
+        create: bool = True,
+        sweep_slots: int = 4096,
+        clock: _ty.Optional[TimeSource] = None,
+    ) -> None:
+        self.sweep_slots = sweep_slots
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        segment = None
+        if name is not None:
+            try:
+                segment = _open_segment(name, create=False)
+            except FileNotFoundError:
+                if not create:
+                    raise
+        self.created = segment is None
+        if segment is None:
+            if capacity <= 0 or capacity & (capacity - 1):
+                raise ValueError(f"Capacity must be a power of two: {capacity}")
+            pool_list = list(pools)
+            record_size = _align(_RECORD.size + client_id_size)
+            size = _align(HEADER_SIZE + len(pool_list) * _POOL.size) + capacity * record_size
+            for pool in pool_list:
+                size += _align(pool.size * 4) + _align((pool.size + 7) // 8)
+            segment = _open_segment(name, create=True, size=size + options_size)
+            self._initialize(_mapped(segment), capacity, pool_list, client_id_size, options_size)
+        self._segment = segment
+        self.name = segment.name
+        self._buf = _mapped(segment)
+        self._closed = False
+        magic, version, self.capacity, self.client_id_size, pool_count, _, options_size, _ = _HEADER.unpack_from(
+            self._buf, 0
+        )
+        if magic != MAGIC or version != VERSION:
+            self._closed = True
+            segment.close()
+            raise ValueError(f"{name} is not a version {VERSION} lease table")
+        self._mask = self.capacity - 1
+        self._record_size = _align(_RECORD.size + self.client_id_size)
+        self._slots = _align(HEADER_SIZE + pool_count * _POOL.size)
+        self._pools: list[_Pool] = []
+        # The arena follows the last bitmap; the mapping itself may be rounded up to a page.
+        self._options = self._slots + self.capacity * self._record_size
+        for number in range(pool_count):
+            offset = HEADER_SIZE + number * _POOL.size
+            first, size, _, _, bitmap, owners = _POOL.unpack_from(self._buf, offset)
+            self._options = max(self._options, bitmap + _align((size + 7) // 8))
+            self._pools.append(
+                _Pool(
+                    first,
+                    size,
+                    offset,
+                    self._buf[owners : owners + size * 4].cast("I"),
+                    self._buf[bitmap : bitmap + (size + 7) // 8],
+                )
+            )
+        self._pools.sort()
+        self._firsts = [pool.first for pool in self._pools]
+        self._options_end = self._options + options_size
+        self._option_ids: dict[bytes, int] = {b"": 0}
+        self._option_sets: dict[int, bytes] = {0: b""}
+        self._options_read = _OPTION_LENGTH.size
+        self._lock = _thread.Lock()
+
+    def _initialize(
+        self, buf: memoryview, capacity: int, pools: list[AddressPool], client_id_size: int, options_size: int
+    ) -> None:
+        record_size = _align(_RECORD.size + client_id_size)
+        offset = _align(HEADER_SIZE + len(pools) * _POOL.size) + capacity * record_size
+        for number, pool in enumerate(pools):
+            owners = offset
+            bitmap = owners + _align(pool.size * 4)
+            _POOL.pack_into(buf, HEADER_SIZE + number * _POOL.size, int(pool.first), pool.size, 0, 0, bitmap, owners)
+            if pool.size % 8:
+                # Bits past the end of the pool are never free.
+                buf[bitmap + pool.size // 8] = 0xFF & ~((1 << pool.size % 8) - 1)
+            offset = bitmap + _align((pool.size + 7) // 8)
+        # The arena starts with the empty option set, at offset 0.
+        _HEADER.pack_into(
+            buf, 0, MAGIC, VERSION, capacity, client_id_size, len(pools), 0, options_size, _OPTION_LENGTH.size
+        )
+
+    def __len__(self) -> int:
+        """Occupied slots, counting leases that have expired but not been swept or overwritten."""
+        count: int = _struct.unpack_from("<Q", self._buf, _COUNT_OFFSET)[0]
+        return count
+
+    def __reduce__(self) -> tuple[_ty.Any, ...]:
+        return _attach, (type(self), self.name)
+
+    @_contextlib.contextmanager
+    def _locked(self, exclusive: bool = True) -> _ty.Iterator[None]:
+        with self._lock:
+            if _fcntl is None:
+                yield
+                return
+            fd = self._segment._fd  # type: ignore[attr-defined]
+            _fcntl.lockf(fd, _fcntl.LOCK_EX if exclusive else _fcntl.LOCK_SH, HEADER_SIZE, 0)
+            try:
+                yield
+            finally:
+                _fcntl.lockf(fd, _fcntl.LOCK_UN, HEADER_SIZE, 0)
+
+    def _begin(self, offset: int) -> int:
+        # An odd sequence left by a writer that died is kept odd; otherwise make it odd.
+        seq: int = _SEQ.unpack_from(self._buf, offset)[0] | 1
+        _SEQ.pack_into(self._buf, offset, seq)
+        return seq
+
+    def _end(self, offset: int, seq: int) -> None:
+        _SEQ.pack_into(self._buf, offset, (seq + 1) & 0xFFFFFFFF)
+
+    def _read(
+        self, offset: int, with_id: bool = False, locked: bool = False
+    ) -> _ty.Optional[tuple[tuple[_ty.Any, ...], bytes]]:
+        """A consistent copy of the slot at `offset` and its client id, or None if it was left half-written.
+
+        Pass `locked` when holding the lock, as no writer can then be halfway.
+        """
+        buf = self._buf
+        for _ in range(0 if locked else _SPINS):
+            seq = _SEQ.unpack_from(buf, offset)[0]
+            if seq & 1:
+                continue
+            record = _RECORD.unpack_from(buf, offset)
+            client_id = bytes(buf[offset + _RECORD.size : offset + _RECORD.size + record[9]]) if with_id else b""
+            if _SEQ.unpack_from(buf, offset)[0] == seq:
+                return record, client_id
+        if not locked:
+            # A writer is slow or died; once its lock is free the slot is as final as it gets.
+            with self._locked(exclusive=False):
+                return self._read(offset, with_id, locked=True)
+        record = _RECORD.unpack_from(buf, offset)
+        if record[0] & 1:
+            return None
+        return record, self._client_id(offset)
+
+    def _probe(self, key: int) -> _ty.Iterator[int]:
+        index = key & self._mask
+        for _ in range(self.capacity):
+            yield self._slots + index * self._record_size
+            index = (index + 1) & self._mask
+
+    def _get(self, client_id: bytes) -> _ty.Optional[tuple[int, tuple[_ty.Any, ...]]]:
+        """Find `client_id`'s slot without locking; return its offset and record."""
+        key = client_hash(client_id.decode())
+        buf = self._buf
+        for offset in self._probe(key):
+            seq, flags, slot_key = _PROBE.unpack_from(buf, offset)
+            if flags == EMPTY and not seq & 1:
+                return None
+            if slot_key != key and not seq & 1:
+                continue
+            found = self._read(offset, with_id=True)
+            if found is None:
+                continue
+            record, slot_id = found
+            if record[1] == EMPTY:
+                return None
+            if record[1] == USED and record[2] == key and slot_id == client_id:
+                return offset, record
+        return None
+
+    def _find(self, key: int, client_id: bytes, now: float) -> tuple[int, int]:
+        """Under the lock: the offset of `client_id`'s slot, or -1, and the first reusable one, or -1."""
+        buf = self._buf
+        reusable = -1
+        for offset in self._probe(key):
+            seq, flags, slot_key = _PROBE.unpack_from(buf, offset)
+            if seq & 1:
+                if reusable < 0:
+                    reusable = offset
+                continue
+            if flags == EMPTY:
+                return -1, offset if reusable < 0 else reusable
+            if flags == USED and slot_key == key and self._client_id(offset) == client_id:
+                return offset, reusable
+            if reusable < 0 and (flags == DELETED or _TIMES.unpack_from(buf, offset + _TIMES_OFFSET)[0] < now):
+                reusable = offset
+        return -1, reusable
+
+    def _client_id(self, offset: int) -> bytes:
+        length = _RECORD.unpack_from(self._buf, offset)[9]
+        return bytes(self._buf[offset + _RECORD.size : offset + _RECORD.size + length])
+
+    def _pool_of(self, ip: int) -> _ty.Optional[tuple[_Pool, int]]:
+        position = _bisect.bisect(self._firsts, ip) - 1
+        if position < 0:
+            return None
+        pool = self._pools[position]
+        index = ip - pool.first
+        return (pool, index) if index < pool.size else None
+
+    def _slot(self, offset: int) -> int:
+        return (offset - self._slots) // self._record_size + 1
+
+    def _set_owner(self, ip: int, offset: int) -> None:
+        located = self._pool_of(ip)
+        if located is not None:
+            pool, index = located
+            pool.owners[index] = self._slot(offset)
+            pool.bitmap[index >> 3] |= 1 << (index & 7)
+
+    def _clear_owner(self, ip: int, offset: int) -> None:
+        located = self._pool_of(ip)
+        if located is not None:
+            pool, index = located
+            if pool.owners[index] == self._slot(offset):
+                pool.owners[index] = 0
+                pool.bitmap[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+    def _add_count(self, delta: int) -> None:
+        _struct.pack_into("<Q", self._buf, _COUNT_OFFSET, len(self) + delta)
+
+    def _read_option_sets(self) -> None:
+        used = _struct.unpack_from("<Q", self._buf, _OPTIONS_USED_OFFSET)[0]
+        while self._options_read < used:
+            offset = self._options_read
+            packed = self._option_set(offset)
+            self._option_ids.setdefault(packed, offset)
+            self._options_read = offset + _OPTION_LENGTH.size + len(packed)
+
+    def _option_set(self, offset: int) -> bytes:
+        packed = self._option_sets.get(offset)
+        if packed is None:
+            start = self._options + offset
+            (length,) = _OPTION_LENGTH.unpack_from(self._buf, start)
+            packed = self._option_sets[offset] = bytes(self._buf[start + _OPTION_LENGTH.size : start + _OPTION_LENGTH.size + length])
+        return packed
+
+    def _intern_options(self, options: DhcpOptions) -> int:
+        """Under the lock: the arena offset of `options`, appending them if new; -1 when the arena is full."""
+        packed = pack_options(options)
+        offset = self._option_ids.get(packed)
+        if offset is not None:
+            return offset
+        self._read_option_sets()
+        offset = self._option_ids.get(packed)
+        if offset is not None:
+            return offset
+        offset = self._options_read
+        end = offset + _OPTION_LENGTH.size + len(packed)
+        if self._options + end > self._options_end:
+            return -1
+        start = self._options + offset
+        _OPTION_LENGTH.pack_into(self._buf, start, len(packed))
+        self._buf[start + _OPTION_LENGTH.size : self._options + end] = packed
+        _struct.pack_into("<Q", self._buf, _OPTIONS_USED_OFFSET, end)
+        self._read_option_sets()
+        return offset
+
+    def _lease(self, record: tuple[_ty.Any, ...]) -> DhcpLease:
+        ip, option_offset, expires = record[3], record[4], record[5]
+        return DhcpLease(
+            ip=IPv4(ip) if ip != NO_IP else None,
+            expires=_dt.datetime.fromtimestamp(expires) if expires != _inf else _inf,
+            options=unpack_options(self._option_set(option_offset)),
+        )
+
+    def allocate(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+        chaddr: _ty.Optional[bytes] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        expires = _dt.datetime.fromtimestamp(self.clock.time() + ttl) if ttl != _inf else _inf
+        lease = DhcpLease(ip=ip, expires=expires, options=options or DhcpOptions())
+        return lease if self._bind(client_id, lease, chaddr) else None
+
+    def allocate_if_free(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+        chaddr: _ty.Optional[bytes] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        """Bind `ip` to `client_id` unless another client holds a live lease on it, atomically across processes."""
+        expires = _dt.datetime.fromtimestamp(self.clock.time() + ttl) if ttl != _inf else _inf
+        lease = DhcpLease(ip=ip, expires=expires, options=options or DhcpOptions())
+        return lease if self._bind(client_id, lease, chaddr, if_free=True) else None
+
+    def _bind(
+        self,
+        client_id: str,
+        lease: DhcpLease,
+        chaddr: _ty.Optional[bytes] = None,
+        touched: _ty.Optional[float] = None,
+        if_free: bool = False,
+    ) -> bool:
+        """Store `lease` as it is; False when it does not fit or, with `if_free`, its address is taken."""
+        encoded = client_id.encode()
+        if len(encoded) > self.client_id_size:
+            return False
+        epoch = lease.expires.timestamp() if isinstance(lease.expires, _dt.datetime) else _inf
+        ip = int(lease.ip) if lease.ip is not None else NO_IP
+        key = client_hash(client_id)
+        now = self.clock.time()
+        with self._locked():
+            if if_free and lease.ip is not None:
+                holder = self._holder(ip, now, locked=True)
+                if holder is not None and holder[0] != encoded:
+                    return False
+            offset, reusable = self._find(key, encoded, now)
+            if offset < 0:
+                if reusable < 0:
+                    return False
+                offset = reusable
+            option_offset = self._intern_options(lease.options)
+            if option_offset < 0:
+                return False
+            seq, flags, _, old_ip = _RECORD.unpack_from(self._buf, offset)[:4]
+            if flags == USED and old_ip != ip:
+                self._clear_owner(old_ip, offset)
+            if flags != USED or seq & 1:
+                self._add_count(1)
+            seq = self._begin(offset)
+            _RECORD.pack_into(
+                self._buf,
+                offset,
+                seq,
+                USED,
+                key,
+                ip,
+                option_offset,
+                epoch,
+                now if touched is None else touched,
+                len(chaddr or b""),
+                chaddr or b"",
+                len(encoded),
+            )
+            self._buf[offset + _RECORD.size : offset + _RECORD.size + len(encoded)] = encoded
+            self._end(offset, seq)
+            self._set_owner(ip, offset)
+        return True
+
+    def _holder(self, ip: int, now: float, locked: bool = False) -> _ty.Optional[tuple[bytes, tuple[_ty.Any, ...]]]:
+        """The client id and record of the live lease on `ip`, or None."""
+        located = self._pool_of(ip)
+        if located is None:
+            for client_id, record in self._live(now, locked):
+                if record[3] == ip:
+                    return client_id, record
+            return None
+        pool, index = located
+        slot = pool.owners[index]
+        if slot == 0:
+            return None
+        found = self._read(self._slots + (slot - 1) * self._record_size, with_id=True, locked=locked)
+        if found is None:
+            return None
+        record, client_id = found
+        if record[1] == USED and record[3] == ip and record[5] >= now:
+            return client_id, record
+        return None
+
+    def lookup(self, client_id: str) -> _ty.Optional[DhcpLease]:
+        found = self._get(client_id.encode())
+        if found is None or found[1][5] < self.clock.time():
+            return None
+        return self._lease(found[1])
+
+    def release(self, client_id: str) -> bool:
+        encoded = client_id.encode()
+        with self._locked():
+            offset, _ = self._find(client_hash(client_id), encoded, self.clock.time())
+            if offset < 0:
+                return False
+            seq = self._begin(offset)
+            _FLAGS.pack_into(self._buf, offset + 4, DELETED)
+            self._end(offset, seq)
+            self._clear_owner(_RECORD.unpack_from(self._buf, offset)[3], offset)
+            self._add_count(-1)
+        return True
+
+    def renew(self, client_id: str, ttl: int) -> _ty.Optional[DhcpLease]:
+        encoded = client_id.encode()
+        now = self.clock.time()
+        expires = _dt.datetime.fromtimestamp(now + ttl) if ttl != _inf else _inf
+        with self._locked():
+            offset, _ = self._find(client_hash(client_id), encoded, now)
+            if offset < 0 or _TIMES.unpack_from(self._buf, offset + _TIMES_OFFSET)[0] < now:
+                return None
+            epoch = expires.timestamp() if isinstance(expires, _dt.datetime) else _inf
+            seq = self._begin(offset)
+            _TIMES.pack_into(self._buf, offset + _TIMES_OFFSET, epoch, now)
+            self._end(offset, seq)
+            record = _RECORD.unpack_from(self._buf, offset)
+        return self._lease(record)._replace(expires=expires)
+
+    def lookup_ip(self, ip: IPv4) -> _ty.Optional[tuple[str, DhcpLease]]:
+        holder = self._holder(int(ip), self.clock.time())
+        if holder is None:
+            return None
+        return holder[0].decode(), self._lease(holder[1])
+
+    def lookup_chaddr(self, chaddr: bytes) -> _ty.Optional[tuple[str, DhcpLease]]:
+        """The most recently active live lease of `chaddr`; scans the table."""
+        latest: _ty.Optional[tuple[str, DhcpLease]] = None
+        latest_cltt = float("-inf")
+        for client_id, record in self._live(self.clock.time()):
+            if record[8][: record[7]] == chaddr and record[6] > latest_cltt:
+                latest, latest_cltt = (client_id.decode(), self._lease(record)), record[6]
+        return latest
+
+    def chaddr(self, client_id: str) -> _ty.Optional[bytes]:
+        found = self._get(client_id.encode())
+        if found is None or not found[1][7]:
+            return None
+        chaddr: bytes = found[1][8]
+        return chaddr[: found[1][7]]
+
+    def last_transaction(self, client_id: str) -> _ty.Optional[float]:
+        found = self._get(client_id.encode())
+        return found[1][6] if found is not None else None
+
+    def _live(self, now: float, locked: bool = False) -> _ty.Iterator[tuple[bytes, tuple[_ty.Any, ...]]]:
+        buf = self._buf
+        for index in range(self.capacity):
+            offset = self._slots + index * self._record_size
+            if _PROBE.unpack_from(buf, offset)[1] != USED:
+                continue
+            found = self._read(offset, with_id=True, locked=locked)
+            if found is not None and found[0][1] == USED and found[0][5] >= now:
+                yield found[1], found[0]
+
+    def iter_leases(self) -> _ty.Iterator[tuple[str, DhcpLease]]:
+        for client_id, record in self._live(self.clock.time()):
+            yield client_id.decode(), self._lease(record)
+
+    def sweep(self, now: _ty.Optional[float] = None, slots: _ty.Optional[int] = None) -> int:
+        """Free the slots and addresses of leases expired at epoch `now`; return how many.
+
+        Visits the next `slots` slots, `sweep_slots` by default, after where
+        the last sweep in any process stopped. Pass ``slots=capacity`` to
+        sweep the whole table.
+        """
+        now = self.clock.time() if now is None else now
+        count = min(self.capacity, self.sweep_slots if slots is None else slots)
+        removed = 0
+        with self._locked():
+            start = _struct.unpack_from("<Q", self._buf, _SWEEP_CURSOR_OFFSET)[0] & self._mask
+            _struct.pack_into("<Q", self._buf, _SWEEP_CURSOR_OFFSET, (start + count) & self._mask)
+            for step in range(count):
+                offset = self._slots + ((start + step) & self._mask) * self._record_size
+                seq, flags, _, ip, _, expires = _RECORD.unpack_from(self._buf, offset)[:6]
+                if flags != USED or seq & 1 or expires >= now:
+                    continue
+                seq = self._begin(offset)
+                _FLAGS.pack_into(self._buf, offset + 4, DELETED)
+                self._end(offset, seq)
+                self._clear_owner(ip, offset)
+                removed += 1
+            if removed:
+                self._add_count(-removed)
+        return removed
+
+    def free_addresses(self, pool: AddressPool) -> _ty.Iterator[IPv4]:
+        """Addresses of `pool` with no lease bound, next-fit from where any process last looked.
+
+        Only pools the table was created with have a bitmap; for others this yields nothing.
+        """
+        located = self._pool_of(int(pool.first))
+        if located is None or located[1] != 0 or located[0].size != pool.size:
+            return
+        shared = located[0]
+        start = _SEQ.unpack_from(self._buf, shared.offset + _CURSOR_OFFSET)[0] % shared.size
+        for first, last in ((start, shared.size), (0, start)):
+            for index in self._zero_bits(shared.bitmap, first, last):
+                _SEQ.pack_into(self._buf, shared.offset + _CURSOR_OFFSET, index + 1)
+                yield IPv4(shared.first + index)
+
+    @staticmethod
+    def _zero_bits(bitmap: memoryview, first: int, last: int) -> _ty.Iterator[int]:
+        position = first >> 3
+        end = (last + 7) >> 3
+        while position < end:
+            chunk = bytes(bitmap[position : min(end, position + _SCAN_CHUNK)])
+            full = len(chunk) - len(chunk.lstrip(b"\xff"))
+            position += full
+            if full == len(chunk):
+                continue
+            byte = bitmap[position]
+            for bit in range(8):
+                index = position * 8 + bit
+                if not byte >> bit & 1 and first <= index < last:
+                    yield index
+            position += 1
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        for pool in self._pools:
+            pool.owners.release()
+            pool.bitmap.release()
+        self._pools = []
+        self._firsts = []
+        self._segment.close()
+
+    def unlink(self) -> None:
+        """Destroy the segment once every process has closed it. Only the supervisor should call this."""
+        with _untracked():
+            self._segment.unlink()
+
+
+class SharedMemoryAllocator:
+    """Picks the next free address from a :class:`SharedMemoryLeaseBackend`'s pool bitmap.
+
+    All workers share the bitmap and its next-fit cursor, so they rarely
+    pick the same address; when two do, only one ``allocate_if_free``
+    succeeds. Pools the table was not created with, and pools whose free
+    bits are all offered or quarantined, are scanned like
+    :class:`~pydhcp.allocation.SequentialAllocator` does, which also finds
+    addresses whose leases expired but were not swept.
+    """
+
+    def __init__(self, backend: SharedMemoryLeaseBackend) -> None:
+        self.backend = backend
+        self._fallback = SequentialAllocator()
+
+    def select(self, client_id: str, pool: AddressPool, in_use: InUse) -> _ty.Optional[IPv4]:
+        for ip in self.backend.free_addresses(pool):
+            if ip in pool.exclude or in_use(ip):
+                continue
+            return ip
+        return self._fallback.select(client_id, pool, in_use)
@@ -0,0 +1,172 @@
+"""Binary lease snapshots: columns of fixed-size values that load without per-field parsing.
+
+Layout, all little-endian::
+
+    header    magic, version, lease count, option-set count, sequence number
+              of the last journal record included (0 outside a journal)
+    options   per set: u32 length, then the set as encoded by pack_options()
+    columns   address (i64, -1 for none), expiry (f64 epoch), last transaction
+              (f64 epoch), option-set index (u32), hardware-address length (u8),
+              client-id length (u32); each column is one array of `count` values
+    blobs     the hardware addresses, then the UTF-8 client ids, back to back
+
+Each column is read with a single ``array.frombytes`` call. Only the leases
+that are still live get a :class:`~pydhcp.lease.LeaseRecord`, and option sets
+stay encoded until a lease using them is first returned. Version 1 files,
+whose header stops before the sequence number, are still read.
+"""
+
+from __future__ import annotations
+
+import array as _array
+import os as _os
+import struct as _struct
+import sys as _sys
+import time as _time
+import typing as _ty
+
+from . import LazyOptionSet, LeaseRecord, OptionSets, pack_options
+
+MAGIC = b"PYDHCPSN"
+VERSION = 2
+
+_HEADER = _struct.Struct("<8sIIIQ")
+_HEADER_V1 = _struct.Struct("<8sIII")
+_LENGTH = _struct.Struct("<I")
+_COLUMNS = (("ips", "q"), ("expires", "d"), ("cltts", "d"), ("option_ids", "I"), ("chaddr_lengths", "B"), ("id_lengths", "I"))
+_SWAP = _sys.byteorder != "little"
+
+
+def is_snapshot(path: str) -> bool:
+    """True when `path` starts like a binary snapshot."""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _read_header(path: str, data: bytes) -> tuple[int, int, int, int]:
+    magic, version = _struct.unpack_from("<8sI", data, 0)
+    if magic != MAGIC or version not in (1, VERSION):
+        raise ValueError(f"{path} is not a version 1 or {VERSION} lease snapshot")
+    if version == 1:
+        _, _, count, set_count = _HEADER_V1.unpack_from(data, 0)
+        return count, set_count, 0, _HEADER_V1.size
+    _, _, count, set_count, seq = _HEADER.unpack_from(data, 0)
+    return count, set_count, seq, _HEADER.size
+
+
+def snapshot_seq(path: str) -> int:
+    """The journal sequence number stored in the snapshot at `path`."""
+    with open(path, "rb") as f:
+        data = f.read(_HEADER.size)
+    return _read_header(path, data)[2]
+
+
+def _column(typecode: str, values: _ty.Iterable[_ty.Any] = ()) -> _array.array[_ty.Any]:
+    column = _array.array(typecode, values)
+    if column.itemsize != _struct.calcsize("<" + typecode):
+        raise RuntimeError(f"array typecode {typecode!r} has an unexpected size on this platform")
+    return column
+
+
+def write_snapshot(path: str, leases: _ty.Iterable[tuple[str, LeaseRecord]], seq: int = 0) -> int:
+    """Write `leases` to `path` atomically and return how many were written.
+
+    `seq` is the last journal record the snapshot includes, see
+    :class:`~pydhcp.lease.journal.JournalLeaseBackend`.
+    """
+    columns = {name: _column(typecode) for name, typecode in _COLUMNS}
+    option_table: list[bytes] = []
+    option_index: dict[bytes, int] = {}
+    # Interned sets are shared objects, so each is packed once rather than once per lease.
+    packed_by_id: dict[int, bytes] = {}
+    chaddrs = bytearray()
+    ids = bytearray()
+    for client_id, record in leases:
+        options = record.options
+        packed: _ty.Optional[bytes]
+        if isinstance(options, LazyOptionSet):
+            packed = options.packed
+        else:
+            packed = packed_by_id.get(id(options))
+            if packed is None:
+                packed = packed_by_id[id(options)] = pack_options(options) if options else b""
+        option_id = option_index.get(packed)
+        if option_id is None:
+            option_id = option_index[packed] = len(option_table)
+            option_table.append(packed)
+        encoded = client_id.encode()
+        chaddr = record.chaddr or b""
+        columns["ips"].append(record.ip)
+        columns["expires"].append(record.expires)
+        columns["cltts"].append(record.cltt)
+        columns["option_ids"].append(option_id)
+        columns["chaddr_lengths"].append(len(chaddr))
+        columns["id_lengths"].append(len(encoded))
+        chaddrs += chaddr
+        ids += encoded
+
+    count = len(columns["ips"])
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, count, len(option_table), seq))
+        for packed in option_table:
+            f.write(_LENGTH.pack(len(packed)))
+            f.write(packed)
+        for name, _ in _COLUMNS:
+            column = columns[name]
+            if _SWAP:
+                column.byteswap()
+            f.write(column.tobytes())
+        f.write(chaddrs)
+        f.write(ids)
+        f.flush()
+        _os.fsync(f.fileno())
+    _os.replace(temp_path, path)
+    return count
+
+
+def read_snapshot(
+    path: str,
+    option_sets: OptionSets,
+    now: _ty.Optional[float] = None,
+) -> _ty.Iterator[tuple[str, LeaseRecord]]:
+    """Yield the leases in the snapshot at `path` that are still live at epoch `now`.
+
+    Option sets are left encoded and are interned through `option_sets` when
+    first used.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    count, set_count, _, offset = _read_header(path, data)
+    table: list[LazyOptionSet] = []
+    for _ in range(set_count):
+        (length,) = _LENGTH.unpack_from(data, offset)
+        offset += _LENGTH.size
+        table.append(LazyOptionSet(data[offset : offset + length], option_sets))
+        offset += length
+
+    view = memoryview(data)
+    columns = {}
+    for name, typecode in _COLUMNS:
+        column = _column(typecode)
+        size = count * column.itemsize
+        column.frombytes(view[offset : offset + size])
+        if _SWAP:
+            column.byteswap()
+        columns[name] = column
+        offset += size
+
+    now = _time.time() if now is None else now
+    ips, expires, cltts = columns["ips"], columns["expires"], columns["cltts"]
+    option_ids, chaddr_lengths, id_lengths = columns["option_ids"], columns["chaddr_lengths"], columns["id_lengths"]
+    chaddr_offset = offset
+    id_offset = offset + sum(chaddr_lengths)
+    for i in range(count):
+        chaddr_length = chaddr_lengths[i]
+        id_length = id_lengths[i]
+        if expires[i] >= now:
+            chaddr = data[chaddr_offset : chaddr_offset + chaddr_length] if chaddr_length else None
+            client_id = data[id_offset : id_offset + id_length].decode()
+            yield client_id, LeaseRecord(ips[i], expires[i], cltts[i], chaddr, table[option_ids[i]])
+        chaddr_offset += chaddr_length
+        id_offset += id_length
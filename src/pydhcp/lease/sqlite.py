@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import datetime as _dt
+import sqlite3 as _sqlite3
+import threading as _thread
+import typing as _ty
+from math import inf as _inf
+
+from ..clock import SYSTEM_CLOCK, TimeSource
+from ..network import IPv4
+from ..options import DhcpOptions
+from . import DhcpLease, pack_options, unpack_options
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    client_id TEXT PRIMARY KEY,
+    ip INTEGER,
+    expires REAL,
+    options BLOB NOT NULL,
+    chaddr BLOB,
+    cltt REAL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS leases_ip ON leases (ip);
+CREATE INDEX IF NOT EXISTS leases_expires ON leases (expires);
+CREATE INDEX IF NOT EXISTS leases_chaddr ON leases (chaddr);
+"""
+
+_UPSERT = (
+    "INSERT INTO leases (client_id, ip, expires, options, chaddr, cltt) VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (client_id) DO UPDATE SET ip = excluded.ip, expires = excluded.expires, "
+    "options = excluded.options, chaddr = COALESCE(excluded.chaddr, chaddr), cltt = excluded.cltt"
+)
+_SELECT = "SELECT ip, expires, options FROM leases WHERE client_id = ?"
+_SELECT_BY_IP = (
+    "SELECT client_id, ip, expires, options FROM leases "
+    "WHERE ip = ? AND (expires IS NULL OR expires >= ?) ORDER BY cltt DESC LIMIT 1"
+)
+_SELECT_BY_CHADDR = (
+    "SELECT client_id, ip, expires, options FROM leases "
+    "WHERE chaddr = ? AND (expires IS NULL OR expires >= ?) ORDER BY cltt DESC LIMIT 1"
+)
+_SELECT_PAGE = (
+    "SELECT client_id, ip, expires, options, chaddr, cltt FROM leases "
+    "WHERE client_id > ? AND (expires IS NULL OR expires >= ?) ORDER BY client_id LIMIT ?"
+)
+_SELECT_EXPIRED = "SELECT client_id, ip, expires, options FROM leases WHERE expires < ? ORDER BY expires LIMIT ?"
+_RENEW = "UPDATE leases SET expires = ?, cltt = ? WHERE client_id = ?"
+_DELETE = "DELETE FROM leases WHERE client_id = ?"
+_DELETE_EXPIRED = "DELETE FROM leases WHERE expires < ?"
+
+
+def _expiry(ttl: float, now: float) -> tuple[_ty.Union[_dt.datetime, float], _ty.Optional[float]]:
+    if ttl == _inf:
+        return _inf, None
+    return _dt.datetime.fromtimestamp(now + ttl), now + ttl
+
+
+def _lease(ip: _ty.Optional[int], expires: _ty.Optional[float], options: bytes) -> DhcpLease:
+    return DhcpLease(
+        ip=IPv4(ip) if ip is not None else None,
+        expires=_dt.datetime.fromtimestamp(expires) if expires is not None else _inf,
+        options=unpack_options(options),
+    )
+
+
+class SqliteLeaseBackend:
+    """Leases in an SQLite database, implementing :class:`~pydhcp.lease.LeaseQueryBackend`.
+
+    Leases are keyed by client id, with indexes on address, expiry and
+    hardware address, so leasequeries and expiry sweeps are index lookups.
+    Expiry is stored as epoch seconds, NULL for infinite leases, and options
+    in the :func:`~pydhcp.lease.pack_options` format. File databases run in
+    WAL mode. Every query is a constant statement, so SQLite's statement
+    cache prepares each one once per connection.
+
+    Writes are grouped into transactions of `batch_size`. Leases written
+    since the last commit are visible to this backend but are lost if the
+    process dies; call :meth:`commit` where durability matters.
+    :class:`~pydhcp.server.DhcpServer` calls :meth:`flush` from its tick
+    every `flush_interval` seconds, so a part batch does not wait for the
+    next write. `synchronous` is passed to ``PRAGMA synchronous``.
+    ``NORMAL`` is durable against process crashes in WAL mode, but can lose
+    the last commits on power loss.
+
+    Expired leases are not returned, but stay in the table until
+    :meth:`sweep` removes them. Times are read from `clock`. The connection
+    is shared between threads behind a lock.
+    """
+
+    def __init__(
+        self,
+        path: str = "leases.db",
+        batch_size: int = 1,
+        synchronous: str = "NORMAL",
+        flush_interval: _ty.Optional[float] = 1.0,
+        clock: _ty.Optional[TimeSource] = None,
+    ) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.clock = clock if clock is not None else SYSTEM_CLOCK
+        self.commits = 0
+        self._pending = 0
+        self._lock = _thread.RLock()
+        self._conn = _sqlite3.connect(path, isolation_level=None, check_same_thread=False, cached_statements=32)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute(f"PRAGMA synchronous = {synchronous}")
+        self._conn.executescript(_SCHEMA)
+
+    def _write(self, sql: str, params: _ty.Sequence[_ty.Any]) -> int:
+        """Run a write in the current batch; return its row count."""
+        with self._lock:
+            if not self._conn.in_transaction:
+                self._conn.execute("BEGIN")
+            rowcount = self._conn.execute(sql, params).rowcount
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self.commit()
+            return rowcount
+
+    def _read(self, sql: str, params: _ty.Sequence[_ty.Any]) -> list[_ty.Any]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def commit(self) -> None:
+        """Commit the writes of the current batch."""
+        with self._lock:
+            if self._conn.in_transaction:
+                self._conn.execute("COMMIT")
+                self.commits += 1
+            self._pending = 0
+
+    def flush(self) -> None:
+        """Commit the writes of a part batch."""
+        self.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self.commit()
+            self._conn.close()
+
+    def allocate(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+        chaddr: _ty.Optional[bytes] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        now = self.clock.time()
+        expires, epoch = _expiry(ttl, now)
+        lease = DhcpLease(ip=ip, expires=expires, options=options or DhcpOptions())
+        packed = pack_options(lease.options)
+        self._write(
+            _UPSERT,
+            (client_id, int(ip) if ip is not None else None, epoch, packed, bytes(chaddr) if chaddr else None, now),
+        )
+        return lease
+
+    def lookup(self, client_id: str) -> _ty.Optional[DhcpLease]:
+        rows = self._read(_SELECT, (client_id,))
+        if not rows or (rows[0][1] is not None and rows[0][1] < self.clock.time()):
+            return None
+        return _lease(*rows[0])
+
+    def release(self, client_id: str) -> bool:
+        return self._write(_DELETE, (client_id,)) > 0
+
+    def renew(self, client_id: str, ttl: int) -> _ty.Optional[DhcpLease]:
+        with self._lock:
+            lease = self.lookup(client_id)
+            if lease is None:
+                return None
+            now = self.clock.time()
+            expires, epoch = _expiry(ttl, now)
+            self._write(_RENEW, (epoch, now, client_id))
+        return lease._replace(expires=expires)
+
+    def lookup_ip(self, ip: IPv4) -> _ty.Optional[tuple[str, DhcpLease]]:
+        rows = self._read(_SELECT_BY_IP, (int(ip), self.clock.time()))
+        return (rows[0][0], _lease(*rows[0][1:])) if rows else None
+
+    def lookup_chaddr(self, chaddr: bytes) -> _ty.Optional[tuple[str, DhcpLease]]:
+        rows = self._read(_SELECT_BY_CHADDR, (bytes(chaddr), self.clock.time()))
+        return (rows[0][0], _lease(*rows[0][1:])) if rows else None
+
+    def chaddr(self, client_id: str) -> _ty.Optional[bytes]:
+        rows = self._read("SELECT chaddr FROM leases WHERE client_id = ?", (client_id,))
+        return rows[0][0] if rows else None
+
+    def last_transaction(self, client_id: str) -> _ty.Optional[float]:
+        rows = self._read("SELECT cltt FROM leases WHERE client_id = ?", (client_id,))
+        return rows[0][0] if rows else None
+
+    def iter_leases(self, page_size: int = 1024) -> _ty.Iterator[tuple[str, DhcpLease]]:
+        for client_id, lease, _, _ in self._iter_records(page_size):
+            yield client_id, lease
+
+    def _iter_records(
+        self, page_size: int = 1024
+    ) -> _ty.Iterator[tuple[str, DhcpLease, _ty.Optional[bytes], _ty.Optional[float]]]:
+        """Like :meth:`iter_leases`, with each lease's chaddr and last-transaction time."""
+        # Pages restart from the last client id rather than holding a cursor
+        # open, so writes made while the iteration is suspended are safe.
+        last = ""
+        while True:
+            rows = self._read(_SELECT_PAGE, (last, self.clock.time(), page_size))
+            for client_id, ip, expires, options, chaddr, cltt in rows:
+                yield client_id, _lease(ip, expires, options), chaddr, cltt
+            if len(rows) < page_size:
+                return
+            last = rows[-1][0]
+
+    def _bind(
+        self,
+        client_id: str,
+        lease: DhcpLease,
+        chaddr: _ty.Optional[bytes] = None,
+        touched: _ty.Optional[float] = None,
+    ) -> None:
+        """Store `lease` as it is, keeping its expiry and last-transaction time."""
+        expires = lease.expires
+        self._write(
+            _UPSERT,
+            (
+                client_id,
+                int(lease.ip) if lease.ip is not None else None,
+                expires.timestamp() if isinstance(expires, _dt.datetime) else None,
+                pack_options(lease.options),
+                bytes(chaddr) if chaddr else None,
+                self.clock.time() if touched is None else touched,
+            ),
+        )
+
+    def expired(self, now: _ty.Optional[float] = None, limit: int = -1) -> list[tuple[str, DhcpLease]]:
+        """Up to `limit` leases past their expiry at epoch `now`, soonest expired first."""
+        rows = self._read(_SELECT_EXPIRED, (self.clock.time() if now is None else now, limit))
+        return [(client_id, _lease(ip, expires, options)) for client_id, ip, expires, options in rows]
+
+    def sweep(self, now: _ty.Optional[float] = None) -> int:
+        """Delete the leases past their expiry at epoch `now`; return how many were removed."""
+        return self._write(_DELETE_EXPIRED, (self.clock.time() if now is None else now,))
+
+    purge_expired = sweep
+    """The former name of :meth:`sweep`."""
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import contextlib as _contextlib
+import itertools as _itertools
+import threading as _thread
+import typing as _ty
+import zlib as _zlib
+
+from ..network import IPv4
+from ..options import DhcpOptions
+from . import DhcpLease, InMemoryLeaseBackend, LeaseQueryBackend
+
+
+class ThreadSafeLeaseBackend:
+    """Makes any :class:`~pydhcp.lease.LeaseQueryBackend` safe to share between threads.
+
+    Locks are striped: each client id hashes to one of `stripes` client
+    locks and each address to one of `stripes` address locks. Every call
+    holds the lock of the key it concerns, so operations on one client or
+    one address are atomic while operations on different ones interleave.
+    Address locks are always taken before client locks, several address
+    locks in ascending stripe order, so no two calls can wait on each other.
+
+    Lookups take no other lock when the backend is an
+    :class:`~pydhcp.lease.InMemoryLeaseBackend` or a subclass: its
+    :attr:`~pydhcp.lease.InMemoryLeaseBackend.prune_on_read` is turned off,
+    after which its lookups only read dicts, so lookups for different
+    clients run in parallel with each other and with a write. Writes still
+    go into the wrapped backend one at a time under a write lock, since the
+    shipped backends keep one expiry heap, file or journal for every
+    client. That lock is held for the single backend call only, never
+    across a check-then-act sequence, and other backends' lookups take it
+    too. The striped locks make those sequences atomic. The main one is
+    :meth:`allocate_if_free`, a compare-and-set that binds an address only
+    if no other client holds a live lease on it.
+    :class:`~pydhcp.server.DhcpServer` uses it whenever the backend provides
+    it.
+
+    Use :meth:`client_lock` to make a longer sequence of calls for one client
+    atomic, such as a lookup followed by a renewal. Do not allocate while
+    holding it, as allocation takes address locks.
+    """
+
+    def __init__(self, backend: _ty.Optional[LeaseQueryBackend] = None, stripes: int = 64) -> None:
+        if backend is None:
+            backend = InMemoryLeaseBackend()
+        if not isinstance(backend, LeaseQueryBackend):
+            raise TypeError(f"{type(backend).__name__} cannot look leases up by address")
+        self.backend = backend
+        self.stripes = stripes
+        self._client_locks = [_thread.RLock() for _ in range(stripes)]
+        self._ip_locks = [_thread.RLock() for _ in range(stripes)]
+        self._backend_lock = _thread.RLock()
+        self._read_lock: _ty.ContextManager[_ty.Any] = self._backend_lock
+        if isinstance(backend, InMemoryLeaseBackend):
+            backend.prune_on_read = False
+            self._read_lock = _contextlib.nullcontext()
+
+    def __getattr__(self, name: str) -> _ty.Any:
+        # Other backend methods (sync, close, ...) are forwarded under the write lock.
+        if name.startswith("_") or name == "backend":
+            raise AttributeError(name)
+        method = getattr(self.backend, name)
+        if not callable(method):
+            return method
+
+        def locked(*args: _ty.Any, **kwargs: _ty.Any) -> _ty.Any:
+            with self._backend_lock:
+                return method(*args, **kwargs)
+
+        return locked
+
+    def _client_stripe(self, client_id: str) -> _thread.RLock:
+        return self._client_locks[_zlib.crc32(client_id.encode()) % self.stripes]
+
+    def _ip_index(self, ip: IPv4) -> int:
+        return int(ip) % self.stripes
+
+    @_contextlib.contextmanager
+    def _move_lock(self, client_id: str, ip: IPv4) -> _ty.Iterator[None]:
+        # Binding `ip` releases the client's current address, so both address
+        # stripes are needed. They are taken in ascending order, then the client
+        # stripe; should the client move before its stripe is held, start over.
+        while True:
+            with self._read_lock:
+                previous = self.backend.lookup(client_id)
+            indexes = {self._ip_index(ip)}
+            if previous is not None and previous.ip is not None:
+                indexes.add(self._ip_index(previous.ip))
+            with _contextlib.ExitStack() as stack:
+                for index in sorted(indexes):
+                    stack.enter_context(self._ip_locks[index])
+                stack.enter_context(self._client_stripe(client_id))
+                with self._read_lock:
+                    current = self.backend.lookup(client_id)
+                if current is None or current.ip is None or self._ip_index(current.ip) in indexes:
+                    yield
+                    return
+
+    @_contextlib.contextmanager
+    def client_lock(self, client_id: str) -> _ty.Iterator[None]:
+        """Hold `client_id`'s stripe, making the calls made meanwhile atomic for that client."""
+        with self._client_stripe(client_id):
+            yield
+
+    def allocate_if_free(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+        chaddr: _ty.Optional[bytes] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        """Bind `ip` to `client_id` unless another client holds a live lease on it.
+
+        Returns None, and changes nothing, when the address is taken.
+        """
+        with self._move_lock(client_id, ip):
+            # Nobody else can bind or move off `ip` while its stripe is held.
+            with self._read_lock:
+                holder = self.backend.lookup_ip(ip)
+            if holder is not None and holder[0] != client_id:
+                return None
+            with self._backend_lock:
+                return self.backend.allocate(client_id, ip, ttl, options, chaddr=chaddr)
+
+    def allocate(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+        chaddr: _ty.Optional[bytes] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        with self._move_lock(client_id, ip), self._backend_lock:
+            return self.backend.allocate(client_id, ip, ttl, options, chaddr=chaddr)
+
+    def lookup(self, client_id: str) -> _ty.Optional[DhcpLease]:
+        with self._client_stripe(client_id), self._read_lock:
+            return self.backend.lookup(client_id)
+
+    def release(self, client_id: str) -> bool:
+        with self._client_stripe(client_id), self._backend_lock:
+            return self.backend.release(client_id)
+
+    def renew(self, client_id: str, ttl: int) -> _ty.Optional[DhcpLease]:
+        with self._client_stripe(client_id), self._backend_lock:
+            return self.backend.renew(client_id, ttl)
+
+    def lookup_ip(self, ip: IPv4) -> _ty.Optional[tuple[str, DhcpLease]]:
+        # No address stripe: it would be taken after the client stripe inside client_lock().
+        with self._read_lock:
+            return self.backend.lookup_ip(ip)
+
+    def lookup_chaddr(self, chaddr: bytes) -> _ty.Optional[tuple[str, DhcpLease]]:
+        with self._read_lock:
+            return self.backend.lookup_chaddr(chaddr)
+
+    def chaddr(self, client_id: str) -> _ty.Optional[bytes]:
+        with self._read_lock:
+            return self.backend.chaddr(client_id)
+
+    def last_transaction(self, client_id: str) -> _ty.Optional[float]:
+        with self._read_lock:
+            return self.backend.last_transaction(client_id)
+
+    def iter_leases(self, page_size: int = 1024) -> _ty.Iterator[tuple[str, DhcpLease]]:
+        # Read `page_size` leases at a time under the lock and yield them
+        # after releasing it, so writes go on between pages and memory stays
+        # bounded by a page.
+        leases = self.backend.iter_leases()
+        while True:
+            with self._backend_lock:
+                page = list(_itertools.islice(leases, page_size))
+            yield from page
+            if len(page) < page_size:
+                return
@@ -0,0 +1,297 @@
+from __future__ import annotations
+
+import select as _select
+import socket as _socket
+import struct as _struct
+import threading as _thread
+import typing as _ty
+
+from . import network as _net, constants as _const
+from .listener import ListenSpec, _parselisteners
+from .lease import DhcpLease, LeaseQueryBackend
+from .log import LOGGER
+from .options import DhcpOptionCode
+from .options import type as _type
+from .packet import enums as _enum
+from .packet.message import DhcpMessage
+
+if _ty.TYPE_CHECKING:
+    from .server import DhcpServer
+
+_FRAME = _struct.Struct("!H")
+
+RELAY_AGENT_REMOTE_ID = 2
+RELAY_AGENT_RELAY_ID = 12
+"""RFC 6925 relay-id sub-option of RELAY_AGENT_INFORMATION."""
+
+
+class LeaseQueryStatus:
+    """RFC 6926 7.2 STATUS_CODE values."""
+
+    SUCCESS = 0
+    UNSPEC_FAIL = 1
+    QUERY_TERMINATED = 2
+    MALFORMED_QUERY = 3
+    NOT_ALLOWED = 4
+
+
+def relay_suboption(relay_info: _ty.Optional[_ty.Union[bytes, bytearray]], code: int) -> _ty.Optional[bytes]:
+    """Return a RELAY_AGENT_INFORMATION sub-option from its raw bytes, without decoding the rest."""
+    if not relay_info:
+        return None
+    offset = 0
+    end = len(relay_info)
+    while offset + 2 <= end:
+        sub_code = relay_info[offset]
+        length = relay_info[offset + 1]
+        if sub_code == code:
+            return bytes(relay_info[offset + 2 : offset + 2 + length])
+        offset += 2 + length
+    return None
+
+
+def _recv_exact(sock: _socket.socket, size: int) -> bytes:
+    chunks = bytearray()
+    while len(chunks) < size:
+        chunk = sock.recv(size - len(chunks))
+        if not chunk:
+            break
+        chunks.extend(chunk)
+    return bytes(chunks)
+
+
+def read_frame(sock: _socket.socket) -> _ty.Optional[bytes]:
+    """Read one length-prefixed DHCP message (RFC 6926 6.1); None on a clean close."""
+    header = _recv_exact(sock, _FRAME.size)
+    if not header:
+        return None
+    if len(header) != _FRAME.size:
+        raise ConnectionError("Connection closed inside a message-size field")
+    (size,) = _FRAME.unpack(header)
+    payload = _recv_exact(sock, size)
+    if len(payload) != size:
+        raise ConnectionError(f"Connection closed after {len(payload)} of {size} message bytes")
+    return payload
+
+
+def frame(data: _ty.Union[bytes, bytearray]) -> bytes:
+    return _FRAME.pack(len(data)) + bytes(data)
+
+
+class BulkLeaseQueryListener:
+    """RFC 6926 Bulk Leasequery over TCP, answered from a :class:`~pydhcp.server.DhcpServer`.
+
+    Runs next to the server's UDP listener and shares its lease backend. Each
+    DHCPBULKLEASEQUERY is answered by a stream of DHCPLEASEACTIVE messages, one
+    per matching binding, followed by DHCPLEASEQUERYDONE. Replies come from a
+    generator over the backend and are written in bounded batches with
+    ``sendall``, so a slow requester throttles the walk through the socket's
+    send buffer and memory stays flat however many leases match. Every
+    connection is served on its own thread, which holds no lock while it
+    writes, so a slow requester holds up only its own stream. One that takes
+    no data for `send_timeout` seconds is dropped, freeing its connection slot.
+
+    Queries may select by ``chaddr``, CLIENT_IDENTIFIER, relay-id or remote-id
+    (sub-options 12 and 2 of RELAY_AGENT_INFORMATION), or match every active
+    lease, optionally narrowed by QUERY_START_TIME/QUERY_END_TIME.
+    """
+
+    DEFAULT_PORTS: _ty.Sequence[int] = (_enum.DhcpPort.SERVER,)
+    SEND_BATCH_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        server: "DhcpServer",
+        listen: ListenSpec = None,
+        select_timeout: _ty.Optional[float] = None,
+        idle_timeout: float = 60.0,
+        max_connections: int = 16,
+        send_timeout: float = 10.0,
+    ) -> None:
+        self.server = server
+        self._listen = _parselisteners(listen or "*", self.DEFAULT_PORTS, expand_wildcard=False)
+        self._select_timeout = select_timeout or 1
+        self.idle_timeout = idle_timeout
+        self.send_timeout = send_timeout
+        self._sockets: list[_socket.socket] = []
+        self._slots = _thread.BoundedSemaphore(max_connections)
+        self._cancellation_token: _thread.Event | None = None
+
+    @property
+    def addresses(self) -> list[_net.SocketAddress]:
+        return [_net.SocketAddress(sock) for sock in self._sockets]
+
+    def bind(self) -> None:
+        if self._sockets:
+            return
+        for address in self._listen:
+            LOGGER.info(f"Bulk leasequery listening on: tcp/{address}")
+            sock = address.listen(
+                _socket.AF_INET,
+                _socket.SOCK_STREAM,
+                options=[_net.SocketOption(_socket.SOL_SOCKET, _socket.SO_REUSEADDR, 1)],
+            )
+            sock.listen()
+            self._sockets.append(sock)
+
+    def start(self, cancellation_token: _thread.Event | None = None) -> _thread.Thread | None:
+        if self._cancellation_token is not None:
+            return None
+        self.bind()
+        self._cancellation_token = cancellation_token or _thread.Event()
+        thread = _thread.Thread(target=self.listen, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        if self._cancellation_token is not None:
+            self._cancellation_token.set()
+
+    def close(self) -> None:
+        self.stop()
+        for sock in self._sockets:
+            try:
+                sock.close()
+            except Exception:
+                pass
+        self._sockets.clear()
+
+    def listen(self) -> None:
+        self.bind()
+        if self._cancellation_token is None:
+            self._cancellation_token = _thread.Event()
+        token = self._cancellation_token
+        try:
+            while not token.is_set():
+                rlist, _, _ = _select.select(list(self._sockets), [], [], self._select_timeout)
+                for sock in rlist:
+                    try:
+                        conn, peer = sock.accept()
+                    except OSError:
+                        continue
+                    if not self._slots.acquire(blocking=False):
+                        LOGGER.warning(f"Bulk leasequery connection from {peer[0]}:{peer[1]} refused, too many open")
+                        conn.close()
+                        continue
+                    _thread.Thread(target=self._serve, args=(conn, peer), daemon=True).start()
+        finally:
+            self._cancellation_token = None
+
+    def _serve(self, conn: _socket.socket, peer: tuple[str, int]) -> None:
+        try:
+            self.serve_connection(conn)
+        except Exception as e:
+            LOGGER.error(f"Bulk leasequery connection from {peer[0]}:{peer[1]} failed: {e.__class__.__name__} | {e}")
+        finally:
+            self._slots.release()
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def serve_connection(self, conn: _socket.socket) -> None:
+        """Answer framed queries on `conn` until the requester closes it or goes idle."""
+        conn.settimeout(self.idle_timeout)
+        server_id = _net.IPv4(conn.getsockname()[0])
+        token = self._cancellation_token
+        while token is None or not token.is_set():
+            try:
+                payload = read_frame(conn)
+            except _socket.timeout:
+                return
+            if payload is None:
+                return
+            msg = DhcpMessage.decode(payload)
+            self.server.metrics.leasequeries += 1
+            self.send_replies(conn, self.iter_replies(msg, server_id))
+
+    def send_replies(self, conn: _socket.socket, replies: _ty.Iterable[DhcpMessage]) -> int:
+        """Frame and write `replies`, batching small messages into one ``sendall``.
+
+        Raises :class:`socket.timeout` when a batch cannot be written within
+        `send_timeout` seconds.
+        """
+        pending = bytearray()
+        sent = 0
+        previous = conn.gettimeout()
+        conn.settimeout(self.send_timeout)
+        try:
+            for reply in replies:
+                # TCP framing lifts the UDP size limit, so nothing needs overloading.
+                data = reply.encode(_const.UDP_MAX_PACKET_SIZE)
+                pending += _FRAME.pack(len(data))
+                pending += data
+                sent += 1
+                if len(pending) >= self.SEND_BATCH_SIZE:
+                    conn.sendall(pending)
+                    pending.clear()
+            if pending:
+                conn.sendall(pending)
+        finally:
+            conn.settimeout(previous)
+        self.server.metrics.packets_sent += sent
+        return sent
+
+    def iter_replies(self, msg: DhcpMessage, server_id: _net.IPv4) -> _ty.Iterator[DhcpMessage]:
+        """Yield the reply stream for one DHCPBULKLEASEQUERY, ending in DHCPLEASEQUERYDONE."""
+        server = self.server
+        msg_ty = msg.options.get(DhcpOptionCode.DHCP_MESSAGE_TYPE)
+        if msg_ty is not _enum.DhcpMessageType.DHCPBULKLEASEQUERY:
+            yield self._status(msg, server_id, LeaseQueryStatus.MALFORMED_QUERY, "expected DHCPBULKLEASEQUERY")
+            return
+        backend = server.lease_backend
+        if not isinstance(backend, LeaseQueryBackend):
+            yield self._status(msg, server_id, LeaseQueryStatus.NOT_ALLOWED, "lease backend cannot be queried")
+            return
+
+        # One reading for the whole stream, so every reply's times share the base time.
+        base_time = int(server.clock.tick())
+        for client_id, lease in self.iter_matches(msg, backend):
+            reply = server._leasequery_active(msg, server_id, client_id, lease)
+            reply.options[DhcpOptionCode.BASE_TIME] = base_time
+            yield reply
+
+        done = server._leasequery_message(msg, server_id, _enum.DhcpMessageType.DHCPLEASEQUERYDONE)
+        done.options[DhcpOptionCode.BASE_TIME] = base_time
+        yield done
+
+    def iter_matches(self, msg: DhcpMessage, backend: LeaseQueryBackend) -> _ty.Iterator[tuple[str, DhcpLease]]:
+        """Yield the `(client_id, lease)` bindings a bulk query selects."""
+        start = msg.options.get(DhcpOptionCode.QUERY_START_TIME, decode=_type.U32)
+        end = msg.options.get(DhcpOptionCode.QUERY_END_TIME, decode=_type.U32)
+        relay_info = msg.options.get(DhcpOptionCode.RELAY_AGENT_INFORMATION, decode=False)
+        relay_id = relay_suboption(relay_info, RELAY_AGENT_RELAY_ID)
+        remote_id = relay_suboption(relay_info, RELAY_AGENT_REMOTE_ID)
+
+        candidates: _ty.Iterable[tuple[str, DhcpLease]]
+        if DhcpOptionCode.CLIENT_IDENTIFIER in msg.options:
+            client_id = msg.client_id()
+            lease = backend.lookup(client_id)
+            candidates = [(client_id, lease)] if lease is not None else []
+        elif msg.hlen and any(msg.chaddr):
+            found = backend.lookup_chaddr(msg.chaddr)
+            candidates = [found] if found is not None else []
+        else:
+            candidates = backend.iter_leases()
+
+        for client_id, lease in candidates:
+            if relay_id is not None or remote_id is not None:
+                stored = lease.options.get(DhcpOptionCode.RELAY_AGENT_INFORMATION, decode=False)
+                if relay_id is not None and relay_suboption(stored, RELAY_AGENT_RELAY_ID) != relay_id:
+                    continue
+                if remote_id is not None and relay_suboption(stored, RELAY_AGENT_REMOTE_ID) != remote_id:
+                    continue
+            if start is not None or end is not None:
+                touched = backend.last_transaction(client_id)
+                if touched is None:
+                    continue
+                if start is not None and touched < int(start):
+                    continue
+                if end is not None and touched > int(end):
+                    continue
+            yield client_id, lease
+
+    def _status(self, msg: DhcpMessage, server_id: _net.IPv4, code: int, message: str) -> DhcpMessage:
+        reply = self.server._leasequery_message(msg, server_id, _enum.DhcpMessageType.DHCPLEASEQUERYSTATUS)
+        reply.options[DhcpOptionCode.STATUS_CODE] = bytes([code]) + message.encode()
+        return reply
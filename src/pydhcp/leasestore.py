@@ -0,0 +1,556 @@
+from __future__ import annotations
+
+import collections as _collections
+import datetime as _dt
+import heapq as _heapq
+import itertools as _itertools
+import select as _select
+import socket as _socket
+import threading as _thread
+import time as _time
+import typing as _ty
+
+from . import network as _net
+from .lease import DhcpLease, InMemoryLeaseBackend, LeaseQueryBackend, lease_from_json, lease_to_json
+from .lease.threadsafe import ThreadSafeLeaseBackend
+from .log import LOGGER
+from .network import IPv4
+from .options import DhcpOptions
+from .replication import read_message, send_message
+
+DEFAULT_PORT = 6740
+"""Not registered with IANA; any port every node can reach will do."""
+
+
+def _options_to_json(options: _ty.Optional[DhcpOptions]) -> _ty.Dict[str, str]:
+    if not options:
+        return {}
+    return {str(int(code)): option.hex() for code, option in options.items(decoded=False)}
+
+
+def _options_from_json(data: _ty.Mapping[str, str]) -> DhcpOptions:
+    options = DhcpOptions()
+    for code, value in data.items():
+        options[int(code)] = bytearray.fromhex(value)
+    return options
+
+
+def _first(item: tuple[str, DhcpLease]) -> str:
+    return item[0]
+
+
+class LeaseStoreServer:
+    """The lease-store daemon: serves one lease backend to :class:`RemoteLeaseBackend` clients.
+
+    Clients connect over TCP and send length-prefixed JSON frames, each
+    carrying a batch of requests. Every frame gets one reply frame with the
+    results in request order. Frames on one connection are answered in the
+    order they arrive, so a client may send several before reading any
+    replies. Each connection is served by its own thread.
+
+    `backend` must be a :class:`~pydhcp.lease.LeaseQueryBackend` and defaults
+    to an :class:`~pydhcp.lease.InMemoryLeaseBackend`. It is wrapped in a
+    :class:`~pydhcp.lease.threadsafe.ThreadSafeLeaseBackend`, so
+    ``allocate_if_free`` is atomic across all clients. That is what stops
+    two nodes from leasing the same address.
+    """
+
+    def __init__(
+        self,
+        backend: _ty.Optional[LeaseQueryBackend] = None,
+        listen: tuple[str, int] = ("127.0.0.1", DEFAULT_PORT),
+        select_timeout: float = 1.0,
+    ) -> None:
+        if backend is None:
+            backend = InMemoryLeaseBackend()
+        if not isinstance(backend, ThreadSafeLeaseBackend):
+            backend = ThreadSafeLeaseBackend(backend)
+        self.backend = backend
+        self._listen = listen
+        self._select_timeout = select_timeout
+        self.requests = 0
+        self._socket: _ty.Optional[_socket.socket] = None
+        self._conns: set[_socket.socket] = set()
+        self._cancellation_token: _thread.Event | None = None
+
+    @property
+    def address(self) -> _net.SocketAddress:
+        """The bound address; call :meth:`bind` first."""
+        return _net.SocketAddress(_ty.cast(_socket.socket, self._socket))
+
+    def bind(self) -> None:
+        if self._socket is not None:
+            return
+        sock = _socket.socket(_socket.AF_INET, _socket.SOCK_STREAM)
+        sock.setsockopt(_socket.SOL_SOCKET, _socket.SO_REUSEADDR, 1)
+        sock.bind(self._listen)
+        sock.listen(64)
+        self._socket = sock
+        LOGGER.info(f"Lease store listening on: tcp/{self._listen[0]}:{sock.getsockname()[1]}")
+
+    def start(self, cancellation_token: _thread.Event | None = None) -> _thread.Thread | None:
+        if self._cancellation_token is not None:
+            return None
+        self.bind()
+        self._cancellation_token = cancellation_token or _thread.Event()
+        thread = _thread.Thread(target=self.listen, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        if self._cancellation_token is not None:
+            self._cancellation_token.set()
+
+    def close(self) -> None:
+        self.stop()
+        for conn in list(self._conns):
+            try:
+                conn.shutdown(_socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except Exception:
+                pass
+            self._socket = None
+
+    def listen(self) -> None:
+        self.bind()
+        if self._cancellation_token is None:
+            self._cancellation_token = _thread.Event()
+        token = self._cancellation_token
+        sock = _ty.cast(_socket.socket, self._socket)
+        try:
+            while not token.is_set():
+                try:
+                    readable, _, _ = _select.select([sock], [], [], self._select_timeout)
+                    if not readable:
+                        continue
+                    conn, peer = sock.accept()
+                except (OSError, ValueError):
+                    if token.is_set():
+                        break  # closed under us by close()
+                    raise
+                _thread.Thread(target=self._serve, args=(conn, peer), daemon=True).start()
+        finally:
+            self._cancellation_token = None
+
+    def _serve(self, conn: _socket.socket, peer: tuple[str, int]) -> None:
+        self._conns.add(conn)
+        with conn:
+            try:
+                conn.setsockopt(_socket.IPPROTO_TCP, _socket.TCP_NODELAY, 1)
+                self.serve_connection(conn)
+            except (OSError, ConnectionError, ValueError) as e:
+                token = self._cancellation_token
+                if token is not None and not token.is_set():
+                    LOGGER.warning(f"Lease store client {peer[0]}:{peer[1]} failed: {e.__class__.__name__} | {e}")
+            finally:
+                self._conns.discard(conn)
+
+    def serve_connection(self, conn: _socket.socket) -> None:
+        while True:
+            message = read_message(conn)
+            if message is None:
+                return
+            results = [self.handle(request) for request in message.get("requests", ())]
+            send_message(conn, {"id": message.get("id"), "results": results})
+
+    def handle(self, request: _ty.Mapping[str, _ty.Any]) -> _ty.Dict[str, _ty.Any]:
+        """Apply one request to the backend and return its JSON result."""
+        self.requests += 1
+        op = request.get("op")
+        backend = self.backend
+        try:
+            if op in ("allocate", "allocate_if_free"):
+                allocate = backend.allocate if op == "allocate" else backend.allocate_if_free
+                chaddr = bytes.fromhex(request["chaddr"]) if request.get("chaddr") else None
+                lease = allocate(
+                    request["id"],
+                    IPv4(request["ip"]),
+                    request["ttl"],
+                    _options_from_json(request.get("options", {})),
+                    chaddr=chaddr,
+                )
+                return self._lease_result(request["id"], lease)
+            if op == "lookup":
+                return self._lease_result(request["id"], backend.lookup(request["id"]))
+            if op == "renew":
+                return self._lease_result(request["id"], backend.renew(request["id"], request["ttl"]))
+            if op == "release":
+                return {"released": backend.release(request["id"])}
+            if op in ("lookup_ip", "lookup_chaddr"):
+                found = (
+                    backend.lookup_ip(IPv4(request["ip"]))
+                    if op == "lookup_ip"
+                    else backend.lookup_chaddr(bytes.fromhex(request["chaddr"]))
+                )
+                if found is None:
+                    return {"lease": None}
+                return {"client_id": found[0], **self._lease_result(found[0], found[1])}
+            if op == "leases":
+                # A page of up to `limit` leases with client ids after `after`, in
+                # client id order, so a client can resume where it left off.
+                after = request.get("after", "")
+                page = (item for item in backend.iter_leases() if item[0] > after)
+                limit = request.get("limit")
+                leases = _heapq.nsmallest(limit, page, key=_first) if limit is not None else sorted(page, key=_first)
+                return {"leases": {client_id: self._lease_result(client_id, lease)["lease"] for client_id, lease in leases}}
+        except (KeyError, TypeError, ValueError) as e:
+            return {"error": f"{e.__class__.__name__}: {e}"}
+        return {"error": f"Unknown operation {op!r}"}
+
+    def _lease_result(self, client_id: str, lease: _ty.Optional[DhcpLease]) -> _ty.Dict[str, _ty.Any]:
+        if lease is None:
+            return {"lease": None}
+        return {"lease": lease_to_json(lease, self.backend.chaddr(client_id), self.backend.last_transaction(client_id))}
+
+
+class _Unavailable(Exception):
+    """The store could not be reached or the circuit is open."""
+
+
+class RemoteLeaseBackend:
+    """A :class:`~pydhcp.lease.LeaseQueryBackend` kept by a :class:`LeaseStoreServer`.
+
+    Several DHCP servers pointed at one lease store share their leases.
+    Requests go out over up to `pool_size` persistent TCP connections, each
+    used by one call at a time. :meth:`lookup_many` and :meth:`renew_many`
+    send many requests in one round trip: requests are packed `batch_size`
+    to a frame and all frames are written before any reply is read.
+
+    Every connect and reply must complete within `timeout` seconds. After
+    `failure_threshold` consecutive failures the circuit opens and calls
+    stop reaching the network. After `reset_timeout` seconds one trial call
+    is let through, and a success closes the circuit again. While the store
+    is unreachable, lookups are answered from the last `cache_size` leases
+    this client saw, renewals return the known lease unchanged, and
+    allocations and releases fail (None and False), since nothing can be
+    committed. :attr:`fallbacks` counts the calls answered this way.
+
+    A request the store answers with an error is logged and answered like
+    a missing lease (None, or False for a release); it does not count as a
+    failure. :meth:`iter_leases` fetches `page_size` leases per round trip.
+    """
+
+    def __init__(
+        self,
+        address: tuple[str, int] = ("127.0.0.1", DEFAULT_PORT),
+        pool_size: int = 4,
+        batch_size: int = 64,
+        timeout: float = 1.0,
+        failure_threshold: int = 3,
+        reset_timeout: float = 5.0,
+        cache_size: int = 4096,
+        page_size: int = 1024,
+    ) -> None:
+        self.address = address
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.cache_size = cache_size
+        self.page_size = page_size
+        self.failures = 0
+        """Consecutive failed calls; reset by a success."""
+        self.fallbacks = 0
+        self._open_until: _ty.Optional[float] = None
+        self._breaker = _thread.Lock()
+        """Guards `failures` and `_open_until`, which every pooled connection's caller updates."""
+        self._pool = _thread.Condition()
+        self._idle: list[_socket.socket] = []
+        self._connections = 0
+        self._frame_ids = _itertools.count(1)
+        self._known: _collections.OrderedDict[str, tuple[DhcpLease, _ty.Optional[bytes], _ty.Optional[float]]] = (
+            _collections.OrderedDict()
+        )
+        self._known_lock = _thread.Lock()
+
+    @property
+    def state(self) -> str:
+        """``"closed"`` while calls reach the store, ``"open"`` while they do not, ``"half-open"`` when one may try."""
+        if self._open_until is None:
+            return "closed"
+        return "open" if _time.monotonic() < self._open_until else "half-open"
+
+    def close(self) -> None:
+        """Close the idle pooled connections."""
+        with self._pool:
+            idle, self._idle = self._idle, []
+            self._connections -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def _checkout(self) -> _socket.socket:
+        with self._pool:
+            while not self._idle and self._connections >= self.pool_size:
+                if not self._pool.wait(self.timeout):
+                    raise TimeoutError(f"No pooled connection became free within {self.timeout}s")
+            if self._idle:
+                return self._idle.pop()
+            self._connections += 1
+        try:
+            conn = _socket.create_connection(self.address, timeout=self.timeout)
+            conn.setsockopt(_socket.IPPROTO_TCP, _socket.TCP_NODELAY, 1)
+        except OSError:
+            self._checkin(None)
+            raise
+        return conn
+
+    def _checkin(self, conn: _ty.Optional[_socket.socket]) -> None:
+        with self._pool:
+            if conn is not None:
+                self._idle.append(conn)
+            else:
+                self._connections -= 1
+            self._pool.notify()
+
+    def _execute(
+        self, requests: _ty.Sequence[_ty.Mapping[str, _ty.Any]]
+    ) -> list[_ty.Optional[_ty.Dict[str, _ty.Any]]]:
+        """Send `requests` pipelined in batches and return their results, or raise `_Unavailable`.
+
+        A request the store refused has None for its result.
+        """
+        with self._breaker:
+            if self._open_until is not None:
+                now = _time.monotonic()
+                if now < self._open_until:
+                    raise _Unavailable("circuit open")
+                # Half-open: this call is the trial, the others keep failing fast meanwhile.
+                self._open_until = now + self.reset_timeout
+        try:
+            conn = self._checkout()
+        except OSError as e:
+            self._failed(e)
+            raise _Unavailable(str(e)) from e
+        try:
+            frames = []
+            for start in range(0, len(requests), self.batch_size):
+                frame_id = next(self._frame_ids)
+                frames.append(frame_id)
+                send_message(conn, {"id": frame_id, "requests": list(requests[start : start + self.batch_size])})
+            results: list[_ty.Dict[str, _ty.Any]] = []
+            for frame_id in frames:
+                reply = read_message(conn)
+                if reply is None:
+                    raise ConnectionError("Lease store closed the connection")
+                if reply.get("id") != frame_id:
+                    raise ValueError(f"Reply {reply.get('id')} does not answer frame {frame_id}")
+                results.extend(reply["results"])
+        except (OSError, ValueError, KeyError) as e:
+            conn.close()
+            self._checkin(None)
+            self._failed(e)
+            raise _Unavailable(str(e)) from e
+        self._checkin(conn)
+        with self._breaker:
+            self.failures = 0
+            self._open_until = None
+        checked: list[_ty.Optional[_ty.Dict[str, _ty.Any]]] = []
+        for request, result in zip(requests, results):
+            if "error" in result:
+                LOGGER.warning(f"Lease store refused {request.get('op')} for {request.get('id')}: {result['error']}")
+                checked.append(None)
+            else:
+                checked.append(result)
+        return checked
+
+    def _failed(self, error: Exception) -> None:
+        with self._breaker:
+            self.failures += 1
+            if self.failures < self.failure_threshold:
+                return
+            if self._open_until is None:
+                LOGGER.warning(
+                    f"Lease store {self.address[0]}:{self.address[1]} unreachable, answering from cache: "
+                    f"{error.__class__.__name__} | {error}"
+                )
+            self._open_until = _time.monotonic() + self.reset_timeout
+
+    def _call(self, request: _ty.Mapping[str, _ty.Any]) -> _ty.Optional[_ty.Dict[str, _ty.Any]]:
+        return self._execute([request])[0]
+
+    def _remember(
+        self, client_id: str, result: _ty.Optional[_ty.Mapping[str, _ty.Any]]
+    ) -> _ty.Optional[DhcpLease]:
+        if result is None:
+            return None
+        record = result.get("lease")
+        with self._known_lock:
+            if record is None:
+                self._known.pop(client_id, None)
+                return None
+            known = lease_from_json(record)
+            self._known[client_id] = known
+            self._known.move_to_end(client_id)
+            if len(self._known) > self.cache_size:
+                self._known.popitem(last=False)
+        return known[0]
+
+    def _cached(self, client_id: str) -> _ty.Optional[tuple[DhcpLease, _ty.Optional[bytes], _ty.Optional[float]]]:
+        """The last lease seen for `client_id`, with its chaddr and cltt, unless it has expired."""
+        with self._known_lock:
+            known = self._known.get(client_id)
+        if known is None:
+            return None
+        expires = known[0].expires
+        if isinstance(expires, _dt.datetime) and expires < _dt.datetime.now():
+            return None
+        return known
+
+    def _allocate(
+        self,
+        op: str,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions],
+        chaddr: _ty.Optional[bytes],
+    ) -> _ty.Optional[DhcpLease]:
+        request = {
+            "op": op,
+            "id": client_id,
+            "ip": str(ip),
+            "ttl": ttl,
+            "options": _options_to_json(options),
+            "chaddr": chaddr.hex() if chaddr else None,
+        }
+        try:
+            return self._remember(client_id, self._call(request))
+        except _Unavailable:
+            self.fallbacks += 1
+            return None
+
+    def allocate(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+        chaddr: _ty.Optional[bytes] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        return self._allocate("allocate", client_id, ip, ttl, options, chaddr)
+
+    def allocate_if_free(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+        chaddr: _ty.Optional[bytes] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        """Bind `ip` to `client_id` unless another client holds it, atomically on the store."""
+        return self._allocate("allocate_if_free", client_id, ip, ttl, options, chaddr)
+
+    def lookup(self, client_id: str) -> _ty.Optional[DhcpLease]:
+        try:
+            return self._remember(client_id, self._call({"op": "lookup", "id": client_id}))
+        except _Unavailable:
+            self.fallbacks += 1
+            known = self._cached(client_id)
+            return known[0] if known else None
+
+    def lookup_many(self, client_ids: _ty.Sequence[str]) -> list[_ty.Optional[DhcpLease]]:
+        """Look several clients up in one round trip."""
+        try:
+            results = self._execute([{"op": "lookup", "id": client_id} for client_id in client_ids])
+        except _Unavailable:
+            self.fallbacks += 1
+            return [known[0] if known else None for known in map(self._cached, client_ids)]
+        return [self._remember(client_id, result) for client_id, result in zip(client_ids, results)]
+
+    def release(self, client_id: str) -> bool:
+        try:
+            result = self._call({"op": "release", "id": client_id})
+        except _Unavailable:
+            self.fallbacks += 1
+            return False
+        with self._known_lock:
+            self._known.pop(client_id, None)
+        return result is not None and bool(result["released"])
+
+    def renew(self, client_id: str, ttl: int) -> _ty.Optional[DhcpLease]:
+        try:
+            return self._remember(client_id, self._call({"op": "renew", "id": client_id, "ttl": ttl}))
+        except _Unavailable:
+            self.fallbacks += 1
+            known = self._cached(client_id)
+            return known[0] if known else None
+
+    def renew_many(self, client_ids: _ty.Sequence[str], ttl: int) -> list[_ty.Optional[DhcpLease]]:
+        """Renew several clients in one round trip."""
+        try:
+            results = self._execute([{"op": "renew", "id": client_id, "ttl": ttl} for client_id in client_ids])
+        except _Unavailable:
+            self.fallbacks += 1
+            return [known[0] if known else None for known in map(self._cached, client_ids)]
+        return [self._remember(client_id, result) for client_id, result in zip(client_ids, results)]
+
+    def _found(
+        self,
+        request: _ty.Mapping[str, _ty.Any],
+        match: _ty.Callable[[DhcpLease, _ty.Optional[bytes]], bool],
+    ) -> _ty.Optional[tuple[str, DhcpLease]]:
+        try:
+            result = self._call(request)
+        except _Unavailable:
+            self.fallbacks += 1
+            with self._known_lock:
+                known = list(self._known.items())
+            for client_id, (lease, chaddr, _) in known:
+                if match(lease, chaddr) and self._cached(client_id) is not None:
+                    return client_id, lease
+            return None
+        if result is None or result["lease"] is None:
+            return None
+        found = self._remember(result["client_id"], result)
+        return (result["client_id"], found) if found is not None else None
+
+    def lookup_ip(self, ip: IPv4) -> _ty.Optional[tuple[str, DhcpLease]]:
+        return self._found({"op": "lookup_ip", "ip": str(ip)}, lambda lease, _: lease.ip == ip)
+
+    def lookup_chaddr(self, chaddr: bytes) -> _ty.Optional[tuple[str, DhcpLease]]:
+        return self._found({"op": "lookup_chaddr", "chaddr": chaddr.hex()}, lambda _, known: known == chaddr)
+
+    def _details(self, client_id: str) -> _ty.Optional[tuple[DhcpLease, _ty.Optional[bytes], _ty.Optional[float]]]:
+        try:
+            self._remember(client_id, self._call({"op": "lookup", "id": client_id}))
+        except _Unavailable:
+            self.fallbacks += 1
+            return self._cached(client_id)
+        with self._known_lock:
+            return self._known.get(client_id)
+
+    def chaddr(self, client_id: str) -> _ty.Optional[bytes]:
+        known = self._details(client_id)
+        return known[1] if known else None
+
+    def last_transaction(self, client_id: str) -> _ty.Optional[float]:
+        known = self._details(client_id)
+        return known[2] if known else None
+
+    def iter_leases(self) -> _ty.Iterator[tuple[str, DhcpLease]]:
+        # Pages restart from the last client id, like SqliteLeaseBackend's, so
+        # neither side holds the whole table at once.
+        last = ""
+        while True:
+            try:
+                result = self._call({"op": "leases", "after": last, "limit": self.page_size})
+            except _Unavailable:
+                self.fallbacks += 1
+                with self._known_lock:
+                    known = sorted(item for item in self._known.items() if item[0] > last)
+                for client_id, (lease, _, _) in known:
+                    if self._cached(client_id):
+                        yield client_id, lease
+                return
+            if result is None:
+                return
+            for client_id, record in result["leases"].items():
+                yield client_id, lease_from_json(record)[0]
+            if len(result["leases"]) < self.page_size:
+                return
+            last = client_id
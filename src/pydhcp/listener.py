@@ -254,6 +254,14 @@ class DhcpListener:
     def handle(self, msg: DhcpMessage, context: RequestContext) -> None:
         pass
 
+    def tick(self) -> None:
+        """Periodic housekeeping, run by the receive loop at least every ``select_timeout`` seconds."""
+        pass
+
+    def shutdown(self) -> None:
+        """Final housekeeping, run once the receive loop has stopped."""
+        pass
+
     def bind(self) -> None:
         active = {_net.SocketAddress(socket): socket for socket in self._sockets}
         _listen = []
@@ -338,6 +346,10 @@ class DhcpListener:
                 )
                 if self._cancelleation_token.is_set():
                     break
+                try:
+                    self.tick()
+                except Exception as e:
+                    LOGGER.error(f"Encounter error in periodic tick: {e.__class__.__name__} | {e}")
                 for socket in rlist:
                     try:
                         if self._pktinfo and hasattr(socket, "recvmsg"):
@@ -397,6 +409,10 @@ class DhcpListener:
             self._cancelleation_token.set()
         finally:
             self._cancelleation_token = None
+            try:
+                self.shutdown()
+            except Exception as e:
+                LOGGER.error(f"Encounter error in shutdown: {e.__class__.__name__} | {e}")
 
 
 # Key by default is (subnet, mac) unless client identifier option set
@@ -439,6 +455,7 @@ class _DhcpDatagramProtocol(_asyncio.DatagramProtocol):
 
 class AsyncDhcpListener:
     DEFAULT_PORTS: _ty.Sequence[int] = tuple(p.value for p in _enum.DhcpPort)
+    TICK_INTERVAL = 1.0
 
     def __init__(
         self,
@@ -454,11 +471,28 @@ class AsyncDhcpListener:
         self._per_interface = per_interface
         self._sockets: list[_socket.socket] = []
         self._transports: list[_asyncio.DatagramTransport] = []
+        self._tick_task: _ty.Optional[_asyncio.Task[None]] = None
         self.metrics = DhcpMetrics()
 
     def handle(self, msg: DhcpMessage, context: RequestContext) -> None:
         pass
 
+    def tick(self) -> None:
+        """Periodic housekeeping, run every ``TICK_INTERVAL`` seconds while started."""
+        pass
+
+    def shutdown(self) -> None:
+        """Final housekeeping, run by :meth:`stop`."""
+        pass
+
+    async def _tick_loop(self) -> None:
+        while True:
+            await _asyncio.sleep(self.TICK_INTERVAL)
+            try:
+                self.tick()
+            except Exception as e:
+                LOGGER.error(f"Encounter error in periodic tick: {e.__class__.__name__} | {e}")
+
     def bind(self) -> None:
         active = {_net.SocketAddress(socket): socket for socket in self._sockets}
         _listen = []
@@ -494,8 +528,13 @@ class AsyncDhcpListener:
                 sock=sock
             )
             self._transports.append(transport)
+        if self._tick_task is None:
+            self._tick_task = loop.create_task(self._tick_loop())
 
     async def stop(self) -> None:
+        if self._tick_task is not None:
+            self._tick_task.cancel()
+            self._tick_task = None
         for transport in self._transports:
             transport.close()
         self._transports.clear()
@@ -505,4 +544,5 @@ class AsyncDhcpListener:
             except Exception:
                 pass
         self._sockets.clear()
+        self.shutdown()
 
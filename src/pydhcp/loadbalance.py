@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import typing as _ty
+
+from .options import DhcpOptionCode
+from .packet import enums as _enum
+from .packet.message import DhcpMessage
+
+BUCKETS = 256
+
+# RFC 3074 Appendix A: the Pearson permutation table.
+_HASH_TABLE = bytes((
+    251, 175, 119, 215, 81, 14, 79, 191, 103, 49, 181, 143, 186, 157, 0, 232,
+    31, 32, 55, 60, 152, 58, 17, 237, 174, 70, 160, 144, 220, 90, 57, 223,
+    59, 3, 18, 140, 111, 166, 203, 196, 134, 243, 124, 95, 222, 179, 197, 65,
+    180, 48, 36, 15, 107, 46, 233, 130, 165, 30, 123, 161, 209, 23, 97, 16,
+    40, 91, 219, 61, 100, 10, 210, 109, 250, 127, 22, 138, 29, 108, 244, 67,
+    207, 9, 178, 204, 74, 98, 126, 249, 167, 116, 34, 77, 193, 200, 121, 5,
+    20, 113, 71, 35, 128, 13, 182, 94, 25, 226, 227, 199, 75, 27, 41, 245,
+    230, 224, 43, 225, 177, 26, 155, 150, 212, 142, 218, 115, 241, 73, 88, 105,
+    39, 114, 62, 255, 192, 201, 145, 214, 168, 158, 221, 148, 154, 122, 12, 84,
+    82, 163, 44, 139, 228, 236, 205, 242, 217, 11, 187, 146, 159, 64, 86, 239,
+    195, 42, 106, 198, 118, 112, 184, 172, 87, 2, 173, 117, 176, 229, 247, 253,
+    137, 185, 99, 164, 102, 147, 45, 66, 231, 52, 141, 211, 194, 206, 246, 238,
+    56, 110, 78, 248, 63, 240, 189, 93, 92, 51, 53, 183, 19, 171, 72, 50,
+    33, 104, 101, 69, 8, 252, 83, 120, 76, 135, 85, 54, 202, 125, 188, 213,
+    96, 235, 136, 208, 162, 129, 190, 132, 156, 38, 47, 1, 7, 254, 24, 4,
+    216, 131, 89, 21, 28, 133, 37, 153, 149, 80, 170, 68, 6, 169, 234, 151,
+))
+
+_DISCOVER = int(_enum.DhcpMessageType.DHCPDISCOVER)
+_REQUEST = int(_enum.DhcpMessageType.DHCPREQUEST)
+
+
+def load_hash(key: _ty.Union[bytes, bytearray, memoryview]) -> int:
+    """The RFC 3074 section 6 Pearson hash of `key`, a bucket number in ``range(256)``."""
+    table = _HASH_TABLE
+    value = len(key) & 0xFF
+    for byte in reversed(key):
+        value = table[value ^ byte]
+    return value
+
+
+def hash_key(msg: DhcpMessage) -> bytes:
+    """The bytes RFC 3074 hashes: the client identifier's contents, else the hardware address."""
+    client_id = msg.options._options.get(DhcpOptionCode.CLIENT_IDENTIFIER)
+    if client_id:
+        return bytes(client_id)
+    return bytes(msg.chaddr[: msg.hlen])
+
+
+def parse_buckets(spec: _ty.Any) -> frozenset[int]:
+    """Parse ``"0-127,200"``, a list of bucket numbers and ``"a-b"`` ranges, or a single number."""
+    if isinstance(spec, int):
+        spec = [spec]
+    elif isinstance(spec, str):
+        spec = [part for part in spec.replace(" ", "").split(",") if part]
+    buckets: set[int] = set()
+    for part in spec:
+        if isinstance(part, str) and "-" in part:
+            first, _, last = part.partition("-")
+            buckets.update(range(int(first), int(last) + 1))
+        else:
+            buckets.add(int(part))
+    if any(not 0 <= bucket < BUCKETS for bucket in buckets):
+        raise ValueError(f"Hash buckets must be in 0-{BUCKETS - 1}: {spec!r}")
+    return frozenset(buckets)
+
+
+class LoadBalancer:
+    """RFC 3074 hash bucket assignment for a group of peer servers.
+
+    Each server serves the clients whose :func:`load_hash` falls in its own
+    buckets. Marking a peer down adds that peer's buckets to ours, so the
+    surviving servers pick up its clients without any shared state; marking
+    it up hands them back. With `secs_threshold` set, a client that has been
+    trying for that many seconds is served whatever its bucket (RFC 3074
+    section 5).
+
+    Only DHCPDISCOVER and DHCPREQUEST without a server identifier are
+    balanced. A DHCPREQUEST naming a server already goes to that server,
+    and other message types concern leases a server has already handed out.
+    """
+
+    def __init__(
+        self,
+        buckets: _ty.Iterable[int],
+        peers: _ty.Optional[_ty.Mapping[str, _ty.Iterable[int]]] = None,
+        secs_threshold: _ty.Optional[int] = None,
+    ) -> None:
+        self.buckets = frozenset(buckets)
+        self.peers = {name: frozenset(peer_buckets) for name, peer_buckets in (peers or {}).items()}
+        self.secs_threshold = secs_threshold
+        self.down: set[str] = set()
+        self._serving = bytearray(BUCKETS)
+        self._rebuild()
+
+    @classmethod
+    def split(cls, index: int, count: int, secs_threshold: _ty.Optional[int] = None) -> "LoadBalancer":
+        """Server `index` of `count` equal peers, splitting the buckets into contiguous ranges.
+
+        Peers are named by their index, as strings, for :meth:`mark_down`.
+        """
+        if not 0 <= index < count:
+            raise ValueError(f"Server index {index} out of range for {count} servers")
+        ranges = {str(i): range(i * BUCKETS // count, (i + 1) * BUCKETS // count) for i in range(count)}
+        own = ranges.pop(str(index))
+        return cls(own, ranges, secs_threshold)
+
+    @classmethod
+    def from_config(cls, config: _ty.Mapping[str, _ty.Any]) -> "LoadBalancer":
+        """Build from the ``load_balance`` config section.
+
+        Either ``{"peers": {name: buckets, ...}, "self": name}`` or
+        ``{"index": i, "count": n}``; both accept ``secs_threshold`` and a
+        ``down`` list of peers to start with marked down.
+        """
+        secs_threshold = config.get("secs_threshold")
+        if "peers" in config:
+            peers = {str(name): parse_buckets(spec) for name, spec in config["peers"].items()}
+            own = peers.pop(str(config["self"]))
+            balancer = cls(own, peers, secs_threshold)
+        else:
+            balancer = cls.split(int(config["index"]), int(config["count"]), secs_threshold)
+        for name in config.get("down", ()):
+            balancer.mark_down(str(name))
+        overlap = [name for name, peer_buckets in balancer.peers.items() if peer_buckets & balancer.buckets]
+        if overlap:
+            raise ValueError(f"Buckets shared with peers: {', '.join(overlap)}")
+        return balancer
+
+    def _rebuild(self) -> None:
+        serving = bytearray(BUCKETS)
+        for bucket in self.buckets:
+            serving[bucket] = 1
+        for name in self.down:
+            for bucket in self.peers.get(name, ()):
+                serving[bucket] = 1
+        self._serving = serving
+
+    def mark_down(self, peer: str) -> None:
+        if peer not in self.peers:
+            raise KeyError(f"Unknown peer {peer!r}")
+        self.down.add(peer)
+        self._rebuild()
+
+    def mark_up(self, peer: str) -> None:
+        self.down.discard(peer)
+        self._rebuild()
+
+    def serves_bucket(self, bucket: int) -> bool:
+        return bool(self._serving[bucket])
+
+    def accepts(self, msg: DhcpMessage) -> bool:
+        """Return False when `msg` belongs to another server's buckets."""
+        raw = msg.options._options
+        msg_ty = raw.get(DhcpOptionCode.DHCP_MESSAGE_TYPE)
+        if not msg_ty:
+            return True
+        if msg_ty[0] != _DISCOVER and (msg_ty[0] != _REQUEST or DhcpOptionCode.SERVER_IDENTIFIER in raw):
+            return True
+        if self._serving[load_hash(hash_key(msg))]:
+            return True
+        return self.secs_threshold is not None and msg.secs.total_seconds() >= self.secs_threshold
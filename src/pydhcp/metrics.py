@@ -9,6 +9,17 @@ class DhcpMetrics:
         self.leases_renewed = 0
         self.leases_released = 0
         self.packets_dropped_hop_limit = 0
+        self.offers_held = 0
+        self.offers_expired = 0
+        self.leasequeries = 0
+        self.packets_dropped_load_balance = 0
+        self.declines = 0
+        self.quarantined = 0
+        self.quarantine_expired = 0
+        self.leases_reclaimed = 0
+        self.lease_cache_hits = 0
+        self.lease_cache_misses = 0
+        self.class_hits: _ty.Dict[str, int] = {}
 
     def reset(self) -> None:
         self.packets_received = 0
@@ -17,13 +28,44 @@ class DhcpMetrics:
         self.leases_renewed = 0
         self.leases_released = 0
         self.packets_dropped_hop_limit = 0
+        self.offers_held = 0
+        self.offers_expired = 0
+        self.leasequeries = 0
+        self.packets_dropped_load_balance = 0
+        self.declines = 0
+        self.quarantined = 0
+        self.quarantine_expired = 0
+        self.leases_reclaimed = 0
+        self.lease_cache_hits = 0
+        self.lease_cache_misses = 0
+        self.class_hits = {}
 
-    def snapshot(self) -> _ty.Dict[str, int]:
-        return {
+    @property
+    def lease_cache_hit_ratio(self) -> float:
+        """Share of lease lookups a :class:`~pydhcp.lease.cached.CachedLeaseBackend` answered itself."""
+        lookups = self.lease_cache_hits + self.lease_cache_misses
+        return self.lease_cache_hits / lookups if lookups else 0.0
+
+    def snapshot(self) -> _ty.Dict[str, float]:
+        snapshot: _ty.Dict[str, float] = {
             "packets_received": self.packets_received,
             "packets_sent": self.packets_sent,
             "leases_allocated": self.leases_allocated,
             "leases_renewed": self.leases_renewed,
             "leases_released": self.leases_released,
             "packets_dropped_hop_limit": self.packets_dropped_hop_limit,
+            "offers_held": self.offers_held,
+            "offers_expired": self.offers_expired,
+            "leasequeries": self.leasequeries,
+            "packets_dropped_load_balance": self.packets_dropped_load_balance,
+            "declines": self.declines,
+            "quarantined": self.quarantined,
+            "quarantine_expired": self.quarantine_expired,
+            "leases_reclaimed": self.leases_reclaimed,
+            "lease_cache_hits": self.lease_cache_hits,
+            "lease_cache_misses": self.lease_cache_misses,
+            "lease_cache_hit_ratio": self.lease_cache_hit_ratio,
         }
+        for name, hits in self.class_hits.items():
+            snapshot[f"class_hits.{name}"] = hits
+        return snapshot
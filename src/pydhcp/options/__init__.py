@@ -187,6 +187,12 @@ class DhcpOptions(_ty.MutableMapping[int, bytearray]):
                 __value = bytearray(__value)
             self._options[__key] = __value
 
+    def copy(self) -> "DhcpOptions":
+        """Return an independent copy; the raw value buffers are copied too."""
+        options = self.__class__(self._codemap)
+        options._options = _ty.OrderedDict((code, bytearray(value)) for code, value in self._options.items())
+        return options
+
     def __delitem__(self, __key: int) -> None:
         return self._options.__delitem__(__key)
 
@@ -0,0 +1,422 @@
+from __future__ import annotations
+
+import collections as _collections
+import datetime as _dt
+import itertools as _itertools
+import json as _json
+import select as _select
+import socket as _socket
+import struct as _struct
+import threading as _thread
+import typing as _ty
+import uuid as _uuid
+from math import inf as _inf
+
+from . import network as _net
+from .clock import SYSTEM_CLOCK, TimeSource
+from .lease import DhcpLease, LeaseBackend, LeaseQueryBackend, lease_from_json, lease_to_json
+from .leasequery import _recv_exact
+from .log import LOGGER
+from .network import IPv4
+from .options import DhcpOptions
+
+_HEADER = _struct.Struct("!I")
+
+DEFAULT_PORT = 647
+"""The port ISC failover uses; the protocol here is pydhcp's own."""
+
+_UNPUBLISHED = frozenset({"allocate_if_free", "shard"})
+"""Backend methods that change bindings behind :meth:`ReplicatedLeaseBackend._publish`, so are not passed through."""
+
+
+def send_message(sock: _socket.socket, message: _ty.Mapping[str, _ty.Any]) -> None:
+    data = _json.dumps(message, separators=(",", ":")).encode()
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def read_message(sock: _socket.socket) -> _ty.Optional[_ty.Dict[str, _ty.Any]]:
+    """Read one length-prefixed JSON message; None on a clean close."""
+    header = _recv_exact(sock, _HEADER.size)
+    if not header:
+        return None
+    if len(header) != _HEADER.size:
+        raise ConnectionError("Connection closed inside a message header")
+    (size,) = _HEADER.unpack(header)
+    payload = _recv_exact(sock, size)
+    if len(payload) != size:
+        raise ConnectionError(f"Connection closed after {len(payload)} of {size} message bytes")
+    message = _json.loads(payload)
+    if not isinstance(message, dict):
+        raise ValueError(f"Expected a JSON object, got {type(message).__name__}")
+    return message
+
+
+class ReplicatedLeaseBackend:
+    """A :class:`~pydhcp.lease.LeaseBackend` that streams its changes to a standby.
+
+    Every allocate, renew and release is applied to the wrapped backend first
+    and then queued, with a sequence number, for a background thread that
+    sends it to a :class:`ReplicationStandby` in batches. At most `window`
+    updates are in flight unacknowledged; past that the sender waits for the
+    standby, while the server keeps answering from the local backend.
+
+    On (re)connect the standby reports the last sequence number it applied.
+    If the updates after it are still in the in-memory backlog they are
+    replayed; otherwise, or when the primary restarted since, the standby
+    catches up from a full snapshot. The wrapped backend must implement
+    :class:`~pydhcp.lease.LeaseQueryBackend` so snapshots can be taken;
+    its query methods are passed through.
+    """
+
+    def __init__(
+        self,
+        backend: LeaseBackend,
+        peer: tuple[str, int],
+        window: int = 256,
+        batch_size: int = 64,
+        backlog: int = 65536,
+        reconnect_interval: float = 1.0,
+        ack_timeout: float = 10.0,
+    ) -> None:
+        if not isinstance(backend, LeaseQueryBackend):
+            raise TypeError(f"{backend.__class__.__name__} cannot be snapshotted; replication needs a LeaseQueryBackend")
+        self.backend: LeaseQueryBackend = backend
+        self.peer = peer
+        self.window = window
+        self.batch_size = batch_size
+        self.reconnect_interval = reconnect_interval
+        self.ack_timeout = ack_timeout
+        self.epoch = _uuid.uuid4().hex
+        """Identifies this primary's sequence space; a standby that saw another epoch resyncs."""
+        self.seq = 0
+        self.acked = 0
+        self.connected = False
+        self._backlog: _ty.Deque[tuple[int, _ty.Dict[str, _ty.Any]]] = _collections.deque(maxlen=backlog)
+        self._lock = _thread.Condition()
+        self._cancellation_token: _thread.Event | None = None
+
+    def __getattr__(self, name: str) -> _ty.Any:
+        # Query methods (lookup_ip, iter_leases, ...) come straight from the wrapped backend.
+        if name.startswith("_") or name == "backend" or name in _UNPUBLISHED:
+            raise AttributeError(name)
+        return getattr(self.backend, name)
+
+    def allocate_if_free(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+        chaddr: _ty.Optional[bytes] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        """Bind `ip` to `client_id` unless another client holds a live lease on it, publishing the bind."""
+        with self._lock:
+            allocate_if_free: _ty.Optional[_ty.Callable[..., _ty.Optional[DhcpLease]]] = getattr(
+                self.backend, "allocate_if_free", None
+            )
+            if allocate_if_free is not None:
+                lease = allocate_if_free(client_id, ip, ttl, options, chaddr=chaddr)
+            else:
+                holder = self.backend.lookup_ip(ip)
+                if holder is not None and holder[0] != client_id:
+                    return None
+                lease = self.backend.allocate(client_id, ip, ttl, options, chaddr=chaddr)
+            if lease is not None:
+                self._publish_bind(client_id, lease)
+        return lease
+
+    def allocate(
+        self,
+        client_id: str,
+        ip: IPv4,
+        ttl: int,
+        options: _ty.Optional[DhcpOptions] = None,
+        chaddr: _ty.Optional[bytes] = None,
+    ) -> _ty.Optional[DhcpLease]:
+        with self._lock:
+            lease = self.backend.allocate(client_id, ip, ttl, options, chaddr=chaddr)
+            if lease is not None:
+                self._publish_bind(client_id, lease)
+        return lease
+
+    def lookup(self, client_id: str) -> _ty.Optional[DhcpLease]:
+        return self.backend.lookup(client_id)
+
+    def release(self, client_id: str) -> bool:
+        with self._lock:
+            released = self.backend.release(client_id)
+            if released:
+                self._publish({"op": "release", "client_id": client_id})
+        return released
+
+    def renew(self, client_id: str, ttl: int) -> _ty.Optional[DhcpLease]:
+        with self._lock:
+            lease = self.backend.renew(client_id, ttl)
+            if lease is not None:
+                self._publish_bind(client_id, lease)
+        return lease
+
+    def _record(self, client_id: str, lease: DhcpLease) -> _ty.Dict[str, _ty.Any]:
+        return lease_to_json(lease, self.backend.chaddr(client_id), self.backend.last_transaction(client_id))
+
+    def _publish_bind(self, client_id: str, lease: DhcpLease) -> None:
+        self._publish({"op": "bind", "client_id": client_id, "lease": self._record(client_id, lease)})
+
+    def _publish(self, update: _ty.Dict[str, _ty.Any]) -> None:
+        self.seq += 1
+        update["seq"] = self.seq
+        self._backlog.append((self.seq, update))
+        self._lock.notify_all()
+
+    @property
+    def pending(self) -> int:
+        """Updates the standby has not acknowledged yet."""
+        return self.seq - self.acked
+
+    def start(self, cancellation_token: _thread.Event | None = None) -> _thread.Thread | None:
+        if self._cancellation_token is not None:
+            return None
+        self._cancellation_token = cancellation_token or _thread.Event()
+        thread = _thread.Thread(target=self.replicate, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        if self._cancellation_token is not None:
+            self._cancellation_token.set()
+            with self._lock:
+                self._lock.notify_all()
+
+    def replicate(self) -> None:
+        """Keep the standby in sync until stopped, reconnecting as needed."""
+        if self._cancellation_token is None:
+            self._cancellation_token = _thread.Event()
+        token = self._cancellation_token
+        try:
+            while not token.is_set():
+                try:
+                    with _socket.create_connection(self.peer, timeout=self.ack_timeout) as conn:
+                        self.connected = True
+                        LOGGER.info(f"Replicating leases to {self.peer[0]}:{self.peer[1]}")
+                        self.sync(conn, token)
+                except (OSError, ConnectionError, ValueError) as e:
+                    if self.connected:
+                        LOGGER.warning(f"Lease replication to {self.peer[0]}:{self.peer[1]} lost: {e.__class__.__name__} | {e}")
+                finally:
+                    self.connected = False
+                token.wait(self.reconnect_interval)
+        finally:
+            self._cancellation_token = None
+
+    def sync(self, conn: _socket.socket, token: _thread.Event) -> None:
+        """Bring the standby on `conn` up to date, then stream updates until stopped."""
+        hello = read_message(conn)
+        if hello is None or hello.get("type") != "hello":
+            raise ConnectionError("Standby did not greet")
+        next_seq = self._catch_up(conn, hello.get("epoch"), int(hello.get("seq", 0)))
+
+        while not token.is_set():
+            # Collect acknowledgements without blocking, unless the window is full.
+            while True:
+                window_full = next_seq - 1 - self.acked >= self.window
+                readable, _, _ = _select.select([conn], [], [], self.ack_timeout if window_full else 0)
+                if not readable:
+                    if window_full:
+                        raise ConnectionError(f"No acknowledgement for {self.ack_timeout}s")
+                    break
+                self._read_ack(conn)
+
+            with self._lock:
+                batch = self._batch(next_seq)
+                if not batch:
+                    self._lock.wait(0.1)
+                    continue
+            send_message(conn, {"type": "updates", "updates": batch})
+            next_seq = batch[-1]["seq"] + 1
+
+    def _catch_up(self, conn: _socket.socket, epoch: _ty.Optional[str], seq: int) -> int:
+        with self._lock:
+            first = self._backlog[0][0] if self._backlog else self.seq + 1
+            if epoch == self.epoch and first <= seq + 1 <= self.seq + 1:
+                LOGGER.info(f"Standby at seq {seq}, replaying {self.seq - seq} updates")
+                self.acked = seq
+                return seq + 1
+            leases = {client_id: self._record(client_id, lease) for client_id, lease in self.backend.iter_leases()}
+            at = self.seq
+        LOGGER.info(f"Standby at {epoch}:{seq}, sending a snapshot of {len(leases)} leases at seq {at}")
+        send_message(conn, {"type": "snapshot", "epoch": self.epoch, "seq": at, "leases": leases})
+        self._read_ack(conn)
+        return at + 1
+
+    def _batch(self, next_seq: int) -> list[_ty.Dict[str, _ty.Any]]:
+        if not self._backlog or next_seq > self.seq:
+            return []
+        first = self._backlog[0][0]
+        if next_seq < first:
+            # The standby fell further behind than the backlog reaches.
+            raise ConnectionError(f"Backlog overrun at seq {next_seq}, resyncing")
+        room = min(self.batch_size, self.window - (next_seq - 1 - self.acked))
+        start = next_seq - first
+        return [update for _, update in _itertools.islice(self._backlog, start, start + room)]
+
+    def _read_ack(self, conn: _socket.socket) -> None:
+        message = read_message(conn)
+        if message is None:
+            raise ConnectionError("Standby closed the connection")
+        if message.get("type") != "ack":
+            raise ValueError(f"Unexpected {message.get('type')!r} from standby")
+        self.acked = int(message["seq"])
+
+
+class ReplicationStandby:
+    """Receives a :class:`ReplicatedLeaseBackend`'s stream into a local backend.
+
+    The standby applies each update to `backend` through the ordinary
+    :class:`~pydhcp.lease.LeaseBackend` calls, so promoting it is just
+    starting a :class:`~pydhcp.server.DhcpServer` on the same backend. One
+    primary is served at a time. Remaining lease times are worked out
+    against `clock`, by default the backend's own.
+    """
+
+    def __init__(
+        self,
+        backend: LeaseBackend,
+        listen: tuple[str, int] = ("0.0.0.0", DEFAULT_PORT),
+        select_timeout: float = 1.0,
+        clock: _ty.Optional[TimeSource] = None,
+    ) -> None:
+        self.backend = backend
+        self.clock: TimeSource = clock if clock is not None else getattr(backend, "clock", SYSTEM_CLOCK)
+        self._listen = listen
+        self._select_timeout = select_timeout
+        self.epoch: _ty.Optional[str] = None
+        self.seq = 0
+        self.applied = 0
+        self._socket: _ty.Optional[_socket.socket] = None
+        self._conn: _ty.Optional[_socket.socket] = None
+        self._cancellation_token: _thread.Event | None = None
+
+    @property
+    def address(self) -> _net.SocketAddress:
+        """The bound address; call :meth:`bind` first."""
+        return _net.SocketAddress(_ty.cast(_socket.socket, self._socket))
+
+    def bind(self) -> None:
+        if self._socket is not None:
+            return
+        sock = _socket.socket(_socket.AF_INET, _socket.SOCK_STREAM)
+        sock.setsockopt(_socket.SOL_SOCKET, _socket.SO_REUSEADDR, 1)
+        sock.bind(self._listen)
+        sock.listen(1)
+        self._socket = sock
+        LOGGER.info(f"Lease replication standby listening on: tcp/{self._listen[0]}:{sock.getsockname()[1]}")
+
+    def start(self, cancellation_token: _thread.Event | None = None) -> _thread.Thread | None:
+        if self._cancellation_token is not None:
+            return None
+        self.bind()
+        self._cancellation_token = cancellation_token or _thread.Event()
+        thread = _thread.Thread(target=self.listen, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        if self._cancellation_token is not None:
+            self._cancellation_token.set()
+
+    def close(self) -> None:
+        self.stop()
+        conn = self._conn
+        if conn is not None:
+            try:
+                conn.shutdown(_socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except Exception:
+                pass
+            self._socket = None
+
+    def listen(self) -> None:
+        self.bind()
+        if self._cancellation_token is None:
+            self._cancellation_token = _thread.Event()
+        token = self._cancellation_token
+        sock = _ty.cast(_socket.socket, self._socket)
+        try:
+            while not token.is_set():
+                try:
+                    readable, _, _ = _select.select([sock], [], [], self._select_timeout)
+                    if not readable:
+                        continue
+                    conn, peer = sock.accept()
+                except (OSError, ValueError):
+                    if token.is_set():
+                        break  # closed under us by close()
+                    raise
+                self._conn = conn
+                with conn:
+                    try:
+                        self.serve_connection(conn)
+                    except (OSError, ConnectionError, ValueError, KeyError) as e:
+                        if not token.is_set():
+                            LOGGER.warning(f"Lease replication from {peer[0]}:{peer[1]} failed: {e.__class__.__name__} | {e}")
+                    finally:
+                        self._conn = None
+        finally:
+            self._cancellation_token = None
+
+    def serve_connection(self, conn: _socket.socket) -> None:
+        conn.settimeout(None)
+        send_message(conn, {"type": "hello", "epoch": self.epoch, "seq": self.seq})
+        token = self._cancellation_token
+        while token is None or not token.is_set():
+            message = read_message(conn)
+            if message is None:
+                return
+            kind = message.get("type")
+            if kind == "snapshot":
+                self.apply_snapshot(message["epoch"], int(message["seq"]), message["leases"])
+            elif kind == "updates":
+                for update in message["updates"]:
+                    self.apply(update)
+            else:
+                raise ValueError(f"Unexpected {kind!r} from primary")
+            send_message(conn, {"type": "ack", "seq": self.seq})
+
+    def apply(self, update: _ty.Mapping[str, _ty.Any]) -> None:
+        seq = int(update["seq"])
+        if seq <= self.seq:
+            return
+        if seq != self.seq + 1:
+            raise ValueError(f"Update {seq} does not follow {self.seq}")
+        if update["op"] == "bind":
+            self._bind(update["client_id"], update["lease"])
+        elif update["op"] == "release":
+            self.backend.release(update["client_id"])
+        self.seq = seq
+        self.applied += 1
+
+    def apply_snapshot(self, epoch: str, seq: int, leases: _ty.Mapping[str, _ty.Mapping[str, _ty.Any]]) -> None:
+        if isinstance(self.backend, LeaseQueryBackend):
+            for client_id in [client_id for client_id, _ in self.backend.iter_leases() if client_id not in leases]:
+                self.backend.release(client_id)
+        for client_id, record in leases.items():
+            self._bind(client_id, record)
+        self.epoch = epoch
+        self.seq = seq
+
+    def _bind(self, client_id: str, record: _ty.Mapping[str, _ty.Any]) -> None:
+        lease, chaddr, _ = lease_from_json(record)
+        if isinstance(lease.expires, _dt.datetime):
+            ttl: float = max(0, round(lease.expires.timestamp() - self.clock.time()))
+        else:
+            ttl = _inf
+        if lease.ip is None:
+            return
+        if isinstance(self.backend, LeaseQueryBackend):
+            self.backend.allocate(client_id, lease.ip, _ty.cast(int, ttl), lease.options, chaddr=chaddr)
+        else:
+            self.backend.allocate(client_id, lease.ip, _ty.cast(int, ttl), lease.options)
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import collections as _collections
+import ipaddress as _ipaddress
+import typing as _ty
+
+from . import network as _net
+from .options import DhcpOptionCode, DhcpOptions
+
+CompiledOptions = _ty.Mapping[int, bytes]
+"""Option code to pre-encoded value bytes, in the order options are written."""
+
+_EMPTY: CompiledOptions = {}
+
+
+def _option_code(key: _ty.Union[str, int]) -> int:
+    if isinstance(key, int) or (isinstance(key, str) and key.isdigit()):
+        return int(key)
+    try:
+        return int(DhcpOptionCode[key.upper()])
+    except KeyError:
+        raise ValueError(f"Unknown DHCP option {key!r}") from None
+
+
+def compile_options(values: _ty.Optional[_ty.Mapping[_ty.Union[str, int], _ty.Any]]) -> dict[int, bytes]:
+    """Encode a config ``options`` table once, keyed by option name or code.
+
+    Values go through the option's registered type, so ``ROUTER: [10.0.0.1]``
+    and ``DOMAIN_NAME: example.com`` work as written. ``{"hex": "..."}`` gives
+    raw bytes for options without a useful type.
+    """
+    options = DhcpOptions()
+    for key, value in (values or {}).items():
+        code = _option_code(key)
+        if isinstance(value, _ty.Mapping) and "hex" in value:
+            value = bytes.fromhex(str(value["hex"]).replace(":", ""))
+        options[code] = value
+    return {code: bytes(raw) for code, raw in options.items(decoded=False)}
+
+
+def interface_options(network: _ipaddress.IPv4Network, server_id: _net.IPv4) -> dict[int, bytes]:
+    """The options a server hands out on the network of the interface it answers on."""
+    return compile_options({
+        DhcpOptionCode.SUBNET_MASK: network.netmask,
+        DhcpOptionCode.BROADCAST_ADDRESS: network.broadcast_address,
+        DhcpOptionCode.ROUTER: [server_id],
+        DhcpOptionCode.DNS: [server_id],
+    })
+
+
+def to_options(compiled: CompiledOptions) -> DhcpOptions:
+    """Return a fresh :class:`DhcpOptions` holding copies of `compiled`'s bytes."""
+    options = DhcpOptions()
+    options._options = _collections.OrderedDict((code, bytearray(raw)) for code, raw in compiled.items())
+    return options
+
+
+def _merge(*layers: CompiledOptions) -> dict[int, bytes]:
+    merged: dict[int, bytes] = {}
+    for layer in layers:
+        merged.update(layer)
+    return merged
+
+
+def _normalize_id(value: str) -> str:
+    return bytes.fromhex(value.replace(":", "").replace("-", "")).hex(":").upper()
+
+
+class PoolScope(_ty.NamedTuple):
+    first: int
+    last: int
+    options: CompiledOptions
+    """The shared network, subnet and pool layers, already merged."""
+
+    def __contains__(self, ip: object) -> bool:
+        return isinstance(ip, _ipaddress.IPv4Address) and self.first <= int(ip) <= self.last
+
+
+class SubnetScope(_ty.NamedTuple):
+    network: _ipaddress.IPv4Network
+    options: CompiledOptions
+    """The shared network and subnet layers, already merged."""
+    pools: tuple[PoolScope, ...]
+    shared_network: _ty.Optional[str] = None
+
+
+def parse_range(spec: _ty.Any) -> tuple[_net.IPv4, _net.IPv4]:
+    """Parse a pool range given as ``"a.b.c.d-e.f.g.h"``, ``[first, last]`` or ``{"start", "end"}``."""
+    if isinstance(spec, str):
+        first, _, last = spec.partition("-")
+    elif isinstance(spec, _ty.Mapping):
+        first, last = spec["start"], spec["end"]
+    else:
+        first, last = spec
+    start, end = _net.IPv4(str(first).strip()), _net.IPv4(str(last).strip())
+    if int(start) > int(end):
+        raise ValueError(f"Pool range {spec!r} ends before it starts")
+    return start, end
+
+
+class OptionScopes:
+    """Scoped option definitions merged at load time into pre-encoded blobs.
+
+    Scopes layer global → shared network → subnet → pool → class → host, each
+    overriding the options of the ones before it. Every scope's options are
+    encoded once when the config is loaded, and the network layers are merged
+    per pool up front. At request time :meth:`resolve` picks the subnet and
+    pool holding the address, adds the client's class and host layers, and
+    returns the merged mapping from a memo keyed by the scopes involved, so
+    repeat clients cost a few dict lookups and no option encoding at all.
+    """
+
+    def __init__(
+        self,
+        global_options: _ty.Optional[CompiledOptions] = None,
+        subnets: _ty.Sequence[SubnetScope] = (),
+        classes: _ty.Optional[_ty.Mapping[str, CompiledOptions]] = None,
+        hosts: _ty.Optional[_ty.Mapping[str, CompiledOptions]] = None,
+        cache_size: int = 4096,
+    ) -> None:
+        self.global_options: CompiledOptions = dict(global_options or {})
+        # Most specific subnet first, so nested declarations resolve correctly.
+        self.subnets = tuple(sorted(subnets, key=lambda subnet: -subnet.network.prefixlen))
+        self.classes: _ty.Mapping[str, CompiledOptions] = dict(classes or {})
+        self.hosts: _ty.Mapping[str, CompiledOptions] = dict(hosts or {})
+        self.cache_size = cache_size
+        self._cache: _ty.OrderedDict[_ty.Hashable, CompiledOptions] = _collections.OrderedDict()
+
+    @classmethod
+    def from_config(cls, config: _ty.Mapping[str, _ty.Any], cache_size: int = 4096) -> "OptionScopes":
+        """Compile the ``options``, ``shared_networks``, ``subnets``, ``classes`` and ``hosts`` sections.
+
+        ``subnets`` entries (top level or under a shared network) take a
+        ``subnet`` CIDR, ``options`` and ``pools``, each pool a ``range`` plus
+        ``options``. ``classes`` entries use the names the classifier reports.
+        ``hosts`` entries are keyed by ``client_id`` or ``chaddr`` in hex.
+        """
+        subnets: list[SubnetScope] = []
+
+        def add_subnets(entries: _ty.Iterable[_ty.Mapping[str, _ty.Any]], shared: CompiledOptions, name: _ty.Optional[str]) -> None:
+            for entry in entries:
+                network = _ipaddress.IPv4Network(entry["subnet"])
+                subnet_options = _merge(
+                    compile_options({"SUBNET_MASK": network.netmask, "BROADCAST_ADDRESS": network.broadcast_address}),
+                    shared,
+                    compile_options(entry.get("options")),
+                )
+                pools = []
+                for pool in entry.get("pools", ()):
+                    first, last = parse_range(pool["range"])
+                    if first not in network or last not in network:
+                        raise ValueError(f"Pool {pool['range']!r} is not inside subnet {network}")
+                    pools.append(PoolScope(int(first), int(last), _merge(subnet_options, compile_options(pool.get("options")))))
+                subnets.append(SubnetScope(network, subnet_options, tuple(pools), name))
+
+        for shared_network in config.get("shared_networks", ()):
+            add_subnets(shared_network.get("subnets", ()), compile_options(shared_network.get("options")), shared_network.get("name"))
+        add_subnets(config.get("subnets", ()), _EMPTY, None)
+
+        classes_config = config.get("classes") or ()
+        if isinstance(classes_config, _ty.Mapping):
+            class_entries = [(name, spec) for name, spec in classes_config.items() if isinstance(spec, _ty.Mapping)]
+        else:
+            class_entries = [(entry["name"], entry) for entry in classes_config]
+        classes = {
+            str(name): compile_options(spec.get("options"))
+            for name, spec in class_entries
+            if spec.get("options")
+        }
+
+        hosts: dict[str, CompiledOptions] = {}
+        for host in config.get("hosts", ()):
+            options = compile_options(host.get("options"))
+            if "client_id" in host:
+                hosts[_normalize_id(host["client_id"])] = options
+            if "chaddr" in host:
+                hosts["chaddr:" + _normalize_id(host["chaddr"])] = options
+
+        return cls(compile_options(config.get("options")), subnets, classes, hosts, cache_size=cache_size)
+
+    def find(self, ip: _ty.Optional[_net.IPv4]) -> tuple[_ty.Optional[SubnetScope], _ty.Optional[PoolScope]]:
+        """Return the subnet and pool scopes holding `ip`."""
+        if ip is None:
+            return None, None
+        for subnet in self.subnets:
+            if ip in subnet.network:
+                for pool in subnet.pools:
+                    if ip in pool:
+                        return subnet, pool
+                return subnet, None
+        return None, None
+
+    def host_key(self, client_id: _ty.Optional[str], chaddr: _ty.Optional[bytes]) -> _ty.Optional[str]:
+        if client_id is not None and client_id in self.hosts:
+            return client_id
+        if chaddr:
+            key = "chaddr:" + bytes(chaddr).hex(":").upper()
+            if key in self.hosts:
+                return key
+        return None
+
+    def resolve(
+        self,
+        ip: _ty.Optional[_net.IPv4],
+        classes: _ty.Sequence[str] = (),
+        client_id: _ty.Optional[str] = None,
+        chaddr: _ty.Optional[bytes] = None,
+        base: CompiledOptions = _EMPTY,
+        base_key: _ty.Hashable = None,
+    ) -> CompiledOptions:
+        """Return the merged options for a client, under the fixed `base` layer.
+
+        `base` sits below the global scope (the server passes its interface
+        defaults) and `base_key` must identify it in the memo. The result is
+        shared; copy it before mutating, as :func:`to_options` does.
+        """
+        subnet, pool = self.find(ip)
+        network_layer: _ty.Union[SubnetScope, PoolScope, None] = pool or subnet
+        class_names = tuple(name for name in classes if name in self.classes)
+        host = self.host_key(client_id, chaddr)
+        key = (base_key, id(network_layer), class_names, host)
+        cache = self._cache
+        found = cache.get(key)
+        if found is not None:
+            cache.move_to_end(key)
+            return found
+        result = _merge(
+            base,
+            self.global_options,
+            network_layer.options if network_layer is not None else _EMPTY,
+            *(self.classes[name] for name in class_names),
+            self.hosts[host] if host is not None else _EMPTY,
+        )
+        cache[key] = result
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return result
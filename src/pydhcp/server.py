@@ -13,10 +13,34 @@ import datetime as _dt
 import typing as _ty
 from math import inf as _inf
 
-from .lease import DhcpLease, LeaseBackend
+from .clock import CachedClock
+from .lease import DhcpLease, LeaseBackend, LeaseQueryBackend
+from .allocation import AddressPool, Allocator, DeclineQuarantine, OfferTable
+from .classify import ClientClassifier
+from .loadbalance import LoadBalancer
+from .scopes import CompiledOptions, OptionScopes, interface_options, to_options
 
 class DhcpServer(_Base):
     DEFAULT_PORTS = (_enum.DhcpPort.SERVER,)
+    OFFER_HOLD_TIME: float = 60.0
+    """Seconds an offered address stays reserved for the client it was offered to."""
+    DECLINE_HOLD_TIME: float = 86400.0
+    """Seconds a declined address is kept out of allocation."""
+    SWEEP_INTERVAL: float = 1.0
+    """Seconds between lease backend sweeps; :meth:`tick` runs on every listener wakeup."""
+    CLASSIFIED_MESSAGES = frozenset({
+        _enum.DhcpMessageType.DHCPDISCOVER,
+        _enum.DhcpMessageType.DHCPREQUEST,
+        _enum.DhcpMessageType.DHCPINFORM,
+    })
+    """Message types counted in ``metrics.class_hits`` when a classifier is set."""
+    _ALWAYS_SENT = frozenset({DhcpOptionCode.IP_ADDRESS_LEASE_TIME, DhcpOptionCode.SERVER_IDENTIFIER})
+    _NAK_OPTIONS = frozenset({
+        DhcpOptionCode.DHCP_MESSAGE,
+        DhcpOptionCode.CLIENT_IDENTIFIER,
+        DhcpOptionCode.VENDOR_CLASS_IDENTIFIER,
+        DhcpOptionCode.SERVER_IDENTIFIER,
+    })
 
     def __init__(
         self,
@@ -25,6 +49,12 @@ class DhcpServer(_Base):
         max_packet_size: _ty.Optional[int] = None,
         lease_backend: _ty.Optional[LeaseBackend] = None,
         per_interface: bool | None = None,
+        classifier: _ty.Optional[ClientClassifier] = None,
+        option_scopes: _ty.Optional[OptionScopes] = None,
+        load_balancer: _ty.Optional[LoadBalancer] = None,
+        allocator: _ty.Optional[Allocator] = None,
+        pools: _ty.Iterable[AddressPool] = (),
+        clock: _ty.Optional[CachedClock] = None,
     ) -> None:
         super().__init__(
             listen=listen,
@@ -32,25 +62,86 @@ class DhcpServer(_Base):
             max_packet_size=max_packet_size,
             per_interface=per_interface,
         )
+        self._init_server(lease_backend, classifier, option_scopes, load_balancer, allocator, pools, clock)
+
+    def _init_server(
+        self,
+        lease_backend: _ty.Optional[LeaseBackend],
+        classifier: _ty.Optional[ClientClassifier],
+        option_scopes: _ty.Optional[OptionScopes],
+        load_balancer: _ty.Optional[LoadBalancer],
+        allocator: _ty.Optional[Allocator],
+        pools: _ty.Iterable[AddressPool],
+        clock: _ty.Optional[CachedClock],
+    ) -> None:
+        # Shared by DhcpServer and AsyncDhcpServer, whose listener bases differ.
         from .lease import InMemoryLeaseBackend
-        self.lease_backend = lease_backend or InMemoryLeaseBackend()
+        from .lease.cached import CachedLeaseBackend
+        self.clock = clock if clock is not None else CachedClock()
+        """Read once per packet and per tick; pass it to the lease backend to share that reading."""
+        # Not `or`: a backend with __len__ and no leases yet is falsy.
+        self.lease_backend = lease_backend if lease_backend is not None else InMemoryLeaseBackend(self.clock)
+        if isinstance(self.lease_backend, CachedLeaseBackend) and self.lease_backend.metrics is None:
+            self.lease_backend.metrics = self.metrics
+        self.offers = OfferTable(self.OFFER_HOLD_TIME, clock=self.clock.monotonic)
+        self.quarantine = DeclineQuarantine(self.DECLINE_HOLD_TIME, clock=self.clock.monotonic)
+        self.classifier = classifier
+        self.option_scopes = option_scopes
+        self.load_balancer = load_balancer
+        self.allocator = allocator
+        self.pools = list(pools)
+        self._interface_options: dict[_net.IPv4, CompiledOptions] = {}
+        self._query_checked: tuple[_ty.Optional[LeaseBackend], bool] = (None, False)
+        self._last_flush = self.clock.monotonic()
+        self._last_sweep = -_inf
+        if self.allocator is not None:
+            self._indexed_backend()
+
+    def server_interface(self, server_id: _net.IPv4) -> _ty.Optional[_net.NetworkInterface]:
+        """Return the local interface holding `server_id`, or None when no interface does.
+
+        Looked up on every packet, so a change of address is seen at once.
+        Override it to serve from addresses the host does not have, as
+        :mod:`pydhcp.simulate` does.
+        """
+        return next(_net.host_ip_interfaces(lambda interface: interface.ip == server_id), None)
+
+    def _query_backend(self) -> _ty.Optional[LeaseQueryBackend]:
+        # A runtime protocol check costs tens of microseconds, so it is made
+        # once per backend rather than per address probed.
+        backend = self.lease_backend
+        checked, indexed = self._query_checked
+        if checked is not backend:
+            indexed = isinstance(backend, LeaseQueryBackend)
+            self._query_checked = (backend, indexed)
+        return _ty.cast(LeaseQueryBackend, backend) if indexed else None
+
+    def _indexed_backend(self) -> LeaseQueryBackend:
+        # Without an address index nothing says which pool addresses are leased.
+        backend = self._query_backend()
+        if backend is None:
+            raise TypeError(
+                f"{type(self.lease_backend).__name__} cannot look leases up by address, which an allocator needs"
+            )
+        return backend
 
     def acquire_lease(self, client_id: str, server_id: _net.IPv4, msg: DhcpMessage) -> _ty.Optional[DhcpLease]:
         """Return a lease for a client message.
 
         The base implementation is intentionally small: it renews existing leases and
-        allocates only when the client supplies `REQUESTED_IP` or `ciaddr`. Override
+        allocates when the client supplies `REQUESTED_IP` or `ciaddr`, or, when an
+        `allocator` is set, picks an address from `pools` (see `allocate_address`). A scoped
+        `IP_ADDRESS_LEASE_TIME` caps the lease time the client asks for. Override
         this method to implement address pools, reservations, policy checks, or custom
         response options.
         """
-        _server = next(_net.host_ip_interfaces(lambda interface: interface.ip == server_id), None)
+        _server = self.server_interface(server_id)
         if _server is None:
             return None
 
         existing = self.lease_backend.lookup(client_id)
         if existing:
-            requested_ttl = msg.options.get(DhcpOptionCode.IP_ADDRESS_LEASE_TIME, decode=_type.U32)
-            ttl = int(requested_ttl) if requested_ttl is not None else 3600
+            ttl = self._lease_time(self.compiled_options(server_id, _server.network, existing.ip, msg), msg)
             renewed = self.lease_backend.renew(client_id, ttl)
             if renewed:
                 self.metrics.leases_renewed += 1
@@ -60,64 +151,256 @@ class DhcpServer(_Base):
         requested_ip = msg.options.get(
             DhcpOptionCode.REQUESTED_IP, decode=_type.IPv4Address
         )
-        requested_ttl = msg.options.get(DhcpOptionCode.IP_ADDRESS_LEASE_TIME, decode=_type.U32)
-        ttl = int(requested_ttl) if requested_ttl is not None else 3600
-
         ip: _ty.Optional[_net.IPv4] = None
         if requested_ip:
             ip = requested_ip
         elif msg.ciaddr != _net.WILDCARD_IPv4:
             ip = msg.ciaddr
 
+        if ip is None and self.allocator is not None:
+            ip = self.allocate_address(client_id, msg, _server.network)
         if ip is None:
             return None
+        if not self.offers.is_available(ip, client_id):
+            LOGGER.info(
+                f"[XID={msg.xid:08x}] {ip} is offered to {self.offers.holder(ip)}, not allocating it for {client_id}"
+            )
+            return None
+        if ip in self.quarantine:
+            LOGGER.info(f"[XID={msg.xid:08x}] {ip} was declined and is quarantined, not allocating it for {client_id}")
+            return None
 
-        options = DhcpOptions()
-        options[DhcpOptionCode.SUBNET_MASK] = _server.network.netmask
-        options[DhcpOptionCode.BROADCAST_ADDRESS] = _server.network.broadcast_address
-        options[DhcpOptionCode.ROUTER] = [server_id]
-        options[DhcpOptionCode.DNS] = [server_id]
+        compiled = self.compiled_options(server_id, _server.network, ip, msg)
+        ttl = self._lease_time(compiled, msg)
+        options = to_options(compiled)
+        # Kept with the lease so leasequery replies can return it (RFC 4388 6.4.2).
+        relay_info = msg.options.get(DhcpOptionCode.RELAY_AGENT_INFORMATION, decode=False)
+        if relay_info is not None:
+            options[DhcpOptionCode.RELAY_AGENT_INFORMATION] = relay_info
 
         LOGGER.debug(f"[XID={msg.xid:08x}] Allocating {ip} for {client_id}")
-        lease = self.lease_backend.allocate(client_id, ip, ttl, options)
+        allocate_if_free: _ty.Optional[_ty.Callable[..., _ty.Optional[DhcpLease]]] = getattr(
+            self.lease_backend, "allocate_if_free", None
+        )
+        taken = False
+        if allocate_if_free is not None:
+            lease = allocate_if_free(client_id, ip, ttl, options, chaddr=msg.chaddr)
+            taken = lease is None
+        elif (indexed := self._query_backend()) is not None:
+            holder = indexed.lookup_ip(ip)
+            taken = holder is not None and holder[0] != client_id
+            lease = None if taken else indexed.allocate(client_id, ip, ttl, options, chaddr=msg.chaddr)
+        else:
+            lease = self.lease_backend.allocate(client_id, ip, ttl, options)
+        if taken:
+            LOGGER.info(f"[XID={msg.xid:08x}] {ip} is leased to another client, not allocating it for {client_id}")
         if lease is not None:
             self.metrics.leases_allocated += 1
         return lease
 
+    def _lease_time(self, compiled: CompiledOptions, msg: DhcpMessage) -> int:
+        """Return the lease time to grant, in seconds.
+
+        A scoped `IP_ADDRESS_LEASE_TIME` is both the default and the longest
+        lease handed out; the client may ask for a shorter one. Without it the
+        client gets what it asks for, or an hour.
+        """
+        requested_ttl = msg.options.get(DhcpOptionCode.IP_ADDRESS_LEASE_TIME, decode=_type.U32)
+        scoped = compiled.get(DhcpOptionCode.IP_ADDRESS_LEASE_TIME)
+        if scoped is None:
+            return int(requested_ttl) if requested_ttl is not None else 3600
+        limit = int.from_bytes(scoped, "big")
+        return min(int(requested_ttl), limit) if requested_ttl is not None else limit
+
+    def allocate_address(self, client_id: str, msg: DhcpMessage, network: _net.IPNetwork) -> _ty.Optional[_net.IPv4]:
+        """Pick a free address for a client that asked for none, using `allocator`.
+
+        Pools are tried in order. A pool with a network serves the relay's
+        `giaddr` network, or the receiving interface's network for direct
+        clients, and a pool with classes serves only clients in one of them.
+        An address is free when no other client holds an offer or a lease on
+        it, so the lease backend must be a
+        :class:`~pydhcp.lease.LeaseQueryBackend`; the server refuses an
+        allocator with any other backend, raising :class:`TypeError`.
+        """
+        allocator = self.allocator
+        if allocator is None:
+            return None
+        self._indexed_backend()
+        classes = self.client_classes(msg)
+        relay = msg.giaddr if msg.giaddr != _net.WILDCARD_IPv4 else None
+
+        def in_use(ip: _net.IPv4) -> bool:
+            return self.address_in_use(ip, client_id)
+
+        for pool in self.pools:
+            if pool.network is not None:
+                if relay is not None and relay not in pool.network:
+                    continue
+                if relay is None and pool.first not in network:
+                    continue
+            if not pool.admits(classes):
+                continue
+            ip = allocator.select(client_id, pool, in_use)
+            if ip is not None:
+                return ip
+        LOGGER.warning(f"[XID={msg.xid:08x}] No free address in any pool for {client_id}")
+        return None
+
+    def address_in_use(self, ip: _net.IPv4, client_id: str) -> bool:
+        """True when `ip` is quarantined, or offered or leased to a client other than `client_id`.
+
+        Leases are checked only with a :class:`~pydhcp.lease.LeaseQueryBackend`,
+        which any server with an `allocator` has.
+        """
+        if ip in self.quarantine or not self.offers.is_available(ip, client_id):
+            return True
+        backend = self._query_backend()
+        if backend is not None:
+            found = backend.lookup_ip(ip)
+            return found is not None and found[0] != client_id
+        return False
+
     def release_lease(self, client_id: str, server_id: _net.IPv4, msg: DhcpMessage) -> None:
         """Release any lease associated with `client_id`.
 
         Override this method when lease release needs to update an external store,
         quarantine declined addresses, or emit custom audit records.
         """
+        self._drop_offer(client_id)
         if self.lease_backend.release(client_id):
             self.metrics.leases_released += 1
 
+    def _expire_holds(self) -> None:
+        expired = self.offers.expire()
+        if expired:
+            self.metrics.offers_expired += expired
+            self.metrics.offers_held = len(self.offers)
+        released = self.quarantine.expire()
+        if released:
+            self.metrics.quarantine_expired += released
+            self.metrics.quarantined = len(self.quarantine)
+
+    def tick(self) -> None:
+        """Expire held offers and quarantined addresses, sweep expired leases and flush the backend.
+
+        The sweep runs when the lease backend has one, as
+        :class:`~pydhcp.lease.InMemoryLeaseBackend` and its subclasses do, at
+        most once every :attr:`SWEEP_INTERVAL` seconds. A
+        backend that holds writes back for a ``flush_interval``, such as
+        :class:`~pydhcp.lease.FileLeaseBackend`, is flushed once that long
+        has passed since the last flush.
+        """
+        self.clock.tick()
+        self._expire_holds()
+        sweep = getattr(self.lease_backend, "sweep", None)
+        if sweep is not None and self.clock.monotonic() - self._last_sweep >= self.SWEEP_INTERVAL:
+            self._last_sweep = self.clock.monotonic()
+            reclaimed = sweep()
+            if reclaimed:
+                self.metrics.leases_reclaimed += reclaimed
+        flush_interval = getattr(self.lease_backend, "flush_interval", None)
+        if flush_interval is not None and self.clock.monotonic() - self._last_flush >= flush_interval:
+            self._flush_backend()
+
+    def _flush_backend(self) -> None:
+        self._last_flush = self.clock.monotonic()
+        flush = getattr(self.lease_backend, "flush", None)
+        if flush is not None:
+            flush()
+
+    def shutdown(self) -> None:
+        """Write anything the lease backend still holds back, and close it, once the server stops listening."""
+        self._flush_backend()
+        close = getattr(self.lease_backend, "close", None)
+        if close is not None:
+            close()
+
+    def _hold_offer(self, client_id: str, ip: _net.IPv4) -> None:
+        self.offers.hold(client_id, ip)
+        self.metrics.offers_held = len(self.offers)
+
+    def _drop_offer(self, client_id: str) -> None:
+        if self.offers.release(client_id) is not None:
+            self.metrics.offers_held = len(self.offers)
+
     def get_inform_options(self, server_id: _net.IPv4, msg: DhcpMessage) -> DhcpOptions:
         """Return configuration options for DHCPINFORM responses.
 
         DHCPINFORM does not allocate an address. Override this method when clients
         should receive site-specific options without touching lease allocation.
         """
-        options = DhcpOptions()
-        _server = next(_net.host_ip_interfaces(lambda interface: interface.ip == server_id), None)
-        if _server is not None:
-            options[DhcpOptionCode.SUBNET_MASK] = _server.network.netmask
-            options[DhcpOptionCode.BROADCAST_ADDRESS] = _server.network.broadcast_address
-            options[DhcpOptionCode.ROUTER] = [server_id]
-            options[DhcpOptionCode.DNS] = [server_id]
-        return options
+        _server = self.server_interface(server_id)
+        ip = msg.ciaddr if msg.ciaddr != _net.WILDCARD_IPv4 else None
+        return to_options(self.compiled_options(server_id, _server.network if _server else None, ip, msg))
+
+    def compiled_options(
+        self,
+        server_id: _net.IPv4,
+        network: _ty.Optional[_net.IPNetwork],
+        ip: _ty.Optional[_net.IPv4],
+        msg: DhcpMessage,
+    ) -> CompiledOptions:
+        """Return the pre-encoded options to hand a client `ip` on `network`.
+
+        The interface defaults (mask, broadcast, router and DNS pointing at
+        this server) are encoded once per server id. When `option_scopes` is
+        set, the scoped options for the address, the client's classes and its
+        host entry are layered on top from the scopes' compiled memo. The
+        mapping is shared: copy it before changing it.
+        """
+        base: CompiledOptions = {}
+        if network is not None:
+            found = self._interface_options.get(server_id)
+            if found is None:
+                found = self._interface_options[server_id] = interface_options(_ty.cast(_net.IPv4Network, network), server_id)
+            base = found
+        if self.option_scopes is None:
+            return base
+        return self.option_scopes.resolve(
+            ip,
+            self.client_classes(msg),
+            msg.client_id(),
+            msg.chaddr[: msg.hlen],
+            base,
+            server_id if network is not None else None,
+        )
+
+    def is_authoritative(self, ip: _net.IPv4, server_id: _net.IPv4) -> bool:
+        """Return True when this server is responsible for assigning `ip`.
+
+        Leasequery uses this to tell DHCPLEASEUNASSIGNED (ours, but free) from
+        DHCPLEASEUNKNOWN. The base implementation claims the network of the
+        interface the query arrived on; override it when serving relayed pools.
+        """
+        _server = self.server_interface(server_id)
+        return _server is not None and ip in _server.network
+
+    def client_classes(self, msg: DhcpMessage) -> tuple[str, ...]:
+        """Return the client classes `msg` falls in, or ``()`` without a classifier.
+
+        Classification is memoized, so pool and option selection can call this
+        freely while handling a message.
+        """
+        if self.classifier is None:
+            return ()
+        return self.classifier.classify(msg.options)
 
     def handle(
         self,
         msg: DhcpMessage,
         context: RequestContext,
     ) -> None:
+        self.clock.tick()
         if msg.op != _enum.OpCode.BOOTREQUEST:
             LOGGER.warning(
                 f"[XID={msg.xid:08x}] Received a reply msg from {context.client} ignoring it."
             )
             return
+        if self.load_balancer is not None and not self.load_balancer.accepts(msg):
+            # RFC 3074: another server owns this client's hash bucket.
+            self.metrics.packets_dropped_load_balance += 1
+            return
         client_id = msg.client_id()
         msg_ty = msg.options.get(DhcpOptionCode.DHCP_MESSAGE_TYPE)
         msg_ty_name = msg_ty.name if (msg_ty is not None and hasattr(msg_ty, "name")) else str(msg_ty)
@@ -137,6 +420,14 @@ class DhcpServer(_Base):
                 )
             return
 
+        if self.classifier is not None and msg_ty in self.CLASSIFIED_MESSAGES:
+            classes = self.client_classes(msg)
+            hits = self.metrics.class_hits
+            for name in classes:
+                hits[name] = hits.get(name, 0) + 1
+            if classes:
+                LOGGER.debug(f"[XID={msg.xid:08x}] {context.client}|{client_id} is in classes {', '.join(classes)}")
+
         if msg_ty is _enum.DhcpMessageType.DHCPDISCOVER:
             self.handle_discover(msg, context)
         elif msg_ty is _enum.DhcpMessageType.DHCPREQUEST:
@@ -147,6 +438,8 @@ class DhcpServer(_Base):
             self.handle_release(msg, context)
         elif msg_ty is _enum.DhcpMessageType.DHCPINFORM:
             self.handle_inform(msg, context)
+        elif msg_ty is _enum.DhcpMessageType.DHCPLEASEQUERY:
+            self.handle_leasequery(msg, context)
         else:
             LOGGER.warning(
                 f"[XID={msg.xid:08x}] Received a DHCP Message with message type: {msg_ty} from: {context.client}|{client_id} at: {actual_server_id}, which we don't handle"
@@ -157,12 +450,15 @@ class DhcpServer(_Base):
         client_id = msg.client_id()
         actual_server_id = _ty.cast(_net.IPv4, context.interface.ip)
         LOGGER.info(f"[XID={msg.xid:08x}] DHCPDISCOVER from {context.client}|{client_id}")
+        self._expire_holds()
         lease = self.acquire_lease(client_id, actual_server_id, msg)
         if not lease:
             LOGGER.info(
                 f"[XID={msg.xid:08x}] No lease available for {context.client}|{client_id} at {actual_server_id} ignoring"
             )
             return
+        if lease.ip:
+            self._hold_offer(client_id, lease.ip)
         resp = self._create_response(msg, lease, actual_server_id, _enum.DhcpMessageType.DHCPOFFER)
         self._filter_and_send(msg, resp, context, _enum.DhcpMessageType.DHCPOFFER)
 
@@ -171,6 +467,7 @@ class DhcpServer(_Base):
         client_id = msg.client_id()
         actual_server_id = _ty.cast(_net.IPv4, context.interface.ip)
         LOGGER.info(f"[XID={msg.xid:08x}] DHCPREQUEST from {context.client}|{client_id}")
+        self._expire_holds()
         lease = self.acquire_lease(client_id, actual_server_id, msg)
         if not lease:
             LOGGER.info(
@@ -186,14 +483,34 @@ class DhcpServer(_Base):
             resp_ty = _enum.DhcpMessageType.DHCPACK
         else:
             resp_ty = _enum.DhcpMessageType.DHCPNAK
+        # Either way the client has answered its offer, so the hold is done.
+        self._drop_offer(client_id)
         resp = self._create_response(msg, lease, actual_server_id, resp_ty)
         self._filter_and_send(msg, resp, context, resp_ty)
 
     def handle_decline(self, msg: DhcpMessage, context: RequestContext) -> None:
-        """Handle DHCPDECLINE by releasing the client's lease through `release_lease`."""
+        """Handle DHCPDECLINE by quarantining the address and releasing the client's lease.
+
+        The declined address is the REQUESTED_IP option (RFC 2131 4.4.4), or
+        the client's current lease when that is missing. It stays out of
+        allocation for `DECLINE_HOLD_TIME` seconds. A DHCPDECLINE is ignored
+        unless the client holds a lease on that address, so no client can
+        take addresses it was never given out of the pool.
+        """
         client_id = msg.client_id()
         actual_server_id = _ty.cast(_net.IPv4, context.interface.ip)
         LOGGER.warning(f"[XID={msg.xid:08x}] DHCPDECLINE from {context.client}|{client_id}")
+        self.metrics.declines += 1
+        lease = self.lease_backend.lookup(client_id)
+        declined: _ty.Optional[_net.IPv4] = msg.options.get(DhcpOptionCode.REQUESTED_IP, decode=_type.IPv4Address)
+        if declined is None and lease is not None:
+            declined = lease.ip
+        if lease is None or declined is None or lease.ip != declined or declined == _net.WILDCARD_IPv4:
+            LOGGER.warning(f"[XID={msg.xid:08x}] DHCPDECLINE ignored, {client_id} holds no lease on {declined}")
+            return
+        self.quarantine.quarantine(declined)
+        self.metrics.quarantined = len(self.quarantine)
+        LOGGER.warning(f"[XID={msg.xid:08x}] {declined} quarantined for {self.quarantine.hold_time:.0f}s")
         self.release_lease(client_id, actual_server_id, msg)
 
     def handle_release(self, msg: DhcpMessage, context: RequestContext) -> None:
@@ -221,6 +538,136 @@ class DhcpServer(_Base):
         resp.yiaddr = _net.WILDCARD_IPv4
         self._filter_and_send(msg, resp, context, _enum.DhcpMessageType.DHCPACK)
 
+    def handle_leasequery(self, msg: DhcpMessage, context: RequestContext) -> None:
+        """Answer an RFC 4388 DHCPLEASEQUERY by IP address, client id, or MAC address."""
+        actual_server_id = _ty.cast(_net.IPv4, context.interface.ip)
+        if msg.giaddr == _net.WILDCARD_IPv4:
+            # RFC 4388 6.1: a leasequery always comes from a relay agent.
+            LOGGER.warning(f"[XID={msg.xid:08x}] DHCPLEASEQUERY from {context.client} without giaddr, ignoring")
+            return
+        self.metrics.leasequeries += 1
+        reply = self.leasequery_reply(msg, actual_server_id)
+        if reply is None:
+            LOGGER.warning(f"[XID={msg.xid:08x}] DHCPLEASEQUERY from {context.client} names no ip, client id or chaddr, ignoring")
+            return
+        LOGGER.info(
+            f"[XID={msg.xid:08x}] DHCPLEASEQUERY from {context.client}: {reply.options.get(DhcpOptionCode.DHCP_MESSAGE_TYPE)}"
+        )
+        self._send_leasequery_reply(msg, reply, context)
+
+    def leasequery_reply(self, msg: DhcpMessage, server_id: _net.IPv4) -> _ty.Optional[DhcpMessage]:
+        """Build the DHCPLEASEACTIVE/UNASSIGNED/UNKNOWN reply to a leasequery.
+
+        The query is by `ciaddr` when set, else by CLIENT_IDENTIFIER, else by
+        `chaddr` (RFC 4388 6.1). Returns None for a query that names nothing.
+        """
+        backend = self.lease_backend
+        indexed = self._query_backend() is not None
+        found: _ty.Optional[tuple[str, DhcpLease]] = None
+        if msg.ciaddr != _net.WILDCARD_IPv4:
+            if indexed:
+                found = _ty.cast(LeaseQueryBackend, backend).lookup_ip(msg.ciaddr)
+            if found is None:
+                if self.is_authoritative(msg.ciaddr, server_id):
+                    return self._leasequery_message(msg, server_id, _enum.DhcpMessageType.DHCPLEASEUNASSIGNED)
+                return self._leasequery_message(msg, server_id, _enum.DhcpMessageType.DHCPLEASEUNKNOWN)
+        elif DhcpOptionCode.CLIENT_IDENTIFIER in msg.options:
+            client_id = msg.client_id()
+            lease = backend.lookup(client_id)
+            found = (client_id, lease) if lease is not None else None
+        elif msg.hlen and any(msg.chaddr):
+            if indexed:
+                found = _ty.cast(LeaseQueryBackend, backend).lookup_chaddr(msg.chaddr)
+            else:
+                client_id = msg.client_id()
+                lease = backend.lookup(client_id)
+                found = (client_id, lease) if lease is not None else None
+        else:
+            return None
+
+        if found is None:
+            return self._leasequery_message(msg, server_id, _enum.DhcpMessageType.DHCPLEASEUNKNOWN)
+        return self._leasequery_active(msg, server_id, *found)
+
+    def _leasequery_message(
+        self,
+        msg: DhcpMessage,
+        server_id: _net.IPv4,
+        resp_ty: _enum.DhcpMessageType,
+    ) -> DhcpMessage:
+        resp = DhcpMessage(**msg.__dict__.copy())
+        resp.op = _enum.OpCode.BOOTREPLY
+        resp.hops = 0
+        resp.secs = _dt.timedelta(seconds=0)
+        resp.yiaddr = _net.WILDCARD_IPv4
+        resp.options = DhcpOptions()
+        resp.options[DhcpOptionCode.DHCP_MESSAGE_TYPE] = resp_ty
+        resp.options[DhcpOptionCode.SERVER_IDENTIFIER] = server_id
+        return resp
+
+    def _leasequery_active(
+        self,
+        msg: DhcpMessage,
+        server_id: _net.IPv4,
+        client_id: str,
+        lease: DhcpLease,
+    ) -> DhcpMessage:
+        resp = self._leasequery_message(msg, server_id, _enum.DhcpMessageType.DHCPLEASEACTIVE)
+        if lease.ip is not None:
+            resp.ciaddr = lease.ip
+        if isinstance(lease.expires, _dt.datetime):
+            remaining = int(lease.expires.timestamp() - self.clock.time())
+            resp.options[DhcpOptionCode.IP_ADDRESS_LEASE_TIME] = max(0, min(remaining, _const.INFINITE_LEASE_TIME))
+        else:
+            resp.options[DhcpOptionCode.IP_ADDRESS_LEASE_TIME] = _const.INFINITE_LEASE_TIME
+        indexed = self._query_backend()
+        if indexed is not None:
+            chaddr = indexed.chaddr(client_id)
+            if chaddr is not None:
+                resp.chaddr = chaddr
+                resp.hlen = len(chaddr)
+            touched = indexed.last_transaction(client_id)
+            if touched is not None:
+                resp.options[DhcpOptionCode.CLIENT_LAST_TRANSACTION_TIME] = max(0, int(self.clock.time() - touched))
+        try:
+            resp.options[DhcpOptionCode.CLIENT_IDENTIFIER] = bytearray.fromhex(client_id.replace(":", ""))
+        except ValueError:
+            pass
+        relay_info = lease.options.get(DhcpOptionCode.RELAY_AGENT_INFORMATION, decode=False)
+        if relay_info is not None:
+            resp.options[DhcpOptionCode.RELAY_AGENT_INFORMATION] = relay_info
+        return resp
+
+    def _send_leasequery_reply(self, msg: DhcpMessage, resp: DhcpMessage, context: RequestContext) -> None:
+        requested = msg.options.get(
+            DhcpOptionCode.PARAMETER_REQUEST_LIST,
+            decode=_type.DhcpOptionCodes[DhcpOptionCode],
+        )
+        if requested:
+            keep = {int(code) for code in requested}
+            keep.update(
+                (
+                    DhcpOptionCode.DHCP_MESSAGE_TYPE,
+                    DhcpOptionCode.SERVER_IDENTIFIER,
+                    DhcpOptionCode.IP_ADDRESS_LEASE_TIME,
+                    DhcpOptionCode.CLIENT_LAST_TRANSACTION_TIME,
+                )
+            )
+            resp.options._options = _ty.OrderedDict(
+                (code, value) for code, value in resp.options._options.items() if code in keep
+            )
+        max_size_opt = msg.options.get(
+            DhcpOptionCode.MAXIMUM_DHCP_MESSAGE_SIZE,
+            default=_const.DHCP_MIN_LEGAL_PACKET_SIZE,
+            decode=_type.U16,
+        )
+        max_size = int(max_size_opt) if max_size_opt is not None else _const.DHCP_MIN_LEGAL_PACKET_SIZE
+        data = resp.encode(max_size)
+        dest = _net.SocketAddress(msg.giaddr, context.client.port)
+        resp.log(context.interface.ip, dest, _logging.INFO)
+        context.transport.send(data, dest.ip, dest.port, msg.chaddr)
+        self.metrics.packets_sent += 1
+
     def _create_response(
         self,
         msg: DhcpMessage,
@@ -229,7 +676,8 @@ class DhcpServer(_Base):
         resp_ty: _enum.DhcpMessageType,
     ) -> DhcpMessage:
         resp = DhcpMessage(**msg.__dict__.copy())
-        resp.options = lease.options
+        # The lease's options are stored with it, so the reply gets its own copy.
+        resp.options = lease.options.copy()
         resp.op = _enum.OpCode.BOOTREPLY
         resp.hops = 0
         resp.secs = _dt.timedelta(seconds=0)
@@ -237,8 +685,7 @@ class DhcpServer(_Base):
             if lease.expires is None or lease.expires == _inf or not isinstance(lease.expires, _dt.datetime):
                 expires = _const.INFINITE_LEASE_TIME
             else:
-                expires = int((lease.expires - _dt.datetime.now()).total_seconds())
-                expires = min(expires, _const.INFINITE_LEASE_TIME)
+                expires = min(int(lease.expires.timestamp() - self.clock.time()), _const.INFINITE_LEASE_TIME)
             if expires > 0:
                 resp.options[DhcpOptionCode.IP_ADDRESS_LEASE_TIME] = expires
                 resp.yiaddr = lease.ip
@@ -256,32 +703,19 @@ class DhcpServer(_Base):
         context: RequestContext,
         resp_ty: _enum.DhcpMessageType,
     ) -> None:
-        requests_params_raw = msg.options.get(
-            DhcpOptionCode.PARAMETER_REQUEST_LIST,
-            decode=_type.DhcpOptionCodes[DhcpOptionCode],
-        )
-        requests_params: _ty.List[DhcpOptionCode] = []
+        # The PRL is a run of option code bytes; no need to decode it.
+        requests_params_raw = msg.options.get(DhcpOptionCode.PARAMETER_REQUEST_LIST, decode=False)
+        requests_params: _ty.FrozenSet[int] = frozenset()
         if requests_params_raw:
-            requests_params = [
-                *requests_params_raw,
-                DhcpOptionCode.IP_ADDRESS_LEASE_TIME,
-                DhcpOptionCode.SERVER_IDENTIFIER,
-            ]
+            requests_params = frozenset(requests_params_raw).union(self._ALWAYS_SENT)
         if resp_ty is _enum.DhcpMessageType.DHCPNAK:
-            requests_params = [
-                DhcpOptionCode.DHCP_MESSAGE,
-                DhcpOptionCode.CLIENT_IDENTIFIER,
-                DhcpOptionCode.VENDOR_CLASS_IDENTIFIER,
-                DhcpOptionCode.SERVER_IDENTIFIER,
-            ]
+            requests_params = self._NAK_OPTIONS
             resp.options[DhcpOptionCode.CLIENT_IDENTIFIER] = bytearray.fromhex(
                 msg.client_id().replace(":", "")
             )
         if requests_params:
-            def _paramfilter(opt: tuple[int, bytearray]) -> bool:
-                return opt[0] in requests_params
             resp.options._options = _ty.OrderedDict(
-                filter(_paramfilter, resp.options.items(decoded=False))
+                (code, value) for code, value in resp.options._options.items() if code in requests_params
             )
         resp.options[DhcpOptionCode.DHCP_MESSAGE_TYPE] = resp_ty
 
@@ -310,7 +744,7 @@ class DhcpServer(_Base):
                 dest = _net.IPv4("255.255.255.255")
 
         resp.log(context.interface.ip, _net.SocketAddress(dest, dest_port), _logging.INFO)
-        if __debug__:
+        if __debug__ and LOGGER.isEnabledFor(_logging.DEBUG):
             _check = DhcpMessage.decode(memoryview(data))
             _check.log(
                 context.interface.ip, _net.SocketAddress(dest, dest_port), _logging.DEBUG
@@ -331,12 +765,23 @@ class AsyncDhcpServer(_AsyncBase, DhcpServer):  # type: ignore[misc]
         max_packet_size: _ty.Optional[int] = None,
         lease_backend: _ty.Optional[LeaseBackend] = None,
         per_interface: bool | None = None,
+        classifier: _ty.Optional[ClientClassifier] = None,
+        option_scopes: _ty.Optional[OptionScopes] = None,
+        load_balancer: _ty.Optional[LoadBalancer] = None,
+        allocator: _ty.Optional[Allocator] = None,
+        pools: _ty.Iterable[AddressPool] = (),
+        clock: _ty.Optional[CachedClock] = None,
     ) -> None:
         _AsyncBase.__init__(self, listen=listen, max_packet_size=max_packet_size, per_interface=per_interface)
-        from .lease import InMemoryLeaseBackend
-        self.lease_backend = lease_backend or InMemoryLeaseBackend()
+        self._init_server(lease_backend, classifier, option_scopes, load_balancer, allocator, pools, clock)
 
     def handle(self, msg: DhcpMessage, context: RequestContext) -> None:
         DhcpServer.handle(self, msg, context)
 
+    def tick(self) -> None:
+        DhcpServer.tick(self)
+
+    def shutdown(self) -> None:
+        DhcpServer.shutdown(self)
+
 
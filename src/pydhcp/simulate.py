@@ -0,0 +1,454 @@
+"""Lease churn on virtual time: simulated clients against an in-process server.
+
+:class:`LeaseChurnSimulation` runs clients that come and go through DORA,
+renewal at T1, rebinding at T2, release and silent expiry against a
+:class:`~pydhcp.server.DhcpServer`, with no sockets and no sleeping: every
+message goes through :meth:`~pydhcp.server.DhcpServer.handle` and the reply
+is decoded from the bytes the server sends, while a
+:class:`~pydhcp.clock.VirtualClock` jumps from one event to the next. With
+``wire=False`` the clients skip the messages and drive the allocator and
+lease backend directly, which is many times faster. It reports how close the pool came to exhaustion, how many writes the lease
+backend took and, optionally, how much memory was held along the way.
+"""
+
+from __future__ import annotations
+
+import collections.abc as _abc
+import dataclasses as _data
+import datetime as _dt
+import heapq as _heapq
+import ipaddress as _ipaddress
+import itertools as _itertools
+import random as _random
+import tracemalloc as _tracemalloc
+import typing as _ty
+
+from . import network as _net
+from .allocation import AddressPool, Allocator, HashAllocator
+from .client import DhcpClient
+from .clock import CachedClock, VirtualClock
+from .lease import DhcpLease, InMemoryLeaseBackend, LeaseBackend, LeaseQueryBackend
+from .listener import RequestContext, Transport
+from .options import DhcpOptionCode
+from .options import type as _type
+from .packet import enums as _enum
+from .packet.message import DhcpMessage
+from .server import DhcpServer
+
+SERVER_INTERFACE = _net.NetworkInterface("sim0", _ipaddress.IPv4Interface("10.0.0.1/8"))
+"""The address the simulated server answers on; default pools start at 10.0.1.0."""
+
+_ARRIVE, _DEPART, _RETRY, _RENEW, _REBIND, _EXPIRE, _TICK, _SAMPLE = range(8)
+
+
+class _CapturingTransport(Transport):
+    def __init__(self) -> None:
+        self.sent: list[bytes] = []
+
+    def send(
+        self,
+        data: _ty.Union[bytes, bytearray, memoryview],
+        dest: _net.IPv4,
+        port: int,
+        client_mac: bytes,
+    ) -> int:
+        self.sent.append(bytes(data))
+        return len(data)
+
+
+class SimulatedDhcpServer(DhcpServer):
+    """A :class:`~pydhcp.server.DhcpServer` answering on `interface` whether or not the host has it."""
+
+    def __init__(self, interface: _net.NetworkInterface = SERVER_INTERFACE, **kwargs: _ty.Any) -> None:
+        super().__init__(**kwargs)
+        self.interface = interface
+
+    def server_interface(self, server_id: _net.IPv4) -> _ty.Optional[_net.NetworkInterface]:
+        return self.interface if server_id == self.interface.ip else None
+
+
+@_data.dataclass(frozen=True)
+class ChurnSample:
+    """The server's state at one point of a simulation."""
+
+    time: float
+    """Seconds since the simulation started."""
+    leases: int
+    offers_held: int
+    backend_writes: int
+    persisted_writes: _ty.Optional[int]
+    traced_bytes: _ty.Optional[int]
+
+
+@_data.dataclass
+class ChurnReport:
+    """What a :meth:`LeaseChurnSimulation.run` saw.
+
+    `backend_writes` counts the allocations, renewals, releases and sweeps
+    the server made on the lease backend. `persisted_writes` is what the
+    backend wrote to disk for them, when it says: journal records for a
+    :class:`~pydhcp.lease.journal.JournalLeaseBackend`, whole-file writes for
+    a :class:`~pydhcp.lease.FileLeaseBackend`.
+    """
+
+    clients: int
+    pool_size: int
+    duration: float
+    packets: int = 0
+    discovers_unanswered: int = 0
+    """DISCOVERs that got no offer, most often because the pool was exhausted."""
+    exhausted_at: _ty.Optional[float] = None
+    """Seconds into the run of the first unanswered DISCOVER."""
+    naks: int = 0
+    renewals: int = 0
+    rebinds: int = 0
+    releases: int = 0
+    client_expiries: int = 0
+    """Leases that ran out on a client that could neither renew nor rebind."""
+    peak_leases: int = 0
+    backend_writes: int = 0
+    persisted_writes: _ty.Optional[int] = None
+    peak_traced_bytes: _ty.Optional[int] = None
+    samples: list[ChurnSample] = _data.field(default_factory=list)
+
+
+class LeaseChurnSimulation:
+    """Drive `clients` simulated DHCP clients through a day, or any `duration`, of churn.
+
+    Each client comes online after an exponentially distributed time with
+    mean `mean_offline` seconds, gets a lease by DISCOVER/OFFER/REQUEST/ACK
+    asking for `lease_time` seconds, and stays for an exponentially
+    distributed `mean_online` seconds. While online it renews at T1 (half
+    the lease) and, should the renewal go unanswered, rebinds at T2 (7/8 of
+    the lease); once the lease runs out it starts over with a DISCOVER. A
+    renewal or rebind is lost with probability `loss`, as when the server is
+    unreachable. Leaving, a client sends DHCPRELEASE with probability
+    `release_ratio` and otherwise goes silently, its lease kept until the
+    server's housekeeping :meth:`~pydhcp.server.DhcpServer.tick`, run every
+    `tick_interval` seconds, reclaims it. A client whose DISCOVER goes
+    unanswered tries again after `retry_interval` seconds.
+
+    The server is a :class:`SimulatedDhcpServer` over one pool of
+    `pool_size` addresses, `clients` by default, using `allocator` and
+    `lease_backend`. A backend passed in should run on `clock`, the
+    :class:`~pydhcp.clock.VirtualClock` the simulation advances, as
+    ``InMemoryLeaseBackend(clock)`` does; the server reads it through a
+    :class:`~pydhcp.clock.CachedClock`. The default is an in-memory backend.
+
+    With `wire` false nothing is encoded or decoded: a DISCOVER and REQUEST
+    become one call to `allocator` over the pool, skipping the addresses
+    :meth:`~pydhcp.server.DhcpServer.address_in_use` reports, and one
+    allocation on the lease backend; renewals and releases go straight to the
+    backend too. The server's metrics count them as
+    :meth:`~pydhcp.server.DhcpServer.handle` would, and `packets` still counts
+    the messages the clients stand in for, but no offers are held and no
+    options are applied, so the backend takes one write per DORA instead of
+    two. A day of 100,000 clients runs in seconds that way.
+
+    Every `sample_interval` seconds a :class:`ChurnSample` is taken, tracing
+    memory with :mod:`tracemalloc` when `trace_memory` is set, which slows
+    the run down several times. Runs are repeatable for a given `seed`, and
+    :meth:`run` can be called again to carry on where the last one stopped.
+    """
+
+    def __init__(
+        self,
+        clients: int,
+        *,
+        lease_time: int = 86400,
+        mean_online: float = 8 * 3600.0,
+        mean_offline: float = 16 * 3600.0,
+        release_ratio: float = 0.5,
+        loss: float = 0.0,
+        pool_size: _ty.Optional[int] = None,
+        lease_backend: _ty.Optional[LeaseBackend] = None,
+        allocator: _ty.Optional[Allocator] = None,
+        clock: _ty.Optional[VirtualClock] = None,
+        tick_interval: float = 60.0,
+        retry_interval: float = 300.0,
+        sample_interval: float = 3600.0,
+        trace_memory: bool = False,
+        wire: bool = True,
+        seed: int = 0,
+    ) -> None:
+        self.clients = clients
+        self.lease_time = lease_time
+        self.mean_online = mean_online
+        self.mean_offline = mean_offline
+        self.release_ratio = release_ratio
+        self.loss = loss
+        self.tick_interval = tick_interval
+        self.retry_interval = retry_interval
+        self.sample_interval = sample_interval
+        self.trace_memory = trace_memory
+        self.wire = wire
+        self.clock = clock if clock is not None else VirtualClock()
+        size = clients if pool_size is None else pool_size
+        first = int(_net.IPv4("10.0.1.0"))
+        self.pool = AddressPool(
+            _net.IPv4(first), _net.IPv4(first + size - 1), _ty.cast(_ipaddress.IPv4Network, SERVER_INTERFACE.network)
+        )
+        self.allocator = allocator if allocator is not None else HashAllocator()
+        self.server = SimulatedDhcpServer(
+            lease_backend=lease_backend if lease_backend is not None else InMemoryLeaseBackend(self.clock),
+            allocator=self.allocator,
+            pools=[self.pool],
+            clock=CachedClock(self.clock),
+        )
+        backend = self.server.lease_backend
+        # The server refuses an allocator with anything but a LeaseQueryBackend.
+        assert isinstance(backend, LeaseQueryBackend)
+        self._backend = backend
+        self._random = _random.Random(seed)
+        self._builder = DhcpClient()
+        self._transport = _CapturingTransport()
+        self._context = RequestContext(
+            transport=self._transport,
+            interface=SERVER_INTERFACE,
+            client=_net.SocketAddress("0.0.0.0", _enum.DhcpPort.CLIENT),
+            client_mac=b"",
+        )
+        self._server_id = _ty.cast(_net.IPv4, SERVER_INTERFACE.ip)
+        self._events: list[tuple[float, int, int, int, int]] = []
+        self._seq = _itertools.count()
+        self._xid = _itertools.count(1)
+        # Per client: the leased address, the lease's generation (bumped to
+        # cancel its timers), when it was bound and how long it is for.
+        self._ip: list[_ty.Optional[_net.IPv4]] = [None] * clients
+        self._generation = [0] * clients
+        self._bound = [0.0] * clients
+        self._granted = [0] * clients
+        self._start = self.clock.time()
+        self.report = ChurnReport(clients=clients, pool_size=size, duration=0.0)
+        for index in range(clients):
+            self._schedule(self._start + self._random.expovariate(1 / mean_offline), _ARRIVE, index)
+        self._schedule(self._start + tick_interval, _TICK)
+        self._schedule(self._start, _SAMPLE)
+
+    def chaddr(self, index: int) -> bytes:
+        """The hardware address of client `index`, locally administered."""
+        return b"\x02" + index.to_bytes(5, "big")
+
+    def client_id(self, index: int) -> str:
+        """The id the server keys client `index`'s lease by, from its hardware address."""
+        return (bytes([_enum.HardwareAddressType.ETHERNET]) + self.chaddr(index)).hex(":").upper()
+
+    def run(self, duration: float = 86400.0) -> ChurnReport:
+        """Simulate `duration` more seconds and return the report, which covers every run so far."""
+        end = self.clock.time() + duration
+        self.report.duration += duration
+        tracing = self.trace_memory and not _tracemalloc.is_tracing()
+        if tracing:
+            _tracemalloc.start()
+        try:
+            events = self._events
+            while events and events[0][0] <= end:
+                when, _, kind, index, generation = _heapq.heappop(events)
+                self.clock.advance_to(when)
+                if kind == _TICK:
+                    self.server.tick()
+                    self._schedule(when + self.tick_interval, _TICK)
+                elif kind == _SAMPLE:
+                    self._sample()
+                    self._schedule(when + self.sample_interval, _SAMPLE)
+                elif kind == _ARRIVE:
+                    self._schedule(when + self._random.expovariate(1 / self.mean_online), _DEPART, index)
+                    self._init(index)
+                elif kind == _DEPART:
+                    self._depart(index)
+                elif generation != self._generation[index]:
+                    continue
+                elif kind == _RETRY:
+                    self._init(index)
+                elif kind == _RENEW:
+                    self._renew(index, rebind=False)
+                elif kind == _REBIND:
+                    self._renew(index, rebind=True)
+                elif kind == _EXPIRE:
+                    self.report.client_expiries += 1
+                    self._ip[index] = None
+                    self._init(index)
+            self.clock.advance_to(end)
+            samples = self.report.samples
+            if not samples or samples[-1].time < end - self._start:
+                self._sample()
+        finally:
+            if tracing:
+                peak = _tracemalloc.get_traced_memory()[1]
+                self.report.peak_traced_bytes = max(peak, self.report.peak_traced_bytes or 0)
+                _tracemalloc.stop()
+        return self.report
+
+    def _schedule(self, when: float, kind: int, index: int = -1, generation: int = 0) -> None:
+        _heapq.heappush(self._events, (when, next(self._seq), kind, index, generation))
+
+    def _exchange(self, msg: DhcpMessage) -> _ty.Optional[DhcpMessage]:
+        self.report.packets += 1
+        sent = self._transport.sent
+        sent.clear()
+        self.server.handle(msg, self._context)
+        if not sent:
+            return None
+        return DhcpMessage.decode(memoryview(sent[-1]))
+
+    def _ask(self, msg: DhcpMessage) -> DhcpMessage:
+        msg.options[DhcpOptionCode.IP_ADDRESS_LEASE_TIME] = self.lease_time
+        return msg
+
+    def _unanswered(self, index: int) -> None:
+        self.report.discovers_unanswered += 1
+        if self.report.exhausted_at is None:
+            self.report.exhausted_at = self.clock.time() - self._start
+        self._schedule(self.clock.time() + self.retry_interval, _RETRY, index, self._generation[index])
+
+    def _init(self, index: int) -> None:
+        chaddr = self.chaddr(index)
+        self._generation[index] += 1
+        if not self.wire:
+            self._acquire(index)
+            return
+        offer = self._exchange(self._ask(self._builder.build_discover(chaddr, xid=next(self._xid))))
+        if offer is None or offer.yiaddr == _net.WILDCARD_IPv4:
+            self._unanswered(index)
+            return
+        request = self._builder.build_request(
+            chaddr, xid=offer.xid, requested_ip=offer.yiaddr, server_identifier=self._server_id
+        )
+        self._handle_ack(index, self._exchange(self._ask(request)), retry=True)
+
+    def _renew(self, index: int, rebind: bool) -> None:
+        ip = self._ip[index]
+        if ip is None:
+            return
+        if rebind:
+            self.report.rebinds += 1
+        else:
+            self.report.renewals += 1
+        if self.loss and self._random.random() < self.loss:
+            self._lost(index, rebind)
+            return
+        if not self.wire:
+            self._renew_lease(index)
+            return
+        request = self._builder.build_request(self.chaddr(index), xid=next(self._xid), ciaddr=ip, broadcast=rebind)
+        reply = self._exchange(self._ask(request))
+        if reply is None:
+            self._lost(index, rebind)
+            return
+        self._handle_ack(index, reply, retry=False)
+
+    def _lost(self, index: int, rebind: bool) -> None:
+        granted = self._granted[index]
+        if rebind:
+            self._schedule(self._bound[index] + granted, _EXPIRE, index, self._generation[index])
+        else:
+            self._schedule(self._bound[index] + granted * 7 / 8, _REBIND, index, self._generation[index])
+
+    def _handle_ack(self, index: int, reply: _ty.Optional[DhcpMessage], retry: bool) -> None:
+        if reply is None or reply.options.get(DhcpOptionCode.DHCP_MESSAGE_TYPE) is not _enum.DhcpMessageType.DHCPACK:
+            if reply is not None:
+                self.report.naks += 1
+            self._ip[index] = None
+            if retry:
+                self._generation[index] += 1
+                self._schedule(self.clock.time() + self.retry_interval, _RETRY, index, self._generation[index])
+            else:
+                self._init(index)
+            return
+        granted = reply.options.get(DhcpOptionCode.IP_ADDRESS_LEASE_TIME, decode=_type.U32)
+        self._bind(index, reply.yiaddr, int(granted) if granted is not None else self.lease_time)
+
+    def _bind(self, index: int, ip: _ty.Optional[_net.IPv4], granted: int) -> None:
+        now = self.clock.time()
+        self._generation[index] += 1
+        self._ip[index] = ip
+        self._bound[index] = now
+        self._granted[index] = granted
+        self._schedule(now + granted / 2, _RENEW, index, self._generation[index])
+
+    def _bind_lease(self, index: int, lease: DhcpLease) -> None:
+        expires = lease.expires
+        if isinstance(expires, _dt.datetime):
+            granted = int(expires.timestamp() - self.clock.time())
+        else:
+            granted = self.lease_time
+        self._bind(index, lease.ip, granted)
+
+    def _acquire(self, index: int) -> None:
+        """DISCOVER and REQUEST without the messages: reuse the client's lease or allocate one."""
+        self.report.packets += 2
+        server = self.server
+        backend = self._backend
+        client_id = self.client_id(index)
+        lease = backend.lookup(client_id)
+        if lease is not None:
+            lease = backend.renew(client_id, self.lease_time)
+            if lease is not None:
+                server.metrics.leases_renewed += 1
+        else:
+            ip = self.allocator.select(client_id, self.pool, lambda ip: server.address_in_use(ip, client_id))
+            if ip is not None:
+                allocate_if_free = getattr(backend, "allocate_if_free", None)
+                allocate = allocate_if_free if allocate_if_free is not None else backend.allocate
+                lease = allocate(client_id, ip, self.lease_time, chaddr=self.chaddr(index))
+                if lease is not None:
+                    server.metrics.leases_allocated += 1
+        if lease is None:
+            self._unanswered(index)
+            return
+        self._bind_lease(index, lease)
+
+    def _renew_lease(self, index: int) -> None:
+        """A renewal or rebind without the messages."""
+        self.report.packets += 1
+        lease = self._backend.renew(self.client_id(index), self.lease_time)
+        if lease is None:
+            self.report.naks += 1
+            self._ip[index] = None
+            self._init(index)
+            return
+        self.server.metrics.leases_renewed += 1
+        self._bind_lease(index, lease)
+
+    def _depart(self, index: int) -> None:
+        self._generation[index] += 1
+        ip = self._ip[index]
+        self._ip[index] = None
+        if ip is not None and self._random.random() < self.release_ratio:
+            self.report.releases += 1
+            if self.wire:
+                release = self._builder.build_release(
+                    self.chaddr(index), ciaddr=ip, server_identifier=self._server_id, xid=next(self._xid)
+                )
+                self._exchange(release)
+            else:
+                self.report.packets += 1
+                if self._backend.release(self.client_id(index)):
+                    self.server.metrics.leases_released += 1
+        self._schedule(self.clock.time() + self._random.expovariate(1 / self.mean_offline), _ARRIVE, index)
+
+    def _sample(self) -> None:
+        metrics = self.server.metrics
+        report = self.report
+        report.backend_writes = (
+            metrics.leases_allocated + metrics.leases_renewed + metrics.leases_released + metrics.leases_reclaimed
+        )
+        backend = self.server.lease_backend
+        persisted = getattr(backend, "seq", None)
+        if persisted is None:
+            persisted = getattr(backend, "saves", None)
+        report.persisted_writes = persisted
+        if isinstance(backend, _abc.Sized):
+            leases = len(backend)
+        else:
+            leases = sum(1 for _ in self._backend.iter_leases())
+        report.peak_leases = max(report.peak_leases, leases)
+        traced = _tracemalloc.get_traced_memory()[0] if _tracemalloc.is_tracing() else None
+        report.samples.append(ChurnSample(
+            time=self.clock.time() - self._start,
+            leases=leases,
+            offers_held=len(self.server.offers),
+            backend_writes=report.backend_writes,
+            persisted_writes=persisted,
+            traced_bytes=traced,
+        ))
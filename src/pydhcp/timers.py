@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import heapq as _heapq
+import typing as _ty
+
+K = _ty.TypeVar("K", bound=_ty.Hashable)
+
+
+class ExpiryHeap(_ty.Generic[K]):
+    """Deadline index over hashable keys.
+
+    A binary heap of ``(deadline, seq, key)`` entries plus a ``key -> deadline``
+    map. Rescheduling or discarding a key leaves its old heap entry behind;
+    stale entries are skipped when they reach the top, so scheduling is
+    O(log n) and expiring ``k`` keys is O(k log n) -- nothing ever scans the
+    live set. The heap is rebuilt once stale entries outnumber live ones, which
+    keeps memory proportional to the number of scheduled keys.
+    """
+
+    def __init__(self) -> None:
+        self._deadlines: _ty.Dict[K, float] = {}
+        self._heap: _ty.List[tuple[float, int, K]] = []
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._deadlines
+
+    def deadline(self, key: K) -> _ty.Optional[float]:
+        return self._deadlines.get(key)
+
+    def schedule(self, key: K, deadline: float) -> None:
+        """Set (or move) the deadline of ``key``."""
+        self._deadlines[key] = deadline
+        self._seq += 1
+        # The sequence number breaks deadline ties so keys never get compared.
+        _heapq.heappush(self._heap, (deadline, self._seq, key))
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._compact()
+
+    def schedule_many(self, items: _ty.Iterable[tuple[K, float]]) -> None:
+        """Schedule many ``(key, deadline)`` pairs, heapifying once: O(n) rather than O(n log n)."""
+        deadlines = self._deadlines
+        heap = self._heap
+        seq = self._seq
+        for key, deadline in items:
+            seq += 1
+            deadlines[key] = deadline
+            heap.append((deadline, seq, key))
+        self._seq = seq
+        if len(heap) > 2 * len(deadlines) + 64:
+            self._compact()
+        else:
+            _heapq.heapify(heap)
+
+    def discard(self, key: K) -> bool:
+        """Forget ``key``; its heap entry goes stale and is dropped lazily."""
+        return self._deadlines.pop(key, None) is not None
+
+    def next_deadline(self) -> _ty.Optional[float]:
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_expired(self, now: float) -> _ty.List[K]:
+        """Remove and return every key whose deadline is at or before ``now``."""
+        expired: _ty.List[K] = []
+        heap = self._heap
+        deadlines = self._deadlines
+        while heap and heap[0][0] <= now:
+            deadline, _, key = _heapq.heappop(heap)
+            if deadlines.get(key) == deadline:
+                del deadlines[key]
+                expired.append(key)
+        return expired
+
+    def clear(self) -> None:
+        self._deadlines.clear()
+        self._heap.clear()
+
+    def _drop_stale(self) -> None:
+        heap = self._heap
+        while heap and self._deadlines.get(heap[0][2]) != heap[0][0]:
+            _heapq.heappop(heap)
+
+    def _compact(self) -> None:
+        self._heap = [
+            (deadline, seq, key)
+            for deadline, seq, key in self._heap
+            if self._deadlines.get(key) == deadline
+        ]
+        _heapq.heapify(self._heap)
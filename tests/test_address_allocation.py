@@ -0,0 +1,159 @@
+import ipaddress
+from datetime import timedelta
+from unittest.mock import Mock
+
+import pytest
+
+from pydhcp import DhcpMessage, DhcpOptions, InMemoryLeaseBackend, NetworkInterface, RequestContext
+from pydhcp.allocation import AddressPool, HashAllocator, SequentialAllocator, pools_from_config
+from pydhcp.packet import DhcpMessageType, Flags, HardwareAddressType, OpCode
+from pydhcp.options import DhcpOptionCode
+from pydhcp.network import IPv4, SocketAddress
+from pydhcp.server import DhcpServer
+
+
+def _pool(first: str = "10.0.0.10", last: str = "10.0.0.19", **kwargs) -> AddressPool:
+    return AddressPool(IPv4(first), IPv4(last), **kwargs)
+
+
+def test_pool_indexes_addresses() -> None:
+    pool = _pool()
+    assert len(pool) == 10
+    assert pool.address(3) == IPv4("10.0.0.13")
+    assert pool.index(IPv4("10.0.0.19")) == 9
+    assert IPv4("10.0.0.20") not in pool
+    with pytest.raises(ValueError):
+        _pool("10.0.0.5", "10.0.0.1")
+
+
+def test_pool_splits_into_contiguous_parts() -> None:
+    pool = _pool(exclude=[IPv4("10.0.0.13")], classes=["voip"])
+    parts = pool.split(3)
+    assert [(str(part.first), str(part.last)) for part in parts] == [
+        ("10.0.0.10", "10.0.0.13"),
+        ("10.0.0.14", "10.0.0.16"),
+        ("10.0.0.17", "10.0.0.19"),
+    ]
+    assert parts[0].exclude == {IPv4("10.0.0.13")}
+    assert not parts[1].exclude
+    assert parts[2].classes == {"voip"}
+    with pytest.raises(ValueError):
+        pool.split(11)
+
+
+def test_sequential_allocator_is_next_fit() -> None:
+    pool = _pool(exclude=[IPv4("10.0.0.10")])
+    allocator = SequentialAllocator()
+    taken = set()
+    for client in "abc":
+        ip = allocator.select(client, pool, taken.__contains__)
+        taken.add(ip)
+    assert sorted(taken) == [IPv4("10.0.0.11"), IPv4("10.0.0.12"), IPv4("10.0.0.13")]
+
+
+def test_hash_allocator_is_deterministic_and_probes_linearly() -> None:
+    pool = _pool()
+    first = HashAllocator().select("client-a", pool, lambda ip: False)
+    assert HashAllocator().select("client-a", pool, lambda ip: False) == first
+
+    home = HashAllocator().home("client-a", pool)
+    probed = HashAllocator().select("client-a", pool, lambda ip: ip == first)
+    assert probed == pool.address((home + 1) % len(pool))
+
+    assert HashAllocator().select("client-a", pool, lambda ip: True) is None
+    assert HashAllocator(salt=b"site-2").home("client-a", _pool("10.0.0.0", "10.0.255.255")) != HashAllocator().home(
+        "client-a", _pool("10.0.0.0", "10.0.255.255")
+    )
+
+
+def test_pools_from_config_share_the_subnet_declarations() -> None:
+    pools = pools_from_config({
+        "subnets": [{"subnet": "10.0.0.0/24", "pools": [{"range": "10.0.0.10-10.0.0.19", "classes": ["voip"]}]}],
+        "shared_networks": [{"subnets": [{"subnet": "10.0.1.0/24", "pools": [{"range": ["10.0.1.5", "10.0.1.6"], "exclude": ["10.0.1.6"]}]}]}],
+    })
+    assert [(str(pool.first), str(pool.last)) for pool in pools] == [("10.0.0.10", "10.0.0.19"), ("10.0.1.5", "10.0.1.6")]
+    assert not pools[0].admits(())
+    assert pools[0].admits(("voip",))
+    assert pools[1].exclude == {IPv4("10.0.1.6")}
+
+
+def _discover(chaddr: bytes) -> DhcpMessage:
+    options = DhcpOptions()
+    options[DhcpOptionCode.DHCP_MESSAGE_TYPE] = DhcpMessageType.DHCPDISCOVER
+    return DhcpMessage(
+        op=OpCode.BOOTREQUEST,
+        htype=HardwareAddressType.ETHERNET,
+        hlen=6,
+        hops=0,
+        xid=1,
+        secs=timedelta(seconds=0),
+        flags=Flags.UNICAST,
+        ciaddr=IPv4("0.0.0.0"),
+        yiaddr=IPv4("0.0.0.0"),
+        siaddr=IPv4("0.0.0.0"),
+        giaddr=IPv4("0.0.0.0"),
+        chaddr=chaddr,
+        sname="",
+        file="",
+        options=options,
+    )
+
+
+def test_server_offers_hashed_addresses_from_its_interface_pool() -> None:
+    pools = [
+        AddressPool(IPv4("10.9.0.10"), IPv4("10.9.0.19"), ipaddress.IPv4Network("10.9.0.0/24")),
+        AddressPool(IPv4("127.0.0.100"), IPv4("127.0.0.101"), ipaddress.IPv4Network("127.0.0.0/8")),
+    ]
+    server = DhcpServer(allocator=HashAllocator(), pools=pools)
+    context = RequestContext(
+        transport=Mock(),
+        interface=NetworkInterface("lo", ipaddress.IPv4Interface("127.0.0.1/8")),
+        client=SocketAddress("127.0.0.1", 68),
+        client_mac=b"\x00" * 6,
+    )
+
+    offered = []
+    for i in range(3):
+        msg = _discover(bytes([0, 0, 0, 0, 0, i]))
+        lease = server.acquire_lease(msg.client_id(), IPv4("127.0.0.1"), msg)
+        if lease is not None:
+            server._hold_offer(msg.client_id(), lease.ip)
+            offered.append(lease.ip)
+    # Two addresses in the local pool; held offers keep the third client out.
+    assert sorted(offered) == [IPv4("127.0.0.100"), IPv4("127.0.0.101")]
+    assert DhcpServer().allocate_address("x", _discover(b"\x00" * 6), ipaddress.IPv4Network("127.0.0.0/8")) is None
+
+
+def test_an_allocator_needs_a_backend_that_looks_leases_up_by_address(tmp_path) -> None:
+    from pydhcp.lease.mmapped import MmapLeaseBackend
+
+    backend = MmapLeaseBackend(str(tmp_path / "leases.mmap"), capacity=64)
+    pools = [AddressPool(IPv4("127.0.0.100"), IPv4("127.0.0.101"), ipaddress.IPv4Network("127.0.0.0/8"))]
+    try:
+        with pytest.raises(TypeError, match="cannot look leases up by address"):
+            DhcpServer(lease_backend=backend, allocator=HashAllocator(), pools=pools)
+
+        # Set afterwards, as the command line does, the allocator is refused when first used.
+        server = DhcpServer(lease_backend=backend)
+        server.allocator = HashAllocator()
+        server.pools = pools
+        with pytest.raises(TypeError, match="cannot look leases up by address"):
+            server.allocate_address("x", _discover(b"\x00" * 6), ipaddress.IPv4Network("127.0.0.0/8"))
+    finally:
+        backend.close()
+
+
+class _NoCheckAndSet(InMemoryLeaseBackend):
+    allocate_if_free = None  # leaves the server to check the address itself
+
+
+@pytest.mark.parametrize("backend", [InMemoryLeaseBackend, _NoCheckAndSet])
+def test_a_requested_address_leased_to_another_client_is_refused(backend) -> None:
+    server = DhcpServer(lease_backend=backend())
+    leases = []
+    for i in range(2):
+        msg = _discover(bytes([0, 0, 0, 0, 0, i]))
+        msg.options[DhcpOptionCode.REQUESTED_IP] = IPv4("127.0.0.5")
+        leases.append(server.acquire_lease(msg.client_id(), IPv4("127.0.0.1"), msg))
+    assert leases[0] is not None and leases[1] is None
+    assert server.lease_backend.lookup_ip(IPv4("127.0.0.5"))[0] == _discover(b"\x00" * 6).client_id()
@@ -68,3 +68,25 @@ def test_async_server_lifecycle():
             client_sock.close()
             
     asyncio.run(run_test())
+
+
+def test_async_listener_ticks_while_started():
+    class TickingServer(AsyncDhcpServer):
+        TICK_INTERVAL = 0.01
+        ticks = 0
+
+        def tick(self):
+            self.ticks += 1
+
+    async def run_test():
+        server = TickingServer(listen=[("127.0.0.1", 10068)])
+        await server.start()
+        await asyncio.sleep(0.1)
+        await server.stop()
+        ticks = server.ticks
+        await asyncio.sleep(0.05)
+        return ticks, server.ticks
+
+    ticks, after_stop = asyncio.run(run_test())
+    assert ticks >= 2
+    assert after_stop == ticks
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import importlib.util
+import json
+from pathlib import Path
+
+
+def _load_module():
+    script_path = Path(__file__).resolve().parent.parent / "benchmarks" / "bench_allocation.py"
+    spec = importlib.util.spec_from_file_location("bench_allocation", script_path)
+    assert spec is not None
+    assert spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_run_benchmarks_compares_both_allocators(monkeypatch) -> None:
+    module = _load_module()
+    monkeypatch.setattr(module, "POOL_SIZE", 64)
+    monkeypatch.setattr(module.timeit, "timeit", lambda func, number: 2.0)
+
+    results = module.run_benchmarks(iterations=1)
+
+    assert list(results) == [
+        "sequential_allocate_51_clients",
+        "sequential_restart_stability",
+        "hash_allocate_51_clients",
+        "hash_restart_stability",
+    ]
+    assert results["hash_allocate_51_clients"]["ops_per_sec"] == 25.5
+    assert results["hash_restart_stability"]["clients"] == 51
+    assert results["hash_restart_stability"]["same_address_ratio"] > results["sequential_restart_stability"]["same_address_ratio"]
+
+
+def test_write_json_report_creates_expected_payload(tmp_path, monkeypatch) -> None:
+    module = _load_module()
+    monkeypatch.setattr(module, "POOL_SIZE", 16)
+    output_path = tmp_path / "benchmarks" / "bench_allocation.json"
+    results = module._measure_benchmarks(iterations=1)
+
+    module.write_json_report(output_path, 1, results)
+
+    payload = json.loads(output_path.read_text(encoding="utf-8"))
+    assert payload["benchmark"] == "bench_allocation"
+    assert payload["metrics"]["hash_allocate_12_clients"]["iterations"] == 1
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import importlib.util
+import json
+from pathlib import Path
+
+
+def _load_module():
+    script_path = Path(__file__).resolve().parent.parent / "benchmarks" / "bench_churn.py"
+    spec = importlib.util.spec_from_file_location("bench_churn", script_path)
+    assert spec is not None
+    assert spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_run_benchmarks_covers_every_scenario(monkeypatch) -> None:
+    module = _load_module()
+    monkeypatch.setattr(module, "DURATION", 6 * 3600.0)
+    monkeypatch.setattr(module, "EXHAUSTION_CLIENTS", 40)
+    monkeypatch.setattr(module, "TRACED_CLIENTS", 20)
+
+    results = module.run_benchmarks(iterations=100)
+
+    assert list(results) == [
+        "in_memory_100_clients",
+        "direct_100_clients",
+        "journal_100_clients",
+        "quarter_pool_40_clients",
+        "traced_20_clients",
+    ]
+    assert results["in_memory_100_clients"]["packets"] > 0
+    assert results["direct_100_clients"]["packets"] == results["in_memory_100_clients"]["packets"]
+    assert results["journal_100_clients"]["persisted_writes"] > 0
+    assert results["quarter_pool_40_clients"]["pool_size"] == 10
+    assert results["traced_20_clients"]["traced_bytes_per_lease"] > 0
+
+
+def test_write_json_report_creates_expected_payload(tmp_path, monkeypatch) -> None:
+    module = _load_module()
+    monkeypatch.setattr(module, "DURATION", 3600.0)
+    output_path = tmp_path / "benchmarks" / "bench_churn.json"
+    results = module._measure_benchmarks(iterations=20)
+
+    module.write_json_report(output_path, 20, results)
+
+    payload = json.loads(output_path.read_text(encoding="utf-8"))
+    assert payload["benchmark"] == "bench_churn"
+    assert payload["metrics"]["in_memory_20_clients"]["clients"] == 20
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import importlib.util
+import json
+from pathlib import Path
+
+
+def _load_module():
+    script_path = Path(__file__).resolve().parent.parent / "benchmarks" / "bench_journal.py"
+    spec = importlib.util.spec_from_file_location("bench_journal", script_path)
+    assert spec is not None
+    assert spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_run_benchmarks_covers_file_and_every_fsync_policy(monkeypatch) -> None:
+    module = _load_module()
+    monkeypatch.setattr(module, "LEASES", 50)
+
+    results = module.run_benchmarks(iterations=10)
+
+    assert list(results) == [
+        "file_allocate_50_leases",
+        "journal_always_allocate_50_leases",
+        "journal_group_allocate_50_leases",
+        "journal_interval_allocate_50_leases",
+        "journal_none_allocate_50_leases",
+        "journal_startup_50_leases",
+        "journal_compact_50_leases",
+    ]
+    assert results["file_allocate_50_leases"]["iterations"] == module.FILE_WRITES
+    assert results["journal_group_allocate_50_leases"]["iterations"] == 10
+    assert results["journal_startup_50_leases"]["replayed_records"] == 10
+
+
+def test_write_json_report_creates_expected_payload(tmp_path, monkeypatch) -> None:
+    module = _load_module()
+    monkeypatch.setattr(module, "LEASES", 20)
+    output_path = tmp_path / "benchmarks" / "bench_journal.json"
+    results = module._measure_benchmarks(iterations=2)
+
+    module.write_json_report(output_path, 2, results)
+
+    payload = json.loads(output_path.read_text(encoding="utf-8"))
+    assert payload["benchmark"] == "bench_journal"
+    assert payload["metrics"]["journal_none_allocate_20_leases"]["iterations"] == 2
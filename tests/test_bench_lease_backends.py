@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import importlib.util
+import json
+from pathlib import Path
+
+
+def _load_module():
+    script_path = Path(__file__).resolve().parent.parent / "benchmarks" / "bench_lease_backends.py"
+    spec = importlib.util.spec_from_file_location("bench_lease_backends", script_path)
+    assert spec is not None
+    assert spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_run_benchmarks_covers_every_backend(monkeypatch) -> None:
+    module = _load_module()
+    monkeypatch.setattr(module, "SIZES", (100,))
+
+    results = module.run_benchmarks(iterations=20)
+
+    for spec in module.BACKENDS:
+        assert results[f"{spec.name}_memory_100_leases"]["fill_seconds"] >= 0
+        for operation in module.OPERATIONS:
+            assert f"{spec.name}_{operation}_100_leases" in results
+        for operation in module.CONCURRENT_OPERATIONS:
+            assert f"{spec.name}_concurrent_{operation}_100_leases" in results
+    assert results["memory_lookup_100_leases"]["ops"] == 20
+    assert results["file_json_allocate_100_leases"]["ops"] == 5
+    assert results["memory_sweep_100_leases"]["swept"] == 120
+    assert results["mmap_sweep_100_leases"]["swept"] == 120
+    latency = results["sqlite_renew_100_leases"]
+    assert latency["p50_us"] <= latency["p99_us"] <= latency["p99_9_us"] <= latency["max_us"]
+    assert results["memory_memory_100_leases"]["bytes_per_lease"] > 0
+    assert results["sqlite_memory_100_leases"]["disk_bytes_per_lease"] > 0
+
+
+def test_sizes_above_a_backends_limit_are_skipped() -> None:
+    module = _load_module()
+
+    results = module._measure_benchmarks(iterations=10, sizes=(200_000,), backends=("file_json",))
+
+    assert results == {}
+
+
+def test_write_json_report_creates_expected_payload(tmp_path) -> None:
+    module = _load_module()
+    output_path = tmp_path / "benchmarks" / "bench_lease_backends.json"
+    results = module._measure_benchmarks(iterations=10, sizes=(50,), backends=("memory",))
+
+    module.write_json_report(output_path, 10, results)
+
+    payload = json.loads(output_path.read_text(encoding="utf-8"))
+    assert payload["benchmark"] == "bench_lease_backends"
+    assert payload["metrics"]["memory_lookup_50_leases"]["ops"] == 10
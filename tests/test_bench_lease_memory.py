@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import importlib.util
+import json
+from pathlib import Path
+
+
+def _load_module():
+    script_path = Path(__file__).resolve().parent.parent / "benchmarks" / "bench_lease_memory.py"
+    spec = importlib.util.spec_from_file_location("bench_lease_memory", script_path)
+    assert spec is not None
+    assert spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_compact_records_use_less_memory_than_tuples(monkeypatch) -> None:
+    module = _load_module()
+    monkeypatch.setattr(module, "LEGACY_LEASES", 200)
+
+    results = module.run_benchmarks(iterations=500)
+
+    assert list(results) == ["legacy_tuples_200_leases", "in_memory_records_500_leases"]
+    assert results["in_memory_records_500_leases"]["leases"] == 500
+    assert results["in_memory_records_500_leases"]["bytes_per_lease"] < results["legacy_tuples_200_leases"]["bytes_per_lease"] / 2
+
+
+def test_write_json_report_creates_expected_payload(tmp_path) -> None:
+    module = _load_module()
+    output_path = tmp_path / "benchmarks" / "bench_lease_memory.json"
+    results = module._measure_benchmarks(iterations=50)
+
+    module.write_json_report(output_path, 50, results)
+
+    payload = json.loads(output_path.read_text(encoding="utf-8"))
+    assert payload["benchmark"] == "bench_lease_memory"
+    assert payload["metrics"]["in_memory_records_50_leases"]["leases"] == 50
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import importlib.util
+import json
+from pathlib import Path
+
+
+def _load_module():
+    script_path = Path(__file__).resolve().parent.parent / "benchmarks" / "bench_snapshot.py"
+    spec = importlib.util.spec_from_file_location("bench_snapshot", script_path)
+    assert spec is not None
+    assert spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_run_benchmarks_times_both_formats() -> None:
+    module = _load_module()
+
+    results = module.run_benchmarks(iterations=200)
+
+    assert list(results) == [
+        "json_startup_200_leases",
+        "binary_startup_200_leases",
+        "binary_write_200_leases",
+        "binary_startup_half_expired_200_leases",
+    ]
+    assert results["json_startup_200_leases"]["loaded"] == 200
+    assert results["binary_startup_200_leases"]["loaded"] == 200
+    assert results["binary_startup_half_expired_200_leases"]["loaded"] == 100
+    assert results["binary_startup_200_leases"]["file_bytes"] < results["json_startup_200_leases"]["file_bytes"] / 3
+
+
+def test_write_json_report_creates_expected_payload(tmp_path) -> None:
+    module = _load_module()
+    output_path = tmp_path / "benchmarks" / "bench_snapshot.json"
+    results = module._measure_benchmarks(iterations=20)
+
+    module.write_json_report(output_path, 20, results)
+
+    payload = json.loads(output_path.read_text(encoding="utf-8"))
+    assert payload["benchmark"] == "bench_snapshot"
+    assert payload["metrics"]["binary_startup_20_leases"]["loaded"] == 20
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import importlib.util
+import json
+from pathlib import Path
+
+
+def _load_module():
+    script_path = Path(__file__).resolve().parent.parent / "benchmarks" / "bench_sqlite.py"
+    spec = importlib.util.spec_from_file_location("bench_sqlite", script_path)
+    assert spec is not None
+    assert spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_run_benchmarks_times_each_operation(monkeypatch) -> None:
+    module = _load_module()
+    monkeypatch.setattr(module, "ROWS", 200)
+
+    results = module.run_benchmarks(iterations=20)
+
+    assert list(results) == [
+        "populate_200_rows",
+        "allocate_200_rows",
+        "renew_200_rows",
+        "allocate_batched_200_rows",
+        "renew_batched_200_rows",
+        "lookup_200_rows",
+        "lookup_ip_200_rows",
+        "expired_query_200_rows",
+    ]
+    assert results["populate_200_rows"]["rows"] == 200
+    assert results["lookup_ip_200_rows"]["iterations"] == 20
+
+
+def test_write_json_report_creates_expected_payload(tmp_path, monkeypatch) -> None:
+    module = _load_module()
+    monkeypatch.setattr(module, "ROWS", 50)
+    output_path = tmp_path / "benchmarks" / "bench_sqlite.json"
+    results = module._measure_benchmarks(iterations=2)
+
+    module.write_json_report(output_path, 2, results)
+
+    payload = json.loads(output_path.read_text(encoding="utf-8"))
+    assert payload["benchmark"] == "bench_sqlite"
+    assert payload["metrics"]["renew_50_rows"]["iterations"] == 2
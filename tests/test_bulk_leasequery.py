@@ -0,0 +1,139 @@
+import itertools
+import socket
+import time
+from datetime import timedelta
+
+import pytest
+
+from pydhcp import DhcpMessage, DhcpOptions, InMemoryLeaseBackend
+from pydhcp.leasequery import BulkLeaseQueryListener, frame, read_frame, relay_suboption
+from pydhcp.packet import DhcpMessageType, Flags, HardwareAddressType, OpCode
+from pydhcp.options import DhcpOptionCode
+from pydhcp.options.type import RelayAgentInformation, TlvOption
+from pydhcp.network import IPv4
+from pydhcp.server import DhcpServer
+
+
+def _query(chaddr: bytes = b"", **options) -> DhcpMessage:
+    opts = DhcpOptions()
+    opts[DhcpOptionCode.DHCP_MESSAGE_TYPE] = DhcpMessageType.DHCPBULKLEASEQUERY
+    for code, value in options.items():
+        opts[DhcpOptionCode[code]] = value
+    return DhcpMessage(
+        op=OpCode.BOOTREQUEST,
+        htype=HardwareAddressType.ETHERNET,
+        hlen=len(chaddr),
+        hops=0,
+        xid=0x00C0FFEE,
+        secs=timedelta(seconds=0),
+        flags=Flags.UNICAST,
+        ciaddr=IPv4("0.0.0.0"),
+        yiaddr=IPv4("0.0.0.0"),
+        siaddr=IPv4("0.0.0.0"),
+        giaddr=IPv4("0.0.0.0"),
+        chaddr=chaddr,
+        sname="",
+        file="",
+        options=opts,
+    )
+
+
+def _relay_info(remote_id: bytes) -> RelayAgentInformation:
+    return RelayAgentInformation([TlvOption(1, b"port-1"), TlvOption(2, remote_id), TlvOption(12, b"relay-a")])
+
+
+@pytest.fixture
+def server() -> DhcpServer:
+    backend = InMemoryLeaseBackend()
+    for i in range(10):
+        options = DhcpOptions()
+        options[DhcpOptionCode.RELAY_AGENT_INFORMATION] = _relay_info(b"even" if i % 2 == 0 else b"odd")
+        backend.allocate(f"01:00:00:00:00:00:{i:02X}", IPv4(f"10.0.0.{i + 10}"), 3600, options, chaddr=bytes([0, 0, 0, 0, 0, i]))
+    return DhcpServer(lease_backend=backend)
+
+
+def _types(replies) -> list:
+    return [reply.options.get(DhcpOptionCode.DHCP_MESSAGE_TYPE) for reply in replies]
+
+
+def test_relay_suboption_scans_raw_bytes() -> None:
+    raw = bytearray()
+    _relay_info(b"abc")._dhcp_write(raw)
+    assert relay_suboption(raw, 2) == b"abc"
+    assert relay_suboption(raw, 12) == b"relay-a"
+    assert relay_suboption(raw, 9) is None
+
+
+def test_all_active_leases_stream_then_done(server: DhcpServer) -> None:
+    bulk = BulkLeaseQueryListener(server, listen=[("127.0.0.1", 0)])
+    replies = list(bulk.iter_replies(_query(), IPv4("127.0.0.1")))
+
+    assert _types(replies) == [DhcpMessageType.DHCPLEASEACTIVE] * 10 + [DhcpMessageType.DHCPLEASEQUERYDONE]
+    assert {reply.ciaddr for reply in replies[:-1]} == {IPv4(f"10.0.0.{i + 10}") for i in range(10)}
+    assert all(reply.xid == 0x00C0FFEE for reply in replies)
+    assert all(reply.options.get(DhcpOptionCode.BASE_TIME) is not None for reply in replies)
+
+
+def test_filters_by_remote_id_relay_id_and_chaddr(server: DhcpServer) -> None:
+    bulk = BulkLeaseQueryListener(server, listen=[("127.0.0.1", 0)])
+    server_id = IPv4("127.0.0.1")
+
+    odd = list(bulk.iter_replies(_query(RELAY_AGENT_INFORMATION=RelayAgentInformation([TlvOption(2, b"odd")])), server_id))
+    assert len(odd) == 6
+
+    other_relay = list(bulk.iter_replies(_query(RELAY_AGENT_INFORMATION=RelayAgentInformation([TlvOption(12, b"relay-b")])), server_id))
+    assert _types(other_relay) == [DhcpMessageType.DHCPLEASEQUERYDONE]
+
+    by_mac = list(bulk.iter_replies(_query(bytes([0, 0, 0, 0, 0, 3])), server_id))
+    assert [reply.ciaddr for reply in by_mac[:-1]] == [IPv4("10.0.0.13")]
+
+
+def test_filters_by_query_start_time(server: DhcpServer) -> None:
+    bulk = BulkLeaseQueryListener(server, listen=[("127.0.0.1", 0)])
+    future = int(time.time()) + 60
+    replies = list(bulk.iter_replies(_query(QUERY_START_TIME=future), IPv4("127.0.0.1")))
+    assert _types(replies) == [DhcpMessageType.DHCPLEASEQUERYDONE]
+
+
+def test_non_bulk_query_gets_status(server: DhcpServer) -> None:
+    bulk = BulkLeaseQueryListener(server, listen=[("127.0.0.1", 0)])
+    query = _query()
+    query.options[DhcpOptionCode.DHCP_MESSAGE_TYPE] = DhcpMessageType.DHCPDISCOVER
+    (reply,) = bulk.iter_replies(query, IPv4("127.0.0.1"))
+    assert reply.options.get(DhcpOptionCode.DHCP_MESSAGE_TYPE) == DhcpMessageType.DHCPLEASEQUERYSTATUS
+    assert reply.options.get(DhcpOptionCode.STATUS_CODE, decode=False)[0] == 3
+
+
+def test_tcp_session_streams_framed_replies(server: DhcpServer) -> None:
+    bulk = BulkLeaseQueryListener(server, listen=[("127.0.0.1", 0)], select_timeout=0.05)
+    thread = bulk.start()
+    try:
+        address = bulk.addresses[0]
+        with socket.create_connection(address.compat(), timeout=2.0) as conn:
+            for query in (_query(), _query(bytes([0, 0, 0, 0, 0, 4]))):
+                conn.sendall(frame(query.encode()))
+                replies = []
+                while True:
+                    reply = DhcpMessage.decode(read_frame(conn))
+                    replies.append(reply)
+                    if reply.options.get(DhcpOptionCode.DHCP_MESSAGE_TYPE) == DhcpMessageType.DHCPLEASEQUERYDONE:
+                        break
+            assert _types(replies) == [DhcpMessageType.DHCPLEASEACTIVE, DhcpMessageType.DHCPLEASEQUERYDONE]
+        assert server.metrics.leasequeries == 2
+    finally:
+        bulk.close()
+        if thread:
+            thread.join(timeout=1.0)
+
+
+def test_a_requester_that_stops_reading_is_dropped(server: DhcpServer) -> None:
+    bulk = BulkLeaseQueryListener(server, listen=[("127.0.0.1", 0)], send_timeout=0.2)
+    reply = next(bulk.iter_replies(_query(), IPv4("127.0.0.1")))
+    left, right = socket.socketpair()
+    with left, right:
+        left.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        started = time.monotonic()
+        with pytest.raises(socket.timeout):
+            bulk.send_replies(left, itertools.repeat(reply))
+        assert time.monotonic() - started < 2.0
+        assert left.gettimeout() is None
@@ -0,0 +1,166 @@
+import time
+
+from pydhcp import InMemoryLeaseBackend, IPv4
+from pydhcp.clock import VirtualClock
+from pydhcp.lease import LeaseQueryBackend
+from pydhcp.lease.cached import CachedLeaseBackend
+from pydhcp.lease.mmapped import MmapLeaseBackend
+from pydhcp.lease.threadsafe import ThreadSafeLeaseBackend
+from pydhcp.server import DhcpServer
+
+
+class CountingBackend(InMemoryLeaseBackend):
+    def __init__(self, clock=None) -> None:
+        super().__init__(clock)
+        self.lookups = 0
+
+    def lookup(self, client_id):
+        self.lookups += 1
+        return super().lookup(client_id)
+
+
+def test_hot_renewals_are_answered_from_the_cache() -> None:
+    inner = CountingBackend()
+    backend = CachedLeaseBackend(inner, size=2)
+    backend.allocate("a", IPv4("10.0.0.1"), 3600)
+    for _ in range(10):
+        assert backend.lookup("a").ip == IPv4("10.0.0.1")
+        assert backend.renew("a", 3600) is not None
+    assert inner.lookups == 0
+    assert backend.hits == 10
+    assert backend.hit_ratio == 1.0
+
+
+def test_lru_evicts_the_least_recently_used_lease() -> None:
+    inner = CountingBackend()
+    backend = CachedLeaseBackend(inner, size=2)
+    for i in range(1, 4):
+        inner.allocate(f"client-{i}", IPv4(f"10.0.0.{i}"), 3600)
+    backend.lookup("client-1")
+    backend.lookup("client-2")
+    backend.lookup("client-1")
+    backend.lookup("client-3")  # evicts client-2
+    assert inner.lookups == 3
+    backend.lookup("client-1")
+    assert inner.lookups == 3
+    backend.lookup("client-2")
+    assert inner.lookups == 4
+    assert len(backend) == 2
+    assert (backend.hits, backend.misses) == (2, 4)
+
+
+def test_unknown_clients_are_cached_until_the_negative_ttl_lapses() -> None:
+    inner = CountingBackend()
+    backend = CachedLeaseBackend(inner, negative_ttl=0.05)
+    assert backend.lookup("new") is None
+    assert backend.lookup("new") is None
+    assert inner.lookups == 1
+    time.sleep(0.06)
+    assert backend.lookup("new") is None
+    assert inner.lookups == 2
+
+    # Allocating through the cache replaces the negative entry.
+    backend.allocate("new", IPv4("10.0.0.9"), 3600)
+    assert backend.lookup("new").ip == IPv4("10.0.0.9")
+    assert inner.lookups == 2
+
+
+def test_release_and_expiry_are_not_served_stale() -> None:
+    backend = CachedLeaseBackend(InMemoryLeaseBackend())
+    backend.allocate("a", IPv4("10.0.0.1"), 3600)
+    assert backend.release("a") is True
+    assert backend.lookup("a") is None
+    backend.allocate("b", IPv4("10.0.0.2"), -1)
+    assert backend.lookup("b") is None
+
+
+def test_invalidate_drops_entries_written_behind_the_cache() -> None:
+    inner = InMemoryLeaseBackend()
+    backend = CachedLeaseBackend(inner)
+    backend.allocate("a", IPv4("10.0.0.1"), 3600)
+    assert backend.lookup("other") is None
+    inner.allocate("a", IPv4("10.0.0.5"), 3600)
+    inner.allocate("other", IPv4("10.0.0.6"), 3600)
+    assert backend.lookup("a").ip == IPv4("10.0.0.1")
+    backend.invalidate("a")
+    assert backend.lookup("a").ip == IPv4("10.0.0.5")
+    assert backend.lookup("other") is None
+    backend.invalidate()
+    assert backend.lookup("other").ip == IPv4("10.0.0.6")
+
+
+def test_queries_pass_through_to_the_wrapped_backend(tmp_path) -> None:
+    backend = CachedLeaseBackend(InMemoryLeaseBackend())
+    assert isinstance(backend, LeaseQueryBackend)
+    backend.allocate("a", IPv4("10.0.0.1"), 3600, chaddr=b"\x00\x00\x00\x00\x00\x01")
+    assert backend.lookup_ip(IPv4("10.0.0.1"))[0] == "a"
+    assert backend.chaddr("a") == b"\x00\x00\x00\x00\x00\x01"
+
+    store = MmapLeaseBackend(str(tmp_path / "leases.mmap"), capacity=64)
+    plain = CachedLeaseBackend(store)
+    assert not isinstance(plain, LeaseQueryBackend)
+    assert plain.allocate("a", IPv4("10.0.0.1"), 3600).ip == IPv4("10.0.0.1")
+    store.close()
+
+
+def test_compare_and_set_allocation_updates_the_cache() -> None:
+    backend = CachedLeaseBackend(ThreadSafeLeaseBackend())
+    assert backend.allocate_if_free("a", IPv4("10.0.0.1"), 3600) is not None
+    assert backend.allocate_if_free("b", IPv4("10.0.0.1"), 3600) is None
+    assert backend.lookup("a").ip == IPv4("10.0.0.1")
+    assert backend.lookup("b") is None
+    assert backend.hits == 1
+
+
+def test_server_reports_the_hit_ratio() -> None:
+    backend = CachedLeaseBackend(InMemoryLeaseBackend())
+    server = DhcpServer(lease_backend=backend)
+    assert backend.metrics is server.metrics
+    backend.allocate("a", IPv4("10.0.0.1"), 3600)
+    backend.lookup("a")
+    backend.lookup("b")
+    backend.lookup("b")
+    assert server.metrics.lease_cache_hits == 2
+    assert server.metrics.lease_cache_misses == 1
+    assert round(server.metrics.lease_cache_hit_ratio, 2) == 0.67
+    assert server.metrics.snapshot()["lease_cache_hits"] == 2
+    server.metrics.reset()
+    assert server.metrics.lease_cache_hit_ratio == 0.0
+
+
+def test_an_expired_entry_is_a_miss_that_asks_the_backend() -> None:
+    inner = CountingBackend()
+    backend = CachedLeaseBackend(inner)
+    backend.allocate("a", IPv4("10.0.0.1"), 0)
+    time.sleep(0.01)
+    # Renewed behind the cache, e.g. by another writer.
+    inner.allocate("a", IPv4("10.0.0.1"), 3600)
+
+    lease = backend.lookup("a")
+    assert lease is not None and lease.ip == IPv4("10.0.0.1")
+    assert (backend.hits, backend.misses, inner.lookups) == (0, 1, 1)
+    assert backend.lookup("a") is lease
+    assert backend.hits == 1
+
+
+def test_expiry_and_negative_entries_follow_the_backend_clock() -> None:
+    clock = VirtualClock()
+    inner = CountingBackend(clock)
+    backend = CachedLeaseBackend(inner, negative_ttl=5)
+    assert backend.clock is clock
+    backend.allocate("a", IPv4("10.0.0.1"), 60)
+    assert backend.lookup("b") is None
+    clock.advance(61)
+
+    assert backend.lookup("a") is None
+    assert backend.lookup("b") is None
+    assert inner.lookups == 3
+
+
+def test_snapshot_carries_the_hit_ratio() -> None:
+    backend = CachedLeaseBackend(InMemoryLeaseBackend())
+    server = DhcpServer(lease_backend=backend)
+    backend.allocate("a", IPv4("10.0.0.1"), 3600)
+    backend.lookup("a")
+    backend.lookup("b")
+    assert server.metrics.snapshot()["lease_cache_hit_ratio"] == 0.5
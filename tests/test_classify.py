@@ -0,0 +1,133 @@
+import ipaddress
+from datetime import timedelta
+from unittest.mock import Mock
+
+import pytest
+
+from pydhcp import DhcpMessage, DhcpOptions, NetworkInterface, RequestContext
+from pydhcp.classify import ClientClassifier, compile_class
+from pydhcp.packet import DhcpMessageType, Flags, HardwareAddressType, OpCode
+from pydhcp.options import DhcpOptionCode
+from pydhcp.options.type import RelayAgentInformation, TlvOption
+from pydhcp.network import IPv4, SocketAddress
+from pydhcp.server import DhcpServer
+
+
+CLASSES = [
+    {"name": "pxe-uefi", "match": {"vendor_class": {"prefix": "PXEClient"}, "arch": [7, 9]}},
+    {"name": "voip", "match": {"user_class": {"contains": "voip"}}},
+    {"name": "printer", "match": {"fingerprint": "1,3,6,15"}},
+    {"name": "building-a", "match": {"circuit_id": {"prefix": "bldgA"}}},
+    {"name": "everyone"},
+]
+
+
+def _options(**values) -> DhcpOptions:
+    options = DhcpOptions()
+    for code, value in values.items():
+        options[DhcpOptionCode[code]] = value
+    return options
+
+
+def _raw(**values) -> dict:
+    return {DhcpOptionCode[code]: bytearray(value) for code, value in values.items()}
+
+
+def test_rules_read_raw_option_bytes() -> None:
+    classifier = ClientClassifier.from_config(CLASSES)
+
+    pxe = _raw(VENDOR_CLASS_IDENTIFIER=b"PXEClient:Arch:00007", CLIENT_SYSTEM_ARCHITECTURE=b"\x00\x00\x00\x07")
+    assert classifier.classify(pxe) == ("pxe-uefi", "everyone")
+
+    bios = _raw(VENDOR_CLASS_IDENTIFIER=b"PXEClient:Arch:00000", CLIENT_SYSTEM_ARCHITECTURE=b"\x00\x00")
+    assert classifier.classify(bios) == ("everyone",)
+
+    phone = _raw(USER_CLASS=b"\x03abc\x08voip-sip")
+    assert classifier.classify(phone) == ("voip", "everyone")
+
+    printer = _raw(PARAMETER_REQUEST_LIST=bytes([1, 3, 6, 15]))
+    assert classifier.classify(printer) == ("printer", "everyone")
+    assert classifier.classify(_raw(PARAMETER_REQUEST_LIST=bytes([1, 3, 6]))) == ("everyone",)
+
+
+def test_fingerprint_as_a_list_of_codes() -> None:
+    # The YAML `fingerprint: [1, 3, 6, 15]` is one fingerprint; a list of lists or strings is several.
+    single = compile_class("printer", {"fingerprint": [1, 3, 6, 15]})
+    assert single.match(_raw(PARAMETER_REQUEST_LIST=bytes([1, 3, 6, 15])))
+    assert not single.match(_raw(PARAMETER_REQUEST_LIST=bytes([1])))
+
+    either = compile_class("printer", {"fingerprint": [[1, 3, 6, 15], "1,3,6"]})
+    assert either.match(_raw(PARAMETER_REQUEST_LIST=bytes([1, 3, 6])))
+    assert either.match(_raw(PARAMETER_REQUEST_LIST=bytes([1, 3, 6, 15])))
+
+    prefix = compile_class("printer", {"fingerprint": {"prefix": [1, 3]}})
+    assert prefix.match(_raw(PARAMETER_REQUEST_LIST=bytes([1, 3, 6, 15])))
+    assert not prefix.match(_raw(PARAMETER_REQUEST_LIST=bytes([3, 1])))
+
+
+def test_relay_agent_fields_and_decoded_options() -> None:
+    classifier = ClientClassifier.from_config(CLASSES)
+    options = _options(RELAY_AGENT_INFORMATION=RelayAgentInformation([TlvOption(1, b"bldgA-sw3"), TlvOption(2, b"r")]))
+    assert classifier.classify(options) == ("building-a", "everyone")
+
+
+def test_results_are_memoized_by_relevant_options_only() -> None:
+    calls = []
+    rule = compile_class("windows", {"vendor_class": "MSFT 5.0"})
+    counted = rule._replace(match=lambda options: calls.append(1) or rule.match(options))
+    classifier = ClientClassifier([counted], cache_size=2)
+    assert classifier.codes == (DhcpOptionCode.VENDOR_CLASS_IDENTIFIER,)
+
+    first = _raw(VENDOR_CLASS_IDENTIFIER=b"MSFT 5.0", HOSTNAME=b"pc-1")
+    second = _raw(VENDOR_CLASS_IDENTIFIER=b"MSFT 5.0", HOSTNAME=b"pc-2")
+    assert classifier.classify(first) == ("windows",)
+    assert classifier.classify(second) == ("windows",)
+    assert len(calls) == 1
+
+    for i in range(3):
+        assert classifier.classify(_raw(VENDOR_CLASS_IDENTIFIER=f"other-{i}".encode())) == ()
+    assert len(classifier._cache) == 2
+
+
+def test_config_validation() -> None:
+    with pytest.raises(ValueError, match="Unknown classification field"):
+        ClientClassifier.from_config([{"name": "bad", "match": {"nope": 1}}])
+    with pytest.raises(ValueError, match="Unknown match operator"):
+        ClientClassifier.from_config({"bad": {"match": {"vendor_class": {"glob": "x*"}}}})
+    with pytest.raises(ValueError, match="unique"):
+        ClientClassifier.from_config([{"name": "a"}, {"name": "a"}])
+
+
+def test_server_counts_class_hits() -> None:
+    server = DhcpServer(classifier=ClientClassifier.from_config(CLASSES))
+    options = _options(DHCP_MESSAGE_TYPE=DhcpMessageType.DHCPDISCOVER, VENDOR_CLASS_IDENTIFIER="PXEClient")
+    msg = DhcpMessage(
+        op=OpCode.BOOTREQUEST,
+        htype=HardwareAddressType.ETHERNET,
+        hlen=6,
+        hops=0,
+        xid=1,
+        secs=timedelta(seconds=0),
+        flags=Flags.UNICAST,
+        ciaddr=IPv4("0.0.0.0"),
+        yiaddr=IPv4("0.0.0.0"),
+        siaddr=IPv4("0.0.0.0"),
+        giaddr=IPv4("0.0.0.0"),
+        chaddr=b"\x00\x11\x22\x33\x44\x55",
+        sname="",
+        file="",
+        options=options,
+    )
+    context = RequestContext(
+        transport=Mock(),
+        interface=NetworkInterface("lo", ipaddress.IPv4Interface("127.0.0.1/8")),
+        client=SocketAddress("127.0.0.1", 68),
+        client_mac=msg.chaddr,
+    )
+    server.handle(msg, context)
+    server.handle(msg, context)
+
+    assert server.client_classes(msg) == ("everyone",)
+    assert server.metrics.class_hits == {"everyone": 2}
+    assert server.metrics.snapshot()["class_hits.everyone"] == 2
+    assert DhcpServer().client_classes(msg) == ()
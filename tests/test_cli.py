@@ -335,7 +335,7 @@ def test_cmd_server(mock_dhcp_server_cls):
     mock_server = MagicMock()
     mock_dhcp_server_cls.return_value = mock_server
 
-    args = argparse.Namespace(config=None, listen="127.0.0.1:6767", log_level=None)
+    args = argparse.Namespace(config=None, listen="127.0.0.1:6767", log_level=None, bulk_leasequery=None, lease_store=None)
     cmd_server(args)
 
     mock_dhcp_server_cls.assert_called_with(listen="127.0.0.1:6767")
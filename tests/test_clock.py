@@ -0,0 +1,164 @@
+import ipaddress
+from datetime import timedelta
+from unittest.mock import Mock
+
+import pytest
+
+from pydhcp import DhcpMessage, DhcpOptions, InMemoryLeaseBackend, NetworkInterface, RequestContext
+from pydhcp.clock import CachedClock, SystemClock, VirtualClock
+from pydhcp.lease.journal import JournalLeaseBackend
+from pydhcp.lease.mmapped import MmapLeaseBackend
+from pydhcp.lease.shared import SharedMemoryLeaseBackend
+from pydhcp.lease.sqlite import SqliteLeaseBackend
+from pydhcp.network import IPv4, SocketAddress
+from pydhcp.options import DhcpOptionCode
+from pydhcp.packet import DhcpMessageType, Flags, HardwareAddressType, OpCode
+from pydhcp.server import DhcpServer
+
+
+class CountingSource:
+    def __init__(self) -> None:
+        self.now = 1_800_000_000.0
+        self.reads = 0
+
+    def time(self) -> float:
+        self.reads += 1
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now - 1_700_000_000.0
+
+
+def _request(message_type: DhcpMessageType, chaddr: bytes, requested: str) -> DhcpMessage:
+    options = DhcpOptions()
+    options[DhcpOptionCode.DHCP_MESSAGE_TYPE] = message_type
+    options[DhcpOptionCode.REQUESTED_IP] = IPv4(requested)
+    options[DhcpOptionCode.SERVER_IDENTIFIER] = IPv4("127.0.0.1")
+    return DhcpMessage(
+        op=OpCode.BOOTREQUEST,
+        htype=HardwareAddressType.ETHERNET,
+        hlen=6,
+        hops=0,
+        xid=0x12345678,
+        secs=timedelta(seconds=0),
+        flags=Flags.UNICAST,
+        ciaddr=IPv4("0.0.0.0"),
+        yiaddr=IPv4("0.0.0.0"),
+        siaddr=IPv4("0.0.0.0"),
+        giaddr=IPv4("0.0.0.0"),
+        chaddr=chaddr,
+        sname="",
+        file="",
+        options=options,
+    )
+
+
+def _context(transport: Mock) -> RequestContext:
+    return RequestContext(
+        transport=transport,
+        interface=NetworkInterface("lo", ipaddress.IPv4Interface("127.0.0.1/8")),
+        client=SocketAddress("127.0.0.1", 68),
+        client_mac=b"\x00\x11\x22\x33\x44\x55",
+    )
+
+
+def test_cached_clock_keeps_its_reading_until_ticked() -> None:
+    source = CountingSource()
+    clock = CachedClock(source)
+    source.now += 30
+    assert clock.time() == 1_800_000_000.0
+    assert clock.monotonic() == 100_000_000.0
+    assert clock.tick() == 1_800_000_030.0
+    assert clock.time() == 1_800_000_030.0
+    assert clock.monotonic() == 100_000_030.0
+    assert source.reads == 2
+    assert SystemClock().time() <= SystemClock().time()
+
+
+def test_lease_backend_runs_on_the_injected_clock() -> None:
+    source = CountingSource()
+    clock = CachedClock(source)
+    backend = InMemoryLeaseBackend(clock)
+
+    lease = backend.allocate("client-a", IPv4("10.0.0.5"), 60)
+    assert lease.expires.timestamp() == source.now + 60
+    assert backend.last_transaction("client-a") == source.now
+    source.now += 50
+    clock.tick()
+    assert backend.renew("client-a", 60).expires.timestamp() == source.now + 60
+    source.now += 61
+    assert backend.lookup("client-a") is not None
+    clock.tick()
+    assert backend.lookup("client-a") is None
+
+    backend.allocate("client-b", IPv4("10.0.0.6"), 10)
+    source.now += 11
+    clock.tick()
+    assert backend.sweep() == 1
+
+
+@pytest.fixture(params=["memory", "journal", "sqlite", "mmap", "shared"])
+def clocked_backend(request, tmp_path):
+    clock = VirtualClock()
+    if request.param == "memory":
+        backend = InMemoryLeaseBackend(clock)
+    elif request.param == "journal":
+        backend = JournalLeaseBackend(str(tmp_path / "leases.json"), clock=clock)
+    elif request.param == "sqlite":
+        backend = SqliteLeaseBackend(str(tmp_path / "leases.db"), clock=clock)
+    elif request.param == "mmap":
+        backend = MmapLeaseBackend(str(tmp_path / "leases.mmap"), capacity=64, clock=clock)
+    else:
+        backend = SharedMemoryLeaseBackend(capacity=64, clock=clock)
+    yield clock, backend
+    if hasattr(backend, "close"):
+        backend.close()
+    if hasattr(backend, "unlink"):
+        backend.unlink()
+
+
+def test_every_backend_works_out_expiry_on_its_clock(clocked_backend) -> None:
+    clock, backend = clocked_backend
+    lease = backend.allocate("client-a", IPv4("10.0.0.5"), 60)
+    assert lease.expires.timestamp() == clock.time() + 60
+    clock.advance(30)
+    assert backend.renew("client-a", 60).expires.timestamp() == clock.time() + 60
+    assert backend.last_transaction("client-a") == clock.time()
+    clock.advance(61)
+    assert backend.lookup("client-a") is None
+
+
+def test_server_reads_the_clock_once_per_packet() -> None:
+    source = CountingSource()
+    clock = CachedClock(source)
+    server = DhcpServer(lease_backend=InMemoryLeaseBackend(clock), clock=clock)
+    transport = Mock()
+
+    reads = source.reads
+    server.handle(_request(DhcpMessageType.DHCPREQUEST, b"\x00\x00\x00\x00\x00\x01", "127.0.0.60"), _context(transport))
+    assert source.reads == reads + 1
+    response = DhcpMessage.decode(transport.send.call_args.args[0])
+    assert response.options.get(DhcpOptionCode.DHCP_MESSAGE_TYPE) == DhcpMessageType.DHCPACK
+    assert response.options.get(DhcpOptionCode.IP_ADDRESS_LEASE_TIME) == 3600
+
+    source.now += 600
+    server.handle(_request(DhcpMessageType.DHCPREQUEST, b"\x00\x00\x00\x00\x00\x01", "127.0.0.60"), _context(transport))
+    assert source.reads == reads + 2
+    assert server.lease_backend.last_transaction("01:00:00:00:00:00:01") == source.now
+
+
+def test_server_shares_its_clock_with_the_default_backend_and_holds() -> None:
+    source = CountingSource()
+    server = DhcpServer(clock=CachedClock(source))
+    transport = Mock()
+
+    discover = _request(DhcpMessageType.DHCPDISCOVER, b"\x00\x00\x00\x00\x00\x01", "127.0.0.61")
+    del discover.options[DhcpOptionCode.SERVER_IDENTIFIER]
+    server.handle(discover, _context(transport))
+    assert server.lease_backend.clock is server.clock
+    assert server.metrics.offers_held == 1
+
+    source.now += server.OFFER_HOLD_TIME + 1
+    server.tick()
+    assert server.metrics.offers_held == 0
+    assert server.metrics.offers_expired == 1
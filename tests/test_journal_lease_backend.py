@@ -0,0 +1,162 @@
+import json
+
+import pytest
+
+from pydhcp import FileLeaseBackend, IPv4, JournalLeaseBackend
+from pydhcp.clock import CachedClock, VirtualClock
+from pydhcp.server import DhcpServer
+
+
+def _leases(backend) -> dict:
+    return {client_id: (str(lease.ip), lease.expires) for client_id, lease in backend.iter_leases()}
+
+
+def test_mutations_append_one_record_each(tmp_path) -> None:
+    path = str(tmp_path / "leases.json")
+    backend = JournalLeaseBackend(path, fsync="always")
+    backend.allocate("a", IPv4("10.0.0.1"), 3600, chaddr=b"\x02\x00\x00\x00\x00\x01")
+    backend.allocate("b", IPv4("10.0.0.2"), 3600)
+    backend.renew("a", 7200)
+    backend.release("b")
+    backend.close()
+
+    lines = (tmp_path / "leases.json.journal").read_bytes().splitlines()
+    assert [json.loads(line)["op"] for line in lines] == ["allocate", "allocate", "renew", "release"]
+    assert backend.fsyncs >= 4
+    assert not (tmp_path / "leases.json").exists()
+
+    reopened = JournalLeaseBackend(path)
+    assert _leases(reopened) == _leases(backend)
+    assert reopened.lookup_chaddr(b"\x02\x00\x00\x00\x00\x01")[0] == "a"
+    assert reopened.last_transaction("a") == backend.last_transaction("a")
+    assert reopened.seq == 4
+    reopened.close()
+
+
+def test_compaction_snapshots_and_empties_the_journal(tmp_path) -> None:
+    path = str(tmp_path / "leases.json")
+    backend = JournalLeaseBackend(path, fsync="none", compact_threshold=10)
+    for i in range(10):
+        backend.allocate(f"client-{i}", IPv4(f"10.0.0.{i + 1}"), 3600)
+    # The write that crosses the threshold leaves compaction to the next flush.
+    assert backend.compactions == 0
+    assert backend.compaction_due
+
+    backend.flush()
+    assert backend.compactions == 1
+    assert backend.records == 0
+    assert (tmp_path / "leases.json.journal").read_bytes() == b""
+
+    backend.release("client-0")
+    backend.close()
+    reopened = JournalLeaseBackend(path)
+    assert _leases(reopened) == _leases(backend)
+    assert reopened.lookup("client-0") is None
+    reopened.close()
+
+
+@pytest.mark.parametrize("file_format", ["json", "binary"])
+def test_replay_skips_records_already_in_the_snapshot(tmp_path, file_format) -> None:
+    path = str(tmp_path / "leases.json")
+    backend = JournalLeaseBackend(path, fsync="none", file_format=file_format)
+    backend.allocate("a", IPv4("10.0.0.1"), 3600)
+    backend.release("a")
+    backend.allocate("b", IPv4("10.0.0.2"), 3600)
+    backend.sync()
+    journal = (tmp_path / "leases.json.journal").read_bytes()
+
+    # A crash between the snapshot rename and the journal truncation.
+    backend.compact()
+    backend.close()
+    (tmp_path / "leases.json.journal").write_bytes(journal)
+
+    reopened = JournalLeaseBackend(path, file_format=file_format)
+    assert set(_leases(reopened)) == {"b"}
+    assert reopened.records == 0
+    assert reopened.seq == 3
+    reopened.close()
+
+
+def test_torn_tail_is_dropped(tmp_path) -> None:
+    path = str(tmp_path / "leases.json")
+    backend = JournalLeaseBackend(path, fsync="always")
+    backend.allocate("a", IPv4("10.0.0.1"), 3600)
+    backend.close()
+    with open(path + ".journal", "ab") as f:
+        f.write(b'{"seq":2,"op":"allocate","id":"b","le')
+
+    reopened = JournalLeaseBackend(path)
+    assert set(_leases(reopened)) == {"a"}
+    reopened.allocate("c", IPv4("10.0.0.3"), 3600)
+    reopened.close()
+    assert set(_leases(JournalLeaseBackend(path))) == {"a", "c"}
+
+
+def test_group_commit_batches_fsyncs(tmp_path) -> None:
+    path = str(tmp_path / "leases.json")
+    backend = JournalLeaseBackend(path, fsync="group", group_size=8)
+    for i in range(20):
+        backend.allocate(f"client-{i}", IPv4(f"10.0.0.{i + 1}"), 3600)
+    assert backend.fsyncs == 2
+    assert len((tmp_path / "leases.json.journal").read_bytes().splitlines()) == 16
+
+    backend.sync()
+    assert backend.fsyncs == 3
+    assert len((tmp_path / "leases.json.journal").read_bytes().splitlines()) == 20
+    backend.close()
+
+
+
+def test_buffered_records_wait_at_most_the_fsync_interval(tmp_path) -> None:
+    clock = VirtualClock()
+    journal = tmp_path / "leases.json.journal"
+    backend = JournalLeaseBackend(str(tmp_path / "leases.json"), fsync="group", group_size=64, clock=clock)
+    server = DhcpServer(lease_backend=backend, clock=CachedClock(clock))
+    backend.allocate("a", IPv4("10.0.0.1"), 3600)
+    server.tick()
+    assert journal.read_bytes() == b""
+
+    # A write after the interval takes the whole group with it...
+    clock.advance(1)
+    backend.allocate("b", IPv4("10.0.0.2"), 3600)
+    assert len(journal.read_bytes().splitlines()) == 2
+
+    # ...and on an idle server the tick does.
+    backend.allocate("c", IPv4("10.0.0.3"), 3600)
+    clock.advance(1)
+    server.tick()
+    assert len(journal.read_bytes().splitlines()) == 3
+    fsyncs = backend.fsyncs
+    clock.advance(1)
+    server.tick()
+    assert backend.fsyncs == fsyncs
+
+    backend.release("a")
+    server.shutdown()
+    assert len(journal.read_bytes().splitlines()) == 4
+    assert backend._journal.closed
+
+def test_interval_policy_fsyncs_at_most_once_per_interval(tmp_path) -> None:
+    backend = JournalLeaseBackend(str(tmp_path / "leases.json"), fsync="interval", fsync_interval=3600)
+    for i in range(20):
+        backend.allocate(f"client-{i}", IPv4(f"10.0.0.{i + 1}"), 3600)
+    assert backend.fsyncs == 0
+    backend._last_fsync -= 3600
+    backend.renew("client-0", 3600)
+    assert backend.fsyncs == 1
+    backend.close()
+
+
+def test_file_backend_lease_file_is_an_initial_snapshot(tmp_path) -> None:
+    path = str(tmp_path / "leases.json")
+    FileLeaseBackend(path).allocate("a", IPv4("10.0.0.1"), 3600)
+    backend = JournalLeaseBackend(path)
+    assert backend.lookup("a").ip == IPv4("10.0.0.1")
+    backend.close()
+
+
+def test_unknown_fsync_policy() -> None:
+    with pytest.raises(ValueError):
+        JournalLeaseBackend("unused.json", fsync="sometimes")
+    with pytest.raises(ValueError):
+        JournalLeaseBackend("unused.json", file_format="xml")
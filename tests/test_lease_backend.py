@@ -91,3 +91,168 @@ def test_file_lease_backend(tmp_path):
 
     final_backend = FileLeaseBackend(filepath=filepath)
     assert final_backend.lookup(client_id) is None
+
+
+def test_file_lease_backend_renew_threshold(tmp_path):
+    filepath = str(tmp_path / "leases.json")
+    backend = FileLeaseBackend(filepath, renew_threshold=0.25)
+    backend.allocate("client", IPv4("192.168.1.10"), 3600)
+    assert backend.saves == 1
+
+    # Short-interval renewals leave the expiry on disk alone
+    for _ in range(100):
+        renewed = backend.renew("client", 3600)
+    assert backend.saves == 1
+    assert renewed.expires > FileLeaseBackend(filepath).lookup("client").expires
+
+    # Once the disk copy covers less than 75% of the lease it is rewritten
+    backend._persisted["client"] = time.time() + 2000
+    backend.renew("client", 3600)
+    assert backend.saves == 2
+    assert FileLeaseBackend(filepath).lookup("client").expires == backend.lookup("client").expires
+
+
+def test_file_lease_backend_flush_interval(tmp_path):
+    filepath = str(tmp_path / "leases.json")
+    backend = FileLeaseBackend(filepath, flush_interval=3600)
+    backend.allocate("a", IPv4("192.168.1.10"), 60)
+    backend.allocate("b", IPv4("192.168.1.11"), 60)
+    assert backend.saves == 2
+
+    for _ in range(50):
+        backend.renew("a", 600)
+    assert backend.saves == 2
+    assert (FileLeaseBackend(filepath).lookup("a").expires - _dt.datetime.now()).total_seconds() < 60
+
+    backend.flush()
+    assert backend.saves == 3
+    assert FileLeaseBackend(filepath).lookup("a").expires == backend.lookup("a").expires
+    backend.flush()
+    assert backend.saves == 3
+
+    # Renewals with the interval elapsed write straight through
+    backend._last_save -= 3600
+    backend.renew("b", 600)
+    assert backend.saves == 4
+
+
+def test_sweep_reclaims_only_expired_leases():
+    backend = InMemoryLeaseBackend()
+    backend.allocate("gone", IPv4("192.168.1.10"), -1, chaddr=b"\x02\x00\x00\x00\x00\x01")
+    backend.allocate("renewed", IPv4("192.168.1.11"), 1)
+    backend.allocate("live", IPv4("192.168.1.12"), 3600)
+    backend.allocate("forever", IPv4("192.168.1.13"), _inf)
+    backend.renew("renewed", 3600)
+
+    assert backend.sweep() == 1
+    assert backend.lookup_ip(IPv4("192.168.1.10")) is None
+    assert backend.lookup_chaddr(b"\x02\x00\x00\x00\x00\x01") is None
+
+    # An hour and a bit later the one-hour leases are gone, the infinite one stays
+    assert backend.sweep(time.time() + 3601) == 2
+    assert backend.sweep(time.time() + 10**9) == 0
+    assert [client_id for client_id, _ in backend.iter_leases()] == ["forever"]
+    assert backend.reclaimed == 3
+
+    # A released lease is no longer scheduled
+    backend.allocate("released", IPv4("192.168.1.14"), 1)
+    backend.release("released")
+    assert backend.sweep(time.time() + 2) == 0
+
+
+def test_iter_leases_walks_the_table_in_place_through_changes():
+    backend = InMemoryLeaseBackend()
+    for i in range(100):
+        backend.allocate(f"client-{i}", IPv4(f"10.0.0.{i + 1}"), 3600)
+    leases = backend.iter_leases()
+    seen = [next(leases)[0] for _ in range(50)]
+    # Changes between steps: removals behind and ahead, a rebind and a new client.
+    for i in range(0, 100, 3):
+        backend.release(f"client-{i}")
+    backend.allocate("client-1", IPv4("10.0.1.1"), 3600)
+    backend.allocate("newcomer", IPv4("10.0.1.2"), 3600)
+    seen += [client_id for client_id, _ in leases]
+
+    kept = {f"client-{i}" for i in range(100) if i % 3}
+    assert kept <= set(seen)
+    assert "newcomer" in seen
+
+
+def test_server_tick_sweeps_the_lease_backend():
+    from pydhcp.server import DhcpServer
+
+    backend = InMemoryLeaseBackend()
+    server = DhcpServer(lease_backend=backend)
+    backend.allocate("gone", IPv4("192.168.1.10"), -1)
+    backend.allocate("live", IPv4("192.168.1.11"), 3600)
+    server.tick()
+    assert server.metrics.leases_reclaimed == 1
+    assert server.metrics.snapshot()["leases_reclaimed"] == 1
+    assert backend.lookup("live") is not None
+
+
+def test_server_tick_sweeps_at_most_once_an_interval():
+    from pydhcp.clock import CachedClock, VirtualClock
+    from pydhcp.server import DhcpServer
+
+    clock = VirtualClock()
+    backend = InMemoryLeaseBackend(clock)
+    server = DhcpServer(lease_backend=backend, clock=CachedClock(clock))
+    server.tick()
+    backend.allocate("gone", IPv4("192.168.1.10"), -1)
+    server.tick()
+    assert server.metrics.leases_reclaimed == 0
+    clock.advance(server.SWEEP_INTERVAL)
+    server.tick()
+    assert server.metrics.leases_reclaimed == 1
+
+
+
+def test_server_tick_and_shutdown_flush_held_back_renewals(tmp_path):
+    from pydhcp.clock import CachedClock, VirtualClock
+    from pydhcp.server import DhcpServer
+
+    clock = VirtualClock()
+    backend = FileLeaseBackend(str(tmp_path / "leases.json"), flush_interval=60, clock=clock)
+    server = DhcpServer(lease_backend=backend, clock=CachedClock(clock))
+    backend.allocate("a", IPv4("192.168.1.10"), 3600)
+    backend.renew("a", 3600)
+    assert backend.saves == 1
+
+    clock.advance(30)
+    server.tick()
+    assert backend.saves == 1
+    clock.advance(30)
+    server.tick()
+    assert backend.saves == 2
+    assert FileLeaseBackend(backend.filepath).lookup("a").expires == backend.lookup("a").expires
+
+    backend.renew("a", 3600)
+    server.shutdown()
+    assert backend.saves == 3
+    server.shutdown()
+    assert backend.saves == 3
+
+def test_identical_option_sets_are_shared():
+    import gc
+
+    backend = InMemoryLeaseBackend()
+    options = DhcpOptions()
+    options[DhcpOptionCode.SUBNET_MASK] = IPv4("255.255.255.0")
+    first = backend.allocate("a", IPv4("192.168.1.10"), 3600, options)
+    second = backend.allocate("b", IPv4("192.168.1.11"), 3600, options.copy())
+    assert first.options is second.options
+    assert backend.lookup("a").options is first.options
+    assert len(backend._option_sets) == 1
+
+    # The caller's object is not the stored one
+    options[DhcpOptionCode.SUBNET_MASK] = IPv4("255.255.0.0")
+    assert backend.lookup("a").options.get(DhcpOptionCode.SUBNET_MASK, decode=IPv4Address) == IPv4("255.255.255.0")
+
+    backend.allocate("c", IPv4("192.168.1.12"), 3600)
+    del first, second
+    backend.release("a")
+    backend.release("b")
+    gc.collect()
+    assert len(backend._option_sets) == 1  # only the empty set of "c" is left
+    assert backend._leases["c"].ip == int(IPv4("192.168.1.12"))
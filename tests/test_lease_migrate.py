@@ -0,0 +1,208 @@
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from pydhcp import DhcpOptions, FileLeaseBackend, IPv4, JournalLeaseBackend
+from pydhcp.lease.migrate import LeaseWriter, copy_leases, infer_format, read_leases
+from pydhcp.lease.mmapped import MmapLeaseBackend
+from pydhcp.lease.sqlite import SqliteLeaseBackend
+from pydhcp.options import DhcpOptionCode
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+MAC = b"\x00\x11\x22\x33\x44\x55"
+
+ISC_LEASES = r"""# The format of this file is documented in the dhcpd.leases(5) manual page.
+authoring-byte-order little-endian;
+server-duid "\000\001\000\001%\2061\315\000\014)\234\013{";
+
+lease 10.0.0.10 {
+  starts 4 2026/10/15 12:00:00;
+  ends never;
+  cltt 4 2026/10/15 12:00:00;
+  binding state active;
+  next binding state free;
+  hardware ethernet 00:11:22:33:44:55;
+  client-hostname "laptop";
+}
+lease 10.0.0.11 {
+  starts 4 2026/10/15 12:00:00;
+  ends never;
+  binding state active;
+  hardware ethernet 00:11:22:33:44:66;
+  uid "\001\000\021\"3Df";
+}
+lease 10.0.0.12 {
+  starts 4 2026/10/15 12:00:00;
+  ends 4 2026/10/15 13:00:00;
+  binding state active;
+  hardware ethernet 00:11:22:33:44:77;
+}
+lease 10.0.0.11 {
+  starts 4 2026/10/15 14:00:00;
+  ends 4 2026/10/15 14:00:00;
+  binding state free;
+  hardware ethernet 00:11:22:33:44:66;
+  uid "\001\000\021\"3Df";
+}
+"""
+
+
+def _options() -> DhcpOptions:
+    options = DhcpOptions()
+    options[DhcpOptionCode.ROUTER] = IPv4("10.0.0.254")
+    return options
+
+
+def _source(path: str) -> FileLeaseBackend:
+    backend = FileLeaseBackend(path, flush_interval=60)
+    backend.allocate("01:00:11:22:33:44:55", IPv4("10.0.0.1"), 3600, _options(), chaddr=MAC)
+    backend.allocate("client-b", IPv4("10.0.0.2"), float("inf"))
+    backend.allocate("gone", IPv4("10.0.0.3"), -10)
+    return backend
+
+
+def _copy(source: str, source_format: str, dest: str, dest_format: str) -> LeaseWriter:
+    with LeaseWriter(dest, dest_format, batch_size=1) as writer:
+        copy_leases(read_leases(source, source_format, page_size=1), writer)
+    return writer
+
+
+@pytest.mark.parametrize("dest_format", ["json", "binary", "journal", "sqlite"])
+def test_backends_round_trip_through_each_other(tmp_path, dest_format) -> None:
+    source = _source(str(tmp_path / "source.json"))
+    writer = _copy(str(tmp_path / "source.json"), "json", str(tmp_path / "dest"), dest_format)
+    assert writer.written == 2
+
+    entries = {entry.client_id: entry for entry in read_leases(str(tmp_path / "dest"), dest_format)}
+    assert set(entries) == {"01:00:11:22:33:44:55", "client-b"}
+    first = entries["01:00:11:22:33:44:55"]
+    assert first.lease.ip == IPv4("10.0.0.1")
+    assert first.lease.options.get(DhcpOptionCode.ROUTER) == [IPv4("10.0.0.254")]
+    assert first.lease.expires == source.lookup("01:00:11:22:33:44:55").expires
+    assert first.chaddr == MAC
+    assert first.cltt == source.last_transaction("01:00:11:22:33:44:55")
+    assert entries["client-b"].lease.expires == float("inf")
+
+
+def test_destination_backends_serve_the_copied_leases(tmp_path) -> None:
+    _source(str(tmp_path / "source.json"))
+    _copy(str(tmp_path / "source.json"), "json", str(tmp_path / "leases.db"), "sqlite")
+    _copy(str(tmp_path / "leases.db"), "sqlite", str(tmp_path / "leases.mmap"), "mmap")
+    _copy(str(tmp_path / "leases.db"), "sqlite", str(tmp_path / "leases.journal"), "journal")
+
+    sqlite = SqliteLeaseBackend(str(tmp_path / "leases.db"))
+    assert sqlite.lookup_chaddr(MAC)[0] == "01:00:11:22:33:44:55"
+    sqlite.close()
+    mmapped = MmapLeaseBackend(str(tmp_path / "leases.mmap"))
+    assert mmapped.lookup("client-b").ip == IPv4("10.0.0.2")
+    assert mmapped.lookup("gone") is None
+    mmapped.close()
+    journal = JournalLeaseBackend(str(tmp_path / "leases.journal"))
+    assert journal.lookup_ip(IPv4("10.0.0.1"))[0] == "01:00:11:22:33:44:55"
+    journal.close()
+
+
+def test_isc_leases_file_is_read_with_later_entries_winning(tmp_path) -> None:
+    path = tmp_path / "dhcpd.leases"
+    path.write_text(ISC_LEASES)
+
+    entries = list(read_leases(str(path), "isc"))
+    assert [(entry.client_id, entry.released) for entry in entries] == [
+        ("01:00:11:22:33:44:55", False),
+        ("01:00:11:22:33:44:66", False),
+        ("01:00:11:22:33:44:66", True),
+    ]
+    assert entries[0].chaddr == MAC
+    assert entries[0].cltt == 1792065600.0
+
+    writer = _copy(str(path), "isc", str(tmp_path / "leases.json"), "json")
+    assert (writer.written, writer.released) == (2, 1)
+    backend = FileLeaseBackend(str(tmp_path / "leases.json"))
+    assert [client_id for client_id, _ in backend.iter_leases()] == ["01:00:11:22:33:44:55"]
+
+
+def test_isc_and_kea_exports_read_back(tmp_path) -> None:
+    _source(str(tmp_path / "source.json"))
+    backend = FileLeaseBackend(str(tmp_path / "source.json"))
+    backend.allocate("01:AA:BB", None, 3600)
+    for dest_format in ("isc", "kea"):
+        dest = str(tmp_path / f"export.{dest_format}")
+        writer = _copy(str(tmp_path / "source.json"), "json", dest, dest_format)
+        assert (writer.written, writer.skipped) == (2, 1)
+
+        entries = {entry.client_id: entry for entry in read_leases(dest, dest_format)}
+        assert set(entries) == {"01:00:11:22:33:44:55", "client-b".encode().hex(":").upper()}
+        assert entries["01:00:11:22:33:44:55"].chaddr == MAC
+        assert entries["01:00:11:22:33:44:55"].cltt == int(backend.last_transaction("01:00:11:22:33:44:55"))
+        assert entries["client-b".encode().hex(":").upper()].lease.expires == float("inf")
+
+    kea = (tmp_path / "export.kea").read_text().splitlines()
+    assert kea[0].startswith("address,hwaddr,client_id,valid_lifetime,expire,subnet_id")
+    assert kea[1].startswith("10.0.0.1,00:11:22:33:44:55,,")
+
+
+def test_kea_rows_with_zero_lifetime_are_releases(tmp_path) -> None:
+    now = int(time.time())
+    path = tmp_path / "kea-leases4.csv"
+    path.write_text(
+        "address,hwaddr,client_id,valid_lifetime,expire,subnet_id,fqdn_fwd,fqdn_rev,hostname,state,user_context\n"
+        f"10.0.0.5,00:11:22:33:44:55,01:02:03,3600,{now + 3000},1,0,0,,0,\n"
+        f"10.0.0.6,00:11:22:33:44:66,,3600,{now - 10},1,0,0,,0,\n"
+        f"10.0.0.5,00:11:22:33:44:55,01:02:03,0,{now},1,0,0,,0,\n"
+    )
+
+    entries = list(read_leases(str(path), "kea"))
+    assert [(entry.client_id, entry.released) for entry in entries] == [("01:02:03", False), ("01:02:03", True)]
+    assert entries[0].cltt == now - 600
+
+
+def test_formats_are_inferred_from_extensions() -> None:
+    assert infer_format("dhcpd.leases") == "isc"
+    assert infer_format("kea-leases4.csv") == "kea"
+    assert infer_format("leases.db") == "sqlite"
+    assert infer_format("leases.json") == "json"
+    with pytest.raises(ValueError):
+        infer_format("leases")
+    with pytest.raises(ValueError):
+        read_leases("leases.mmap", "mmap")
+
+
+def test_progress_is_reported_every_n_leases(tmp_path) -> None:
+    (tmp_path / "dhcpd.leases").write_text(ISC_LEASES)
+    reports = []
+    with LeaseWriter(str(tmp_path / "out.csv"), "kea") as writer:
+        count = copy_leases(read_leases(str(tmp_path / "dhcpd.leases"), "isc"), writer, lambda n, s: reports.append(n), 2)
+    assert count == 3
+    assert reports == [2]
+
+
+def test_leases_command_copies_and_reports(tmp_path) -> None:
+    (tmp_path / "dhcpd.leases").write_text(ISC_LEASES)
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC), env.get("PYTHONPATH")]))
+
+    result = subprocess.run(
+        [sys.executable, "-m", "pydhcp.cli", "leases", str(tmp_path / "dhcpd.leases"), str(tmp_path / "leases.db")],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    assert "Copied 2 leases" in result.stderr
+    assert "1 released" in result.stderr
+    backend = SqliteLeaseBackend(str(tmp_path / "leases.db"))
+    assert [client_id for client_id, _ in backend.iter_leases()] == ["01:00:11:22:33:44:55"]
+    backend.close()
+
+    result = subprocess.run(
+        [sys.executable, "-m", "pydhcp.cli", "leases", str(tmp_path / "leases.db"), "-", "--to", "kea"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    assert result.stdout.splitlines()[1].startswith("10.0.0.10,00:11:22:33:44:55,,4294967295,")
@@ -0,0 +1,123 @@
+import json
+import struct
+import time
+
+import pytest
+
+from pydhcp import DhcpOptions, FileLeaseBackend, IPv4, JournalLeaseBackend
+from pydhcp.lease import LazyOptionSet, OptionSets
+from pydhcp.lease.snapshot import MAGIC, is_snapshot, read_snapshot, snapshot_seq, write_snapshot
+from pydhcp.options import DhcpOptionCode
+
+
+def _options(router: str) -> DhcpOptions:
+    options = DhcpOptions()
+    options[DhcpOptionCode.ROUTER] = IPv4(router)
+    return options
+
+
+def _leases(backend) -> dict:
+    return {
+        client_id: (lease.ip, lease.expires, lease.options.get(DhcpOptionCode.ROUTER))
+        for client_id, lease in backend.iter_leases()
+    }
+
+
+def test_binary_file_round_trips(tmp_path) -> None:
+    path = str(tmp_path / "leases.bin")
+    backend = FileLeaseBackend(path, file_format="binary")
+    backend.allocate("a", IPv4("10.0.0.1"), 3600, _options("10.0.0.254"), chaddr=b"\x00\x11\x22\x33\x44\x55")
+    backend.allocate("b", IPv4("10.0.0.2"), float("inf"))
+    backend.allocate("été", None, 3600, _options("10.0.0.254"))
+    assert is_snapshot(path)
+
+    reopened = FileLeaseBackend(path, file_format="binary")
+    assert _leases(reopened) == _leases(backend)
+    assert reopened.lookup_chaddr(b"\x00\x11\x22\x33\x44\x55")[0] == "a"
+    assert reopened.lookup_ip(IPv4("10.0.0.2"))[0] == "b"
+    assert reopened.last_transaction("a") == backend.last_transaction("a")
+    assert reopened.chaddr("b") is None
+
+
+def test_option_sets_are_stored_once_and_decoded_lazily(tmp_path) -> None:
+    path = str(tmp_path / "leases.bin")
+    backend = FileLeaseBackend(path, file_format="binary", flush_interval=60)
+    for i in range(100):
+        backend.allocate(f"client-{i}", IPv4(f"10.0.{i // 250}.{i % 250 + 1}"), 3600, _options(f"10.0.0.{250 + i % 2}"))
+    backend.flush()
+
+    sets = OptionSets()
+    records = dict(read_snapshot(path, sets))
+    assert len(records) == 100
+    lazy = {id(record.options) for record in records.values()}
+    assert len(lazy) == 2
+    assert all(type(record.options) is LazyOptionSet for record in records.values())
+    assert len(sets) == 0
+
+    first = records["client-0"].view()
+    assert first.options.get(DhcpOptionCode.ROUTER) == [IPv4("10.0.0.250")]
+    assert records["client-2"].view().options is first.options
+    assert len(sets) == 1
+
+
+def test_expired_leases_are_skipped_on_load(tmp_path) -> None:
+    path = str(tmp_path / "leases.bin")
+    backend = FileLeaseBackend(path, file_format="binary", flush_interval=60)
+    backend.allocate("short", IPv4("10.0.0.1"), 3600)
+    backend.allocate("long", IPv4("10.0.0.2"), 7200)
+    backend.flush()
+
+    later = time.time() + 5000
+    assert [client_id for client_id, _ in read_snapshot(path, OptionSets(), now=later)] == ["long"]
+    assert {client_id for client_id, _ in read_snapshot(path, OptionSets())} == {"short", "long"}
+
+
+def test_formats_convert_on_the_next_write(tmp_path) -> None:
+    path = str(tmp_path / "leases.json")
+    backend = FileLeaseBackend(path)
+    backend.allocate("a", IPv4("10.0.0.1"), 3600, _options("10.0.0.254"))
+    assert json.loads((tmp_path / "leases.json").read_text())["a"]["ip"] == "10.0.0.1"
+
+    binary = FileLeaseBackend(path, file_format="binary")
+    assert _leases(binary) == _leases(backend)
+    binary.allocate("b", IPv4("10.0.0.2"), 3600)
+    assert (tmp_path / "leases.json").read_bytes().startswith(MAGIC)
+
+    journal = JournalLeaseBackend(path)
+    assert set(_leases(journal)) == {"a", "b"}
+    journal.close()
+
+    back = FileLeaseBackend(path)
+    back.allocate("c", IPv4("10.0.0.3"), 3600)
+    assert set(json.loads((tmp_path / "leases.json").read_text())) == {"a", "b", "c"}
+
+
+def test_write_snapshot_reuses_lazy_sets_without_decoding(tmp_path) -> None:
+    source = str(tmp_path / "source.bin")
+    target = str(tmp_path / "target.bin")
+    backend = FileLeaseBackend(source, file_format="binary")
+    backend.allocate("a", IPv4("10.0.0.1"), 3600, _options("10.0.0.254"))
+
+    sets = OptionSets()
+    assert write_snapshot(target, read_snapshot(source, sets)) == 1
+    assert len(sets) == 0
+    assert (tmp_path / "target.bin").read_bytes() == (tmp_path / "source.bin").read_bytes()
+
+
+def test_version_1_snapshots_are_read_with_no_sequence_number(tmp_path) -> None:
+    path = tmp_path / "leases.bin"
+    backend = FileLeaseBackend(str(path), file_format="binary")
+    backend.allocate("a", IPv4("10.0.0.1"), 3600, _options("10.0.0.254"))
+    write_snapshot(str(path), backend._leases.items(), seq=7)
+    assert snapshot_seq(str(path)) == 7
+
+    data = path.read_bytes()
+    _, _, count, set_count, _ = struct.unpack_from("<8sIIIQ", data)
+    path.write_bytes(struct.pack("<8sIII", MAGIC, 1, count, set_count) + data[struct.calcsize("<8sIIIQ") :])
+    assert snapshot_seq(str(path)) == 0
+    assert _leases(FileLeaseBackend(str(path))) == _leases(backend)
+
+
+def test_unknown_formats_are_rejected(tmp_path) -> None:
+    with pytest.raises(ValueError):
+        FileLeaseBackend(str(tmp_path / "leases"), file_format="xml")
@@ -0,0 +1,141 @@
+import ipaddress
+from datetime import timedelta
+from unittest.mock import Mock
+
+from pydhcp import DhcpMessage, DhcpOptions, InMemoryLeaseBackend, LeaseQueryBackend, NetworkInterface, RequestContext
+from pydhcp.packet import DhcpMessageType, Flags, HardwareAddressType, OpCode
+from pydhcp.options import DhcpOptionCode
+from pydhcp.options.type import RelayAgentInformation, TlvOption
+from pydhcp.network import IPv4, SocketAddress
+from pydhcp.server import DhcpServer
+
+
+CHADDR = b"\x00\x11\x22\x33\x44\x55"
+RELAY = "127.0.0.9"
+
+
+def _message(
+    message_type: DhcpMessageType,
+    chaddr: bytes = CHADDR,
+    ciaddr: str = "0.0.0.0",
+    giaddr: str = "0.0.0.0",
+) -> DhcpMessage:
+    options = DhcpOptions()
+    options[DhcpOptionCode.DHCP_MESSAGE_TYPE] = message_type
+    return DhcpMessage(
+        op=OpCode.BOOTREQUEST,
+        htype=HardwareAddressType.ETHERNET,
+        hlen=len(chaddr),
+        hops=0,
+        xid=0x0BADF00D,
+        secs=timedelta(seconds=0),
+        flags=Flags.UNICAST,
+        ciaddr=IPv4(ciaddr),
+        yiaddr=IPv4("0.0.0.0"),
+        siaddr=IPv4("0.0.0.0"),
+        giaddr=IPv4(giaddr),
+        chaddr=chaddr,
+        sname="",
+        file="",
+        options=options,
+    )
+
+
+def _context(transport: Mock) -> RequestContext:
+    return RequestContext(
+        transport=transport,
+        interface=NetworkInterface("lo", ipaddress.IPv4Interface("127.0.0.1/8")),
+        client=SocketAddress(RELAY, 67),
+        client_mac=CHADDR,
+    )
+
+
+def _leased_server() -> DhcpServer:
+    server = DhcpServer()
+    request = _message(DhcpMessageType.DHCPREQUEST)
+    request.options[DhcpOptionCode.REQUESTED_IP] = IPv4("127.0.0.60")
+    request.options[DhcpOptionCode.RELAY_AGENT_INFORMATION] = RelayAgentInformation([TlvOption(2, b"remote-1")])
+    server.handle(request, _context(Mock()))
+    return server
+
+
+def _query(server: DhcpServer, msg: DhcpMessage) -> tuple[DhcpMessage, tuple]:
+    transport = Mock()
+    server.handle(msg, _context(transport))
+    data, dest, port, _ = transport.send.call_args.args
+    return DhcpMessage.decode(data), (dest, port)
+
+
+def test_in_memory_backend_keeps_secondary_indexes() -> None:
+    backend = InMemoryLeaseBackend()
+    assert isinstance(backend, LeaseQueryBackend)
+    backend.allocate("client-a", IPv4("10.0.0.5"), 60, chaddr=CHADDR)
+
+    assert backend.lookup_ip(IPv4("10.0.0.5"))[0] == "client-a"
+    assert backend.lookup_chaddr(CHADDR)[0] == "client-a"
+
+    backend.allocate("client-a", IPv4("10.0.0.6"), 60, chaddr=CHADDR)
+    assert backend.lookup_ip(IPv4("10.0.0.5")) is None
+    assert backend.lookup_ip(IPv4("10.0.0.6"))[0] == "client-a"
+
+    backend.release("client-a")
+    assert backend.lookup_ip(IPv4("10.0.0.6")) is None
+    assert backend.lookup_chaddr(CHADDR) is None
+
+
+def test_expired_lease_drops_out_of_indexes() -> None:
+    backend = InMemoryLeaseBackend()
+    backend.allocate("client-a", IPv4("10.0.0.5"), -1, chaddr=CHADDR)
+
+    assert backend.lookup_ip(IPv4("10.0.0.5")) is None
+    assert backend._by_ip == {}
+    assert backend._by_chaddr == {}
+
+
+def test_leasequery_by_ip_returns_active_lease() -> None:
+    server = _leased_server()
+    reply, dest = _query(server, _message(DhcpMessageType.DHCPLEASEQUERY, b"", ciaddr="127.0.0.60", giaddr=RELAY))
+
+    assert dest == (IPv4(RELAY), 67)
+    assert reply.op == OpCode.BOOTREPLY
+    assert reply.options.get(DhcpOptionCode.DHCP_MESSAGE_TYPE) == DhcpMessageType.DHCPLEASEACTIVE
+    assert reply.ciaddr == IPv4("127.0.0.60")
+    assert reply.chaddr == CHADDR
+    assert 3590 < reply.options.get(DhcpOptionCode.IP_ADDRESS_LEASE_TIME) <= 3600
+    assert reply.options.get(DhcpOptionCode.CLIENT_LAST_TRANSACTION_TIME) is not None
+    assert reply.options.get(DhcpOptionCode.RELAY_AGENT_INFORMATION, decode=False) is not None
+    assert server.metrics.leasequeries == 1
+
+
+def test_leasequery_by_mac_and_client_id() -> None:
+    server = _leased_server()
+
+    by_mac, _ = _query(server, _message(DhcpMessageType.DHCPLEASEQUERY, giaddr=RELAY))
+    assert by_mac.options.get(DhcpOptionCode.DHCP_MESSAGE_TYPE) == DhcpMessageType.DHCPLEASEACTIVE
+    assert by_mac.ciaddr == IPv4("127.0.0.60")
+
+    query = _message(DhcpMessageType.DHCPLEASEQUERY, b"", giaddr=RELAY)
+    query.options[DhcpOptionCode.CLIENT_IDENTIFIER] = b"\x01" + CHADDR
+    by_client_id, _ = _query(server, query)
+    assert by_client_id.options.get(DhcpOptionCode.DHCP_MESSAGE_TYPE) == DhcpMessageType.DHCPLEASEACTIVE
+    assert by_client_id.ciaddr == IPv4("127.0.0.60")
+
+
+def test_leasequery_unassigned_and_unknown() -> None:
+    server = _leased_server()
+
+    unassigned, _ = _query(server, _message(DhcpMessageType.DHCPLEASEQUERY, b"", ciaddr="127.0.0.61", giaddr=RELAY))
+    assert unassigned.options.get(DhcpOptionCode.DHCP_MESSAGE_TYPE) == DhcpMessageType.DHCPLEASEUNASSIGNED
+
+    unknown_ip, _ = _query(server, _message(DhcpMessageType.DHCPLEASEQUERY, b"", ciaddr="192.0.2.1", giaddr=RELAY))
+    assert unknown_ip.options.get(DhcpOptionCode.DHCP_MESSAGE_TYPE) == DhcpMessageType.DHCPLEASEUNKNOWN
+
+    unknown_mac, _ = _query(server, _message(DhcpMessageType.DHCPLEASEQUERY, b"\x66" * 6, giaddr=RELAY))
+    assert unknown_mac.options.get(DhcpOptionCode.DHCP_MESSAGE_TYPE) == DhcpMessageType.DHCPLEASEUNKNOWN
+
+
+def test_leasequery_without_giaddr_is_dropped() -> None:
+    server = _leased_server()
+    transport = Mock()
+    server.handle(_message(DhcpMessageType.DHCPLEASEQUERY, b"", ciaddr="127.0.0.60"), _context(transport))
+    transport.send.assert_not_called()
@@ -0,0 +1,187 @@
+import os
+import pathlib
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from pydhcp import DhcpOptions, InMemoryLeaseBackend, IPv4
+from pydhcp.lease import LeaseQueryBackend
+from pydhcp.leasestore import LeaseStoreServer, RemoteLeaseBackend
+from pydhcp.options import DhcpOptionCode
+
+SRC = pathlib.Path(__file__).resolve().parents[1] / "src"
+
+
+@pytest.fixture
+def store():
+    store = LeaseStoreServer(listen=("127.0.0.1", 0), select_timeout=0.05)
+    store.bind()
+    thread = store.start()
+    yield store
+    store.close()
+    if thread:
+        thread.join(timeout=1.0)
+
+
+def test_client_round_trip(store: LeaseStoreServer) -> None:
+    client = RemoteLeaseBackend(store.address.compat())
+    assert isinstance(client, LeaseQueryBackend)
+    options = DhcpOptions()
+    options[DhcpOptionCode.ROUTER] = IPv4("10.0.0.254")
+    chaddr = b"\x00\x11\x22\x33\x44\x55"
+
+    lease = client.allocate("a", IPv4("10.0.0.1"), 3600, options, chaddr=chaddr)
+    assert lease.ip == IPv4("10.0.0.1")
+    assert client.lookup("a").options.get(DhcpOptionCode.ROUTER) == [IPv4("10.0.0.254")]
+    assert client.lookup("missing") is None
+    assert client.lookup_ip(IPv4("10.0.0.1"))[0] == "a"
+    assert client.lookup_chaddr(chaddr)[0] == "a"
+    assert client.chaddr("a") == chaddr
+    assert client.last_transaction("a") is not None
+    assert client.allocate("b", IPv4("10.0.0.2"), float("inf")).expires == float("inf")
+    assert sorted(client_id for client_id, _ in client.iter_leases()) == ["a", "b"]
+
+    renewed = client.renew("a", 7200)
+    assert (renewed.expires - lease.expires).total_seconds() > 3000
+    assert client.release("b") is True
+    assert client.release("b") is False
+    assert store.backend.lookup("b") is None
+    client.close()
+
+
+def test_nodes_share_leases_and_cannot_take_each_others_addresses(store: LeaseStoreServer) -> None:
+    first = RemoteLeaseBackend(store.address.compat())
+    second = RemoteLeaseBackend(store.address.compat())
+    assert first.allocate_if_free("a", IPv4("10.0.0.1"), 3600) is not None
+    assert second.lookup("a").ip == IPv4("10.0.0.1")
+    assert second.allocate_if_free("b", IPv4("10.0.0.1"), 3600) is None
+    assert second.allocate_if_free("b", IPv4("10.0.0.2"), 3600) is not None
+    assert first.lookup_ip(IPv4("10.0.0.2"))[0] == "b"
+
+
+def test_requests_are_batched_and_pipelined_over_pooled_connections(store: LeaseStoreServer) -> None:
+    client = RemoteLeaseBackend(store.address.compat(), pool_size=2, batch_size=2)
+    ids = [f"client-{i}" for i in range(5)]
+    for i, client_id in enumerate(ids[:4]):
+        client.allocate(client_id, IPv4(f"10.0.0.{i + 1}"), 3600)
+
+    sent = []
+    original = client._execute
+
+    def spy(requests):
+        sent.append(len(requests))
+        return original(requests)
+
+    client._execute = spy
+    leases = client.lookup_many(ids)
+    assert sent == [5]
+    assert [lease.ip if lease else None for lease in leases] == [IPv4(f"10.0.0.{i}") for i in range(1, 5)] + [None]
+    renewed = client.renew_many(ids[:3], 60)
+    assert all(lease is not None for lease in renewed)
+    # Everything ran over one reused connection.
+    assert client._connections == 1
+    assert store.requests == 4 + 5 + 3
+
+
+def test_refused_requests_answer_none_without_tripping_the_breaker(store: LeaseStoreServer, caplog) -> None:
+    client = RemoteLeaseBackend(store.address.compat(), failure_threshold=1)
+    client.allocate("a", IPv4("10.0.0.1"), 3600)
+    assert client._call({"op": "nonsense"}) is None
+    assert client.renew("a", "soon") is None
+    assert client.lookup_many(["a", "missing"])[0].ip == IPv4("10.0.0.1")
+    assert "Lease store refused renew for a" in caplog.text
+    assert client.state == "closed"
+    assert client.failures == 0
+    assert client.fallbacks == 0
+
+
+def test_leases_are_listed_a_page_at_a_time(store: LeaseStoreServer) -> None:
+    client = RemoteLeaseBackend(store.address.compat(), page_size=2)
+    for n in range(5):
+        client.allocate(f"client-{4 - n}", IPv4(f"10.0.0.{n + 1}"), 3600)
+    requests = store.requests
+
+    assert [client_id for client_id, _ in client.iter_leases()] == [f"client-{n}" for n in range(5)]
+    assert store.requests == requests + 3
+    # A full last page costs one more, empty, page.
+    assert len(list(RemoteLeaseBackend(store.address.compat(), page_size=5).iter_leases())) == 5
+
+
+def test_breaker_opens_and_falls_back_to_cached_leases(store: LeaseStoreServer) -> None:
+    client = RemoteLeaseBackend(store.address.compat(), timeout=0.5, failure_threshold=2, reset_timeout=0.2)
+    client.allocate("a", IPv4("10.0.0.1"), 3600)
+    client.allocate("gone", IPv4("10.0.0.9"), -1)
+    address = store.address.compat()
+    store.close()
+    client.close()
+
+    assert client.lookup("a").ip == IPv4("10.0.0.1")
+    assert client.state == "closed"
+    assert client.renew("a", 3600).ip == IPv4("10.0.0.1")
+    assert client.state == "open"
+    assert client.failures == 2
+
+    def no_network():
+        raise AssertionError("an open circuit must not connect")
+
+    client._checkout = no_network
+    assert client.lookup_ip(IPv4("10.0.0.1"))[0] == "a"
+    assert client.lookup("gone") is None
+    assert client.allocate("b", IPv4("10.0.0.2"), 3600) is None
+    assert client.release("a") is False
+    assert client.fallbacks == 6
+    del client._checkout
+
+    # After the reset timeout one trial call goes through and closes the circuit.
+    replacement = LeaseStoreServer(listen=("127.0.0.1", 0), select_timeout=0.05)
+    thread = replacement.start()
+    try:
+        client.address = replacement.address.compat()
+        assert client.address != address
+        time.sleep(0.25)
+        assert client.state == "half-open"
+        assert client.lookup("a") is None
+        assert client.state == "closed"
+        assert client.allocate("b", IPv4("10.0.0.2"), 3600) is not None
+    finally:
+        replacement.close()
+        if thread:
+            thread.join(timeout=1.0)
+
+
+def test_lease_store_command_serves_clients(tmp_path) -> None:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC), env.get("PYTHONPATH")]))
+    journal = str(tmp_path / "leases.json")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "pydhcp.cli", "lease-store", "--listen", f"127.0.0.1:{port}", "--journal", journal],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        client = RemoteLeaseBackend(("127.0.0.1", port), failure_threshold=1000)
+        deadline = time.monotonic() + 10
+        while client.allocate("a", IPv4("10.0.0.1"), 3600) is None:
+            assert time.monotonic() < deadline, "lease store did not start"
+            time.sleep(0.05)
+        assert client.lookup("a").ip == IPv4("10.0.0.1")
+        client.close()
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    assert os.path.exists(journal + ".journal")
+
+
+def test_store_requires_an_address_index() -> None:
+    class PlainBackend:
+        pass
+
+    with pytest.raises(TypeError):
+        LeaseStoreServer(PlainBackend())
+    assert isinstance(LeaseStoreServer(InMemoryLeaseBackend()).backend.backend, InMemoryLeaseBackend)
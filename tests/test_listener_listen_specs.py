@@ -75,3 +75,30 @@ def test_server_constructors_accept_per_interface_and_multiple_endpoints() -> No
     ]
     assert server._listen == expected
     assert async_server._listen == expected
+
+
+def test_receive_loop_ticks_between_selects() -> None:
+    import threading
+    import time
+
+    class TickingServer(DhcpServer):
+        ticks = 0
+
+        def tick(self) -> None:
+            self.ticks += 1
+            if self.ticks == 2:
+                raise RuntimeError("a failing tick must not stop the loop")
+
+    server = TickingServer(listen=[("127.0.0.1", 0)], select_timeout=0.01)
+    token = threading.Event()
+    server._cancelleation_token = token
+    thread = threading.Thread(target=server.listen)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 5
+        while server.ticks < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        token.set()
+        thread.join(timeout=2)
+    assert server.ticks >= 5
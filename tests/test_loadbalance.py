@@ -0,0 +1,109 @@
+import ipaddress
+from datetime import timedelta
+from unittest.mock import Mock
+
+import pytest
+
+from pydhcp import DhcpMessage, DhcpOptions, NetworkInterface, RequestContext
+from pydhcp.loadbalance import LoadBalancer, hash_key, load_hash, parse_buckets
+from pydhcp.packet import DhcpMessageType, Flags, HardwareAddressType, OpCode
+from pydhcp.options import DhcpOptionCode
+from pydhcp.network import IPv4, SocketAddress
+from pydhcp.server import DhcpServer
+
+
+def _message(chaddr: bytes, message_type: DhcpMessageType = DhcpMessageType.DHCPDISCOVER, secs: int = 0) -> DhcpMessage:
+    options = DhcpOptions()
+    options[DhcpOptionCode.DHCP_MESSAGE_TYPE] = message_type
+    return DhcpMessage(
+        op=OpCode.BOOTREQUEST,
+        htype=HardwareAddressType.ETHERNET,
+        hlen=len(chaddr),
+        hops=0,
+        xid=1,
+        secs=timedelta(seconds=secs),
+        flags=Flags.UNICAST,
+        ciaddr=IPv4("0.0.0.0"),
+        yiaddr=IPv4("0.0.0.0"),
+        siaddr=IPv4("0.0.0.0"),
+        giaddr=IPv4("0.0.0.0"),
+        chaddr=chaddr,
+        sname="",
+        file="",
+        options=options,
+    )
+
+
+def _macs(count: int) -> list:
+    return [bytes([0x02, 0, 0, 0, i >> 8, i & 0xFF]) for i in range(count)]
+
+
+def test_hash_is_pearson_over_the_key() -> None:
+    assert load_hash(b"") == 0
+    assert load_hash(b"\x00") == 175  # T[len ^ 0]
+    buckets = {load_hash(mac) for mac in _macs(4096)}
+    assert len(buckets) > 250
+
+
+def test_hash_key_prefers_client_identifier() -> None:
+    msg = _message(b"\x00\x11\x22\x33\x44\x55")
+    assert hash_key(msg) == b"\x00\x11\x22\x33\x44\x55"
+    msg.options[DhcpOptionCode.CLIENT_IDENTIFIER] = b"\x01abc"
+    assert hash_key(msg) == b"\x01abc"
+
+
+def test_peers_split_every_client_exactly_once() -> None:
+    balancers = [LoadBalancer.split(i, 3) for i in range(3)]
+    for mac in _macs(600):
+        msg = _message(mac)
+        assert sum(balancer.accepts(msg) for balancer in balancers) == 1
+
+
+def test_peer_down_fallback_and_secs_threshold() -> None:
+    first = LoadBalancer.from_config({"peers": {"a": "0-127", "b": "128-255"}, "self": "a", "secs_threshold": 10})
+    theirs = [mac for mac in _macs(200) if load_hash(mac) >= 128]
+
+    assert not any(first.accepts(_message(mac)) for mac in theirs)
+    assert all(first.accepts(_message(mac, secs=10)) for mac in theirs)
+
+    first.mark_down("b")
+    assert all(first.accepts(_message(mac)) for mac in theirs)
+    first.mark_up("b")
+    assert not first.accepts(_message(theirs[0]))
+
+
+def test_only_unaddressed_discover_and_request_are_balanced() -> None:
+    balancer = LoadBalancer([])
+    mac = _macs(1)[0]
+    assert not balancer.accepts(_message(mac))
+    assert not balancer.accepts(_message(mac, DhcpMessageType.DHCPREQUEST))
+
+    selecting = _message(mac, DhcpMessageType.DHCPREQUEST)
+    selecting.options[DhcpOptionCode.SERVER_IDENTIFIER] = IPv4("127.0.0.1")
+    assert balancer.accepts(selecting)
+    assert balancer.accepts(_message(mac, DhcpMessageType.DHCPRELEASE))
+
+
+def test_config_validation() -> None:
+    assert parse_buckets("0-3,9") == frozenset({0, 1, 2, 3, 9})
+    with pytest.raises(ValueError):
+        parse_buckets([256])
+    with pytest.raises(ValueError, match="shared"):
+        LoadBalancer.from_config({"peers": {"a": "0-128", "b": "128-255"}, "self": "a"})
+
+
+def test_server_drops_out_of_bucket_clients_before_lease_work() -> None:
+    server = DhcpServer(load_balancer=LoadBalancer([]))
+    server.acquire_lease = Mock()
+    transport = Mock()
+    context = RequestContext(
+        transport=transport,
+        interface=NetworkInterface("lo", ipaddress.IPv4Interface("127.0.0.1/8")),
+        client=SocketAddress("127.0.0.1", 68),
+        client_mac=_macs(1)[0],
+    )
+    server.handle(_message(_macs(1)[0]), context)
+
+    server.acquire_lease.assert_not_called()
+    transport.send.assert_not_called()
+    assert server.metrics.packets_dropped_load_balance == 1
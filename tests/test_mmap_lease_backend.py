@@ -0,0 +1,179 @@
+import os
+import pathlib
+import random
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from pydhcp import DhcpOptions, IPv4
+from pydhcp.lease import LeaseQueryBackend
+from pydhcp.lease.mmapped import HEADER_SIZE, RECORD_SIZE, MmapLeaseBackend
+from pydhcp.options import DhcpOptionCode
+
+SRC = pathlib.Path(__file__).resolve().parents[1] / "src"
+
+
+def _options(router: str) -> DhcpOptions:
+    options = DhcpOptions()
+    options[DhcpOptionCode.ROUTER] = IPv4(router)
+    return options
+
+
+def test_round_trip_and_reopen(tmp_path) -> None:
+    path = str(tmp_path / "leases.mmap")
+    backend = MmapLeaseBackend(path, capacity=64)
+    assert not isinstance(backend, LeaseQueryBackend)
+    assert os.path.getsize(path) == HEADER_SIZE + 64 * RECORD_SIZE
+
+    lease = backend.allocate("a", IPv4("10.0.0.1"), 3600, _options("10.0.0.254"))
+    backend.allocate("b", IPv4("10.0.0.2"), float("inf"))
+    assert backend.lookup("a") == lease
+    assert backend.lookup("b").expires == float("inf")
+    assert backend.lookup("missing") is None
+
+    renewed = backend.renew("a", 7200)
+    assert renewed.ip == IPv4("10.0.0.1")
+    assert (renewed.expires - lease.expires).total_seconds() > 3000
+    assert backend.release("b") is True
+    assert backend.release("b") is False
+    assert len(backend) == 1
+    backend.close()
+
+    reopened = MmapLeaseBackend(path, capacity=1024)
+    assert reopened.capacity == 64
+    found = reopened.lookup("a")
+    assert found.expires == renewed.expires
+    assert found.options.get(DhcpOptionCode.ROUTER) == [IPv4("10.0.0.254")]
+    assert reopened.last_transaction("a") is not None
+    reopened.close()
+
+
+def test_option_sets_are_interned(tmp_path) -> None:
+    path = str(tmp_path / "leases.mmap")
+    backend = MmapLeaseBackend(path, capacity=64)
+    for i in range(20):
+        backend.allocate(f"client-{i}", IPv4(f"10.0.0.{i + 1}"), 3600, _options("10.0.0.254"))
+    size = os.path.getsize(path + ".options")
+    backend.allocate("other", IPv4("10.0.0.100"), 3600, _options("10.0.0.253"))
+    assert os.path.getsize(path + ".options") == 2 * size
+    backend.close()
+
+
+def test_slots_are_reused_and_a_full_table_refuses(tmp_path) -> None:
+    backend = MmapLeaseBackend(str(tmp_path / "leases.mmap"), capacity=8)
+    for i in range(8):
+        assert backend.allocate(f"client-{i}", IPv4(f"10.0.0.{i + 1}"), 3600) is not None
+    assert backend.allocate("late", IPv4("10.0.0.9"), 3600) is None
+    # Re-allocating a known client reuses its slot
+    assert backend.allocate("client-3", IPv4("10.0.0.30"), 3600).ip == IPv4("10.0.0.30")
+
+    backend.release("client-0")
+    backend.allocate("client-1", IPv4("10.0.0.2"), -1)
+    assert backend.allocate("late", IPv4("10.0.0.9"), 3600) is not None
+    assert backend.allocate("later", IPv4("10.0.0.10"), 3600) is not None
+    assert backend.lookup("client-1") is None
+    assert all(backend.lookup(f"client-{i}") is not None for i in range(2, 8))
+    assert len(backend) == 8
+    backend.close()
+
+
+
+def test_sweep_empties_released_and_expired_slots_a_run_at_a_time(tmp_path) -> None:
+    path = str(tmp_path / "leases.mmap")
+    backend = MmapLeaseBackend(path, capacity=16, sweep_slots=4)
+    for i in range(10):
+        backend.allocate(f"client-{i}", IPv4(f"10.0.0.{i + 1}"), 3600, _options("10.0.0.254"))
+    backend.allocate("expired", IPv4("10.0.0.99"), -1)
+    for i in range(3):
+        backend.release(f"client-{i}")
+    assert backend.tombstones == 3
+    assert len(backend) == 8
+
+    # Four slots a call; twice round the table reaches every slot whatever moved back.
+    assert sum(backend.sweep() for _ in range(8)) == 1
+    assert backend.tombstones == 0
+    assert len(backend) == 7
+    backend.close()
+
+    reopened = MmapLeaseBackend(path)
+    assert all(reopened.lookup(f"client-{i}").ip == IPv4(f"10.0.0.{i + 1}") for i in range(3, 10))
+    assert reopened.lookup("client-0") is None
+    assert reopened.lookup("expired") is None
+    with open(path, "rb") as f:
+        table = f.read()[HEADER_SIZE:]
+    flags = [int.from_bytes(table[i * RECORD_SIZE + 8 : i * RECORD_SIZE + 12], "little") for i in range(16)]
+    assert flags.count(0) == 9
+    reopened.close()
+
+
+def test_sweeping_keeps_every_lease_reachable(tmp_path) -> None:
+    rng = random.Random(7)
+    backend = MmapLeaseBackend(str(tmp_path / "leases.mmap"), capacity=32, sweep_slots=3)
+    live: dict = {}
+    for step in range(3000):
+        client_id = f"client-{rng.randrange(40)}"
+        action = rng.random()
+        if action < 0.45 and (client_id in live or len(backend) < 30):
+            ttl = -1 if rng.random() < 0.2 else 3600
+            assert backend.allocate(client_id, IPv4(f"10.0.{step // 256}.{step % 256}"), ttl) is not None
+            if ttl > 0:
+                live[client_id] = IPv4(f"10.0.{step // 256}.{step % 256}")
+            else:
+                live.pop(client_id, None)
+        elif action < 0.7:
+            backend.release(client_id)
+            live.pop(client_id, None)
+        else:
+            backend.sweep()
+        for known, ip in live.items():
+            assert backend.lookup(known).ip == ip
+    backend.sweep(slots=32)
+    assert backend.tombstones == 0
+    assert len(backend) == len(live)
+    backend.close()
+
+
+def test_capacity_must_be_a_power_of_two(tmp_path) -> None:
+    with pytest.raises(ValueError):
+        MmapLeaseBackend(str(tmp_path / "leases.mmap"), capacity=100)
+
+
+WORKER_SCRIPT = textwrap.dedent(
+    """
+    import sys
+    from pydhcp import DhcpOptions, IPv4
+    from pydhcp.lease.mmapped import MmapLeaseBackend
+    from pydhcp.options import DhcpOptionCode
+
+    backend = MmapLeaseBackend(sys.argv[1])
+    worker = int(sys.argv[2])
+    for i in range(300):
+        options = DhcpOptions()
+        options[DhcpOptionCode.ROUTER] = IPv4(f"10.{worker}.{i % 3}.254")
+        assert backend.allocate(f"w{worker}-{i}", IPv4(f"10.{worker}.{i >> 8}.{i & 0xFF}"), 3600, options)
+        assert backend.renew(f"w{worker}-{i // 2}", 3600)
+    backend.close()
+    """
+)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs fcntl range locks")
+def test_worker_processes_share_one_store(tmp_path) -> None:
+    path = str(tmp_path / "leases.mmap")
+    MmapLeaseBackend(path, capacity=2048).close()
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC), env.get("PYTHONPATH")]))
+    workers = [subprocess.Popen([sys.executable, "-c", WORKER_SCRIPT, path, str(worker)], env=env) for worker in range(4)]
+    assert [worker.wait(timeout=30) for worker in workers] == [0, 0, 0, 0]
+
+    backend = MmapLeaseBackend(path)
+    assert len(backend) == 1200
+    for worker in range(4):
+        for i in range(300):
+            lease = backend.lookup(f"w{worker}-{i}")
+            assert lease.ip == IPv4(f"10.{worker}.{i >> 8}.{i & 0xFF}")
+            assert lease.options.get(DhcpOptionCode.ROUTER) == [IPv4(f"10.{worker}.{i % 3}.254")]
+    assert len(backend._option_sets) == 1 + 4 * 3  # every distinct set stored once
+    backend.close()
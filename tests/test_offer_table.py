@@ -0,0 +1,201 @@
+import ipaddress
+from datetime import timedelta
+from unittest.mock import Mock
+
+from pydhcp import DhcpMessage, DhcpOptions, NetworkInterface, RequestContext
+from pydhcp.allocation import DeclineQuarantine, OfferTable
+from pydhcp.clock import CachedClock, VirtualClock
+from pydhcp.timers import ExpiryHeap
+from pydhcp.packet import DhcpMessageType, Flags, HardwareAddressType, OpCode
+from pydhcp.options import DhcpOptionCode
+from pydhcp.network import IPv4, SocketAddress
+from pydhcp.server import DhcpServer
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _message(message_type: DhcpMessageType, chaddr: bytes, requested: str) -> DhcpMessage:
+    options = DhcpOptions()
+    options[DhcpOptionCode.DHCP_MESSAGE_TYPE] = message_type
+    options[DhcpOptionCode.REQUESTED_IP] = IPv4(requested)
+    return DhcpMessage(
+        op=OpCode.BOOTREQUEST,
+        htype=HardwareAddressType.ETHERNET,
+        hlen=6,
+        hops=0,
+        xid=0x12345678,
+        secs=timedelta(seconds=0),
+        flags=Flags.UNICAST,
+        ciaddr=IPv4("0.0.0.0"),
+        yiaddr=IPv4("0.0.0.0"),
+        siaddr=IPv4("0.0.0.0"),
+        giaddr=IPv4("0.0.0.0"),
+        chaddr=chaddr,
+        sname="",
+        file="",
+        options=options,
+    )
+
+
+def _context(transport: Mock) -> RequestContext:
+    return RequestContext(
+        transport=transport,
+        interface=NetworkInterface("lo", ipaddress.IPv4Interface("127.0.0.1/8")),
+        client=SocketAddress("127.0.0.1", 68),
+        client_mac=b"\x00\x11\x22\x33\x44\x55",
+    )
+
+
+def test_expiry_heap_pops_in_deadline_order_and_skips_rescheduled_keys() -> None:
+    heap: ExpiryHeap[str] = ExpiryHeap()
+    heap.schedule("a", 10)
+    heap.schedule("b", 5)
+    heap.schedule("c", 20)
+    heap.schedule("a", 30)
+    heap.discard("c")
+
+    assert heap.next_deadline() == 5
+    assert heap.pop_expired(25) == ["b"]
+    assert len(heap) == 1
+    assert heap.pop_expired(30) == ["a"]
+    assert len(heap) == 0
+
+
+def test_expiry_heap_bulk_schedule_matches_one_at_a_time() -> None:
+    heap: ExpiryHeap[str] = ExpiryHeap()
+    heap.schedule("a", 10)
+    heap.schedule_many([("b", 5), ("c", 20), ("a", 30)])
+
+    assert len(heap) == 3
+    assert heap.next_deadline() == 5
+    assert heap.pop_expired(25) == ["b", "c"]
+    assert heap.pop_expired(30) == ["a"]
+
+
+def test_offer_table_holds_address_for_one_client_until_timeout() -> None:
+    clock = FakeClock()
+    offers = OfferTable(hold_time=30, clock=clock)
+    ip = IPv4("10.0.0.5")
+
+    offers.hold("client-a", ip)
+    assert offers.holder(ip) == "client-a"
+    assert offers.is_available(ip, "client-a")
+    assert not offers.is_available(ip, "client-b")
+
+    clock.now += 31
+    assert offers.is_available(ip, "client-b")
+    assert offers.expire() == 1
+    assert len(offers) == 0
+
+
+def test_offer_table_moves_hold_when_client_gets_new_offer() -> None:
+    offers = OfferTable(clock=FakeClock())
+    offers.hold("client-a", IPv4("10.0.0.5"))
+    offers.hold("client-a", IPv4("10.0.0.6"))
+
+    assert offers.holder(IPv4("10.0.0.5")) is None
+    assert offers.offered("client-a") == IPv4("10.0.0.6")
+    assert offers.release("client-a") == IPv4("10.0.0.6")
+    assert offers.holder(IPv4("10.0.0.6")) is None
+
+
+def test_server_does_not_offer_held_address_to_second_client() -> None:
+    server = DhcpServer()
+    transport = Mock()
+
+    server.handle(_message(DhcpMessageType.DHCPDISCOVER, b"\x00\x00\x00\x00\x00\x01", "127.0.0.50"), _context(transport))
+    assert transport.send.call_count == 1
+    assert server.metrics.offers_held == 1
+
+    server.handle(_message(DhcpMessageType.DHCPDISCOVER, b"\x00\x00\x00\x00\x00\x02", "127.0.0.50"), _context(transport))
+    assert transport.send.call_count == 1
+
+    request = _message(DhcpMessageType.DHCPREQUEST, b"\x00\x00\x00\x00\x00\x01", "127.0.0.50")
+    request.options[DhcpOptionCode.SERVER_IDENTIFIER] = IPv4("127.0.0.1")
+    server.handle(request, _context(transport))
+    response = DhcpMessage.decode(transport.send.call_args.args[0])
+    assert response.options.get(DhcpOptionCode.DHCP_MESSAGE_TYPE) == DhcpMessageType.DHCPACK
+    assert server.metrics.offers_held == 0
+
+
+def test_server_expires_stale_offers() -> None:
+    clock = VirtualClock()
+    server = DhcpServer(clock=CachedClock(clock))
+    server.offers = OfferTable(hold_time=5, clock=clock.monotonic)
+    transport = Mock()
+
+    # The first client's lease, bound when it was offered, lapses with the offer.
+    discover = _message(DhcpMessageType.DHCPDISCOVER, b"\x00\x00\x00\x00\x00\x01", "127.0.0.51")
+    discover.options[DhcpOptionCode.IP_ADDRESS_LEASE_TIME] = 5
+    server.handle(discover, _context(transport))
+    clock.advance(10)
+    server.handle(_message(DhcpMessageType.DHCPDISCOVER, b"\x00\x00\x00\x00\x00\x02", "127.0.0.51"), _context(transport))
+
+    assert transport.send.call_count == 2
+    assert server.metrics.offers_expired == 1
+    assert server.metrics.offers_held == 1
+
+
+def test_decline_quarantine_holds_addresses_until_timeout() -> None:
+    clock = FakeClock()
+    quarantine = DeclineQuarantine(hold_time=60, clock=clock)
+    quarantine.quarantine(IPv4("10.0.0.5"))
+    quarantine.quarantine(IPv4("10.0.0.6"), hold_time=600)
+
+    assert IPv4("10.0.0.5") in quarantine
+    assert IPv4("10.0.0.7") not in quarantine
+    clock.now += 61
+    assert IPv4("10.0.0.5") not in quarantine
+    assert quarantine.expire() == 1
+    assert len(quarantine) == 1
+    assert quarantine.release(IPv4("10.0.0.6"))
+    assert len(quarantine) == 0
+
+
+def test_server_quarantines_declined_address() -> None:
+    clock = FakeClock()
+    server = DhcpServer()
+    server.quarantine = DeclineQuarantine(hold_time=30, clock=clock)
+    transport = Mock()
+
+    request = _message(DhcpMessageType.DHCPREQUEST, b"\x00\x00\x00\x00\x00\x01", "127.0.0.52")
+    server.handle(request, _context(transport))
+    server.handle(_message(DhcpMessageType.DHCPDECLINE, b"\x00\x00\x00\x00\x00\x01", "127.0.0.52"), _context(transport))
+    assert server.metrics.declines == 1
+    assert server.metrics.quarantined == 1
+    assert server.lease_backend.lookup(request.client_id()) is None
+
+    sends = transport.send.call_count
+    server.handle(_message(DhcpMessageType.DHCPDISCOVER, b"\x00\x00\x00\x00\x00\x02", "127.0.0.52"), _context(transport))
+    assert transport.send.call_count == sends
+    assert server.address_in_use(IPv4("127.0.0.52"), "anyone")
+
+    clock.now += 31
+    server.handle(_message(DhcpMessageType.DHCPDISCOVER, b"\x00\x00\x00\x00\x00\x02", "127.0.0.52"), _context(transport))
+    assert transport.send.call_count == sends + 1
+    assert server.metrics.quarantine_expired == 1
+    assert server.metrics.quarantined == 0
+
+
+def test_server_ignores_a_decline_for_an_address_the_client_does_not_hold() -> None:
+    server = DhcpServer()
+    transport = Mock()
+
+    request = _message(DhcpMessageType.DHCPREQUEST, b"\x00\x00\x00\x00\x00\x01", "127.0.0.52")
+    server.handle(request, _context(transport))
+    stranger = b"\x00\x00\x00\x00\x00\x02"
+    server.handle(_message(DhcpMessageType.DHCPDECLINE, stranger, "127.0.0.52"), _context(transport))
+    server.handle(_message(DhcpMessageType.DHCPDECLINE, b"\x00\x00\x00\x00\x00\x01", "127.0.0.53"), _context(transport))
+
+    assert server.metrics.declines == 2
+    assert server.metrics.quarantined == 0
+    assert IPv4("127.0.0.52") not in server.quarantine
+    assert IPv4("127.0.0.53") not in server.quarantine
+    lease = server.lease_backend.lookup(request.client_id())
+    assert lease is not None and lease.ip == IPv4("127.0.0.52")
@@ -0,0 +1,179 @@
+import json
+import os
+import pathlib
+import socket
+import struct
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+from pydhcp import InMemoryLeaseBackend
+from pydhcp.clock import VirtualClock
+from pydhcp.lease.threadsafe import ThreadSafeLeaseBackend
+from pydhcp.network import IPv4
+from pydhcp.replication import ReplicatedLeaseBackend, ReplicationStandby, read_message, send_message
+from pydhcp.server import DhcpServer
+
+SRC = pathlib.Path(__file__).resolve().parents[1] / "src"
+
+
+def _wait(predicate, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting for replication")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def standby():
+    standby = ReplicationStandby(InMemoryLeaseBackend(), listen=("127.0.0.1", 0), select_timeout=0.05)
+    standby.bind()
+    thread = standby.start()
+    yield standby
+    standby.close()
+    if thread:
+        thread.join(timeout=1.0)
+
+
+def _leases(backend) -> dict:
+    return {client_id: str(lease.ip) for client_id, lease in backend.iter_leases()}
+
+
+def test_updates_stream_in_order_and_are_acknowledged(standby: ReplicationStandby) -> None:
+    primary = ReplicatedLeaseBackend(InMemoryLeaseBackend(), standby.address.compat(), window=4, batch_size=2, reconnect_interval=0.05)
+    thread = primary.start()
+    try:
+        for i in range(20):
+            primary.allocate(f"client-{i}", IPv4(f"10.0.0.{i + 1}"), 3600, chaddr=bytes([0, 0, 0, 0, 0, i]))
+        primary.renew("client-3", 60)
+        primary.release("client-4")
+
+        _wait(lambda: primary.pending == 0 and primary.seq == 22)
+        assert standby.seq == 22
+        assert _leases(standby.backend) == _leases(primary)
+        assert standby.backend.lookup_chaddr(bytes([0, 0, 0, 0, 0, 7]))[0] == "client-7"
+        assert 0 < (standby.backend.lookup("client-3").expires - primary.lookup("client-3").expires).total_seconds() + 1 < 2
+    finally:
+        primary.stop()
+        if thread:
+            thread.join(timeout=1.0)
+
+
+def test_reconnect_replays_backlog_or_falls_back_to_snapshot(standby: ReplicationStandby) -> None:
+    primary = ReplicatedLeaseBackend(InMemoryLeaseBackend(), standby.address.compat(), backlog=4, reconnect_interval=0.05)
+    for i in range(10):
+        primary.allocate(f"client-{i}", IPv4(f"10.0.0.{i + 1}"), 3600)
+    # Stale state from an earlier primary is dropped by the snapshot.
+    standby.backend.allocate("ghost", IPv4("10.0.0.200"), 3600)
+
+    thread = primary.start()
+    try:
+        _wait(lambda: standby.seq == 10 and primary.pending == 0)
+        assert standby.applied == 0  # caught up from a snapshot, the backlog no longer reached seq 1
+        assert _leases(standby.backend) == _leases(primary)
+
+        primary.release("client-0")
+        _wait(lambda: standby.seq == 11)
+        assert standby.applied == 1
+        assert standby.backend.lookup("client-0") is None
+    finally:
+        primary.stop()
+        if thread:
+            thread.join(timeout=1.0)
+
+
+def test_requires_a_snapshottable_backend() -> None:
+    class Plain:
+        def allocate(self, client_id, ip, ttl, options=None): ...
+        def lookup(self, client_id): ...
+        def release(self, client_id): ...
+        def renew(self, client_id, ttl): ...
+
+    with pytest.raises(TypeError):
+        ReplicatedLeaseBackend(Plain(), ("127.0.0.1", 1))
+
+
+def test_a_frame_that_is_not_an_object_is_refused() -> None:
+    left, right = socket.socketpair()
+    with left, right:
+        send_message(left, {"type": "hello"})
+        left.sendall(struct.pack("!I", 2) + b"[]")
+        assert read_message(right) == {"type": "hello"}
+        with pytest.raises(ValueError, match="JSON object"):
+            read_message(right)
+
+
+@pytest.mark.parametrize("inner", [InMemoryLeaseBackend, ThreadSafeLeaseBackend])
+def test_allocate_if_free_is_published(inner) -> None:
+    primary = ReplicatedLeaseBackend(inner(), ("127.0.0.1", 1))
+    assert primary.allocate_if_free("a", IPv4("10.0.0.5"), 3600) is not None
+    assert primary.allocate_if_free("b", IPv4("10.0.0.5"), 3600) is None
+    assert primary.seq == 1
+    assert primary.pending == 1
+    with pytest.raises(AttributeError):
+        primary.shard
+
+
+def test_the_standby_reads_remaining_time_from_its_clock() -> None:
+    clock = VirtualClock()
+    primary = ReplicatedLeaseBackend(InMemoryLeaseBackend(clock), ("127.0.0.1", 1))
+    standby = ReplicationStandby(InMemoryLeaseBackend(clock))
+    lease = primary.allocate("a", IPv4("10.0.0.5"), 600)
+    standby.apply(primary._backlog[-1][1])
+    assert standby.backend.lookup("a").expires == lease.expires
+
+
+STANDBY_SCRIPT = textwrap.dedent(
+    """
+    import json, sys
+    from pydhcp import InMemoryLeaseBackend
+    from pydhcp.replication import ReplicationStandby
+
+    standby = ReplicationStandby(InMemoryLeaseBackend(), listen=("127.0.0.1", 0), select_timeout=0.05)
+    standby.bind()
+    standby.start()
+    print(standby.address.port, flush=True)
+    for line in sys.stdin:
+        leases = {client_id: str(lease.ip) for client_id, lease in standby.backend.iter_leases()}
+        print(json.dumps({"seq": standby.seq, "leases": leases}), flush=True)
+    standby.close()
+    """
+)
+
+
+def test_two_processes_on_localhost() -> None:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC), env.get("PYTHONPATH")]))
+    proc = subprocess.Popen(
+        [sys.executable, "-c", STANDBY_SCRIPT],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+        env=env,
+    )
+    try:
+        port = int(proc.stdout.readline())
+        primary = ReplicatedLeaseBackend(InMemoryLeaseBackend(), ("127.0.0.1", port), reconnect_interval=0.05)
+        server = DhcpServer(lease_backend=primary)
+        thread = primary.start()
+        try:
+            for i in range(50):
+                server.lease_backend.allocate(f"client-{i}", IPv4(f"10.1.0.{i + 1}"), 3600)
+            _wait(lambda: primary.pending == 0 and primary.connected)
+        finally:
+            primary.stop()
+            if thread:
+                thread.join(timeout=1.0)
+
+        proc.stdin.write("dump\n")
+        proc.stdin.flush()
+        state = json.loads(proc.stdout.readline())
+        assert state["seq"] == 50
+        assert state["leases"] == _leases(primary)
+    finally:
+        proc.stdin.close()
+        proc.wait(timeout=5)
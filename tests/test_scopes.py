@@ -0,0 +1,144 @@
+import ipaddress
+from datetime import timedelta
+from unittest.mock import Mock
+
+import pytest
+
+from pydhcp import DhcpMessage, DhcpOptions, NetworkInterface, RequestContext
+from pydhcp.classify import ClientClassifier
+from pydhcp.packet import DhcpMessageType, Flags, HardwareAddressType, OpCode
+from pydhcp.options import DhcpOptionCode
+from pydhcp.network import IPv4, SocketAddress
+from pydhcp.scopes import OptionScopes, compile_options
+from pydhcp.server import DhcpServer
+
+
+CHADDR = b"\x00\x11\x22\x33\x44\x55"
+
+CONFIG = {
+    "options": {"DNS": ["192.0.2.53"], "DOMAIN_NAME": "example.net"},
+    "shared_networks": [
+        {
+            "name": "campus",
+            "options": {"NTP_SERVERS": ["10.0.0.1"], "DOMAIN_NAME": "campus.example.net"},
+            "subnets": [
+                {
+                    "subnet": "10.0.0.0/24",
+                    "options": {"ROUTER": ["10.0.0.1"]},
+                    "pools": [{"range": "10.0.0.100-10.0.0.199", "options": {"IP_ADDRESS_LEASE_TIME": 600}}],
+                },
+            ],
+        },
+    ],
+    "subnets": [{"subnet": "127.0.0.0/8", "options": {"ROUTER": ["127.0.0.254"]}}],
+    "classes": [{"name": "pxe", "match": {"vendor_class": {"prefix": "PXEClient"}}, "options": {"BOOTFILE_NAME": "ipxe.efi"}}],
+    "hosts": [{"chaddr": "00:11:22:33:44:55", "options": {"HOSTNAME": "printer-1", "BOOTFILE_NAME": "printer.bin"}}],
+}
+
+
+def test_layers_override_in_scope_order() -> None:
+    scopes = OptionScopes.from_config(CONFIG)
+
+    in_pool = scopes.resolve(IPv4("10.0.0.150"))
+    assert in_pool[DhcpOptionCode.DOMAIN_NAME] == b"campus.example.net"
+    assert in_pool[DhcpOptionCode.ROUTER] == bytes([10, 0, 0, 1])
+    assert in_pool[DhcpOptionCode.SUBNET_MASK] == bytes([255, 255, 255, 0])
+    assert in_pool[DhcpOptionCode.IP_ADDRESS_LEASE_TIME] == (600).to_bytes(4, "big")
+
+    outside_pool = scopes.resolve(IPv4("10.0.0.5"))
+    assert DhcpOptionCode.IP_ADDRESS_LEASE_TIME not in outside_pool
+
+    elsewhere = scopes.resolve(IPv4("192.0.2.9"))
+    assert elsewhere == compile_options(CONFIG["options"])
+
+    host = scopes.resolve(IPv4("10.0.0.150"), ("pxe",), chaddr=CHADDR)
+    assert host[DhcpOptionCode.BOOTFILE_NAME] == b"printer.bin"
+    assert scopes.resolve(IPv4("10.0.0.150"), ("pxe",))[DhcpOptionCode.BOOTFILE_NAME] == b"ipxe.efi"
+
+
+def test_resolve_is_memoized_and_base_layer_sits_below_global() -> None:
+    scopes = OptionScopes.from_config(CONFIG)
+    base = {int(DhcpOptionCode.DNS): b"\x01\x01\x01\x01", int(DhcpOptionCode.TIME_OFFSET): b"\x00\x00\x00\x00"}
+
+    first = scopes.resolve(IPv4("10.0.0.150"), base=base, base_key="eth0")
+    assert first[DhcpOptionCode.DNS] == bytes([192, 0, 2, 53])
+    assert first[DhcpOptionCode.TIME_OFFSET] == b"\x00\x00\x00\x00"
+    assert scopes.resolve(IPv4("10.0.0.151"), base=base, base_key="eth0") is first
+
+
+def test_bad_config_is_rejected_at_load() -> None:
+    with pytest.raises(ValueError, match="Unknown DHCP option"):
+        OptionScopes.from_config({"options": {"NOT_AN_OPTION": 1}})
+    with pytest.raises(ValueError, match="not inside subnet"):
+        OptionScopes.from_config({"subnets": [{"subnet": "10.0.0.0/24", "pools": [{"range": "10.0.1.1-10.0.1.9"}]}]})
+
+
+def _request(vendor_class: str) -> DhcpMessage:
+    options = DhcpOptions()
+    options[DhcpOptionCode.DHCP_MESSAGE_TYPE] = DhcpMessageType.DHCPREQUEST
+    options[DhcpOptionCode.REQUESTED_IP] = IPv4("127.0.0.80")
+    options[DhcpOptionCode.VENDOR_CLASS_IDENTIFIER] = vendor_class
+    options[DhcpOptionCode.PARAMETER_REQUEST_LIST] = bytes([1, 3, 6, 67])
+    return DhcpMessage(
+        op=OpCode.BOOTREQUEST,
+        htype=HardwareAddressType.ETHERNET,
+        hlen=6,
+        hops=0,
+        xid=7,
+        secs=timedelta(seconds=0),
+        flags=Flags.UNICAST,
+        ciaddr=IPv4("0.0.0.0"),
+        yiaddr=IPv4("0.0.0.0"),
+        siaddr=IPv4("0.0.0.0"),
+        giaddr=IPv4("0.0.0.0"),
+        chaddr=b"\x00\xaa\xbb\xcc\xdd\xee",
+        sname="",
+        file="",
+        options=options,
+    )
+
+
+def test_server_hands_out_scoped_options_filtered_by_prl() -> None:
+    server = DhcpServer(classifier=ClientClassifier.from_config(CONFIG["classes"]), option_scopes=OptionScopes.from_config(CONFIG))
+    transport = Mock()
+    context = RequestContext(
+        transport=transport,
+        interface=NetworkInterface("lo", ipaddress.IPv4Interface("127.0.0.1/8")),
+        client=SocketAddress("127.0.0.1", 68),
+        client_mac=b"\x00\xaa\xbb\xcc\xdd\xee",
+    )
+    server.handle(_request("PXEClient:Arch:00007"), context)
+
+    reply = DhcpMessage.decode(transport.send.call_args.args[0])
+    assert reply.options.get(DhcpOptionCode.DHCP_MESSAGE_TYPE) == DhcpMessageType.DHCPACK
+    assert reply.options.get(DhcpOptionCode.ROUTER, decode=False) == bytes([127, 0, 0, 254])
+    assert reply.options.get(DhcpOptionCode.DNS, decode=False) == bytes([192, 0, 2, 53])
+    assert reply.options.get(DhcpOptionCode.BOOTFILE_NAME, decode=False) == b"ipxe.efi"
+    assert DhcpOptionCode.DOMAIN_NAME not in reply.options
+
+    # The reply was built on a copy; the stored lease keeps everything it was given.
+    lease = server.lease_backend.lookup(_request("").client_id())
+    assert DhcpOptionCode.DOMAIN_NAME in lease.options
+    assert DhcpOptionCode.SERVER_IDENTIFIER not in lease.options
+
+
+@pytest.mark.parametrize("requested, granted", [(None, 600), (7200, 600), (60, 60)])
+def test_a_scoped_lease_time_caps_the_lease(requested, granted) -> None:
+    config = {"subnets": [{"subnet": "127.0.0.0/8", "pools": [{"range": "127.0.0.50-127.0.0.99", "options": {"IP_ADDRESS_LEASE_TIME": 600}}]}]}
+    server = DhcpServer(option_scopes=OptionScopes.from_config(config))
+    transport = Mock()
+    context = RequestContext(
+        transport=transport,
+        interface=NetworkInterface("lo", ipaddress.IPv4Interface("127.0.0.1/8")),
+        client=SocketAddress("127.0.0.1", 68),
+        client_mac=b"\x00\xaa\xbb\xcc\xdd\xee",
+    )
+    request = _request("")
+    if requested is not None:
+        request.options[DhcpOptionCode.IP_ADDRESS_LEASE_TIME] = requested
+
+    for _ in range(2):
+        # The first request allocates, the second renews.
+        server.handle(request, context)
+        reply = DhcpMessage.decode(transport.send.call_args.args[0])
+        assert granted - 1 <= reply.options.get(DhcpOptionCode.IP_ADDRESS_LEASE_TIME) <= granted
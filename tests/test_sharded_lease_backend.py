@@ -0,0 +1,212 @@
+import ipaddress
+import random
+import sqlite3
+import threading
+from datetime import timedelta
+from unittest.mock import Mock
+
+import pytest
+
+from pydhcp import DhcpMessage, DhcpOptions, InMemoryLeaseBackend, IPv4, LeaseQueryBackend, NetworkInterface, RequestContext, ThreadSafeLeaseBackend
+from pydhcp.allocation import AddressPool, SequentialAllocator
+from pydhcp.lease.sharded import ShardedAllocator, ShardedLeaseBackend
+from pydhcp.network import SocketAddress
+from pydhcp.options import DhcpOptionCode
+from pydhcp.packet import DhcpMessageType, Flags, HardwareAddressType, OpCode
+from pydhcp.server import DhcpServer
+
+
+class CountingBackend(InMemoryLeaseBackend):
+    def __init__(self) -> None:
+        super().__init__()
+        self.ip_lookups = 0
+
+    def lookup_ip(self, ip):
+        self.ip_lookups += 1
+        return super().lookup_ip(ip)
+
+
+def _discover(chaddr: bytes) -> DhcpMessage:
+    options = DhcpOptions()
+    options[DhcpOptionCode.DHCP_MESSAGE_TYPE] = DhcpMessageType.DHCPDISCOVER
+    return DhcpMessage(
+        op=OpCode.BOOTREQUEST,
+        htype=HardwareAddressType.ETHERNET,
+        hlen=6,
+        hops=0,
+        xid=1,
+        secs=timedelta(seconds=0),
+        flags=Flags.UNICAST,
+        ciaddr=IPv4("0.0.0.0"),
+        yiaddr=IPv4("0.0.0.0"),
+        siaddr=IPv4("0.0.0.0"),
+        giaddr=IPv4("0.0.0.0"),
+        chaddr=chaddr,
+        sname="",
+        file="",
+        options=options,
+    )
+
+
+def _pool() -> AddressPool:
+    return AddressPool(IPv4("10.0.0.0"), IPv4("10.0.3.255"))
+
+
+def test_clients_always_go_to_the_same_shard() -> None:
+    backend = ShardedLeaseBackend([InMemoryLeaseBackend() for _ in range(4)])
+    assert isinstance(backend, LeaseQueryBackend)
+    counts = [0] * 4
+    for i in range(4000):
+        counts[backend.shard_of(f"client-{i}")] += 1
+    assert all(800 < count < 1200 for count in counts)
+    assert ShardedLeaseBackend([InMemoryLeaseBackend() for _ in range(4)]).shard_of("client-1") == backend.shard_of("client-1")
+
+    backend.allocate("client-1", IPv4("192.0.2.1"), 3600)
+    assert backend.shard("client-1").lookup("client-1").ip == IPv4("192.0.2.1")
+    assert sum(shard.lookup("client-1") is not None for shard in backend.shards) == 1
+    assert backend.renew("client-1", 60) is not None
+    assert backend.release("client-1")
+    assert backend.lookup("client-1") is None
+    with pytest.raises(ValueError):
+        ShardedLeaseBackend([])
+
+
+def test_addresses_are_allocated_and_looked_up_in_the_owning_shard() -> None:
+    pool = _pool()
+    shards = [CountingBackend() for _ in range(4)]
+    backend = ShardedLeaseBackend(shards, pools=[pool])
+    allocator = ShardedAllocator(backend)
+    for i in range(100):
+        client_id = f"client-{i}"
+        ip = allocator.select(client_id, pool, lambda ip: backend.lookup_ip(ip) is not None)
+        assert backend.owner_of(ip) == backend.shard_of(client_id)
+        assert backend.allocate_if_free(client_id, ip, 3600) is not None
+
+    for shard in shards:
+        shard.ip_lookups = 0
+    found = backend.lookup_ip(backend.lookup("client-7").ip)
+    assert found[0] == "client-7"
+    assert sum(shard.ip_lookups for shard in shards) == 1
+    assert len(list(backend.iter_leases())) == 100
+
+
+def test_addresses_in_another_shards_slice_are_refused() -> None:
+    pool = _pool()
+    backend = ShardedLeaseBackend([InMemoryLeaseBackend() for _ in range(4)], pools=[pool])
+    index = backend.shard_of("client-a")
+    foreign = backend.partition(pool)[(index + 1) % 4].first
+    own = backend.partition(pool)[index].first
+
+    assert backend.allocate("client-a", foreign, 3600) is None
+    assert backend.allocate_if_free("client-a", foreign, 3600) is None
+    assert backend.allocate_if_free("client-a", own, 3600) is not None
+    assert backend.owner_of(IPv4("192.0.2.1")) is None
+
+
+
+def test_pools_the_allocator_meets_are_registered() -> None:
+    pool = _pool()
+    backend = ShardedLeaseBackend([InMemoryLeaseBackend() for _ in range(4)])
+    assert backend.owner_of(pool.first) is None
+
+    ip = ShardedAllocator(backend).select("client-a", pool, lambda ip: False)
+    assert backend.owner_of(ip) == backend.shard_of("client-a")
+    parts = backend.partition(pool)
+    backend.register(pool)
+    assert backend.partition(pool) is parts
+    assert len(backend._slices[1]) == 4
+
+    with pytest.raises(TypeError, match="cannot look leases up by address"):
+        ShardedLeaseBackend([object()])
+
+def test_addresses_outside_the_pools_are_checked_in_every_shard() -> None:
+    backend = ShardedLeaseBackend([InMemoryLeaseBackend() for _ in range(4)])
+    clients = [f"client-{i}" for i in range(50)]
+    other = next(c for c in clients if backend.shard_of(c) != backend.shard_of("client-0"))
+    assert backend.allocate_if_free("client-0", IPv4("192.0.2.1"), 3600, chaddr=b"\x00\x11\x22\x33\x44\x55") is not None
+    assert backend.allocate_if_free(other, IPv4("192.0.2.1"), 3600) is None
+    assert backend.lookup_ip(IPv4("192.0.2.1"))[0] == "client-0"
+    assert backend.lookup_chaddr(b"\x00\x11\x22\x33\x44\x55")[0] == "client-0"
+    assert backend.chaddr("client-0") == b"\x00\x11\x22\x33\x44\x55"
+
+    backend.allocate(other, IPv4("192.0.2.2"), -1)
+    assert backend.sweep() == 1
+
+
+def test_threads_sharing_sharded_backend_never_double_lease() -> None:
+    pool = _pool()
+    backend = ShardedLeaseBackend([ThreadSafeLeaseBackend() for _ in range(4)], pools=[pool])
+    allocator = ShardedAllocator(backend, SequentialAllocator())
+    errors = []
+
+    def in_use_by_others(client_id: str):
+        def in_use(ip: IPv4) -> bool:
+            holder = backend.lookup_ip(ip)
+            return holder is not None and holder[0] != client_id
+
+        return in_use
+
+    def worker(n: int) -> None:
+        rng = random.Random(n)
+        for _ in range(200):
+            client_id = f"client-{rng.randrange(400)}"
+            ip = allocator.select(client_id, pool, in_use_by_others(client_id))
+            if ip is None:
+                errors.append(client_id)
+                continue
+            backend.allocate_if_free(client_id, ip, 3600)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    leases = list(backend.iter_leases())
+    addresses = [lease.ip for _, lease in leases]
+    assert not errors
+    assert len(addresses) == len(set(addresses))
+    assert all(backend.owner_of(lease.ip) == backend.shard_of(client_id) for client_id, lease in leases)
+
+
+def test_server_allocates_from_each_clients_shard() -> None:
+    pool = AddressPool(IPv4("127.0.0.100"), IPv4("127.0.0.131"), ipaddress.IPv4Network("127.0.0.0/8"))
+    backend = ShardedLeaseBackend([ThreadSafeLeaseBackend() for _ in range(4)], pools=[pool])
+    server = DhcpServer(lease_backend=backend, allocator=ShardedAllocator(backend), pools=[pool])
+    RequestContext(
+        transport=Mock(),
+        interface=NetworkInterface("lo", ipaddress.IPv4Interface("127.0.0.1/8")),
+        client=SocketAddress("127.0.0.1", 68),
+        client_mac=b"\x00" * 6,
+    )
+
+    for i in range(8):
+        msg = _discover(bytes([0, 0, 0, 0, 0, i]))
+        lease = server.acquire_lease(msg.client_id(), IPv4("127.0.0.1"), msg)
+        assert lease is not None
+        assert backend.owner_of(lease.ip) == backend.shard_of(msg.client_id())
+        assert backend.shard(msg.client_id()).lookup(msg.client_id()) is not None
+
+
+def test_server_flushes_and_closes_every_shard(tmp_path) -> None:
+    from pydhcp.lease.sqlite import SqliteLeaseBackend
+
+    paths = [str(tmp_path / f"shard-{n}.db") for n in range(2)]
+    shards = [SqliteLeaseBackend(path, batch_size=100, flush_interval=n + 1.0) for n, path in enumerate(paths)]
+    backend = ShardedLeaseBackend([InMemoryLeaseBackend(), *shards])
+    assert backend.flush_interval == 1.0
+    for i in range(10):
+        backend.allocate(f"client-{i}", IPv4(f"10.0.0.{i + 1}"), 3600)
+
+    written = sum(len(list(shard.iter_leases())) for shard in shards)
+    assert written > 0 and all(shard.commits == 0 for shard in shards)
+    backend.flush()
+    readers = [SqliteLeaseBackend(path) for path in paths]
+    assert sum(len(list(reader.iter_leases())) for reader in readers) == written
+    for reader in readers:
+        reader.close()
+
+    DhcpServer(lease_backend=backend).shutdown()
+    for shard in shards:
+        with pytest.raises(sqlite3.ProgrammingError):
+            shard.lookup("client-0")
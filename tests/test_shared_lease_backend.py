@@ -0,0 +1,327 @@
+import ipaddress
+import multiprocessing
+import os
+import pickle
+import signal
+import struct
+import time
+from datetime import timedelta
+from multiprocessing import shared_memory
+from unittest.mock import Mock
+
+import pytest
+
+from pydhcp import DhcpMessage, DhcpOptions, IPv4, LeaseQueryBackend, NetworkInterface, RequestContext
+from pydhcp.allocation import AddressPool
+from pydhcp.lease.shared import SharedMemoryAllocator, SharedMemoryLeaseBackend
+from pydhcp.network import SocketAddress
+from pydhcp.options import DhcpOptionCode
+from pydhcp.packet import DhcpMessageType, Flags, HardwareAddressType, OpCode
+from pydhcp.server import DhcpServer
+
+MAC = b"\x00\x11\x22\x33\x44\x55"
+
+fork = pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="needs fork to share the segment"
+)
+
+
+@pytest.fixture
+def pool() -> AddressPool:
+    return AddressPool(IPv4("10.0.0.1"), IPv4("10.0.0.20"), exclude=[IPv4("10.0.0.3")])
+
+
+@pytest.fixture
+def backend(pool):
+    backend = SharedMemoryLeaseBackend(capacity=64, pools=[pool])
+    yield backend
+    backend.close()
+    backend.unlink()
+
+
+def _options(router: str) -> DhcpOptions:
+    options = DhcpOptions()
+    options[DhcpOptionCode.ROUTER] = IPv4(router)
+    return options
+
+
+def _allocate_clients(name: str, first: int, count: int) -> None:
+    backend = SharedMemoryLeaseBackend(name)
+    for n in range(first, first + count):
+        backend.allocate(f"client-{n}", IPv4(f"192.0.2.{n}"), 3600, _options("192.0.2.254"))
+    backend.close()
+
+
+def _crash_after_allocating(name: str) -> None:
+    backend = SharedMemoryLeaseBackend(name)
+    backend.allocate("crashed", IPv4("192.0.2.99"), 3600)
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def _flip_leases(name: str, rounds: int) -> None:
+    backend = SharedMemoryLeaseBackend(name)
+    for n in range(rounds):
+        if n % 2:
+            backend.allocate("flipping", IPv4("192.0.2.1"), 3600, _options("192.0.2.254"), chaddr=MAC)
+        else:
+            backend.allocate("flipping", IPv4("198.51.100.1"), 7200, _options("198.51.100.254"), chaddr=b"\xaa" * 6)
+    backend.close()
+
+
+def test_leases_round_trip(backend) -> None:
+    assert isinstance(backend, LeaseQueryBackend)
+    lease = backend.allocate("client-a", IPv4("10.0.0.5"), 3600, _options("10.0.0.254"), chaddr=MAC)
+    assert lease is not None
+    assert backend.lookup("client-a") == lease
+    assert backend.lookup_ip(IPv4("10.0.0.5")) == ("client-a", lease)
+    assert backend.lookup_ip(IPv4("10.0.0.6")) is None
+    assert backend.lookup_chaddr(MAC) == ("client-a", lease)
+    assert backend.chaddr("client-a") == MAC
+    assert backend.last_transaction("client-a") == pytest.approx(time.time(), abs=5)
+    assert list(backend.iter_leases()) == [("client-a", lease)]
+    assert len(backend) == 1
+
+    renewed = backend.renew("client-a", 60)
+    assert renewed.ip == IPv4("10.0.0.5")
+    assert renewed.options.get(DhcpOptionCode.ROUTER) == [IPv4("10.0.0.254")]
+    assert backend.release("client-a")
+    assert not backend.release("client-a")
+    assert backend.lookup("client-a") is None
+    assert backend.lookup_ip(IPv4("10.0.0.5")) is None
+    assert len(backend) == 0
+
+
+def test_addresses_outside_pools_and_expired_leases(backend) -> None:
+    backend.allocate("outside", IPv4("192.0.2.1"), 3600)
+    backend.allocate("expired", IPv4("10.0.0.7"), -10)
+    assert backend.lookup_ip(IPv4("192.0.2.1"))[0] == "outside"
+    assert backend.lookup("expired") is None
+    assert backend.lookup_ip(IPv4("10.0.0.7")) is None
+    assert backend.renew("expired", 60) is None
+    assert backend.allocate_if_free("other", IPv4("192.0.2.1"), 3600) is None
+    assert backend.allocate_if_free("other", IPv4("10.0.0.7"), 3600) is not None
+    assert backend.allocate_if_free("other", IPv4("10.0.0.7"), 3600) is not None
+
+    backend.allocate("gone", IPv4("10.0.0.8"), -10)
+    assert len(backend) == 4
+    assert backend.sweep() == 2
+    assert len(backend) == 2
+
+
+def test_each_sweep_visits_a_bounded_run_of_slots(pool) -> None:
+    backend = SharedMemoryLeaseBackend(capacity=64, pools=[pool], sweep_slots=16)
+    opened = SharedMemoryLeaseBackend(backend.name, sweep_slots=16)
+    try:
+        for n in range(40):
+            backend.allocate(f"client-{n}", IPv4(f"192.0.2.{n}"), -10)
+        # Expired slots are reused, so fewer than 40 are taken.
+        occupied = len(backend)
+        swept = [backend.sweep(), opened.sweep(), backend.sweep(), opened.sweep()]
+        # The cursor is in the segment, so the two handles cover the table between them.
+        assert all(count < occupied for count in swept)
+        assert sum(swept) == occupied
+        assert len(backend) == 0
+
+        backend.allocate("late", IPv4("192.0.2.99"), -10)
+        assert backend.sweep(slots=backend.capacity) == 1
+    finally:
+        opened.close()
+        backend.close()
+        backend.unlink()
+
+
+def test_what_does_not_fit_is_refused() -> None:
+    backend = SharedMemoryLeaseBackend(capacity=2, client_id_size=8, options_size=32)
+    try:
+        assert backend.allocate("much-too-long", IPv4("192.0.2.1"), 3600) is None
+        assert backend.allocate("a", IPv4("192.0.2.1"), 3600, _options("192.0.2.254")) is not None
+        assert backend.allocate("b", IPv4("192.0.2.2"), 3600, _options("192.0.2.253")) is not None
+        big = DhcpOptions()
+        big[DhcpOptionCode.HOSTNAME] = "x" * 40
+        assert backend.allocate("a", IPv4("192.0.2.1"), 3600, big) is None
+        assert backend.allocate("c", IPv4("192.0.2.3"), 3600) is None
+    finally:
+        backend.close()
+        backend.unlink()
+    with pytest.raises(ValueError):
+        SharedMemoryLeaseBackend(capacity=3)
+
+
+def test_other_instances_open_the_same_table(backend, pool) -> None:
+    backend.allocate("client-a", IPv4("10.0.0.5"), 3600, _options("10.0.0.254"))
+    opened = SharedMemoryLeaseBackend(backend.name, capacity=8)
+    copied = pickle.loads(pickle.dumps(backend))
+    try:
+        assert not opened.created
+        assert opened.capacity == 64
+        assert copied.lookup("client-a").options.get(DhcpOptionCode.ROUTER) == [IPv4("10.0.0.254")]
+        copied.allocate("client-b", IPv4("10.0.0.6"), 3600, _options("10.0.0.254"))
+        assert opened.lookup_ip(IPv4("10.0.0.6"))[0] == "client-b"
+        assert backend.lookup("client-b") is not None
+    finally:
+        opened.close()
+        copied.close()
+
+    other = shared_memory.SharedMemory(create=True, size=4096)
+    try:
+        with pytest.raises(ValueError):
+            SharedMemoryLeaseBackend(other.name)
+    finally:
+        other.close()
+        other.unlink()
+
+
+
+def test_unpickling_a_removed_table_raises(pool) -> None:
+    backend = SharedMemoryLeaseBackend(capacity=8, pools=[pool])
+    pickled = pickle.dumps(backend)
+    backend.close()
+    backend.close()
+    backend.unlink()
+
+    with pytest.raises(FileNotFoundError):
+        pickle.loads(pickled)
+    with pytest.raises(FileNotFoundError):
+        SharedMemoryLeaseBackend(backend.name, create=False)
+
+def test_allocator_hands_out_free_bits_next_fit(backend, pool) -> None:
+    allocator = SharedMemoryAllocator(backend)
+    worker = SharedMemoryAllocator(pickle.loads(pickle.dumps(backend)))
+    taken = []
+    for n in range(pool.size - 1):
+        # Two workers take turns, sharing the bitmap and its cursor.
+        turn = (allocator, worker)[n % 2]
+        ip = turn.select(f"client-{n}", pool, lambda ip: False)
+        assert turn.backend.allocate_if_free(f"client-{n}", ip, 3600) is not None
+        taken.append(ip)
+    assert len(set(taken)) == pool.size - 1
+    assert IPv4("10.0.0.3") not in taken
+    assert taken[:3] == [IPv4("10.0.0.1"), IPv4("10.0.0.2"), IPv4("10.0.0.4")]
+    worker.backend.close()
+
+    def in_use(ip: IPv4) -> bool:
+        return backend.lookup_ip(ip) is not None
+
+    assert allocator.select("late", pool, in_use) is None
+    backend.allocate("client-0", IPv4("10.0.0.1"), -10)
+    assert allocator.select("late", pool, in_use) == IPv4("10.0.0.1")
+    backend.release("client-5")
+    assert set(backend.free_addresses(pool)) == {IPv4("10.0.0.3"), taken[5]}
+
+
+def test_half_written_slot_reads_as_free(backend) -> None:
+    backend.allocate("torn", IPv4("10.0.0.5"), 3600)
+    offset, _ = backend._get(b"torn")
+    seq = struct.unpack_from("<I", backend._buf, offset)[0]
+    struct.pack_into("<I", backend._buf, offset, seq | 1)
+
+    assert backend.lookup("torn") is None
+    assert backend.lookup_ip(IPv4("10.0.0.5")) is None
+    assert backend.allocate("torn", IPv4("10.0.0.5"), 3600) is not None
+    assert backend.lookup("torn").ip == IPv4("10.0.0.5")
+    assert struct.unpack_from("<I", backend._buf, backend._get(b"torn")[0])[0] % 2 == 0
+
+
+@fork
+def test_worker_processes_share_the_table(backend) -> None:
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_allocate_clients, args=(backend.name, 1 + 10 * n, 10)) for n in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    assert len(backend) == 30
+    assert backend.lookup_ip(IPv4("192.0.2.25"))[0] == "client-25"
+    assert backend.lookup("client-7").options.get(DhcpOptionCode.ROUTER) == [IPv4("192.0.2.254")]
+
+
+@fork
+def test_table_survives_a_worker_crash(backend) -> None:
+    context = multiprocessing.get_context("fork")
+    worker = context.Process(target=_crash_after_allocating, args=(backend.name,))
+    worker.start()
+    worker.join()
+    assert worker.exitcode == -signal.SIGKILL
+
+    assert backend.lookup("crashed").ip == IPv4("192.0.2.99")
+    worker = context.Process(target=_allocate_clients, args=(backend.name, 1, 1))
+    worker.start()
+    worker.join()
+    assert worker.exitcode == 0
+    assert backend.lookup("client-1") is not None
+
+
+@fork
+def test_lock_free_lookups_never_see_a_half_written_lease(backend) -> None:
+    backend.allocate("flipping", IPv4("192.0.2.1"), 3600, _options("192.0.2.254"), chaddr=MAC)
+    context = multiprocessing.get_context("fork")
+    writer = context.Process(target=_flip_leases, args=(backend.name, 5000))
+    writer.start()
+    consistent = {
+        (IPv4("192.0.2.1"), IPv4("192.0.2.254"), MAC),
+        (IPv4("198.51.100.1"), IPv4("198.51.100.254"), b"\xaa" * 6),
+    }
+    seen = set()
+    while writer.is_alive():
+        found = backend._get(b"flipping")
+        if found is None:
+            continue
+        record = found[1]
+        lease = backend._lease(record)
+        seen.add((lease.ip, lease.options.get(DhcpOptionCode.ROUTER)[0], record[8][: record[7]]))
+    writer.join()
+    assert writer.exitcode == 0
+    assert seen and seen <= consistent
+
+
+def _discover(chaddr: bytes) -> DhcpMessage:
+    options = DhcpOptions()
+    options[DhcpOptionCode.DHCP_MESSAGE_TYPE] = DhcpMessageType.DHCPDISCOVER
+    return DhcpMessage(
+        op=OpCode.BOOTREQUEST,
+        htype=HardwareAddressType.ETHERNET,
+        hlen=6,
+        hops=0,
+        xid=1,
+        secs=timedelta(seconds=0),
+        flags=Flags.UNICAST,
+        ciaddr=IPv4("0.0.0.0"),
+        yiaddr=IPv4("0.0.0.0"),
+        siaddr=IPv4("0.0.0.0"),
+        giaddr=IPv4("0.0.0.0"),
+        chaddr=chaddr,
+        sname=b"",
+        file=b"",
+        options=options,
+    )
+
+
+def test_servers_sharing_a_table_never_lease_one_address_twice() -> None:
+    pool = AddressPool(IPv4("127.0.0.100"), IPv4("127.0.0.107"), ipaddress.IPv4Network("127.0.0.0/8"))
+    backend = SharedMemoryLeaseBackend(capacity=16, pools=[pool])
+    opened = SharedMemoryLeaseBackend(backend.name)
+    try:
+        servers = [
+            DhcpServer(lease_backend=table, allocator=SharedMemoryAllocator(table), pools=[pool])
+            for table in (backend, opened)
+        ]
+        RequestContext(
+            transport=Mock(),
+            interface=NetworkInterface("lo", ipaddress.IPv4Interface("127.0.0.1/8")),
+            client=SocketAddress("127.0.0.1", 68),
+            client_mac=b"\x00" * 6,
+        )
+        leases = []
+        for n in range(8):
+            msg = _discover(bytes([0, 0, 0, 0, 0, n]))
+            leases.append(servers[n % 2].acquire_lease(msg.client_id(), IPv4("127.0.0.1"), msg))
+        assert all(lease is not None for lease in leases)
+        assert len({lease.ip for lease in leases}) == 8
+        msg = _discover(b"\x00\x00\x00\x00\x00\x08")
+        assert servers[0].acquire_lease(msg.client_id(), IPv4("127.0.0.1"), msg) is None
+    finally:
+        opened.close()
+        backend.close()
+        backend.unlink()
@@ -0,0 +1,129 @@
+import pytest
+
+from pydhcp.clock import CachedClock, VirtualClock
+from pydhcp.lease.journal import JournalLeaseBackend
+from pydhcp.network import IPv4
+from pydhcp.simulate import SERVER_INTERFACE, LeaseChurnSimulation, SimulatedDhcpServer
+
+
+def test_virtual_clock_moves_only_when_advanced() -> None:
+    clock = VirtualClock(1000.0)
+    cached = CachedClock(clock)
+    assert (clock.time(), clock.monotonic()) == (1000.0, 0.0)
+
+    assert clock.advance(30) == 1030.0
+    assert clock.advance_to(1020.0) == 1030.0
+    assert clock.advance_to(1100.0) == 1100.0
+    assert clock.monotonic() == 100.0
+    assert cached.time() == 1000.0
+    assert cached.tick() == 1100.0
+    with pytest.raises(ValueError):
+        clock.advance(-1)
+
+
+def test_simulated_server_answers_on_its_own_interface_only() -> None:
+    server = SimulatedDhcpServer()
+    assert server.server_interface(SERVER_INTERFACE.ip) is SERVER_INTERFACE
+    assert server.server_interface(IPv4("127.0.0.1")) is None
+
+
+def test_a_day_of_churn_is_repeatable_and_fits_the_pool() -> None:
+    report = LeaseChurnSimulation(200, seed=7).run()
+    again = LeaseChurnSimulation(200, seed=7).run()
+
+    assert report == again
+    assert report.duration == 86400.0
+    assert report.discovers_unanswered == 0
+    assert report.exhausted_at is None
+    assert report.naks == 0
+    assert 0 < report.peak_leases <= 200
+    assert report.packets > 2 * report.peak_leases
+    assert report.releases > 0
+    # Every packet was a DISCOVER, REQUEST or RELEASE, each one write.
+    assert report.backend_writes == report.packets
+    assert report.samples[0].time == 0.0
+    assert report.samples[-1].time == 86400.0
+    assert report.samples[-1].traced_bytes is None
+
+    resumed = LeaseChurnSimulation(200, seed=7)
+    resumed.run(36000)
+    assert resumed.run(50400) == report
+
+
+def test_silent_departures_are_reclaimed_by_the_server() -> None:
+    simulation = LeaseChurnSimulation(100, lease_time=600, release_ratio=0.0, mean_online=3600, mean_offline=3600)
+    report = simulation.run(6 * 3600)
+
+    assert report.releases == 0
+    assert report.renewals > 0
+    assert simulation.server.metrics.leases_reclaimed > 0
+    assert report.samples[-1].leases < report.peak_leases
+
+
+def test_lost_renewals_rebind_and_then_expire() -> None:
+    report = LeaseChurnSimulation(50, lease_time=3600, loss=1.0, mean_online=86400, mean_offline=600).run(4 * 3600)
+
+    assert report.renewals > 0
+    assert 0 < report.rebinds <= report.renewals
+    assert report.client_expiries > 0
+    # Lost renewals and rebinds never reach the server.
+    assert report.backend_writes == report.packets
+
+
+def test_a_small_pool_runs_out() -> None:
+    report = LeaseChurnSimulation(60, pool_size=10, lease_time=4 * 3600, release_ratio=0.0).run()
+
+    assert report.pool_size == 10
+    assert report.peak_leases == 10
+    assert report.discovers_unanswered > 0
+    assert report.exhausted_at is not None and 0 < report.exhausted_at < 86400
+
+
+def test_persisted_writes_and_memory_are_reported(tmp_path) -> None:
+    clock = VirtualClock()
+    backend = JournalLeaseBackend(str(tmp_path / "leases.json"), fsync="none", clock=clock)
+    try:
+        report = LeaseChurnSimulation(50, lease_backend=backend, clock=clock, trace_memory=True).run(6 * 3600)
+    finally:
+        backend.close()
+
+    assert report.persisted_writes == backend.seq > 0
+    assert report.peak_traced_bytes is not None and report.peak_traced_bytes > 0
+    assert all(sample.traced_bytes is not None for sample in report.samples)
+    assert report.samples[-1].persisted_writes == backend.seq
+
+
+def test_without_the_wire_clients_see_the_same_day_with_half_the_dora_writes(tmp_path) -> None:
+    wire = LeaseChurnSimulation(200, seed=7).run()
+    direct = LeaseChurnSimulation(200, seed=7, wire=False)
+    report = direct.run()
+
+    assert (report.packets, report.peak_leases, report.releases, report.renewals) == (
+        wire.packets,
+        wire.peak_leases,
+        wire.releases,
+        wire.renewals,
+    )
+    # The REQUEST after each DISCOVER renews in the wire path; here the allocation is the only write.
+    assert report.backend_writes < wire.backend_writes
+    backend = direct.server.lease_backend
+    for index in range(200):
+        ip = direct._ip[index]
+        if ip is not None:
+            assert backend.lookup_ip(ip)[0] == direct.client_id(index)
+
+    clock = VirtualClock()
+    backend = JournalLeaseBackend(str(tmp_path / "leases.json"), fsync="none", clock=clock)
+    try:
+        journaled = LeaseChurnSimulation(50, lease_backend=backend, clock=clock, wire=False).run(6 * 3600)
+    finally:
+        backend.close()
+    assert journaled.persisted_writes == backend.seq > 0
+
+
+def test_without_the_wire_a_small_pool_still_runs_out() -> None:
+    report = LeaseChurnSimulation(60, pool_size=10, lease_time=4 * 3600, release_ratio=0.0, wire=False).run()
+
+    assert report.peak_leases == 10
+    assert report.discovers_unanswered > 0
+    assert report.exhausted_at is not None
@@ -0,0 +1,104 @@
+import time
+
+from pydhcp import DhcpOptions, IPv4, IPv4Address
+from pydhcp.lease import LeaseQueryBackend, pack_options, unpack_options
+from pydhcp.clock import CachedClock, VirtualClock
+from pydhcp.lease.sqlite import SqliteLeaseBackend
+from pydhcp.options import DhcpOptionCode
+from pydhcp.server import DhcpServer
+
+
+def test_round_trip_and_indexes(tmp_path) -> None:
+    path = str(tmp_path / "leases.db")
+    backend = SqliteLeaseBackend(path)
+    assert isinstance(backend, LeaseQueryBackend)
+    options = DhcpOptions()
+    options[DhcpOptionCode.SUBNET_MASK] = IPv4("255.255.255.0")
+
+    lease = backend.allocate("a", IPv4("10.0.0.1"), 3600, options, chaddr=b"\x02\x00\x00\x00\x00\x01")
+    backend.allocate("b", IPv4("10.0.0.2"), float("inf"))
+    assert backend.lookup("a") == lease
+    assert backend.lookup("b").expires == float("inf")
+    assert backend.lookup_ip(IPv4("10.0.0.1"))[0] == "a"
+    assert backend.lookup_chaddr(b"\x02\x00\x00\x00\x00\x01")[0] == "a"
+
+    # Re-allocating without a chaddr keeps the stored one
+    backend.allocate("a", IPv4("10.0.0.3"), 3600, options)
+    assert backend.chaddr("a") == b"\x02\x00\x00\x00\x00\x01"
+    assert backend.lookup_ip(IPv4("10.0.0.1")) is None
+
+    renewed = backend.renew("a", 7200)
+    assert (renewed.expires - lease.expires).total_seconds() > 3000
+    assert backend.last_transaction("a") <= time.time()
+    assert backend.release("b") is True
+    assert backend.release("b") is False
+    backend.close()
+
+    reopened = SqliteLeaseBackend(path)
+    found = reopened.lookup("a")
+    assert found.ip == IPv4("10.0.0.3")
+    assert found.expires == renewed.expires
+    assert found.options.get(DhcpOptionCode.SUBNET_MASK, decode=IPv4Address) == IPv4("255.255.255.0")
+    assert reopened._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    reopened.close()
+
+
+def test_expired_leases_are_hidden_and_purged(tmp_path) -> None:
+    backend = SqliteLeaseBackend(str(tmp_path / "leases.db"))
+    backend.allocate("old", IPv4("10.0.0.1"), -10)
+    backend.allocate("older", IPv4("10.0.0.2"), -20)
+    backend.allocate("live", IPv4("10.0.0.3"), 3600)
+
+    assert backend.lookup("old") is None
+    assert backend.renew("old", 60) is None
+    assert backend.lookup_ip(IPv4("10.0.0.1")) is None
+    assert [client_id for client_id, _ in backend.iter_leases()] == ["live"]
+    assert [client_id for client_id, _ in backend.expired()] == ["older", "old"]
+    assert [client_id for client_id, _ in backend.expired(limit=1)] == ["older"]
+
+    assert backend.purge_expired() == 2
+    assert backend.expired() == []
+    backend.close()
+
+
+def test_batched_commits(tmp_path) -> None:
+    path = str(tmp_path / "leases.db")
+    backend = SqliteLeaseBackend(path, batch_size=10)
+    for i in range(25):
+        backend.allocate(f"client-{i}", IPv4(f"10.0.0.{i + 1}"), 3600)
+    assert backend.commits == 2
+
+    # Uncommitted writes are visible here but not to other connections
+    assert backend.lookup("client-24") is not None
+    other = SqliteLeaseBackend(path)
+    assert len(list(other.iter_leases())) == 20
+    backend.commit()
+    assert len(list(other.iter_leases(page_size=7))) == 25
+    other.close()
+    backend.close()
+
+
+def test_server_tick_sweeps_and_flushes_on_the_backend_clock(tmp_path) -> None:
+    path = str(tmp_path / "leases.db")
+    clock = VirtualClock()
+    backend = SqliteLeaseBackend(path, batch_size=10, clock=clock)
+    server = DhcpServer(lease_backend=backend, clock=CachedClock(clock))
+    backend.allocate("short", IPv4("10.0.0.1"), 60)
+    backend.allocate("long", IPv4("10.0.0.2"), 3600)
+    clock.advance(61)
+    assert backend.lookup("short") is None
+
+    server.tick()
+    other = SqliteLeaseBackend(path, clock=clock)
+    assert [client_id for client_id, _ in other.iter_leases()] == ["long"]
+    assert other.expired() == []
+    other.close()
+    backend.close()
+
+
+def test_pack_options_keeps_long_values() -> None:
+    options = DhcpOptions()
+    options[DhcpOptionCode.DOMAIN_NAME] = bytearray(b"x" * 600)
+    options[DhcpOptionCode.ROUTER] = IPv4("10.0.0.1")
+    unpacked = unpack_options(pack_options(options))
+    assert dict(unpacked.items(decoded=False)) == dict(options.items(decoded=False))
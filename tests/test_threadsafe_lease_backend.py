@@ -0,0 +1,222 @@
+import threading
+from datetime import timedelta
+
+import pytest
+
+from pydhcp import DhcpMessage, DhcpOptions, FileLeaseBackend, InMemoryLeaseBackend, IPv4
+from pydhcp.lease import LeaseQueryBackend
+from pydhcp.lease.mmapped import MmapLeaseBackend
+from pydhcp.lease.threadsafe import ThreadSafeLeaseBackend
+from pydhcp.options import DhcpOptionCode
+from pydhcp.packet import DhcpMessageType, Flags, HardwareAddressType, OpCode
+from pydhcp.server import DhcpServer
+
+
+def test_allocate_if_free_refuses_an_address_held_by_another_client() -> None:
+    backend = ThreadSafeLeaseBackend()
+    assert isinstance(backend, LeaseQueryBackend)
+    ip = IPv4("10.0.0.1")
+    first = backend.allocate_if_free("a", ip, 3600, chaddr=b"\x00\x00\x00\x00\x00\x01")
+    assert first is not None
+    assert backend.allocate_if_free("b", ip, 3600) is None
+    assert backend.lookup("b") is None
+    assert backend.lookup_ip(ip)[0] == "a"
+    assert backend.chaddr("a") == b"\x00\x00\x00\x00\x00\x01"
+
+    # The holder may re-bind its own address; a released or expired address is free again.
+    assert backend.allocate_if_free("a", ip, 7200) is not None
+    backend.release("a")
+    assert backend.allocate_if_free("b", ip, -1) is not None
+    assert backend.allocate_if_free("c", ip, 3600) is not None
+    assert [client_id for client_id, _ in backend.iter_leases()] == ["c"]
+
+
+def test_other_backend_methods_are_forwarded(tmp_path) -> None:
+    backend = ThreadSafeLeaseBackend(FileLeaseBackend(str(tmp_path / "leases.json"), flush_interval=60))
+    backend.allocate("a", IPv4("10.0.0.1"), 3600)
+    backend.renew("a", 3600)
+    backend.flush()
+    assert backend.saves == 2
+    assert backend.sweep() == 0
+
+
+def test_backends_without_an_address_index_are_rejected(tmp_path) -> None:
+    store = MmapLeaseBackend(str(tmp_path / "leases.mmap"), capacity=64)
+    with pytest.raises(TypeError):
+        ThreadSafeLeaseBackend(store)
+    store.close()
+
+
+def test_racing_threads_never_share_an_address() -> None:
+    backend = ThreadSafeLeaseBackend(InMemoryLeaseBackend(), stripes=8)
+    addresses = [IPv4(f"10.0.0.{i}") for i in range(1, 33)]
+    barrier = threading.Barrier(16)
+    won: dict[int, list[tuple[str, IPv4]]] = {}
+
+    def worker(n: int) -> None:
+        barrier.wait()
+        mine = won.setdefault(n, [])
+        for round_ in range(50):
+            client_id = f"t{n}-{round_ % 4}"
+            for ip in addresses[(n + round_) % len(addresses) :] + addresses:
+                if backend.allocate_if_free(client_id, ip, 3600) is not None:
+                    mine.append((client_id, ip))
+                    break
+            if round_ % 3 == 0:
+                backend.release(client_id)
+            with backend.client_lock(client_id):
+                lease = backend.lookup(client_id)
+                if lease is not None:
+                    assert backend.lookup_ip(lease.ip)[0] == client_id
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert any(won.values())
+    holders: dict[IPv4, str] = {}
+    for client_id, lease in backend.iter_leases():
+        assert lease.ip not in holders, f"{lease.ip} bound to {holders.get(lease.ip)} and {client_id}"
+        holders[lease.ip] = client_id
+        assert backend.lookup_ip(lease.ip)[0] == client_id
+    assert len(holders) <= len(addresses)
+
+
+def test_clients_moving_across_stripes_do_not_deadlock() -> None:
+    # With two stripes, .2 and .4 share one and .3 and .5 the other: moving
+    # a from .2 to .5 while b moves from .3 to .4 needs both stripes in
+    # opposite orders unless they are taken in a fixed one.
+    backend = ThreadSafeLeaseBackend(InMemoryLeaseBackend(), stripes=2)
+    moves = {"a": (IPv4("10.0.0.2"), IPv4("10.0.0.5")), "b": (IPv4("10.0.0.3"), IPv4("10.0.0.4"))}
+    barrier = threading.Barrier(len(moves))
+
+    def worker(client_id: str) -> None:
+        barrier.wait()
+        for round_ in range(2000):
+            ip = moves[client_id][round_ % 2]
+            if round_ % 4 < 2:
+                backend.allocate(client_id, ip, 3600)
+            else:
+                backend.allocate_if_free(client_id, ip, 3600)
+
+    threads = [threading.Thread(target=worker, args=(client_id,), daemon=True) for client_id in moves]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+        assert not thread.is_alive(), "lease backend deadlocked"
+
+    assert backend.lookup("a").ip == IPv4("10.0.0.5")
+    assert backend.lookup("b").ip == IPv4("10.0.0.4")
+    assert backend.lookup_ip(IPv4("10.0.0.2")) is None
+
+
+class BlockingBackend(InMemoryLeaseBackend):
+    """Holds lookups for "slow" until released, to see what else runs meanwhile."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.entered = threading.Event()
+        self.proceed = threading.Event()
+
+    def lookup(self, client_id):
+        if client_id == "slow":
+            self.entered.set()
+            self.proceed.wait(10)
+        return super().lookup(client_id)
+
+
+def test_lookups_for_different_clients_run_in_parallel() -> None:
+    inner = BlockingBackend()
+    backend = ThreadSafeLeaseBackend(inner)
+    backend.allocate("fast", IPv4("10.0.0.1"), 3600)
+    done = threading.Event()
+
+    def slow() -> None:
+        backend.lookup("slow")
+        done.set()
+
+    thread = threading.Thread(target=slow)
+    thread.start()
+    try:
+        assert inner.entered.wait(10)
+        # Neither a lookup nor a write for another client waits for the one in progress.
+        assert backend.lookup("fast").ip == IPv4("10.0.0.1")
+        assert backend.lookup_ip(IPv4("10.0.0.1"))[0] == "fast"
+        assert backend.renew("fast", 7200) is not None
+        assert not done.is_set()
+    finally:
+        inner.proceed.set()
+        thread.join(timeout=10)
+    assert done.is_set()
+
+
+def test_lookups_leave_expired_leases_to_the_sweep() -> None:
+    inner = InMemoryLeaseBackend()
+    backend = ThreadSafeLeaseBackend(inner)
+    backend.allocate("a", IPv4("10.0.0.1"), -1)
+    assert backend.lookup("a") is None
+    assert backend.lookup_ip(IPv4("10.0.0.1")) is None
+    assert "a" in inner._leases
+    assert backend.sweep() == 1
+    assert "a" not in inner._leases
+
+
+def test_iter_leases_reads_a_page_at_a_time() -> None:
+    class CountingBackend(InMemoryLeaseBackend):
+        read = 0
+
+        def iter_leases(self):
+            for binding in super().iter_leases():
+                self.read += 1
+                yield binding
+
+    inner = CountingBackend()
+    for i in range(100):
+        inner.allocate(f"client-{i}", IPv4(f"10.0.0.{i + 1}"), 3600)
+    backend = ThreadSafeLeaseBackend(inner)
+    leases = backend.iter_leases(page_size=10)
+    next(leases)
+    assert inner.read == 10
+    # The lock is free between pages, so another thread's write goes through.
+    writer = threading.Thread(target=backend.allocate, args=("late", IPv4("10.0.1.1"), 3600))
+    writer.start()
+    writer.join(timeout=1.0)
+    assert not writer.is_alive()
+    assert len(list(leases)) == 100
+    assert inner.read == 101
+
+
+def _request(chaddr: bytes, ip: str) -> DhcpMessage:
+    options = DhcpOptions()
+    options[DhcpOptionCode.DHCP_MESSAGE_TYPE] = DhcpMessageType.DHCPREQUEST
+    options[DhcpOptionCode.REQUESTED_IP] = IPv4(ip)
+    return DhcpMessage(
+        op=OpCode.BOOTREQUEST,
+        htype=HardwareAddressType.ETHERNET,
+        hlen=6,
+        hops=0,
+        xid=1,
+        secs=timedelta(seconds=0),
+        flags=Flags.UNICAST,
+        ciaddr=IPv4("0.0.0.0"),
+        yiaddr=IPv4("0.0.0.0"),
+        siaddr=IPv4("0.0.0.0"),
+        giaddr=IPv4("0.0.0.0"),
+        chaddr=chaddr,
+        sname="",
+        file="",
+        options=options,
+    )
+
+
+def test_server_does_not_allocate_a_taken_address() -> None:
+    server = DhcpServer(lease_backend=ThreadSafeLeaseBackend())
+    first = _request(b"\x00\x00\x00\x00\x00\x01", "127.0.0.50")
+    second = _request(b"\x00\x00\x00\x00\x00\x02", "127.0.0.50")
+    assert server.acquire_lease(first.client_id(), IPv4("127.0.0.1"), first) is not None
+    assert server.acquire_lease(second.client_id(), IPv4("127.0.0.1"), second) is None
+    assert server.metrics.leases_allocated == 1
+    assert server.lease_backend.chaddr(first.client_id()) == b"\x00\x00\x00\x00\x00\x01"